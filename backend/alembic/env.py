@@ -13,7 +13,18 @@ from app.database import Base
 from app.models.user import User
 from app.models.note import Note
 from app.models.favorite import Favorite
+from app.models.ai_blob import AIBlob
 from app.models.ai_generation import AIGeneration
+from app.models.sync_counter import SyncCounter
+from app.models.note_tombstone import NoteTombstone
+from app.models.rate_limit_bucket import RateLimitBucket
+from app.models.note_revision import NoteRevision
+from app.models.refresh_token import RefreshToken
+from app.models.personal_access_token import PersonalAccessToken
+from app.models.revoked_token import RevokedToken
+from app.models.account_deletion import AccountDeletion
+from app.models.event_stream_ticket import EventStreamTicket
+from app.models.ai_generation import PARTITION_NAME_PATTERN
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -31,6 +42,22 @@ if config.config_file_name is not None:
 # for 'autogenerate' support
 target_metadata = Base.metadata
 
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """
+    autogenerate の比較対象から除外するオブジェクト
+
+    ai_generations の月ごとのパーティション（ai_generations_yYYYYmMM）は
+    ai_service.maintain_generation_partitions が作成・削除するため、モデルには含めない
+    """
+    if type_ == "table" and PARTITION_NAME_PATTERN.match(name):
+        return False
+    if type_ == "index" and PARTITION_NAME_PATTERN.match(object.table.name):
+        return False
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -53,6 +80,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -75,7 +103,11 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+        )
 
         with context.begin_transaction():
             context.run_migrations()
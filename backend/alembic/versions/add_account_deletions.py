@@ -0,0 +1,58 @@
+"""Add account_deletions table and indexes for batched account deletion
+
+Revision ID: add_account_deletions
+Revises: add_users_created_idx
+Create Date: 2025-12-15 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "add_account_deletions"
+down_revision: Union[str, Sequence[str], None] = "add_users_created_idx"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "account_deletions",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("stage", sa.String(length=20), nullable=False),
+        sa.Column(
+            "favorites_deleted", sa.Integer(), server_default="0", nullable=False
+        ),
+        sa.Column(
+            "generations_deleted", sa.Integer(), server_default="0", nullable=False
+        ),
+        sa.Column(
+            "revisions_deleted", sa.Integer(), server_default="0", nullable=False
+        ),
+        sa.Column("notes_deleted", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("lease_owner", sa.String(length=32), nullable=True),
+        sa.Column("lease_until", sa.DateTime(), nullable=True),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("requested_date", sa.DateTime(), nullable=False),
+        sa.Column("updated_date", sa.DateTime(), nullable=False),
+        sa.Column("completed_date", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    # ノート削除時の外部キー検査（お気に入りの参照）で全件走査しないよう
+    op.create_index("idx_favorites_note", "favorites", ["note_id"], unique=False)
+    # ユーザー削除時の外部キー検査（CASCADE）とリビジョンのバッチ削除用
+    op.create_index(
+        "idx_note_revisions_user", "note_revisions", ["user_id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("idx_note_revisions_user", table_name="note_revisions")
+    op.drop_index("idx_favorites_note", table_name="favorites")
+    op.drop_table("account_deletions")
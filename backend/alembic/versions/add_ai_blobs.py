@@ -0,0 +1,146 @@
+"""Deduplicate AI generation prompts and outputs into ai_blobs
+
+Revision ID: add_ai_blobs
+Revises: add_content_compression
+Create Date: 2025-11-26 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.config import settings
+from app.database import apply_content_compression
+from app.models.ai_generation import BLOB_REFCOUNT_FUNCTION, BLOB_REFCOUNT_TRIGGER
+
+
+# revision identifiers, used by Alembic.
+revision: str = "add_ai_blobs"
+down_revision: Union[str, Sequence[str], None] = "add_content_compression"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_SHA256 = "encode(sha256(convert_to({}, 'UTF8')), 'hex')"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "ai_blobs",
+        sa.Column("hash", sa.String(length=64), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("refcount", sa.Integer(), server_default="0", nullable=False),
+        sa.Column(
+            "created_date",
+            sa.DateTime(),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("hash"),
+    )
+    op.create_index(
+        "idx_ai_blobs_unreferenced",
+        "ai_blobs",
+        ["hash"],
+        unique=False,
+        postgresql_where=sa.text("refcount <= 0"),
+    )
+
+    # 既存の本文をBLOBに移す（refcount は参照数）
+    op.execute(
+        f"""
+        INSERT INTO ai_blobs (hash, content, refcount)
+        SELECT {_SHA256.format("body")}, body, count(*)
+        FROM (
+            SELECT prompt AS body FROM ai_generations
+            UNION ALL
+            SELECT generated_content FROM ai_generations
+        ) AS bodies
+        GROUP BY body
+        """
+    )
+    op.add_column(
+        "ai_generations", sa.Column("prompt_hash", sa.String(length=64), nullable=True)
+    )
+    op.add_column(
+        "ai_generations", sa.Column("content_hash", sa.String(length=64), nullable=True)
+    )
+    op.execute(
+        f"""
+        UPDATE ai_generations
+        SET prompt_hash = {_SHA256.format("prompt")},
+            content_hash = {_SHA256.format("generated_content")}
+        """
+    )
+    op.alter_column("ai_generations", "prompt_hash", nullable=False)
+    op.alter_column("ai_generations", "content_hash", nullable=False)
+    op.create_foreign_key(
+        "ai_generations_prompt_hash_fkey",
+        "ai_generations",
+        "ai_blobs",
+        ["prompt_hash"],
+        ["hash"],
+    )
+    op.create_foreign_key(
+        "ai_generations_content_hash_fkey",
+        "ai_generations",
+        "ai_blobs",
+        ["content_hash"],
+        ["hash"],
+    )
+    op.create_index(
+        "idx_ai_generations_prompt_hash", "ai_generations", ["prompt_hash"], unique=False
+    )
+    op.create_index(
+        "idx_ai_generations_content_hash",
+        "ai_generations",
+        ["content_hash"],
+        unique=False,
+    )
+    op.drop_column("ai_generations", "prompt")
+    op.drop_column("ai_generations", "generated_content")
+
+    op.execute(BLOB_REFCOUNT_FUNCTION)
+    op.execute(BLOB_REFCOUNT_TRIGGER)
+
+    # 本文の圧縮方式を他の大きなテキストカラムと揃える
+    if settings.CONTENT_COMPRESSION:
+        apply_content_compression(
+            op.get_bind(), settings.CONTENT_COMPRESSION, {"ai_blobs": ("content",)}
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER ai_generations_blob_refcount ON ai_generations")
+    op.execute("DROP FUNCTION ai_generation_blob_refcount()")
+
+    op.add_column("ai_generations", sa.Column("prompt", sa.Text(), nullable=True))
+    op.add_column(
+        "ai_generations", sa.Column("generated_content", sa.Text(), nullable=True)
+    )
+    op.execute(
+        """
+        UPDATE ai_generations AS g
+        SET prompt = p.content, generated_content = c.content
+        FROM ai_blobs AS p, ai_blobs AS c
+        WHERE p.hash = g.prompt_hash AND c.hash = g.content_hash
+        """
+    )
+    op.alter_column("ai_generations", "prompt", nullable=False)
+    op.alter_column("ai_generations", "generated_content", nullable=False)
+
+    op.drop_index("idx_ai_generations_content_hash", table_name="ai_generations")
+    op.drop_index("idx_ai_generations_prompt_hash", table_name="ai_generations")
+    op.drop_constraint(
+        "ai_generations_content_hash_fkey", "ai_generations", type_="foreignkey"
+    )
+    op.drop_constraint(
+        "ai_generations_prompt_hash_fkey", "ai_generations", type_="foreignkey"
+    )
+    op.drop_column("ai_generations", "content_hash")
+    op.drop_column("ai_generations", "prompt_hash")
+    op.drop_index("idx_ai_blobs_unreferenced", table_name="ai_blobs")
+    op.drop_table("ai_blobs")
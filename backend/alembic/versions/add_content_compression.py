@@ -0,0 +1,55 @@
+"""Set TOAST compression for large text columns (opt-in)
+
+Revision ID: add_content_compression
+Revises: add_note_revisions
+Create Date: 2025-11-24 00:00:00.000000
+
+"""
+
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+
+from app.core.config import settings
+from app.database import apply_content_compression
+
+
+# revision identifiers, used by Alembic.
+revision: str = "add_content_compression"
+down_revision: Union[str, Sequence[str], None] = "add_note_revisions"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+# このリビジョン時点の対象カラム（以降のマイグレーションで変わっても固定）
+COLUMNS = {
+    "notes": ("content",),
+    "note_revisions": ("content", "delta"),
+    "ai_generations": ("generated_content",),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONTENT_COMPRESSION が設定されている場合のみ変更する（例: lz4）
+    # 既存の値は再圧縮されない（必要なら VACUUM FULL などで書き直す）
+    if settings.CONTENT_COMPRESSION:
+        if not apply_content_compression(
+            op.get_bind(), settings.CONTENT_COMPRESSION, COLUMNS
+        ):
+            logger.warning(
+                f"Compression method {settings.CONTENT_COMPRESSION} is not supported "
+                "by the database server; skipped"
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table_name, columns in COLUMNS.items():
+        for column_name in columns:
+            op.execute(
+                f"ALTER TABLE {table_name} ALTER COLUMN {column_name} "
+                "SET COMPRESSION DEFAULT"
+            )
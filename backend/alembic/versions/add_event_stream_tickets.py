@@ -0,0 +1,54 @@
+"""Add event_stream_tickets table
+
+Revision ID: add_event_stream_tickets
+Revises: add_account_deletions
+Create Date: 2025-12-17 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "add_event_stream_tickets"
+down_revision: Union[str, Sequence[str], None] = "add_account_deletions"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "event_stream_tickets",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("token_hash", sa.String(length=64), nullable=False),
+        sa.Column("jti", sa.String(length=32), nullable=True),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.Column("created_date", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("token_hash"),
+    )
+    op.create_index(
+        op.f("ix_event_stream_tickets_id"),
+        "event_stream_tickets",
+        ["id"],
+        unique=False,
+    )
+    op.create_index(
+        "idx_event_stream_tickets_expires",
+        "event_stream_tickets",
+        ["expires_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("idx_event_stream_tickets_expires", table_name="event_stream_tickets")
+    op.drop_index(op.f("ix_event_stream_tickets_id"), table_name="event_stream_tickets")
+    op.drop_table("event_stream_tickets")
@@ -0,0 +1,129 @@
+"""Partition ai_generations by month of created_date
+
+Revision ID: add_generation_partitions
+Revises: add_ai_blobs
+Create Date: 2025-11-28 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.config import settings
+from app.models.ai_generation import (
+    BLOB_REFCOUNT_TRIGGER,
+    add_months,
+    create_partition_ddl,
+)
+
+
+# revision identifiers, used by Alembic.
+revision: str = "add_generation_partitions"
+down_revision: Union[str, Sequence[str], None] = "add_ai_blobs"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_COLUMNS = "id, user_id, note_ids, prompt_hash, ai_provider, content_hash, created_date"
+
+_INDEXES = (
+    ("idx_user_created", ["user_id", "created_date"]),
+    ("idx_ai_generations_prompt_hash", ["prompt_hash"]),
+    ("idx_ai_generations_content_hash", ["content_hash"]),
+)
+
+
+def _create_generations_table(primary_key, **kwargs) -> None:
+    """ai_generations を作成（id は既存のシーケンスを引き継ぐ）"""
+    op.create_table(
+        "ai_generations",
+        sa.Column(
+            "id",
+            sa.Integer(),
+            server_default=sa.text("nextval('ai_generations_id_seq'::regclass)"),
+            autoincrement=False,
+            nullable=False,
+        ),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("note_ids", sa.ARRAY(sa.Integer()), nullable=False),
+        sa.Column("prompt_hash", sa.String(length=64), nullable=False),
+        sa.Column("ai_provider", sa.String(length=50), nullable=False),
+        sa.Column("content_hash", sa.String(length=64), nullable=False),
+        sa.Column(
+            "created_date",
+            sa.DateTime(),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["prompt_hash"], ["ai_blobs.hash"]),
+        sa.ForeignKeyConstraint(["content_hash"], ["ai_blobs.hash"]),
+        sa.PrimaryKeyConstraint(*primary_key),
+        **kwargs,
+    )
+    op.execute("ALTER SEQUENCE ai_generations_id_seq OWNED BY ai_generations.id")
+
+
+def _set_aside_generations_table(indexes) -> None:
+    """既存の ai_generations を退避（インデックス名とシーケンスを解放する）"""
+    op.execute("DROP TRIGGER ai_generations_blob_refcount ON ai_generations")
+    for index_name in indexes:
+        op.drop_index(index_name, table_name="ai_generations")
+    op.rename_table("ai_generations", "ai_generations_old")
+    op.execute("ALTER INDEX ai_generations_pkey RENAME TO ai_generations_old_pkey")
+    op.execute("ALTER SEQUENCE ai_generations_id_seq OWNED BY NONE")
+
+
+def _copy_generations_and_finish(indexes) -> None:
+    """退避したデータを移して古いテーブルを削除し、インデックスとトリガーを作成"""
+    # 行はそのまま移すため、BLOBの参照数を変えないようトリガーは最後に作成する
+    op.execute(
+        f"INSERT INTO ai_generations ({_COLUMNS}) "
+        f"SELECT {_COLUMNS} FROM ai_generations_old"
+    )
+    op.drop_table("ai_generations_old")
+    for index_name, columns in indexes:
+        op.create_index(index_name, "ai_generations", columns, unique=False)
+    op.execute(BLOB_REFCOUNT_TRIGGER)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 主キーは (id, created_date) になるため、id だけのインデックスは不要
+    _set_aside_generations_table(
+        ["ix_ai_generations_id"] + [index_name for index_name, _ in _INDEXES]
+    )
+    _create_generations_table(
+        ("id", "created_date"), postgresql_partition_by="RANGE (created_date)"
+    )
+
+    # 既存データの最も古い月から、当月の AI_GENERATION_PARTITIONS_AHEAD か月先まで
+    first, last, current = (
+        op.get_bind()
+        .execute(
+            sa.text(
+                "SELECT date_trunc('month', coalesce(min(created_date), now()))::date,"
+                " date_trunc('month', coalesce(max(created_date), now()))::date,"
+                " date_trunc('month', now())::date"
+                " FROM ai_generations_old"
+            )
+        )
+        .one()
+    )
+    last = max(last, add_months(current, settings.AI_GENERATION_PARTITIONS_AHEAD))
+    month = first
+    while month <= last:
+        op.execute(create_partition_ddl(month))
+        month = add_months(month, 1)
+
+    _copy_generations_and_finish(_INDEXES)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # 親テーブルのインデックスを削除すると各パーティションのインデックスも削除される
+    _set_aside_generations_table([index_name for index_name, _ in _INDEXES])
+    _create_generations_table(("id",))
+    # パーティションは親テーブルと一緒に削除される
+    _copy_generations_and_finish((("ix_ai_generations_id", ["id"]),) + _INDEXES)
@@ -0,0 +1,72 @@
+"""Add note revision history
+
+Revision ID: add_note_revisions
+Revises: add_rate_limit_buckets
+Create Date: 2025-11-20 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "add_note_revisions"
+down_revision: Union[str, Sequence[str], None] = "add_rate_limit_buckets"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "notes",
+        sa.Column("revision", sa.Integer(), server_default="1", nullable=False),
+    )
+
+    op.create_table(
+        "note_revisions",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("note_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("revision", sa.Integer(), nullable=False),
+        sa.Column("title", sa.String(length=200), nullable=False),
+        sa.Column("content", sa.Text(), nullable=True),
+        sa.Column("delta", sa.Text(), nullable=True),
+        sa.Column(
+            "created_date",
+            sa.DateTime(),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(["note_id"], ["notes.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_note_revisions_id"), "note_revisions", ["id"], unique=False
+    )
+    op.create_index(
+        "idx_note_revisions_note_rev",
+        "note_revisions",
+        ["note_id", "revision"],
+        unique=True,
+    )
+
+    # 既存ノートの現在の状態を最初のリビジョン（全文）として記録
+    op.execute(
+        """
+        INSERT INTO note_revisions (note_id, user_id, revision, title, content, created_date)
+        SELECT id, user_id, 1, title, content, updated_date FROM notes
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("idx_note_revisions_note_rev", table_name="note_revisions")
+    op.drop_index(op.f("ix_note_revisions_id"), table_name="note_revisions")
+    op.drop_table("note_revisions")
+    op.drop_column("notes", "revision")
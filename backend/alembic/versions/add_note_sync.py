@@ -0,0 +1,99 @@
+"""Add change sequence and tombstones for note delta sync
+
+Revision ID: add_note_sync
+Revises: add_notes_user_updated_idx
+Create Date: 2025-11-12 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "add_note_sync"
+down_revision: Union[str, Sequence[str], None] = "add_notes_user_updated_idx"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 既存ノートは change_seq = 0（初回同期で全件返される）
+    op.add_column(
+        "notes",
+        sa.Column(
+            "change_seq", sa.BigInteger(), server_default="0", nullable=False
+        ),
+    )
+    op.create_index(
+        "idx_notes_user_seq",
+        "notes",
+        ["user_id", "change_seq", "id"],
+        unique=False,
+    )
+
+    # ユーザーごとの変更シーケンス
+    op.create_table(
+        "sync_counters",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("last_seq", sa.BigInteger(), nullable=False),
+        sa.Column(
+            "compacted_seq", sa.BigInteger(), server_default="0", nullable=False
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+            ondelete="CASCADE",
+        ),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+
+    # 削除されたノートの墓標
+    op.create_table(
+        "note_tombstones",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("note_id", sa.Integer(), nullable=False),
+        sa.Column("change_seq", sa.BigInteger(), nullable=False),
+        sa.Column(
+            "deleted_date",
+            sa.DateTime(),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+            ondelete="CASCADE",
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_note_tombstones_id"), "note_tombstones", ["id"], unique=False
+    )
+    op.create_index(
+        "idx_tombstones_user_seq",
+        "note_tombstones",
+        ["user_id", "change_seq", "note_id"],
+        unique=False,
+    )
+    op.create_index(
+        "idx_tombstones_deleted",
+        "note_tombstones",
+        ["deleted_date"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("idx_tombstones_deleted", table_name="note_tombstones")
+    op.drop_index("idx_tombstones_user_seq", table_name="note_tombstones")
+    op.drop_index(op.f("ix_note_tombstones_id"), table_name="note_tombstones")
+    op.drop_table("note_tombstones")
+    op.drop_table("sync_counters")
+    op.drop_index("idx_notes_user_seq", table_name="notes")
+    op.drop_column("notes", "change_seq")
@@ -0,0 +1,35 @@
+"""Add notes (user_id, updated_date) index
+
+Revision ID: add_notes_user_updated_idx
+Revises: add_ai_generations
+Create Date: 2025-11-10 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "add_notes_user_updated_idx"
+down_revision: Union[str, Sequence[str], None] = "add_ai_generations"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ノート一覧取得とETag用のバージョン確認（count + max(updated_date)）で使用
+    op.create_index(
+        "idx_notes_user_updated",
+        "notes",
+        ["user_id", "updated_date"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("idx_notes_user_updated", table_name="notes")
@@ -0,0 +1,65 @@
+"""Add personal_access_tokens table
+
+Revision ID: add_personal_access_tokens
+Revises: add_refresh_tokens
+Create Date: 2025-12-08 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "add_personal_access_tokens"
+down_revision: Union[str, Sequence[str], None] = "add_refresh_tokens"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "personal_access_tokens",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=100), nullable=False),
+        sa.Column("token_hash", sa.String(length=64), nullable=False),
+        sa.Column("token_prefix", sa.String(length=16), nullable=False),
+        sa.Column(
+            "scopes", postgresql.ARRAY(sa.String(length=32)), nullable=False
+        ),
+        sa.Column("expires_at", sa.DateTime(), nullable=True),
+        sa.Column("last_used_date", sa.DateTime(), nullable=True),
+        sa.Column("revoked_date", sa.DateTime(), nullable=True),
+        sa.Column("created_date", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("token_hash"),
+    )
+    op.create_index(
+        op.f("ix_personal_access_tokens_id"),
+        "personal_access_tokens",
+        ["id"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_personal_access_tokens_user_id"),
+        "personal_access_tokens",
+        ["user_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        op.f("ix_personal_access_tokens_user_id"), table_name="personal_access_tokens"
+    )
+    op.drop_index(
+        op.f("ix_personal_access_tokens_id"), table_name="personal_access_tokens"
+    )
+    op.drop_table("personal_access_tokens")
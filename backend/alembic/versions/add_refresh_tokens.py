@@ -0,0 +1,57 @@
+"""Add refresh_tokens table
+
+Revision ID: add_refresh_tokens
+Revises: add_generation_partitions
+Create Date: 2025-12-05 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "add_refresh_tokens"
+down_revision: Union[str, Sequence[str], None] = "add_generation_partitions"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "refresh_tokens",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("token_hash", sa.String(length=64), nullable=False),
+        sa.Column("family_id", sa.String(length=32), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.Column("used_date", sa.DateTime(), nullable=True),
+        sa.Column("revoked_date", sa.DateTime(), nullable=True),
+        sa.Column("created_date", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("token_hash"),
+    )
+    op.create_index(
+        op.f("ix_refresh_tokens_id"), "refresh_tokens", ["id"], unique=False
+    )
+    op.create_index(
+        op.f("ix_refresh_tokens_family_id"),
+        "refresh_tokens",
+        ["family_id"],
+        unique=False,
+    )
+    op.create_index(
+        "idx_refresh_tokens_expires", "refresh_tokens", ["expires_at"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("idx_refresh_tokens_expires", table_name="refresh_tokens")
+    op.drop_index(op.f("ix_refresh_tokens_family_id"), table_name="refresh_tokens")
+    op.drop_index(op.f("ix_refresh_tokens_id"), table_name="refresh_tokens")
+    op.drop_table("refresh_tokens")
@@ -0,0 +1,49 @@
+"""Add revoked_tokens table
+
+Revision ID: add_revoked_tokens
+Revises: add_personal_access_tokens
+Create Date: 2025-12-10 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "add_revoked_tokens"
+down_revision: Union[str, Sequence[str], None] = "add_personal_access_tokens"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "revoked_tokens",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("jti", sa.String(length=32), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.Column("created_date", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("jti"),
+    )
+    op.create_index(
+        op.f("ix_revoked_tokens_id"), "revoked_tokens", ["id"], unique=False
+    )
+    op.create_index(
+        "idx_revoked_tokens_created", "revoked_tokens", ["created_date"], unique=False
+    )
+    op.create_index(
+        "idx_revoked_tokens_expires", "revoked_tokens", ["expires_at"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("idx_revoked_tokens_expires", table_name="revoked_tokens")
+    op.drop_index("idx_revoked_tokens_created", table_name="revoked_tokens")
+    op.drop_index(op.f("ix_revoked_tokens_id"), table_name="revoked_tokens")
+    op.drop_table("revoked_tokens")
@@ -0,0 +1,35 @@
+"""Add users (created_date, id) index
+
+Revision ID: add_users_created_idx
+Revises: add_revoked_tokens
+Create Date: 2025-12-12 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "add_users_created_idx"
+down_revision: Union[str, Sequence[str], None] = "add_revoked_tokens"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ユーザー一覧のキーセットページネーションと作成日時での絞り込みで使用
+    op.create_index(
+        "idx_users_created",
+        "users",
+        ["created_date", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("idx_users_created", table_name="users")
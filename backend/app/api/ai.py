@@ -1,34 +1,38 @@
 # AI API routes
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 from app.schemas.ai_schema import (
     AIGenerationRequest,
     AIGenerationResponse,
     SaveAsNoteRequest,
     GenerationListResponse,
+    GenerationSummaryListResponse,
+    AI_GENERATION_RESPONSE_FIELDS,
+    AI_GENERATION_SUMMARY_FIELDS,
 )
 from app.schemas.note_schema import NoteResponse
 from app.services import ai_service
 from app.core.security import get_current_user
-from typing import Optional
+from app.core.rate_limit import rate_limit
+from app.core.config import settings
+from app.core.responses import ORJSONResponse, project_records, not_modified
+from app.core.utils import make_weak_etag, etag_matches, etag_headers, fields_digest
+from typing import Literal, Optional, Union
 
 router = APIRouter(prefix="/api/ai", tags=["ai"])
 
-# レート制限の設定
-limiter = Limiter(key_func=get_remote_address)
-
 
 @router.post(
     "/generate-idea",
     response_model=AIGenerationResponse,
     status_code=status.HTTP_200_OK,
 )
-@limiter.limit("10/hour")
 async def generate_idea(
-    request: Request,
     payload: AIGenerationRequest,
     current_user=Depends(get_current_user),
+    # ユーザーごとのレート制限（全ワーカーで共有）
+    consume_rate_limit=Depends(
+        rate_limit(settings.AI_GENERATION_RATE_LIMIT, "generate_idea")
+    ),
 ):
     """
     AIを使用してアイデアを生成
@@ -37,8 +41,11 @@ async def generate_idea(
     - **prompt**: カスタムプロンプト（オプション、最大2000文字）
     - **ai_provider**: AIプロバイダー（openai, anthropic, gemini）
 
-    レート制限: 1時間あたり10回
+    レート制限: ユーザーごとに1時間あたり10回（RateLimit-* ヘッダーで残り回数を返します）。
+    検証エラー（422）のリクエストは回数に数えません
     """
+    # リクエストの検証に成功してから回数を消費する
+    await consume_rate_limit()
     try:
         result = await ai_service.generate_idea(
             note_ids=payload.note_ids,
@@ -60,12 +67,14 @@ async def generate_idea(
 
 @router.get(
     "/generations",
-    response_model=GenerationListResponse,
+    response_model=Union[GenerationListResponse, GenerationSummaryListResponse],
     status_code=status.HTTP_200_OK,
 )
 async def get_generations(
     page: int = 1,
     per_page: int = 20,
+    view: Literal["full", "summary"] = "full",
+    if_none_match: Optional[str] = Header(None),
     current_user=Depends(get_current_user),
 ):
     """
@@ -73,8 +82,11 @@ async def get_generations(
 
     - **page**: ページ番号（デフォルト: 1）
     - **per_page**: 1ページあたりの件数（デフォルト: 20）
+    - **view**: full（生成結果の全文）または summary（generated_content の代わりに
+      先頭部分の preview と文字数の content_length）。全文は
+      GET /api/ai/generations/{id} で取得する
 
-    作成日時の降順で返されます
+    作成日時の降順で返されます。If-None-Match が一致すれば 304 を返します
     """
     if page < 1:
         raise HTTPException(
@@ -88,12 +100,57 @@ async def get_generations(
             detail="Per page must be between 1 and 100",
         )
 
+    summary = view == "summary"
+    fields = AI_GENERATION_SUMMARY_FIELDS if summary else AI_GENERATION_RESPONSE_FIELDS
+
+    version = await ai_service.get_generations_version(current_user["id"])
+    parts = [version["count"], version["last_modified"], page, per_page]
+    if summary:
+        # 返すフィールドが異なる表現はETagも区別する
+        parts.append(fields_digest(fields))
+    etag = make_weak_etag(*parts)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
     result = await ai_service.get_generations(
         user_id=current_user["id"],
         page=page,
         per_page=per_page,
+        summary=summary,
+    )
+    result["items"] = project_records(result["items"], fields)
+    return ORJSONResponse(result, headers=etag_headers(etag))
+
+
+@router.get(
+    "/generations/{generation_id}",
+    response_model=AIGenerationResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def get_generation(
+    generation_id: int,
+    if_none_match: Optional[str] = Header(None),
+    current_user=Depends(get_current_user),
+):
+    """
+    AI生成履歴を1件取得（生成結果の全文を含む）
+
+    生成履歴は作成後に変更されないため、If-None-Match が一致すれば 304 を返します
+    """
+    generation = await ai_service.get_generation(generation_id, current_user["id"])
+    if not generation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Generation not found or access denied",
+        )
+
+    etag = make_weak_etag(generation["id"], generation["created_date"])
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    return ORJSONResponse(
+        project_records([generation], AI_GENERATION_RESPONSE_FIELDS)[0],
+        headers=etag_headers(etag),
     )
-    return result
 
 
 @router.post(
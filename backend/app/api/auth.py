@@ -1,9 +1,23 @@
 # Authentication API routes
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.security import OAuth2PasswordRequestForm
-from app.schemas.user_schema import UserCreate, UserResponse
-from app.services import user_service
-from app.core.security import create_access_token, get_current_user
+from typing import List, Optional
+from app.schemas.user_schema import (
+    UserCreate,
+    UserResponse,
+    Token,
+    RefreshTokenRequest,
+    PersonalAccessTokenCreate,
+    PersonalAccessTokenResponse,
+    PersonalAccessTokenCreated,
+)
+from app.services import user_service, token_service
+from app.core.security import (
+    create_access_token,
+    decode_access_token,
+    get_current_user,
+    optional_oauth2_scheme,
+)
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
@@ -11,18 +25,20 @@ router = APIRouter(prefix="/api/auth", tags=["auth"])
 @router.post("/register", response_model=UserResponse, status_code=201)
 async def register(payload: UserCreate):
     """新規ユーザー登録"""
-    # ユーザー名の重複チェック
-    existing_user = await user_service.get_by_username(payload.username)
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Username already exists")
-
     user = await user_service.create_user(payload)
+    if not user:
+        # ユーザー名の重複
+        raise HTTPException(status_code=400, detail="Username already exists")
     return user
 
 
-@router.post("/login")
+@router.post("/login", response_model=Token)
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    """ログイン"""
+    """
+    ログイン
+
+    アクセストークンと、期限切れ後に再ログインせず更新するためのリフレッシュトークンを返す
+    """
     user = await user_service.authenticate_user(form_data.username, form_data.password)
     if not user:
         raise HTTPException(
@@ -32,10 +48,97 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
         )
 
     access_token = create_access_token(data={"sub": user["username"]})
-    return {"access_token": access_token, "token_type": "bearer"}
+    refresh_token = await token_service.issue_refresh_token(user["id"])
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+    }
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh(payload: RefreshTokenRequest):
+    """
+    アクセストークンの更新（パスワードの検証なし）
+
+    リフレッシュトークンは1回限り有効で、新しいリフレッシュトークンと交換する。
+    使用済みのトークンが再び使われた場合は、そのログインのトークンをすべて失効させる。
+    """
+    session = await token_service.rotate_refresh_token(payload.refresh_token)
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    access_token = create_access_token(data={"sub": session["username"]})
+    return {
+        "access_token": access_token,
+        "refresh_token": session["refresh_token"],
+        "token_type": "bearer",
+    }
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    payload: RefreshTokenRequest,
+    access_token: Optional[str] = Depends(optional_oauth2_scheme),
+):
+    """
+    ログアウト（リフレッシュトークンを失効させる）
+
+    Authorization ヘッダーのアクセストークンも、期限を待たずに失効させる
+    """
+    await token_service.revoke_refresh_token(payload.refresh_token)
+    claims = decode_access_token(access_token) if access_token else None
+    if claims and claims.get("jti"):
+        await token_service.revoke_access_token(claims["jti"], claims["exp"])
+    return None
 
 
 @router.get("/me", response_model=UserResponse)
 async def read_users_me(current_user: dict = Depends(get_current_user)):
     """現在のユーザー情報取得"""
     return current_user
+
+
+@router.post(
+    "/tokens",
+    response_model=PersonalAccessTokenCreated,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_personal_access_token(
+    payload: PersonalAccessTokenCreate, current_user=Depends(get_current_user)
+):
+    """
+    パーソナルアクセストークンを作成（スクリプトなどから Bearer トークンとして使う）
+
+    - **scopes**: 使えるAPI（notes / favorites / ai）と read / write の組み合わせ
+    - **expires_in_days**: 有効期限の日数（省略時は無期限）
+
+    トークン本体はこのレスポンスでのみ返す
+    """
+    return await token_service.create_personal_access_token(
+        current_user["id"], payload.name, payload.scopes, payload.expires_in_days
+    )
+
+
+@router.get("/tokens", response_model=List[PersonalAccessTokenResponse])
+async def get_personal_access_tokens(current_user=Depends(get_current_user)):
+    """パーソナルアクセストークンの一覧"""
+    return await token_service.get_personal_access_tokens(current_user["id"])
+
+
+@router.delete("/tokens/{token_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_personal_access_token(
+    token_id: int, current_user=Depends(get_current_user)
+):
+    """パーソナルアクセストークンを失効させる"""
+    if not await token_service.revoke_personal_access_token(
+        token_id, current_user["id"]
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Token not found"
+        )
+    return None
@@ -0,0 +1,99 @@
+# Change event stream API routes
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+
+from app.core.config import settings
+from app.core.events import RESYNC, event_hub
+from app.core.responses import EventStreamResponse, event_frame
+from app.core.security import (
+    decode_access_token,
+    get_current_user,
+    oauth2_scheme,
+    optional_oauth2_scheme,
+)
+from app.schemas.event_schema import EventStreamTicketResponse
+from app.services import token_service
+
+router = APIRouter(prefix="/api/events", tags=["events"])
+
+# 切断された場合にクライアントが再接続するまでの時間（ミリ秒）
+RETRY_MILLISECONDS = 3000
+
+
+async def stream_events(subscription):
+    try:
+        yield f"retry: {RETRY_MILLISECONDS}\n\n".encode() + event_frame("ready")
+        while not subscription.closed:
+            events = await subscription.next_batch(
+                settings.EVENT_STREAM_HEARTBEAT_SECONDS
+            )
+            if not events:
+                # 接続を維持し、切断された接続を検出するためのコメント行
+                yield b": ping\n\n"
+                continue
+            yield b"".join(
+                event_frame("resync")
+                if event is RESYNC
+                else event_frame("change", event)
+                for event in events
+            )
+    finally:
+        event_hub.unsubscribe(subscription)
+
+
+@router.post("/tickets", response_model=EventStreamTicketResponse)
+async def create_stream_ticket(
+    current_user=Depends(get_current_user), token: str = Depends(oauth2_scheme)
+):
+    """
+    変更イベントのストリームの接続チケットを発行
+
+    ブラウザの EventSource は Authorization ヘッダーを付けられないため、
+    チケットをクエリパラメータで渡して接続する（使い捨て・短時間で期限切れ）
+    """
+    claims = decode_access_token(token)
+    ticket = await token_service.issue_event_stream_ticket(
+        current_user["id"], claims.get("jti") if claims else None
+    )
+    return {"ticket": ticket, "expires_in": settings.EVENT_STREAM_TICKET_SECONDS}
+
+
+@router.get("")
+async def stream_changes(
+    request: Request,
+    ticket: Optional[str] = Query(None),
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+):
+    """
+    自分のノート・お気に入り・AI生成履歴の変更イベント（Server-Sent Events）
+
+    - change: {"type": "note" | "favorite" | "generation", "id", "op", "updated_date"}
+      （op は created / updated / deleted、favorite の id はノートID）
+    - resync: イベントを取りこぼした可能性がある（/api/notes/changes などで読み直す）
+
+    認証は ticket（POST /api/events/tickets で発行）か Authorization ヘッダーで行う。
+    接続直後に ready を送り、イベントがない間は一定間隔でコメント行を送る。
+    サーバーの終了時、認証に使ったトークンの失効時、ユーザーの無効化・削除時には
+    接続を閉じるため、クライアントは（新しいチケットで）再接続して読み直す。
+    """
+    if ticket:
+        redeemed = await token_service.redeem_event_stream_ticket(ticket)
+        if redeemed is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid or expired stream ticket",
+            )
+        user, jti = redeemed["user"], redeemed["jti"]
+    elif token:
+        user = await get_current_user(request, token)
+        claims = decode_access_token(token)
+        jti = claims.get("jti") if claims else None
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    subscription = event_hub.subscribe(user["id"], jti)
+    return EventStreamResponse(stream_events(subscription))
@@ -1,10 +1,17 @@
 # Favorites API routes
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 from app.schemas.favorite_schema import FavoriteCreate, FavoriteResponse
-from app.schemas.note_schema import NoteResponse
-from app.services import favorite_service
+from app.schemas.note_schema import NoteListResponse, NOTE_RESPONSE_FIELDS
+from app.services import favorite_service, note_service
 from app.core.security import get_current_user
-from typing import List
+from app.core.responses import RecordListResponse, not_modified
+from app.core.utils import (
+    make_weak_etag,
+    etag_matches,
+    etag_headers,
+    fields_digest,
+)
+from typing import Literal, Optional
 
 router = APIRouter(prefix="/api/favorites", tags=["favorites"])
 
@@ -31,11 +38,34 @@ async def remove_favorite(note_id: int, current_user=Depends(get_current_user)):
     return None
 
 
-@router.get("", response_model=List[NoteResponse])
-async def get_favorites(current_user=Depends(get_current_user)):
-    """お気に入り一覧取得"""
-    favorites = await favorite_service.get_favorites(current_user["id"])
-    return favorites
+@router.get("", response_model=NoteListResponse)
+async def get_favorites(
+    view: Literal["full", "summary"] = "full",
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    current_user=Depends(get_current_user),
+):
+    """
+    お気に入り一覧取得（If-None-Match が一致すれば 304）
+
+    view / fields は GET /api/notes と同じ
+    """
+    try:
+        selected = note_service.parse_note_fields(fields, view)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    version = await favorite_service.get_favorites_version(current_user["id"])
+    parts = [version["count"], version["last_modified"]]
+    if selected != NOTE_RESPONSE_FIELDS:
+        # 返すフィールドが異なる表現はETagも区別する
+        parts.append(fields_digest(selected))
+    etag = make_weak_etag(*parts)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    favorites = await favorite_service.get_favorites(current_user["id"], selected)
+    return RecordListResponse(favorites, selected, headers=etag_headers(etag))
 
 
 @router.get("/{note_id}/check")
@@ -1,13 +1,50 @@
 # Notes API routes
-from fastapi import APIRouter, Depends, HTTPException, status
-from app.schemas.note_schema import NoteCreate, NoteUpdate, NoteResponse
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Response,
+    status,
+)
+from app.schemas.note_schema import (
+    NoteCreate,
+    NoteUpdate,
+    NotePatch,
+    NoteBatchRequest,
+    NoteBatchResponse,
+    NoteResponse,
+    NoteListResponse,
+    NoteChangesResponse,
+    NoteRevisionSummary,
+    NoteRevisionResponse,
+    NOTE_RESPONSE_FIELDS,
+)
 from app.services import note_service
 from app.core.security import get_current_user
-from typing import List
+from app.core.responses import (
+    ORJSONResponse,
+    RecordListResponse,
+    not_modified,
+    project_records,
+)
+from app.core.utils import (
+    make_weak_etag,
+    etag_matches,
+    etag_headers,
+    fields_digest,
+)
+from typing import List, Literal, Optional
 
 router = APIRouter(prefix="/api/notes", tags=["notes"])
 
 
+def _note_etag(note) -> str:
+    """単一ノートのETag（IDと更新日時から生成）"""
+    return make_weak_etag(note["id"], note["updated_date"])
+
+
 @router.post("", response_model=NoteResponse, status_code=status.HTTP_201_CREATED)
 async def create_note(payload: NoteCreate, current_user=Depends(get_current_user)):
     """ノート作成"""
@@ -15,34 +52,186 @@ async def create_note(payload: NoteCreate, current_user=Depends(get_current_user
     return note
 
 
-@router.get("", response_model=List[NoteResponse])
-async def get_notes(current_user=Depends(get_current_user)):
-    """ノート一覧取得"""
-    notes = await note_service.get_all_notes(current_user["id"])
-    return notes
+@router.post("/batch", response_model=NoteBatchResponse)
+async def batch_notes(
+    payload: NoteBatchRequest, current_user=Depends(get_current_user)
+):
+    """
+    複数ノートの作成・更新・削除を1リクエスト・1トランザクションで実行
+
+    - **operations**: {"op": "create" | "update" | "delete", ...} のリスト（最大500件）
+
+    結果は操作ごとに status（201 / 200 / 204 / 404）を返す。
+    同じノートを複数の操作で対象にした場合は 400。
+    """
+    try:
+        results = await note_service.batch_notes(payload.operations, current_user["id"])
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return {"results": results}
+
+
+@router.get("", response_model=NoteListResponse)
+async def get_notes(
+    view: Literal["full", "summary"] = "full",
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    current_user=Depends(get_current_user),
+):
+    """
+    ノート一覧取得（If-None-Match が一致すれば 304）
+
+    - **view**: full（全フィールド）または summary（id, title, preview, updated_date, revision）
+    - **fields**: 返すフィールドをカンマ区切りで指定（view より優先、id は常に含む）。
+      preview は本文の先頭部分（DB側で切り出すため、content より大幅に軽い）
+    """
+    try:
+        selected = note_service.parse_note_fields(fields, view)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    version = await note_service.get_notes_version(current_user["id"])
+    parts = [version["count"], version["last_modified"]]
+    if selected != NOTE_RESPONSE_FIELDS:
+        # 返すフィールドが異なる表現はETagも区別する
+        parts.append(fields_digest(selected))
+    etag = make_weak_etag(*parts)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    notes = await note_service.get_all_notes(current_user["id"], selected)
+    # SELECTの形が出力フィールドと一致するため、検証を省いてorjsonで直接返す
+    return RecordListResponse(notes, selected, headers=etag_headers(etag))
+
+
+@router.get("/changes", response_model=NoteChangesResponse)
+async def get_note_changes(
+    since: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=1000),
+    current_user=Depends(get_current_user),
+):
+    """
+    差分同期: カーソル以降に変更・削除されたノートを取得
+
+    - **since**: 前回のレスポンスの cursor（省略時は全件）
+    - **limit**: 1回で返す最大件数（1-1000）
+
+    has_more が true の間は cursor を since に指定して繰り返し取得する。
+    reset が true の場合はローカルのノートを破棄し、changes で置き換える。
+    """
+    try:
+        cursor = note_service.parse_sync_cursor(since)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid sync cursor"
+        )
+
+    result = await note_service.get_changes(current_user["id"], cursor, limit)
+    result["changes"] = project_records(result["changes"], NOTE_RESPONSE_FIELDS)
+    return ORJSONResponse(result)
 
 
 @router.get("/{note_id}", response_model=NoteResponse)
-async def get_note(note_id: int, current_user=Depends(get_current_user)):
-    """ノート詳細取得"""
+async def get_note(
+    note_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user=Depends(get_current_user),
+):
+    """ノート詳細取得（If-None-Match が一致すれば 304）"""
     note = await note_service.get_note(note_id, current_user["id"])
     if not note:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Note not found"
         )
+
+    etag = _note_etag(note)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    response.headers.update(etag_headers(etag))
     return note
 
 
 @router.put("/{note_id}", response_model=NoteResponse)
 async def update_note(
-    note_id: int, payload: NoteUpdate, current_user=Depends(get_current_user)
+    note_id: int,
+    payload: NoteUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user=Depends(get_current_user),
 ):
-    """ノート更新"""
-    note = await note_service.update_note(note_id, current_user["id"], payload)
+    """
+    ノート更新
+
+    If-Match ヘッダーが指定された場合、現在のETagと一致するときのみ更新する
+    （一致しない場合は 412 Precondition Failed）
+    """
+    expected_updated_date = None
+    if if_match is not None and if_match.strip() != "*":
+        current = await note_service.get_note(note_id, current_user["id"])
+        if not current:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Note not found"
+            )
+        if not etag_matches(if_match, _note_etag(current)):
+            raise HTTPException(
+                status_code=status.HTTP_412_PRECONDITION_FAILED,
+                detail="Note has been modified",
+            )
+        expected_updated_date = current["updated_date"]
+
+    note = await note_service.update_note(
+        note_id,
+        current_user["id"],
+        payload,
+        expected_updated_date=expected_updated_date,
+    )
     if not note:
+        if expected_updated_date is not None:
+            # 確認後に他のリクエストで更新された
+            raise HTTPException(
+                status_code=status.HTTP_412_PRECONDITION_FAILED,
+                detail="Note has been modified",
+            )
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Note not found"
         )
+
+    response.headers.update(etag_headers(_note_etag(note)))
+    return note
+
+
+@router.patch("/{note_id}", response_model=NoteResponse)
+async def patch_note(
+    note_id: int,
+    payload: NotePatch,
+    response: Response,
+    current_user=Depends(get_current_user),
+):
+    """
+    ノートの部分更新（本文全体を送らずに編集範囲のみ送る）
+
+    - **base_revision**: 編集の基準としたリビジョン（現在のリビジョンと異なる場合は 409）
+    - **title**: 新しいタイトル（省略可）
+    - **edits**: ベースリビジョンの本文に対する文字範囲の置換
+      （start, end はUnicodeコードポイント単位、範囲は重ならないこと）
+    """
+    try:
+        note = await note_service.patch_note(note_id, current_user["id"], payload)
+    except note_service.RevisionConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Base revision is stale (current revision: {e.current_revision})",
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if not note:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Note not found"
+        )
+
+    response.headers.update(etag_headers(_note_etag(note)))
     return note
 
 
@@ -57,6 +246,44 @@ async def delete_note(note_id: int, current_user=Depends(get_current_user)):
     return None
 
 
+@router.get("/{note_id}/revisions", response_model=List[NoteRevisionSummary])
+async def get_note_revisions(
+    note_id: int,
+    before: Optional[int] = Query(None, ge=1),
+    limit: int = Query(50, ge=1, le=200),
+    current_user=Depends(get_current_user),
+):
+    """
+    ノートのリビジョン一覧（新しい順、本文は含まない）
+
+    - **before**: このリビジョン番号より古いものを取得（ページング用）
+    - **limit**: 最大件数（1-200）
+    """
+    revisions = await note_service.get_revisions(
+        note_id, current_user["id"], before=before, limit=limit
+    )
+    if not revisions and before is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Note not found"
+        )
+    return revisions
+
+
+@router.get(
+    "/{note_id}/revisions/{revision}", response_model=NoteRevisionResponse
+)
+async def get_note_revision(
+    note_id: int, revision: int, current_user=Depends(get_current_user)
+):
+    """指定したリビジョンのノートを取得"""
+    result = await note_service.get_revision(note_id, current_user["id"], revision)
+    if not result:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Revision not found"
+        )
+    return result
+
+
 @router.post("/import", status_code=status.HTTP_201_CREATED)
 async def import_notes(notes_data: List[dict], current_user=Depends(get_current_user)):
     """ノートをインポート"""
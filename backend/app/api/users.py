@@ -1,7 +1,15 @@
 # User API routes
-from fastapi import APIRouter, HTTPException, Path, Depends
-from typing import List
-from app.schemas.user_schema import UserCreate, UserResponse, UserUpdate
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Path, Depends, Query, status
+from typing import List, Literal, Optional
+from app.core.responses import NDJSONRecordStreamResponse, RecordListResponse
+from app.schemas.user_schema import (
+    AccountDeletionResponse,
+    UserCreate,
+    UserResponse,
+    UserUpdate,
+    USER_RESPONSE_FIELDS,
+)
 from app.services import user_service
 
 router = APIRouter(prefix="/api/users", tags=["users"])
@@ -10,12 +18,10 @@ router = APIRouter(prefix="/api/users", tags=["users"])
 @router.post("/", response_model=UserResponse, status_code=201)
 async def create_user(payload: UserCreate):
     """新規ユーザー作成（管理者用）"""
-    # ユーザー名の重複チェック
-    existing_user = await user_service.get_by_username(payload.username)
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Username already exists")
-
     user = await user_service.create_user(payload)
+    if not user:
+        # ユーザー名の重複
+        raise HTTPException(status_code=400, detail="Username already exists")
     return user
 
 
@@ -29,9 +35,54 @@ async def read_user(id: int = Path(..., gt=0)):
 
 
 @router.get("/", response_model=List[UserResponse])
-async def read_all_users():
-    """ユーザー一覧取得"""
-    return await user_service.get_all_users()
+async def read_all_users(
+    after: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    is_active: Optional[bool] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    export_format: Literal["json", "ndjson"] = Query("json", alias="format"),
+):
+    """
+    ユーザー一覧取得（作成日時順）
+
+    - **after**: 前のページのレスポンスの X-Next-Cursor ヘッダー（省略時は先頭から）
+    - **limit**: 1ページの最大件数（1-1000）
+    - **is_active**: 有効・無効で絞り込む
+    - **created_from** / **created_to**: 作成日時の範囲（以上・未満）
+    - **format**: ndjson の場合は、条件に一致する全件を1行1件のJSONで
+      順に送る（エクスポート用、limit は無視する）
+
+    次のページがある場合は X-Next-Cursor ヘッダーを返す
+    """
+    try:
+        cursor = user_service.parse_user_cursor(after)
+    except (ValueError, OverflowError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+    if export_format == "ndjson":
+        batches = user_service.iter_users(
+            cursor,
+            is_active=is_active,
+            created_from=created_from,
+            created_to=created_to,
+        )
+        return NDJSONRecordStreamResponse(batches, USER_RESPONSE_FIELDS)
+
+    users, next_position = await user_service.get_users(
+        cursor,
+        limit=limit,
+        is_active=is_active,
+        created_from=created_from,
+        created_to=created_to,
+    )
+    headers = {}
+    if next_position is not None:
+        headers["X-Next-Cursor"] = user_service.format_user_cursor(next_position)
+    # SELECTの形が出力フィールドと一致するため、検証を省いてorjsonで直接返す
+    return RecordListResponse(users, USER_RESPONSE_FIELDS, headers=headers)
 
 
 @router.put("/{id}/", response_model=UserResponse)
@@ -40,20 +91,33 @@ async def update_user(
     id: int = Path(..., gt=0),
 ):
     """ユーザー情報更新"""
-    user = await user_service.get_user(id)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
     updated_user = await user_service.update_user(id, payload)
+    if not updated_user:
+        raise HTTPException(status_code=404, detail="User not found")
     return updated_user
 
 
-@router.delete("/{id}/", response_model=UserResponse)
+@router.delete(
+    "/{id}/", response_model=UserResponse, status_code=status.HTTP_202_ACCEPTED
+)
 async def delete_user(id: int = Path(..., gt=0)):
-    """ユーザー削除"""
-    user = await user_service.get_user(id)
+    """
+    ユーザー削除
+
+    ユーザーは即座に無効化され（ログイン・API呼び出し不可）、ノート・お気に入り・
+    AI生成履歴はバックグラウンドで少しずつ削除される。
+    進捗は GET /api/users/{id}/deletion で確認できる。
+    """
+    user = await user_service.delete_user(id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-
-    await user_service.delete_user(id)
     return user
+
+
+@router.get("/{id}/deletion", response_model=AccountDeletionResponse)
+async def read_user_deletion(id: int = Path(..., gt=0)):
+    """ユーザー削除の進捗（段階と削除した件数）"""
+    deletion = await user_service.get_account_deletion(id)
+    if not deletion:
+        raise HTTPException(status_code=404, detail="Deletion not found")
+    return deletion
@@ -0,0 +1,44 @@
+# Bloom filter for in-memory membership checks
+import hashlib
+import math
+
+
+class BloomFilter:
+    """
+    集合に含まれる可能性があるかを定数時間で判定するビット配列
+
+    偽陽性（含まれないのに True）は error_rate 程度の確率で起こるが、
+    偽陰性（含まれるのに False）は起こらない。同じ要素を何度追加してもよいが、
+    削除はできないため、古い要素を除くには作り直す。
+
+    ハッシュは BLAKE2b のダイジェスト1回から2つの値を取り出し、その線形結合で
+    hash_count 個の位置を求める（Kirsch–Mitzenmacher の方法）。
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        # 要素数 capacity で偽陽性率が error_rate になる最小のビット数とハッシュ数
+        self.size = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.capacity = capacity
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        # 2つ目の値が偶数だと、size が偶数の場合に位置が偏るため奇数にする
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        bits = self._bits
+        return all(
+            bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
@@ -7,6 +7,42 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # リフレッシュトークンの有効期限（ローテーションのたびに延長される）
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    # 使用済みのリフレッシュトークンが再び使われても、使用からこの秒数以内なら
+    # 系列を失効させない（同じトークンで同時に更新した別のタブなど）
+    REFRESH_TOKEN_REUSE_GRACE_SECONDS: int = 10
+    # 失効させたアクセストークンを他のワーカーのブルームフィルタに取り込む間隔
+    # （失効させたワーカーでは即座に無効）
+    JWT_REVOCATION_REFRESH_SECONDS: int = 5
+    # ブルームフィルタの想定要素数と偽陽性率（偽陽性の場合のみDBで確認する）
+    JWT_REVOCATION_BLOOM_CAPACITY: int = 100000
+    JWT_REVOCATION_BLOOM_ERROR_RATE: float = 0.01
+
+    # Personal access tokens
+    # 検証結果をプロセス内にキャッシュする秒数（他のワーカーでの失効はこの時間内に反映）
+    PAT_CACHE_TTL_SECONDS: int = 60
+    PAT_CACHE_MAX_ENTRIES: int = 10000
+    # 最後に使われた時刻をまとめてDBに書き込む間隔
+    PAT_LAST_USED_FLUSH_SECONDS: int = 60
+
+    # Password hashing (bcrypt / argon2id、argon2id は argon2-cffi が必要)
+    PASSWORD_HASH_SCHEME: str = "bcrypt"
+    # ハッシュ1回の目標時間（起動後の初回使用時に、この時間に収まる最も重いコストを計測で選ぶ）
+    PASSWORD_HASH_TARGET_MS: int = 250
+    # コストを固定する場合に指定（0: 計測で決める）
+    PASSWORD_HASH_BCRYPT_ROUNDS: int = 0
+    PASSWORD_HASH_ARGON2_TIME_COST: int = 0
+    PASSWORD_HASH_ARGON2_MEMORY_KIB: int = 19456
+
+    # Account deletion (background, batched)
+    # 1回（1トランザクション）で削除する最大行数と、バッチ間の待ち時間（DB負荷の抑制）
+    ACCOUNT_DELETION_BATCH_SIZE: int = 500
+    ACCOUNT_DELETION_BATCH_DELAY_MS: int = 50
+    # 処理中のワーカーが停止した場合、この秒数後に他のワーカーが続きから再開する
+    ACCOUNT_DELETION_LEASE_SECONDS: int = 60
+    # 他のワーカーで受け付けた削除を確認する間隔
+    ACCOUNT_DELETION_POLL_SECONDS: int = 30
 
     # CORS
     FRONTEND_URL: str = "http://localhost:5173"
@@ -20,6 +56,72 @@ class Settings(BaseSettings):
     AI_REQUEST_TIMEOUT: int = 30
     AI_MAX_RETRIES: int = 3
     AI_DEFAULT_PROVIDER: str = "openai"
+    # 起動後にAPIキーが設定されたプロバイダーのSDKをバックグラウンドで読み込む
+    AI_PRELOAD_PROVIDERS: bool = True
+    # 生成履歴の要約（view=summary）の preview フィールドの文字数
+    AI_GENERATION_PREVIEW_LENGTH: int = 200
+    # 生成履歴の月別パーティションを何か月先まで作成しておくか
+    AI_GENERATION_PARTITIONS_AHEAD: int = 3
+    # 生成履歴の保持期間（月数、0: 無期限）。過ぎた月はパーティションごと削除する
+    AI_GENERATION_RETENTION_MONTHS: int = 0
+    # プロンプトとノートがほぼ同じ（空白の違いや小さな編集のみ）場合に過去の生成結果を返す
+    # （プロセスごとのインメモリキャッシュ、numpy が必要）
+    AI_SEMANTIC_CACHE: bool = False
+    # 一致とみなすコサイン類似度（コンテキスト・プロンプトの両方が超える必要がある）
+    AI_SEMANTIC_CACHE_THRESHOLD: float = 0.95
+    AI_SEMANTIC_CACHE_PROMPT_THRESHOLD: float = 0.8
+    # ユーザー・プロバイダーごとのエントリ数と、保持するユーザー数の上限
+    # （メモリ使用量の上限は約 4 KiB × エントリ数 × ユーザー数）
+    AI_SEMANTIC_CACHE_MAX_ENTRIES: int = 50
+    AI_SEMANTIC_CACHE_MAX_USERS: int = 1000
+    AI_SEMANTIC_CACHE_TTL_SECONDS: int = 86400
+
+    # Rate limiting (memory / postgres / redis)
+    RATE_LIMIT_BACKEND: str = "postgres"
+    RATE_LIMIT_REDIS_URL: str = "redis://localhost:6379/0"
+    AI_GENERATION_RATE_LIMIT: str = "10/hour"
+
+    # Server lifecycle
+    # 終了時に実行中のリクエスト・AI呼び出しの完了を待つ最大秒数
+    SHUTDOWN_GRACE_SECONDS: int = 45
+
+    # Delta sync
+    SYNC_TOMBSTONE_RETENTION_DAYS: int = 30
+    SYNC_COMPACTION_INTERVAL_SECONDS: int = 3600
+
+    # Note revisions
+    # 全文スナップショットを保存する間隔（リビジョン復元時に適用する差分の最大数）
+    NOTE_REVISION_SNAPSHOT_INTERVAL: int = 20
+
+    # 一覧の preview フィールドの文字数
+    NOTE_PREVIEW_LENGTH: int = 200
+
+    # Read cache (notes / favorites)
+    # ノート・お気に入りの読み取り結果をプロセス内にキャッシュするエントリ数（0: 無効）
+    READ_CACHE_MAX_ENTRIES: int = 10000
+    # キャッシュの推定メモリ使用量の上限（バイト）
+    READ_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    # 他のワーカーの書き込みが無効化バスで伝わらなかった場合も、この秒数以内に反映される
+    READ_CACHE_TTL_SECONDS: int = 60
+
+    # Cross-worker cache invalidation (Postgres LISTEN/NOTIFY)
+    # 書き込みを他のワーカーのキャッシュに伝える（無効の場合は各キャッシュのTTLで反映）
+    INVALIDATION_BUS: bool = True
+    INVALIDATION_CHANNEL: str = "cache_invalidation"
+    # この期間内の無効化をまとめて1回の NOTIFY で送る
+    INVALIDATION_COALESCE_MS: int = 20
+
+    # Change event stream (/api/events)
+    # 1接続にためるイベントの上限（超えた場合は捨てて resync を送る）
+    EVENT_STREAM_BUFFER_SIZE: int = 256
+    # イベントがない間に送るハートビートの間隔（プロキシのアイドルタイムアウトより短くする）
+    EVENT_STREAM_HEARTBEAT_SECONDS: int = 15
+    # EventSource 用の接続チケット（使い捨て）の有効期間
+    EVENT_STREAM_TICKET_SECONDS: int = 30
+
+    # 本文などの大きなテキストのTOAST圧縮方式（空: サーバーの既定 / pglz / lz4）
+    # lz4 は Postgres 14+ かつ lz4 付きでビルドされたサーバーで利用可能
+    CONTENT_COMPRESSION: str = ""
 
     class ConfigDict:
         env_file = ".env"
@@ -0,0 +1,216 @@
+# Per-user change events fanned out to streaming connections
+import asyncio
+import itertools
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, Iterable, List, Optional, Set
+
+from app.core.config import settings
+from app.core.invalidation import invalidation_bus
+
+# 無効化バスでのトピック（イベント / 接続を閉じる対象）
+_TOPIC = "events"
+_CLOSE_TOPIC = "event_streams"
+# バッファがあふれた・取りこぼした可能性がある場合に送る（クライアントは読み直す）
+RESYNC = {"type": "resync"}
+
+
+def change_event(
+    kind: str, id: int, op: str, updated_date: Optional[datetime] = None
+) -> dict:
+    """
+    変更イベント
+
+    Args:
+        kind: "note" / "favorite" / "generation"
+        id: ノートID（favorite もノートID）または生成履歴ID
+        op: "created" / "updated" / "deleted"
+        updated_date: 変更後の更新日時（削除の場合は None）
+    """
+    if isinstance(updated_date, datetime):
+        updated_date = updated_date.isoformat()
+    return {"type": kind, "id": id, "op": op, "updated_date": updated_date}
+
+
+class Subscription:
+    """1つのストリーミング接続のイベントのバッファ（上限付き）"""
+
+    def __init__(self, user_id: int, buffer_size: int, jti: Optional[str] = None):
+        self.user_id = user_id
+        # 接続の認証に使ったアクセストークンの jti（失効させたら接続を閉じる）
+        self.jti = jti
+        self.buffer_size = buffer_size
+        self.events: Deque[dict] = deque()
+        self.closed = False
+        self._ready = asyncio.Event()
+
+    def push(self, event: dict) -> None:
+        # 読み出しが追いつかない接続のイベントは捨て、読み直しを求める
+        # （1接続のメモリを一定に保ち、遅い接続が他の接続への配信を遅らせない）
+        if len(self.events) >= self.buffer_size:
+            self.events.clear()
+            event = RESYNC
+        if event is RESYNC and self.events and self.events[-1] is RESYNC:
+            return
+        self.events.append(event)
+        self._ready.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+
+    async def next_batch(self, timeout: float) -> List[dict]:
+        """
+        バッファのイベントをまとめて取り出す
+
+        timeout 秒以内にイベントがなければ空のリストを返す（ハートビートの送信用）
+        """
+        if not self.events and not self.closed:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        self._ready.clear()
+        batch = list(self.events)
+        self.events.clear()
+        return batch
+
+
+class EventHub:
+    """
+    ユーザーごとの変更イベントを、そのユーザーのストリーミング接続に配信する
+
+    書き込んだワーカーの接続には直接配信し、他のワーカーへは無効化バス（ワーカーごとに
+    1つの LISTEN 用コネクション）で送る。受け取ったワーカーはユーザーIDで接続を
+    引いて配信するため、待機しているだけの接続の数はイベントの配信コストに影響しない。
+    バスが切断されていた間のイベントや、まとめきれないほどのイベントは、
+    そのワーカーのすべての接続に resync として伝える。
+    ユーザーの無効化・削除や、接続に使ったアクセストークンの失効では、
+    すべてのワーカーのその接続を閉じる（disconnect）。
+    """
+
+    def __init__(self, buffer_size: int):
+        self.buffer_size = buffer_size
+        self.subscriptions: Dict[int, Set[Subscription]] = {}
+        # app.main の lifespan で open するまで接続は受け付けない
+        self.closed = True
+        self._sequence = itertools.count()
+
+    @property
+    def connections(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self.subscriptions.values())
+
+    def subscribe(self, user_id: int, jti: Optional[str] = None) -> Subscription:
+        subscription = Subscription(user_id, self.buffer_size, jti)
+        if self.closed:
+            subscription.close()
+        else:
+            self.subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self.subscriptions.get(subscription.user_id)
+        if subscriptions is None:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self.subscriptions[subscription.user_id]
+
+    def _deliver(self, user_id: int, events: Iterable[dict]) -> None:
+        for subscription in self.subscriptions.get(user_id, ()):
+            for event in events:
+                subscription.push(event)
+
+    def publish(self, user_id: int, events: List[dict]) -> None:
+        """ユーザーの変更イベントをすべてのワーカーの接続に配信する"""
+        if not events:
+            return
+        self._deliver(user_id, events)
+        # "<順序>|<ユーザー>|<種類>|<操作>|<ID>|<更新日時>"（バスのキーは順不同のため番号を付ける）
+        invalidation_bus.publish(
+            _TOPIC,
+            [
+                f"{next(self._sequence)}|{user_id}|{event['type']}|{event['op']}|"
+                f"{event['id']}|{event['updated_date'] or ''}"
+                for event in events
+            ],
+        )
+
+    def _on_remote_events(self, keys: Optional[List[str]]) -> None:
+        """他のワーカーからのイベントを配信する（None: 取りこぼした可能性がある）"""
+        if keys is None:
+            for subscriptions in self.subscriptions.values():
+                for subscription in subscriptions:
+                    subscription.push(RESYNC)
+            return
+        for key in sorted(keys, key=lambda key: int(key.split("|", 1)[0])):
+            _, user_id, kind, op, id, updated_date = key.split("|")
+            if int(user_id) in self.subscriptions:
+                event = {
+                    "type": kind,
+                    "id": int(id),
+                    "op": op,
+                    "updated_date": updated_date or None,
+                }
+                self._deliver(int(user_id), [event])
+
+    def disconnect(
+        self,
+        user_id: Optional[int] = None,
+        jti: Optional[str] = None,
+        notify: bool = True,
+    ) -> None:
+        """
+        ユーザー（無効化・削除）またはアクセストークン（失効）の接続を閉じる
+
+        notify が True の場合は無効化バスで他のワーカーにも伝える
+        """
+        keys = []
+        if user_id is not None:
+            keys.append(f"user:{user_id}")
+            for subscription in self.subscriptions.get(user_id, ()):
+                subscription.close()
+        if jti is not None:
+            keys.append(f"token:{jti}")
+            for subscriptions in self.subscriptions.values():
+                for subscription in subscriptions:
+                    if subscription.jti == jti:
+                        subscription.close()
+        if notify and keys:
+            invalidation_bus.publish(_CLOSE_TOPIC, keys)
+
+    def _on_remote_disconnect(self, keys: Optional[List[str]]) -> None:
+        """
+        他のワーカーで閉じた接続を閉じる
+
+        取りこぼした可能性がある（None）場合は、すべての接続を閉じて再接続
+        （認証のやり直し）させる
+        """
+        if keys is None:
+            for subscriptions in self.subscriptions.values():
+                for subscription in subscriptions:
+                    subscription.close()
+            return
+        for key in keys:
+            kind, value = key.split(":", 1)
+            if kind == "user":
+                self.disconnect(user_id=int(value), notify=False)
+            else:
+                self.disconnect(jti=value, notify=False)
+
+    def open(self) -> None:
+        """接続の受け付けを始める（ワーカーの起動時）"""
+        self.closed = False
+
+    def close(self) -> None:
+        """すべての接続を終了させ、以降の接続はすぐに終了する（ワーカーの終了時）"""
+        self.closed = True
+        for subscriptions in self.subscriptions.values():
+            for subscription in subscriptions:
+                subscription.close()
+
+
+# ワーカーごとに1つ
+event_hub = EventHub(settings.EVENT_STREAM_BUFFER_SIZE)
+invalidation_bus.subscribe(_TOPIC, event_hub._on_remote_events)
+invalidation_bus.subscribe(_CLOSE_TOPIC, event_hub._on_remote_disconnect)
@@ -0,0 +1,264 @@
+# Cross-worker cache invalidation over Postgres LISTEN/NOTIFY
+import asyncio
+import logging
+import uuid
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY のペイロードの上限（8000バイト）に余裕を持たせた1メッセージの最大長
+_MAX_PAYLOAD = 7000
+# 1回に送るキーがこれを超えたトピックは、キーを列挙せずに全体を無効にする
+_MAX_KEYS = 500
+# トピック全体の無効化を表すキー
+_ALL = "*"
+# 受信用コネクションの死活確認と、切断後の再接続の間隔（秒）
+_KEEPALIVE_SECONDS = 15
+_RECONNECT_SECONDS = 1
+# 起動時に最初の接続を待つ最大秒数（接続できなくてもリクエストの受付は始める）
+_STARTUP_TIMEOUT_SECONDS = 5
+
+# 受け取ったキーのリスト（None: トピック全体）で無効化する関数
+Handler = Callable[[Optional[List[str]]], None]
+
+
+@dataclass
+class InvalidationStats:
+    """送受信したメッセージ数（プロセスごと）"""
+
+    published: int = 0
+    # 同じ期間内の重複をまとめた後に送ったキーの数
+    keys_sent: int = 0
+    notifications_sent: int = 0
+    notifications_received: int = 0
+    reconnects: int = 0
+
+
+def encode_messages(sender: str, topic: str, keys: Iterable[str]) -> List[str]:
+    """
+    "<送信元> <トピック> <キー>,<キー>,..." 形式のメッセージに分割
+
+    キーは publish された順に送る（変更イベントのように、受信側が順序に依存する
+    トピックがある）。キーが _MAX_KEYS を超える場合はトピック全体（"*"）を無効にする
+    """
+    keys = list(keys)
+    if len(keys) > _MAX_KEYS:
+        keys = [_ALL]
+    prefix = f"{sender} {topic} "
+    messages, chunk, size = [], [], len(prefix)
+    for key in keys:
+        if chunk and size + len(key) + 1 > _MAX_PAYLOAD:
+            messages.append(prefix + ",".join(chunk))
+            chunk, size = [], len(prefix)
+        chunk.append(key)
+        size += len(key) + 1
+    if chunk:
+        messages.append(prefix + ",".join(chunk))
+    return messages
+
+
+def decode_message(payload: str):
+    """メッセージを (送信元, トピック, キーのリスト（None: 全体）) に分解"""
+    sender, topic, keys = payload.split(" ", 2)
+    return sender, topic, None if keys == _ALL else keys.split(",")
+
+
+class InvalidationBus:
+    """
+    ワーカー間でキャッシュの無効化を伝えるバス（Postgres の LISTEN/NOTIFY）
+
+    書き込んだワーカーは自分のキャッシュを直ちに無効にし、publish でキーを送る。
+    キーは coalesce_seconds の間まとめ（重複は1つにして）、トピックごとに1回の
+    NOTIFY で送るため、一括の書き込みでも通知は少数に収まる。自分が送った
+    メッセージは受信しても無視する。
+
+    受信は専用のコネクションで行い、切断されたら再接続する。切断中のメッセージは
+    失われるため、接続のたびに各トピックの全体を無効にする（handler(None)）。
+    送信できなかったキーは再接続後に送る。
+    """
+
+    def __init__(self, channel: str, coalesce_seconds: float = 0.02):
+        self.channel = channel
+        self.coalesce_seconds = coalesce_seconds
+        self.sender = uuid.uuid4().hex[:12]
+        self.stats = InvalidationStats()
+        self._handlers: Dict[str, Handler] = {}
+        # トピックごとの送信待ちのキー（重複を除き、publish された順に保つ）
+        self._pending: Dict[str, Dict[str, None]] = {}
+        self._connection = None
+        # 受信用コネクションでのクエリ（送信・死活確認）は同時に1つ
+        self._lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._lost: Optional[asyncio.Event] = None
+        self._connected: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def subscribe(self, topic: str, handler: Handler) -> None:
+        self._handlers[topic] = handler
+
+    def publish(self, topic: str, keys: Iterable) -> None:
+        """他のワーカーにキーの無効化を伝える（起動していない場合は何もしない）"""
+        if not self.running:
+            return
+        pending = self._pending.setdefault(topic, {})
+        for key in keys:
+            pending[str(key)] = None
+            self.stats.published += 1
+        self._wakeup.set()
+
+    async def start(self, dsn: str) -> None:
+        """
+        受信と送信のタスクを開始し、最初の接続を待つ
+
+        接続できない場合も、バックグラウンドで再接続を続けながら処理を進める
+        """
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._lost = asyncio.Event()
+        self._connected = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._listen(dsn)),
+            asyncio.create_task(self._flush_periodically()),
+        ]
+        try:
+            await asyncio.wait_for(self._connected.wait(), _STARTUP_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning("Cache invalidation listener is not connected yet")
+
+    async def stop(self) -> None:
+        """未送信のキーを送ってから停止する"""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._connection is not None:
+            try:
+                await self._flush()
+            except Exception as e:
+                logger.error(f"Cache invalidation flush failed: {str(e)}")
+            await self._connection.close()
+            self._connection = None
+
+    def _invalidate_all(self) -> None:
+        for topic, handler in self._handlers.items():
+            try:
+                handler(None)
+            except Exception as e:
+                logger.error(f"Cache invalidation of {topic} failed: {str(e)}")
+
+    def _on_notification(self, connection, pid, channel, payload: str) -> None:
+        try:
+            sender, topic, keys = decode_message(payload)
+        except ValueError:
+            logger.warning(f"Ignoring malformed invalidation message: {payload!r}")
+            return
+        if sender == self.sender:
+            return
+        self.stats.notifications_received += 1
+        handler = self._handlers.get(topic)
+        if handler is None:
+            return
+        try:
+            handler(keys)
+        except Exception as e:
+            logger.error(f"Cache invalidation of {topic} failed: {str(e)}")
+
+    def _on_termination(self, connection) -> None:
+        self._lost.set()
+
+    async def _connect(self, dsn: str):
+        # asyncpg は databases の依存として入っている
+        import asyncpg
+
+        connection = await asyncpg.connect(dsn)
+        connection.add_termination_listener(self._on_termination)
+        await connection.add_listener(self.channel, self._on_notification)
+        return connection
+
+    async def _listen(self, dsn: str) -> None:
+        """受信用コネクションを維持する（切断・死活確認の失敗で再接続）"""
+        first = True
+        while True:
+            try:
+                self._lost.clear()
+                self._connection = await self._connect(dsn)
+            except Exception as e:
+                logger.error(f"Cache invalidation listener connect failed: {str(e)}")
+                await asyncio.sleep(_RECONNECT_SECONDS)
+                continue
+            if not first:
+                self.stats.reconnects += 1
+                logger.info("Cache invalidation listener reconnected")
+            first = False
+            # 接続していない間に送られたメッセージを受け取れていない
+            self._invalidate_all()
+            self._connected.set()
+            # 切断中にたまったキーを送る
+            self._wakeup.set()
+            while not self._lost.is_set():
+                try:
+                    await asyncio.wait_for(self._lost.wait(), _KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    try:
+                        async with self._lock:
+                            await asyncio.wait_for(
+                                self._connection.execute("SELECT 1"),
+                                _KEEPALIVE_SECONDS,
+                            )
+                    except Exception as e:
+                        logger.error(f"Cache invalidation listener lost: {str(e)}")
+                        break
+            connection, self._connection = self._connection, None
+            connection.terminate()
+            await asyncio.sleep(_RECONNECT_SECONDS)
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            # 同じ期間内の publish をまとめる
+            await asyncio.sleep(self.coalesce_seconds)
+            self._wakeup.clear()
+            if self._connection is None:
+                # 再接続後に送る
+                continue
+            try:
+                await self._flush()
+            except Exception as e:
+                logger.error(f"Cache invalidation publish failed: {str(e)}")
+
+    async def _flush(self) -> None:
+        pending, self._pending = self._pending, {}
+        messages = [
+            message
+            for topic, keys in pending.items()
+            for message in encode_messages(self.sender, topic, keys)
+        ]
+        if not messages:
+            return
+        self.stats.keys_sent += sum(len(keys) for keys in pending.values())
+        try:
+            async with self._lock:
+                for message in messages:
+                    await self._connection.execute(
+                        "SELECT pg_notify($1, $2)", self.channel, message
+                    )
+                    self.stats.notifications_sent += 1
+        except Exception:
+            # 送れなかったキーは次の送信（再接続後）に、その後に publish されたキーより
+            # 先に送る
+            for topic, keys in pending.items():
+                self._pending[topic] = {**keys, **self._pending.get(topic, {})}
+            raise
+
+
+# ワーカーごとに1つ（app.main の lifespan で開始する）
+invalidation_bus = InvalidationBus(
+    settings.INVALIDATION_CHANNEL, settings.INVALIDATION_COALESCE_MS / 1000
+)
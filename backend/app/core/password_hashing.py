@@ -0,0 +1,206 @@
+# Password hashing with a work factor calibrated to the current CPU
+import logging
+import re
+import statistics
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Callable, Optional, Tuple
+
+import bcrypt
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# bcrypt は先頭72バイトまでしか使わない
+_BCRYPT_MAX_BYTES = 72
+# コストの下限（計測前の既定値。CPUが遅くてもこれ未満にはしない）と上限
+# 下限より軽くする場合は PASSWORD_HASH_BCRYPT_ROUNDS で明示的に固定する
+_BCRYPT_MIN_ROUNDS = 12
+_BCRYPT_MAX_ROUNDS = 16
+# 計測に使うコスト（1増えるごとに時間は2倍）
+_BCRYPT_PROBE_ROUNDS = 8
+_BCRYPT_PATTERN = re.compile(r"^\$2[aby]?\$(\d{2})\$")
+
+_ARGON2_MIN_TIME_COST = 2
+_ARGON2_MAX_TIME_COST = 20
+
+
+@dataclass(frozen=True)
+class HashParams:
+    """新しく作成するハッシュの方式とパラメータ（ハッシュ文字列にも記録される）"""
+
+    scheme: str = "bcrypt"
+    # bcrypt のコスト（2^rounds 回の反復）
+    rounds: int = 12
+    # argon2id の反復回数・メモリ（KiB）・並列度
+    time_cost: int = _ARGON2_MIN_TIME_COST
+    memory_cost: int = 19456
+    parallelism: int = 1
+
+
+_params: Optional[HashParams] = None
+_params_lock = threading.Lock()
+
+
+def _argon2():
+    # argon2-cffi は PASSWORD_HASH_SCHEME=argon2id の場合（または argon2 のハッシュが
+    # 保存されている場合）のみ必要
+    import argon2
+
+    return argon2
+
+
+def _argon2_hasher(params: HashParams):
+    argon2 = _argon2()
+    return argon2.PasswordHasher(
+        time_cost=params.time_cost,
+        memory_cost=params.memory_cost,
+        parallelism=params.parallelism,
+        type=argon2.Type.ID,
+    )
+
+
+def _bcrypt_bytes(password: str) -> bytes:
+    return password.encode("utf-8")[:_BCRYPT_MAX_BYTES]
+
+
+def _hash(password: str, params: HashParams) -> str:
+    if params.scheme == "argon2id":
+        return _argon2_hasher(params).hash(password)
+    salt = bcrypt.gensalt(params.rounds)
+    return bcrypt.hashpw(_bcrypt_bytes(password), salt).decode("utf-8")
+
+
+def _median_ms(operation: Callable[[], object], clock: Callable[[], float]) -> float:
+    samples = []
+    for _ in range(3):
+        start = clock()
+        operation()
+        samples.append((clock() - start) * 1000)
+    return statistics.median(samples)
+
+
+def calibrate(
+    scheme: Optional[str] = None,
+    target_ms: Optional[float] = None,
+    clock: Callable[[], float] = time.perf_counter,
+) -> HashParams:
+    """
+    ハッシュ1回の時間が target_ms 以下で最も重いパラメータを求める
+
+    低いコストで計測して外挿する（bcrypt はコストが1増えるごとに2倍、
+    argon2id は反復回数に比例して伸びる）。bcrypt のコストは目標時間に
+    収まらなくても _BCRYPT_MIN_ROUNDS（12）より下げない。
+    設定でコストを固定している場合はその値を使う（下限より低くてもよい）。
+    """
+    scheme = scheme or settings.PASSWORD_HASH_SCHEME
+    target_ms = target_ms or settings.PASSWORD_HASH_TARGET_MS
+    if scheme == "argon2id":
+        params = HashParams(
+            scheme=scheme,
+            time_cost=1,
+            memory_cost=settings.PASSWORD_HASH_ARGON2_MEMORY_KIB,
+        )
+        if settings.PASSWORD_HASH_ARGON2_TIME_COST:
+            return replace(params, time_cost=settings.PASSWORD_HASH_ARGON2_TIME_COST)
+        # メモリの確保・初期化の固定費があるため、反復回数1と2の差から1回あたりを求める
+        first = _median_ms(lambda: _hash("calibration", params), clock)
+        second = _median_ms(
+            lambda: _hash("calibration", replace(params, time_cost=2)), clock
+        )
+        per_pass = second - first
+        time_cost = (
+            1 + int((target_ms - first) // per_pass)
+            if per_pass > 0
+            else _ARGON2_MAX_TIME_COST
+        )
+        return replace(
+            params,
+            time_cost=min(max(time_cost, _ARGON2_MIN_TIME_COST), _ARGON2_MAX_TIME_COST),
+        )
+    if scheme != "bcrypt":
+        raise ValueError(f"Unsupported password hash scheme: {scheme}")
+
+    if settings.PASSWORD_HASH_BCRYPT_ROUNDS:
+        return HashParams(scheme=scheme, rounds=settings.PASSWORD_HASH_BCRYPT_ROUNDS)
+    probe = HashParams(scheme=scheme, rounds=_BCRYPT_PROBE_ROUNDS)
+    elapsed = _median_ms(lambda: _hash("calibration", probe), clock)
+    rounds = _BCRYPT_MIN_ROUNDS
+    while (
+        rounds < _BCRYPT_MAX_ROUNDS
+        and elapsed * 2 ** (rounds + 1 - _BCRYPT_PROBE_ROUNDS) <= target_ms
+    ):
+        rounds += 1
+    return HashParams(scheme=scheme, rounds=rounds)
+
+
+def current_params() -> HashParams:
+    """現在のパラメータ（初回に計測する。計測はハッシュ1回分より短い）"""
+    global _params
+    if _params is None:
+        with _params_lock:
+            if _params is None:
+                _params = calibrate()
+                logger.info(f"Password hashing calibrated: {_params}")
+    return _params
+
+
+def set_params(params: Optional[HashParams]) -> None:
+    """パラメータを設定（None の場合は次回使用時に計測し直す）"""
+    global _params
+    _params = params
+
+
+def hash_password(password: str) -> str:
+    """現在のパラメータでハッシュ化（CPUを使うため、イベントループ外で呼ぶ）"""
+    return _hash(password, current_params())
+
+
+def verify_password(password: str, hashed: str) -> bool:
+    """ハッシュの方式とパラメータはハッシュ文字列から読み取る"""
+    if hashed.startswith("$argon2"):
+        exceptions = _argon2().exceptions
+        try:
+            return _argon2_hasher(HashParams()).verify(hashed, password)
+        except (exceptions.VerificationError, exceptions.InvalidHashError):
+            return False
+    try:
+        return bcrypt.checkpw(_bcrypt_bytes(password), hashed.encode("utf-8"))
+    except ValueError:
+        return False
+
+
+def needs_rehash(hashed: str) -> bool:
+    """
+    ハッシュが現在の方式・パラメータより弱いか
+
+    ワーカーごとの計測結果は多少ばらつくため、弱い場合のみ作り直す
+    （強い側に揃い、ワーカー間で作り直しを繰り返さない）
+    """
+    params = current_params()
+    if params.scheme == "argon2id":
+        if not hashed.startswith("$argon2id$"):
+            return True
+        stored = _argon2().extract_parameters(hashed)
+        return (
+            stored.time_cost < params.time_cost
+            or stored.memory_cost < params.memory_cost
+        )
+    match = _BCRYPT_PATTERN.match(hashed)
+    return match is None or int(match.group(1)) < params.rounds
+
+
+def verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """
+    パスワードを検証し、ハッシュが現在のパラメータより弱ければ作り直す
+
+    Returns:
+        (検証結果, 新しいハッシュ（作り直さない場合は None）)
+    """
+    if not verify_password(password, hashed):
+        return False, None
+    if needs_rehash(hashed):
+        return True, hash_password(password)
+    return True, None
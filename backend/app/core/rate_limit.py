@@ -0,0 +1,268 @@
+# Per-user token bucket rate limiting
+import logging
+import math
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi import Depends, HTTPException, Response, status
+from sqlalchemy import case, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core.config import settings
+from app.core.security import get_current_user
+
+logger = logging.getLogger(__name__)
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_rate(spec: str) -> Tuple[int, float]:
+    """
+    "10/hour" 形式のレート指定を (バケット容量, 1秒あたりの補充量) に変換
+
+    Raises:
+        ValueError: 形式が不正な場合
+    """
+    count, period = spec.split("/")
+    capacity = int(count)
+    seconds = _PERIODS.get(period.strip().rstrip("s"))
+    if seconds is None:
+        raise ValueError(f"Unsupported rate limit period: {period}")
+    return capacity, capacity / seconds
+
+
+@dataclass
+class RateLimitResult:
+    """トークンバケットの消費結果"""
+
+    allowed: bool
+    limit: int
+    tokens: float
+    refill_rate: float
+    cost: int = 1
+
+    @property
+    def remaining(self) -> int:
+        return max(0, math.floor(self.tokens))
+
+    @property
+    def reset_after(self) -> int:
+        """バケットが満タンに戻るまでの秒数"""
+        return max(0, math.ceil((self.limit - self.tokens) / self.refill_rate))
+
+    @property
+    def retry_after(self) -> int:
+        """次のリクエストが許可されるまでの秒数"""
+        return max(1, math.ceil((self.cost - self.tokens) / self.refill_rate))
+
+    def headers(self) -> Dict[str, str]:
+        """RateLimit-* レスポンスヘッダー"""
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(self.reset_after),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(self.retry_after)
+        return headers
+
+
+class RateLimitBackend(ABC):
+    """レート制限の状態を保存するバックエンドの基底クラス"""
+
+    @abstractmethod
+    async def consume(
+        self, key: str, capacity: int, refill_rate: float, cost: int = 1
+    ) -> RateLimitResult:
+        """
+        バケットからトークンを消費（補充計算と消費を1回の操作でアトミックに行う）
+
+        Args:
+            key: バケットのキー（スコープとユーザーID）
+            capacity: バケット容量
+            refill_rate: 1秒あたりの補充量
+            cost: 消費するトークン数
+
+        Returns:
+            消費結果
+        """
+        pass
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """プロセス内メモリのバックエンド（単一ワーカー・開発用）"""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.buckets: Dict[str, Tuple[float, float]] = {}
+
+    async def consume(
+        self, key: str, capacity: int, refill_rate: float, cost: int = 1
+    ) -> RateLimitResult:
+        now = self.clock()
+        tokens, updated_at = self.buckets.get(key, (capacity, now))
+        available = min(capacity, tokens + (now - updated_at) * refill_rate)
+        allowed = available >= cost
+        if allowed:
+            available -= cost
+        self.buckets[key] = (available, now)
+        return RateLimitResult(allowed, capacity, available, refill_rate, cost)
+
+
+class PostgresRateLimitBackend(RateLimitBackend):
+    """
+    Postgresのバックエンド（複数ワーカー・複数インスタンスで共有）
+
+    INSERT ... ON CONFLICT DO UPDATE の1ステートメントで補充と消費を行う
+    """
+
+    async def consume(
+        self, key: str, capacity: int, refill_rate: float, cost: int = 1
+    ) -> RateLimitResult:
+        # Import here to avoid circular dependency
+        from app.database import database
+        from app.models.rate_limit_bucket import RateLimitBucket
+
+        bucket = RateLimitBucket.__table__
+        elapsed = func.extract("epoch", func.now() - bucket.c.updated_at)
+        available = func.least(
+            float(capacity), bucket.c.tokens + elapsed * float(refill_rate)
+        )
+        allowed = available >= float(cost)
+
+        query = (
+            pg_insert(bucket)
+            .values(
+                key=key,
+                tokens=float(capacity - cost),
+                allowed=True,
+                updated_at=func.now(),
+            )
+            .on_conflict_do_update(
+                index_elements=[bucket.c.key],
+                set_={
+                    "tokens": case((allowed, available - float(cost)), else_=available),
+                    "allowed": allowed,
+                    "updated_at": func.now(),
+                },
+            )
+            .returning(bucket.c.tokens, bucket.c.allowed)
+        )
+        row = await database.fetch_one(query=query)
+        return RateLimitResult(
+            row["allowed"], capacity, row["tokens"], refill_rate, cost
+        )
+
+
+# Redisの時刻で補充量を計算し、読み取り・更新を1回のEVALSHAで行う
+_REDIS_TOKEN_BUCKET = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+local available = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if available >= cost then
+  available = available - cost
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(available), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - available) / rate * 1000) + 1000)
+return {allowed, tostring(available)}
+"""
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """Redis互換サーバー（Redis / Valkey / KeyDB など）のバックエンド"""
+
+    def __init__(self, url: str):
+        # redis はこのバックエンドを使う場合のみ必要
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.script = self.client.register_script(_REDIS_TOKEN_BUCKET)
+
+    async def consume(
+        self, key: str, capacity: int, refill_rate: float, cost: int = 1
+    ) -> RateLimitResult:
+        allowed, tokens = await self.script(
+            keys=[f"ratelimit:{key}"], args=[capacity, refill_rate, cost]
+        )
+        return RateLimitResult(
+            bool(allowed), capacity, float(tokens), refill_rate, cost
+        )
+
+
+_backend: Optional[RateLimitBackend] = None
+
+
+def get_rate_limit_backend() -> RateLimitBackend:
+    """
+    設定（RATE_LIMIT_BACKEND）に応じたバックエンドを取得
+
+    Raises:
+        ValueError: 未対応のバックエンドが指定された場合
+    """
+    global _backend
+    if _backend is None:
+        name = settings.RATE_LIMIT_BACKEND.lower()
+        if name == "memory":
+            _backend = MemoryRateLimitBackend()
+        elif name == "postgres":
+            _backend = PostgresRateLimitBackend()
+        elif name == "redis":
+            _backend = RedisRateLimitBackend(settings.RATE_LIMIT_REDIS_URL)
+        else:
+            raise ValueError(
+                f"Unsupported rate limit backend: {name}. Supported backends: memory, postgres, redis"
+            )
+    return _backend
+
+
+def rate_limit(spec: str, scope: str):
+    """
+    認証済みユーザーIDごとのレート制限を行う依存関係を生成
+
+    依存関係はリクエストボディの検証前に解決されるため、ここではトークンを消費せず、
+    消費する関数を返す。エンドポイントの本体（検証に成功した後）でその関数を呼ぶ
+    （422 になるリクエストは回数に数えない）。
+
+    Args:
+        spec: レート指定（例: "10/hour"）
+        scope: 制限の対象（エンドポイント名など）
+
+    Returns:
+        FastAPIの依存関係（消費する関数を返す。上限を超えた場合は関数が 429 を送出）
+    """
+    capacity, refill_rate = parse_rate(spec)
+
+    async def dependency(response: Response, current_user=Depends(get_current_user)):
+        key = f"{scope}:{current_user['id']}"
+
+        async def consume() -> None:
+            try:
+                result = await get_rate_limit_backend().consume(
+                    key, capacity, refill_rate
+                )
+            except Exception as e:
+                # バックエンド障害時はリクエストを通す（APIを止めない）
+                logger.error(f"Rate limit backend error: {str(e)}")
+                return
+
+            if not result.allowed:
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail=f"Rate limit exceeded: {spec}",
+                    headers=result.headers(),
+                )
+            response.headers.update(result.headers())
+
+        return consume
+
+    return dependency
@@ -0,0 +1,209 @@
+# Versioned per-user read-through cache
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Optional,
+    Tuple,
+)
+
+# 1レコードあたりの推定オーバーヘッド（asyncpg / databases のレコードとキー）
+_RECORD_OVERHEAD = 200
+
+_MISSING = object()
+
+
+@dataclass
+class ReadCacheStats:
+    """キャッシュのヒット率（プロセスごと）"""
+
+    hits: int = 0
+    misses: int = 0
+    # ミスのうち、書き込み（世代の更新）または期限切れで無効になっていたもの
+    stale: int = 0
+    # 上限を超えたため破棄したエントリ
+    evictions: int = 0
+
+    def summary(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "stale": self.stale,
+            "evictions": self.evictions,
+        }
+
+
+class _Entry:
+    __slots__ = ("value", "dependencies", "size", "expires")
+
+    def __init__(self, value, dependencies, size: int, expires: float):
+        self.value = value
+        self.dependencies = dependencies
+        self.size = size
+        self.expires = expires
+
+
+def estimate_size(value) -> int:
+    """レコード（またはそのリスト）の推定メモリ使用量（バイト）"""
+    if value is None:
+        return 0
+    records = value if isinstance(value, list) else [value]
+    return sum(
+        _RECORD_OVERHEAD + sum(sys.getsizeof(field) for field in record.values())
+        for record in records
+    )
+
+
+class ReadCache:
+    """
+    ユーザーごとの世代番号で無効化する読み取りキャッシュ（プロセスごと）
+
+    書き込みのたびに bump で対象ユーザーの世代を新しい値にする。エントリには
+    読み込んだ結果が依存するユーザーとその時点の世代を記録し、取得時にいずれかの
+    世代が変わっていれば無効とみなす（書き込み時に該当するキーを探す必要がない）。
+    世代はプロセス全体で単調に増える値のため、読み込み中に書き込まれたかを判定でき、
+    その場合は結果を保存しない。bump は書き込みのコミット後に呼び出す。
+
+    エントリ数と推定メモリ使用量の上限を超えた場合は、最近使われていないものから破棄する。
+    他のワーカーでの書き込みは on_bump（無効化バスへの送信）で伝える。伝わらなかった
+    場合に備えて、エントリは ttl_seconds で期限切れにする。
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+        on_bump: Optional[Callable[[Tuple[int, ...]], None]] = None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.on_bump = on_bump
+        self.entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self.size = 0
+        self.stats = ReadCacheStats()
+        self._generations: "OrderedDict[int, int]" = OrderedDict()
+        self._counter = 0
+        # 世代の表から破棄したユーザーの世代（表にないユーザーはこの値とみなす）
+        self._floor = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def generation(self, user_id: int) -> int:
+        return self._generations.get(user_id, self._floor)
+
+    def bump(self, *user_ids: int, notify: bool = True) -> None:
+        """
+        ユーザーのデータが変更されたことを記録し、そのユーザーに依存するエントリを無効にする
+
+        notify が True の場合は on_bump で他のワーカーにも伝える
+        （他のワーカーから受け取った無効化では False にする）
+        """
+        if notify and self.on_bump is not None:
+            self.on_bump(user_ids)
+        for user_id in user_ids:
+            self._counter += 1
+            self._generations[user_id] = self._counter
+            self._generations.move_to_end(user_id)
+        # 世代の表も最近書き込んだユーザーに限る。破棄したユーザーの世代は floor として
+        # 残すため、そのユーザーのエントリは（より新しい世代を破棄するまで）有効なまま
+        while len(self._generations) > max(self.max_entries, 1):
+            _, generation = self._generations.popitem(last=False)
+            self._floor = max(self._floor, generation)
+
+    def get(self, key: Hashable):
+        """有効なエントリの値、ない場合は _MISSING"""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return _MISSING
+        if self.clock() >= entry.expires or any(
+            self.generation(user_id) != generation
+            for user_id, generation in entry.dependencies
+        ):
+            self._remove(key)
+            self.stats.misses += 1
+            self.stats.stale += 1
+            return _MISSING
+        self.entries.move_to_end(key)
+        self.stats.hits += 1
+        return entry.value
+
+    def put(
+        self, key: Hashable, value, dependencies: Tuple[Tuple[int, int], ...]
+    ) -> None:
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = _Entry(
+            value, dependencies, size, self.clock() + self.ttl_seconds
+        )
+        self.size += size
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+            self.stats.evictions += 1
+
+    def _remove(self, key: Hashable) -> None:
+        self.size -= self.entries.pop(key).size
+
+    def clear(self) -> None:
+        """全エントリを無効にする（読み込み中の結果も保存しない）"""
+        self.entries.clear()
+        self.size = 0
+        self._generations.clear()
+        self._counter += 1
+        self._floor = self._counter
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        user_id: int,
+        load: Callable[[], Awaitable[Any]],
+        owners: Optional[Callable[[Any], Iterable[int]]] = None,
+    ):
+        """
+        key の有効なエントリがあればその値を、なければ load() の結果を保存して返す
+
+        Args:
+            key: キャッシュのキー（ユーザーIDとパラメータを含める）
+            user_id: 結果が依存するユーザー
+            load: 値をDBから読み込むコルーチン関数
+            owners: 値から、結果が依存する他のユーザーのIDを取り出す関数
+                （お気に入りに含まれるノートの所有者など）
+        """
+        if not self.enabled:
+            return await load()
+        value = self.get(key)
+        if value is not _MISSING:
+            return value
+        started = self._counter
+        value = await load()
+        users = {user_id, *(owners(value) if owners else ())}
+        dependencies = tuple((user, self.generation(user)) for user in users)
+        # 読み込み中に書き込まれた（世代が進んだ）場合は古い結果の可能性がある
+        if all(generation <= started for _, generation in dependencies):
+            self.put(key, value, dependencies)
+        return value
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            **self.stats.summary(),
+            "entries": len(self.entries),
+            "bytes": self.size,
+        }
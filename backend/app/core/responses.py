@@ -0,0 +1,101 @@
+# Fast JSON response helpers
+from typing import Any, AsyncIterable, Iterable, Mapping, Sequence
+
+import orjson
+from fastapi import Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.core.utils import etag_headers
+
+
+class ORJSONResponse(JSONResponse):
+    """orjsonでシリアライズするJSONレスポンス"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def project_records(
+    records: Iterable[Mapping[str, Any]], fields: Sequence[str]
+) -> list:
+    """
+    DBレコードをレスポンス用のdictへ射影
+
+    SELECTするカラムがレスポンススキーマと一致している（SQLの形が既知の）
+    場合にのみ使用する。Pydanticの検証を通さないため、行ごとのモデル生成を省ける。
+
+    Args:
+        records: databasesのレコード（またはdict）のリスト
+        fields: 出力するフィールド名
+
+    Returns:
+        dictのリスト
+    """
+    return [{field: record[field] for field in fields} for record in records]
+
+
+class RecordListResponse(ORJSONResponse):
+    """DBレコードのリストを検証なしで直接JSONにするレスポンス"""
+
+    def __init__(
+        self,
+        records: Iterable[Mapping[str, Any]],
+        fields: Sequence[str],
+        **kwargs: Any,
+    ):
+        super().__init__(project_records(records, fields), **kwargs)
+
+
+class NDJSONRecordStreamResponse(StreamingResponse):
+    """
+    DBレコードのバッチを1行1件のJSON（NDJSON）として順に送るレスポンス
+
+    全件をメモリに載せずに大量のレコードを返す場合に使う（バッチごとに1回書き込む）
+    """
+
+    media_type = "application/x-ndjson"
+
+    def __init__(
+        self,
+        batches: AsyncIterable[Sequence[Mapping[str, Any]]],
+        fields: Sequence[str],
+        **kwargs: Any,
+    ):
+        async def lines():
+            async for batch in batches:
+                yield b"".join(
+                    orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
+                    for record in project_records(batch, fields)
+                )
+
+        super().__init__(lines(), **kwargs)
+
+
+class EventStreamResponse(StreamingResponse):
+    """
+    Server-Sent Events（text/event-stream）のレスポンス
+
+    プロキシにバッファリング・キャッシュさせず、書き込んだイベントをすぐに届ける
+    """
+
+    media_type = "text/event-stream"
+
+    def __init__(self, content: AsyncIterable[bytes], **kwargs: Any):
+        super().__init__(content, **kwargs)
+        self.headers["Cache-Control"] = "no-cache"
+        self.headers["X-Accel-Buffering"] = "no"
+
+
+def event_frame(event: str, data: Any = None) -> bytes:
+    """SSEのイベント1件（data はJSONにする）"""
+    frame = b"event: " + event.encode()
+    if data is not None:
+        frame += b"\ndata: " + orjson.dumps(data)
+    return frame + b"\n\n"
+
+
+def not_modified(etag: str) -> Response:
+    """304 Not Modified レスポンス"""
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED, headers=etag_headers(etag)
+    )
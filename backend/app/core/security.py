@@ -1,33 +1,32 @@
 # JWT and password hashing utilities
+import uuid
 from datetime import datetime, timedelta, timezone
 from typing import Optional
-import bcrypt
 from jose import JWTError, jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from app.core.config import settings
+from app.core import password_hashing
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+# 認証が任意のエンドポイント用（トークンがなくても 401 にしない）
+optional_oauth2_scheme = OAuth2PasswordBearer(
+    tokenUrl="/api/auth/login", auto_error=False
+)
 
 
 def get_password_hash(password: str) -> str:
-    """パスワードをハッシュ化"""
-    # Truncate password to 72 bytes if needed (bcrypt limitation)
-    password_bytes = password.encode("utf-8")[:72]
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(password_bytes, salt).decode("utf-8")
+    """パスワードをハッシュ化（CPUを使うため、イベントループ外で呼ぶ）"""
+    return password_hashing.hash_password(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """パスワード検証"""
-    # Truncate password to 72 bytes if needed (bcrypt limitation)
-    password_bytes = plain_password.encode("utf-8")[:72]
-    hashed_bytes = hashed_password.encode("utf-8")
-    return bcrypt.checkpw(password_bytes, hashed_bytes)
+    return password_hashing.verify_password(plain_password, hashed_password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-    """JWTアクセストークン生成"""
+    """JWTアクセストークン生成（期限前に失効させるための jti を含む）"""
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
@@ -36,33 +35,61 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
     to_encode.update({"exp": expire})
+    to_encode.setdefault("jti", uuid.uuid4().hex)
     encoded_jwt = jwt.encode(
         to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM
     )
     return encoded_jwt
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
-    """JWTトークンから現在のユーザーを取得"""
+def decode_access_token(token: str) -> Optional[dict]:
+    """JWTアクセストークンを検証してクレームを返す（無効・期限切れの場合は None）"""
+    try:
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+
+
+async def get_current_user(request: Request, token: str = Depends(oauth2_scheme)):
+    """
+    JWTトークン（またはパーソナルアクセストークン）から現在のユーザーを取得
+
+    JWT の場合はログアウトなどで失効させたトークンでないかを、パーソナルアクセストークンの
+    場合は、リクエストがトークンのスコープに含まれるかも確認する
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
 
     # Import here to avoid circular dependency
-    from app.services import user_service
+    from app.services import token_service, user_service
+
+    if token.startswith(token_service.PAT_PREFIX):
+        access_token = await token_service.authenticate_personal_access_token(token)
+        if access_token is None:
+            raise credentials_exception
+        if not token_service.scope_allows(
+            access_token.scopes, request.method, request.url.path
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Insufficient token scope",
+            )
+        return access_token.user
+
+    payload = decode_access_token(token)
+    username: Optional[str] = payload.get("sub") if payload else None
+    if username is None:
+        raise credentials_exception
+    # 期限前に失効させたトークン（ほとんどはワーカー内のブルームフィルタのみで判定する）
+    jti = payload.get("jti")
+    if jti and await token_service.is_access_token_revoked(jti):
+        raise credentials_exception
 
     user = await user_service.get_by_username(username)
-    if user is None:
+    # 無効化（削除中を含む）されたユーザーのトークンは期限前でも使えない
+    if user is None or not user["is_active"]:
         raise credentials_exception
     return user
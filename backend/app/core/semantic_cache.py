@@ -0,0 +1,175 @@
+# Semantic near-duplicate cache for AI generations
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# 埋め込みベクトルの次元数と n-gram の長さ
+_DIMENSIONS = 512
+_NGRAM = 3
+
+# 句読点・記号・空白（単語を構成しない文字）の連続
+_SEPARATORS = re.compile(r"[\W_]+")
+
+
+@dataclass
+class SemanticCacheStats:
+    """キャッシュのヒット率とレイテンシ（プロセスごと）"""
+
+    hits: int = 0
+    misses: int = 0
+    # 埋め込みと検索にかかった時間の合計
+    lookup_seconds: float = 0.0
+    # ミス時のAI呼び出し（ヒットすれば省ける時間）の合計
+    generation_seconds: float = 0.0
+
+    def record_lookup(self, hit: bool, seconds: float) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        self.lookup_seconds += seconds
+
+    def record_generation(self, seconds: float) -> None:
+        self.generation_seconds += seconds
+
+    def summary(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "avg_lookup_ms": self.lookup_seconds / lookups * 1000 if lookups else 0.0,
+            "avg_generation_ms": (
+                self.generation_seconds / self.misses * 1000 if self.misses else 0.0
+            ),
+        }
+
+
+class _UserIndex:
+    """1ユーザー・1プロバイダー分のベクトル（固定長のリングバッファ）"""
+
+    def __init__(self, np, capacity: int):
+        self.prompts = np.zeros((capacity, _DIMENSIONS), dtype=np.float32)
+        self.contexts = np.zeros((capacity, _DIMENSIONS), dtype=np.float32)
+        self.generation_ids = np.zeros(capacity, dtype=np.int64)
+        self.created = np.zeros(capacity, dtype=np.float64)
+        self.size = 0
+        self.next = 0
+
+
+class SemanticCache:
+    """
+    プロンプトとコンテキストがほぼ同じ過去の生成結果を探すインメモリのキャッシュ
+
+    テキストは正規化（NFKC・小文字化・句読点と空白の除去）した文字 n-gram を
+    特徴量ハッシングで固定長のベクトルにし、コサイン類似度で比較する。
+    プロンプトとコンテキストの類似度がそれぞれのしきい値以上なら一致とみなすため、
+    空白の違いや小さな編集は一致し、別のプロンプトや別のノートは一致しない。
+    （短いプロンプトは1文字の違いでも類似度が大きく下がるため、しきい値を分ける）
+
+    インデックスはユーザーとプロバイダーごとに持ち、古いエントリから置き換える。
+    プロセスごとのキャッシュのため、ワーカー間では共有しない。
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        prompt_threshold: float,
+        max_entries: int,
+        max_users: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        # numpy はこのキャッシュを使う場合のみ必要
+        import numpy as np
+
+        self.np = np
+        self.threshold = threshold
+        self.prompt_threshold = prompt_threshold
+        self.max_entries = max_entries
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.indexes: "OrderedDict[Tuple[int, str], _UserIndex]" = OrderedDict()
+        self.stats = SemanticCacheStats()
+
+    def _embed_text(self, text: str):
+        np = self.np
+        vector = np.zeros(_DIMENSIONS, dtype=np.float32)
+        # 句読点・記号と空白の違いは無視する
+        normalized = _SEPARATORS.sub(" ", unicodedata.normalize("NFKC", text).lower())
+        if not normalized.strip():
+            return vector
+        padded = f" {normalized.strip()} "
+        # 出現回数ではなく n-gram の集合にする（長いテキストが言語全体の分布に近づかないよう）
+        grams = {padded[i : i + _NGRAM] for i in range(len(padded) - _NGRAM + 1)}
+        # ベクトルはプロセス外に出ないため、組み込みの hash で十分
+        hashes = np.fromiter(
+            (hash(gram) for gram in grams), dtype=np.int64, count=len(grams)
+        )
+        # 最下位ビットを符号に使い、衝突による偏りを打ち消す
+        signs = np.where(hashes & 1, 1.0, -1.0).astype(np.float32)
+        np.add.at(vector, (hashes >> 1) % _DIMENSIONS, signs)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed(self, prompt: str, context: str) -> tuple:
+        """(プロンプト, コンテキスト) の埋め込みベクトル"""
+        return self._embed_text(prompt), self._embed_text(context)
+
+    def lookup(self, user_id: int, provider: str, embedding: tuple) -> Optional[int]:
+        """
+        類似度がしきい値以上で最も近い過去の生成履歴のIDを返す
+
+        Returns:
+            生成履歴のID、見つからない場合は None
+        """
+        index = self.indexes.get((user_id, provider))
+        if index is None or index.size == 0:
+            return None
+        self.indexes.move_to_end((user_id, provider))
+
+        np = self.np
+        prompt_vector, context_vector = embedding
+        size = index.size
+        context_scores = index.contexts[:size] @ context_vector
+        matches = (
+            (index.prompts[:size] @ prompt_vector >= self.prompt_threshold)
+            & (context_scores >= self.threshold)
+            # 期限切れのエントリは一致させない
+            & (index.created[:size] >= self.clock() - self.ttl_seconds)
+        )
+        if not matches.any():
+            return None
+        best = int(np.argmax(np.where(matches, context_scores, -1.0)))
+        return int(index.generation_ids[best])
+
+    def add(
+        self, user_id: int, provider: str, embedding: tuple, generation_id: int
+    ) -> None:
+        """生成結果を登録（容量を超えた場合は最も古いエントリを置き換える）"""
+        key = (user_id, provider)
+        index = self.indexes.get(key)
+        if index is None:
+            index = self.indexes[key] = _UserIndex(self.np, self.max_entries)
+            # 最近使われていないユーザーから破棄してメモリを一定に保つ
+            while len(self.indexes) > self.max_users:
+                self.indexes.popitem(last=False)
+        self.indexes.move_to_end(key)
+
+        slot = index.next
+        index.prompts[slot], index.contexts[slot] = embedding
+        index.generation_ids[slot] = generation_id
+        index.created[slot] = self.clock()
+        index.next = (slot + 1) % self.max_entries
+        index.size = min(index.size + 1, self.max_entries)
+
+    def discard(self, user_id: int, provider: str, generation_id: int) -> None:
+        """生成履歴が削除された場合などにエントリを無効化"""
+        index = self.indexes.get((user_id, provider))
+        if index is None:
+            return
+        index.created[index.generation_ids == generation_id] = float("-inf")
@@ -0,0 +1,98 @@
+# Text deltas for note revision storage and PATCH edits
+import difflib
+import json
+from typing import Iterable, List, Tuple, Union
+
+# 差分の操作: [start, end] はベースの行 start:end をコピー、文字列はそのまま挿入
+DeltaOp = Union[List[int], str]
+
+
+def make_delta(base: str, target: str) -> List[DeltaOp]:
+    """
+    base から target を復元するための行単位の差分を生成
+
+    共通の先頭・末尾の行を除いてから difflib で比較するため、
+    1か所だけ編集された大きなテキストでも高速に計算できる。
+    """
+    a = base.splitlines(keepends=True)
+    b = target.splitlines(keepends=True)
+
+    prefix = 0
+    limit = min(len(a), len(b))
+    while prefix < limit and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while (
+        suffix < limit - prefix and a[len(a) - 1 - suffix] == b[len(b) - 1 - suffix]
+    ):
+        suffix += 1
+
+    ops: List[DeltaOp] = []
+
+    def copy(start: int, end: int) -> None:
+        if start == end:
+            return
+        if ops and isinstance(ops[-1], list) and ops[-1][1] == start:
+            ops[-1][1] = end
+        else:
+            ops.append([start, end])
+
+    def insert(text: str) -> None:
+        if not text:
+            return
+        if ops and isinstance(ops[-1], str):
+            ops[-1] += text
+        else:
+            ops.append(text)
+
+    copy(0, prefix)
+    a_mid, b_mid = a[prefix : len(a) - suffix], b[prefix : len(b) - suffix]
+    matcher = difflib.SequenceMatcher(None, a_mid, b_mid)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            copy(prefix + i1, prefix + i2)
+        else:
+            insert("".join(b_mid[j1:j2]))
+    copy(len(a) - suffix, len(a))
+    return ops
+
+
+def apply_delta(base: str, delta: List[DeltaOp]) -> str:
+    """make_delta で生成した差分を base に適用"""
+    lines = base.splitlines(keepends=True)
+    return "".join(
+        "".join(lines[op[0] : op[1]]) if isinstance(op, list) else op for op in delta
+    )
+
+
+def encode_delta(delta: List[DeltaOp]) -> str:
+    """差分を保存用のコンパクトなJSON文字列に変換"""
+    return json.dumps(delta, ensure_ascii=False, separators=(",", ":"))
+
+
+def decode_delta(data: str) -> List[DeltaOp]:
+    """encode_delta の逆変換"""
+    return json.loads(data)
+
+
+def apply_edits(text: str, edits: Iterable[Tuple[int, int, str]]) -> str:
+    """
+    文字範囲の編集（start, end, 置換後の文字列）を適用
+
+    範囲はすべて元の text に対する位置（Unicodeコードポイント単位）で指定する。
+
+    Raises:
+        ValueError: 範囲が不正、または編集同士が重なっている場合
+    """
+    parts = []
+    position = 0
+    for start, end, replacement in sorted(edits, key=lambda edit: edit[:2]):
+        if not 0 <= start <= end <= len(text):
+            raise ValueError(f"Edit range {start}-{end} is out of bounds")
+        if start < position:
+            raise ValueError(f"Edit range {start}-{end} overlaps another edit")
+        parts.append(text[position:start])
+        parts.append(replacement)
+        position = end
+    parts.append(text[position:])
+    return "".join(parts)
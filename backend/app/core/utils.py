@@ -1 +1,45 @@
-# Common utility functions
\ No newline at end of file
+# Common utility functions
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+
+def _etag_part(value: Any) -> str:
+    """ETagの構成要素を文字列化（日時はマイクロ秒単位のエポック値）"""
+    if value is None:
+        return "0"
+    if isinstance(value, datetime):
+        return str(int(value.timestamp() * 1_000_000))
+    return str(value)
+
+
+def make_weak_etag(*parts: Any) -> str:
+    """
+    バージョン情報（件数・最終更新日時など）から弱いETagを生成
+
+    ペイロードをハッシュせず、DBから安価に取得できる値だけで構成する
+    """
+    return 'W/"' + "-".join(_etag_part(part) for part in parts) + '"'
+
+
+def fields_digest(fields: Iterable[str]) -> int:
+    """返すフィールドの組み合わせを表す短い値（フィールドごとにETagを区別するため）"""
+    return zlib.crc32(",".join(fields).encode())
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """If-None-Match / If-Match ヘッダーがETagに一致するか（弱い比較）"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in header.split(",")
+    )
+
+
+def etag_headers(etag: str) -> Dict[str, str]:
+    """ETag付きレスポンスのヘッダー（毎回再検証させる）"""
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 from databases import Database
 from app.core.config import settings
@@ -17,3 +17,61 @@ metadata = Base.metadata
 database = Database(
     settings.DATABASE_URL.replace("postgresql+psycopg", "postgresql+asyncpg")
 )
+
+# 大きなテキストを保存するカラム（TOAST圧縮方式の対象）
+COMPRESSIBLE_COLUMNS = {
+    "notes": ("content",),
+    "note_revisions": ("content", "delta"),
+    "ai_blobs": ("content",),
+}
+
+_COMPRESSION_CODES = {"pglz": "p", "lz4": "l"}
+
+
+def apply_content_compression(connection, method: str, columns=None) -> bool:
+    """
+    大きなテキストカラムのTOAST圧縮方式を設定（Postgres 14+）
+
+    現在の設定と異なるカラムのみ ALTER TABLE する（何度呼び出してもよい）。
+    変更後に書き込まれた値から適用され、既存の値は再圧縮されない。
+
+    Args:
+        connection: SQLAlchemyの同期コネクション
+        method: "pglz" または "lz4"
+        columns: 対象のカラム（{テーブル名: (カラム名, ...)}）、省略時は COMPRESSIBLE_COLUMNS
+
+    Returns:
+        設定した場合は True、サーバーが対応していない場合は False
+    """
+    if method not in _COMPRESSION_CODES:
+        raise ValueError(
+            f"Unsupported compression method: {method}. Supported methods: pglz, lz4"
+        )
+    # lz4 はサーバーが lz4 付きでビルドされている場合のみ利用できる
+    supported = connection.execute(
+        text(
+            "SELECT enumvals FROM pg_settings WHERE name = 'default_toast_compression'"
+        )
+    ).scalar()
+    if not supported or method not in supported:
+        return False
+
+    columns = columns or COMPRESSIBLE_COLUMNS
+    current = connection.execute(
+        text(
+            "SELECT attrelid::regclass::text AS table_name, attname, attcompression"
+            " FROM pg_attribute"
+            " WHERE attrelid = ANY(CAST(:tables AS regclass[])) AND attnum > 0"
+        ),
+        {"tables": list(columns)},
+    )
+    code = _COMPRESSION_CODES[method]
+    for table_name, column_name, compression in current:
+        if column_name in columns.get(table_name, ()) and compression != code:
+            connection.execute(
+                text(
+                    f"ALTER TABLE {table_name} ALTER COLUMN {column_name}"
+                    f" SET COMPRESSION {method}"
+                )
+            )
+    return True
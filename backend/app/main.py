@@ -1,27 +1,194 @@
 from contextlib import asynccontextmanager
+import asyncio
+import logging
+import signal
 import sys
+import threading
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
 
-from app.api import notes, users, auth, favorites, ai
-from app.database import database, engine, Base
+from app.api import notes, users, auth, favorites, ai, events
+from app.database import database, engine, Base, apply_content_compression
 from app.models.user import User
 from app.models.note import Note
 from app.models.favorite import Favorite
+from app.models.ai_blob import AIBlob
 from app.models.ai_generation import AIGeneration
+from app.models.sync_counter import SyncCounter
+from app.models.note_tombstone import NoteTombstone
+from app.models.rate_limit_bucket import RateLimitBucket
+from app.models.note_revision import NoteRevision
+from app.models.refresh_token import RefreshToken
+from app.models.personal_access_token import PersonalAccessToken
+from app.models.revoked_token import RevokedToken
+from app.models.account_deletion import AccountDeletion
+from app.models.event_stream_ticket import EventStreamTicket
+
+from app.services import note_service, ai_service, token_service, user_service
+from app.services.ai_providers.factory import warm_up_providers
+from app.core.config import settings
+from app.core.events import event_hub
+from app.core.invalidation import invalidation_bus
+
+logger = logging.getLogger(__name__)
 
 # テーブル作成
 Base.metadata.create_all(engine)
 
+# 本文カラムの圧縮方式を設定に合わせる（オプトイン）
+if settings.CONTENT_COMPRESSION:
+    with engine.begin() as connection:
+        if not apply_content_compression(connection, settings.CONTENT_COMPRESSION):
+            logger.warning(
+                f"Compression method {settings.CONTENT_COMPRESSION} is not supported "
+                "by the database server; using the server default"
+            )
+
+
+async def compact_periodically():
+    """
+    定期メンテナンス: 差分同期用の墓標の削除、AI生成履歴のパーティションの
+    作成・保持期間切れの削除、参照されなくなったAI生成のBLOBの削除、
+    期限切れのリフレッシュトークン・アクセストークンの失効・ストリームの接続チケットの削除、
+    失効のブルームフィルタの作り直し、
+    類似生成キャッシュ・読み取りキャッシュ・無効化バスの統計の記録
+    """
+    while True:
+        await asyncio.sleep(settings.SYNC_COMPACTION_INTERVAL_SECONDS)
+        try:
+            purged = await note_service.compact_tombstones()
+            if purged:
+                logger.info(f"Compacted {purged} note tombstones")
+        except Exception as e:
+            logger.error(f"Tombstone compaction failed: {str(e)}")
+        try:
+            await ai_service.maintain_generation_partitions()
+        except Exception as e:
+            logger.error(f"AI generation partition maintenance failed: {str(e)}")
+        try:
+            purged = await ai_service.compact_blobs()
+            if purged:
+                logger.info(f"Deleted {purged} unreferenced AI blobs")
+        except Exception as e:
+            logger.error(f"AI blob compaction failed: {str(e)}")
+        try:
+            purged = await token_service.delete_expired_refresh_tokens()
+            if purged:
+                logger.info(f"Deleted {purged} expired refresh tokens")
+        except Exception as e:
+            logger.error(f"Refresh token cleanup failed: {str(e)}")
+        try:
+            purged = await token_service.delete_expired_revoked_tokens()
+            if purged:
+                logger.info(f"Deleted {purged} expired access token revocations")
+        except Exception as e:
+            logger.error(f"Access token revocation cleanup failed: {str(e)}")
+        try:
+            # 期限切れの失効をブルームフィルタから除くため、削除したワーカーかに
+            # かかわらず毎回作り直す（他のワーカーが削除した分は次の周期で除かれる。
+            # 作り直さないと要素が想定数を超えて偽陽性率が上がり続ける）
+            await token_service.load_revoked_tokens()
+        except Exception as e:
+            logger.error(f"Access token revocation reload failed: {str(e)}")
+        try:
+            purged = await token_service.delete_expired_event_stream_tickets()
+            if purged:
+                logger.info(f"Deleted {purged} expired event stream tickets")
+        except Exception as e:
+            logger.error(f"Event stream ticket cleanup failed: {str(e)}")
+        logger.info(f"Access token revocation: {token_service.revocation_stats}")
+        cache = ai_service.get_semantic_cache()
+        if cache:
+            logger.info(f"AI semantic cache: {cache.stats.summary()}")
+        if note_service.read_cache.enabled:
+            logger.info(f"Read cache: {note_service.read_cache.summary()}")
+        if invalidation_bus.running:
+            logger.info(f"Cache invalidation: {invalidation_bus.stats}")
+
+
+async def flush_token_usage_periodically():
+    """パーソナルアクセストークンの最後に使われた時刻をまとめて書き込む"""
+    while True:
+        await asyncio.sleep(settings.PAT_LAST_USED_FLUSH_SECONDS)
+        try:
+            await token_service.flush_personal_access_token_usage()
+        except Exception as e:
+            logger.error(f"Access token usage flush failed: {str(e)}")
+
+
+async def refresh_revocations_periodically():
+    """他のワーカーで失効させたアクセストークンをブルームフィルタに取り込む"""
+    while True:
+        await asyncio.sleep(settings.JWT_REVOCATION_REFRESH_SECONDS)
+        try:
+            await token_service.refresh_revoked_tokens()
+        except Exception as e:
+            logger.error(f"Access token revocation refresh failed: {str(e)}")
+
+
+async def delete_accounts_in_background():
+    """削除を受け付けたアカウントのデータを少しずつ削除する（停止後は続きから再開）"""
+    while True:
+        try:
+            await user_service.process_account_deletions()
+        except Exception as e:
+            logger.error(f"Account deletion failed: {str(e)}")
+        await user_service.wait_for_account_deletions(
+            settings.ACCOUNT_DELETION_POLL_SECONDS
+        )
+
+
+async def preload_ai_providers():
+    """AI SDKをバックグラウンドで読み込む（起動を遅らせず、初回のAIリクエストを速くする）"""
+    try:
+        loaded = await asyncio.to_thread(warm_up_providers)
+        if loaded:
+            logger.info(f"Preloaded AI providers: {', '.join(loaded)}")
+    except Exception as e:
+        logger.error(f"AI provider preload failed: {str(e)}")
+
+
+def close_event_streams_on_exit() -> None:
+    """
+    終了シグナルを受けたら、イベントストリームの接続を閉じる
+
+    uvicorn は実行中のレスポンスが終わるまで（最大 timeout_graceful_shutdown 秒）
+    終了を待つため、開いたままのストリームがあると終了が遅れる。
+    uvicorn（gunicorn のワーカーを含む）が設定したシグナルハンドラーの前に閉じる。
+    """
+    # シグナルはメインスレッドでのみ受け取れる（TestClient などでは何もしない）
+    if threading.current_thread() is not threading.main_thread():
+        return
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            continue
+
+        def handler(signum, frame, previous=previous):
+            loop.call_soon_threadsafe(event_hub.close)
+            previous(signum, frame)
+
+        signal.signal(sig, handler)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     await database.connect()
+    # 生成履歴の保存先パーティションを用意する（月をまたいでも書き込めるよう先行して作成）
+    await ai_service.maintain_generation_partitions(drop_expired=False)
+    # 失効させたアクセストークンを、リクエストを受ける前にブルームフィルタに読み込む
+    await token_service.load_revoked_tokens()
+    # 他のワーカーでの書き込みによるキャッシュの無効化を受け取る
+    if settings.INVALIDATION_BUS:
+        await invalidation_bus.start(
+            settings.DATABASE_URL.replace("postgresql+psycopg", "postgresql")
+        )
+    # 変更イベントのストリームの受け付けを始める（終了シグナルで閉じる）
+    event_hub.open()
+    close_event_streams_on_exit()
 
     # カラー出力（Windowsでも動作）
     GREEN = "\033[92m"
@@ -39,11 +206,17 @@ async def lifespan(app: FastAPI):
 {BLUE}🔐 Auth:{RESET}
   - POST /api/auth/register
   - POST /api/auth/login
+  - POST /api/auth/refresh
+  - POST /api/auth/logout
   - GET  /api/auth/me
+  - GET/POST/DEL /api/auth/tokens[/{{id}}]
 
 {BLUE}📝 Notes:{RESET}
   - GET/POST    /api/notes
-  - GET/PUT/DEL /api/notes/{{id}}
+  - GET/PUT/PATCH/DEL /api/notes/{{id}}
+  - POST        /api/notes/batch
+  - GET         /api/notes/changes
+  - GET         /api/notes/{{id}}/revisions[/{{rev}}]
 
 {BLUE}⭐ Favorites:{RESET}
   - GET         /api/favorites
@@ -56,12 +229,42 @@ async def lifespan(app: FastAPI):
   - GET         /api/ai/generations
   - POST        /api/ai/save-as-note
 
+{BLUE}📡 Events:{RESET}
+  - POST        /api/events/tickets
+  - GET         /api/events  (Server-Sent Events)
+
 {GREEN}{'='*60}{RESET}
 """
     print(message, file=sys.stderr)
+    compaction_task = asyncio.create_task(compact_periodically())
+    token_usage_task = asyncio.create_task(flush_token_usage_periodically())
+    revocation_task = asyncio.create_task(refresh_revocations_periodically())
+    account_deletion_task = asyncio.create_task(delete_accounts_in_background())
+    # タスクがGCされないよう参照を保持する
+    preload_task = None
+    if settings.AI_PRELOAD_PROVIDERS:
+        preload_task = asyncio.create_task(preload_ai_providers())
     yield
 
     # Shutdown
+    event_hub.close()
+    compaction_task.cancel()
+    token_usage_task.cancel()
+    revocation_task.cancel()
+    account_deletion_task.cancel()
+    if preload_task:
+        preload_task.cancel()
+    # 実行中のAI生成が履歴を保存し終えるまでDB接続を維持する
+    remaining = await ai_service.wait_for_inflight_generations(
+        timeout=settings.SHUTDOWN_GRACE_SECONDS
+    )
+    if remaining:
+        logger.warning(f"Shutting down with {remaining} AI generations in flight")
+    try:
+        await token_service.flush_personal_access_token_usage()
+    except Exception as e:
+        logger.error(f"Access token usage flush failed: {str(e)}")
+    await invalidation_bus.stop()
     await database.disconnect()
 
 
@@ -72,14 +275,7 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
-# レート制限の設定
-limiter = Limiter(key_func=get_remote_address)
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-
 # CORS設定（フロントエンドからのアクセスを許可）
-from app.core.config import settings
-
 allowed_origins = [
     "http://localhost:3000",
     "http://localhost:5173",
@@ -103,6 +299,7 @@ app.include_router(users.router)
 app.include_router(notes.router)
 app.include_router(favorites.router)
 app.include_router(ai.router)
+app.include_router(events.router)
 
 
 @app.get("/")
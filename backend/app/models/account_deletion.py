@@ -0,0 +1,33 @@
+# AccountDeletion SQLAlchemy model
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class AccountDeletion(Base):
+    """
+    アカウント削除のジョブ（バックグラウンドでデータを少しずつ削除する）
+
+    進捗（段階と削除した件数）はバッチの削除と同じステートメントで更新するため、
+    ワーカーが停止しても続きから再開できる。処理中のワーカーは lease_until まで
+    ジョブを占有し、期限を過ぎると他のワーカーが引き継ぐ。
+    ユーザーの削除後も結果を確認できるよう、users への外部キーは持たない。
+    """
+
+    __tablename__ = "account_deletions"
+
+    user_id = Column(Integer, primary_key=True)
+    # 削除中の段階（user_service.ACCOUNT_DELETION_STAGES）、完了後は "completed"
+    stage = Column(String(20), nullable=False)
+    # 削除したユーザーのノートに付いていた、他のユーザーのお気に入りも含む
+    favorites_deleted = Column(Integer, nullable=False, server_default="0")
+    generations_deleted = Column(Integer, nullable=False, server_default="0")
+    revisions_deleted = Column(Integer, nullable=False, server_default="0")
+    notes_deleted = Column(Integer, nullable=False, server_default="0")
+    lease_owner = Column(String(32), nullable=True)
+    lease_until = Column(DateTime, nullable=True)
+    # 直近の失敗（次の再開まで記録しておく）
+    last_error = Column(Text, nullable=True)
+    requested_date = Column(DateTime, default=func.now(), nullable=False)
+    updated_date = Column(DateTime, default=func.now(), nullable=False)
+    completed_date = Column(DateTime, nullable=True)
@@ -0,0 +1,28 @@
+# AIBlob SQLAlchemy model
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class AIBlob(Base):
+    """
+    AI生成のプロンプト・出力本文（内容のSHA-256で重複排除して保存）
+
+    refcount は参照している ai_generations の数（トリガーで更新される）
+    """
+
+    __tablename__ = "ai_blobs"
+
+    hash = Column(String(64), primary_key=True)
+    content = Column(Text, nullable=False)
+    refcount = Column(Integer, nullable=False, default=0, server_default="0")
+    created_date = Column(DateTime, default=func.now(), nullable=False)
+
+    __table_args__ = (
+        # 参照されなくなったBLOBの削除用
+        Index(
+            "idx_ai_blobs_unreferenced",
+            "hash",
+            postgresql_where=refcount <= 0,
+        ),
+    )
@@ -1,18 +1,105 @@
 # AIGeneration SQLAlchemy model
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, ARRAY
+import re
+from datetime import date
+
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    DateTime,
+    ForeignKey,
+    ARRAY,
+    DDL,
+    Index,
+    event,
+)
 from sqlalchemy.sql import func
 from app.database import Base
 
 
 class AIGeneration(Base):
+    """
+    AI生成履歴
+
+    created_date による月別のレンジパーティションに分割する。パーティションは
+    ai_service.maintain_generation_partitions が先行して作成し、保持期間を過ぎた
+    月はパーティションごと削除する（主キーにはパーティションキーを含める必要がある）
+    """
+
     __tablename__ = "ai_generations"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(
         Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
     )
     note_ids = Column(ARRAY(Integer), nullable=False)
-    prompt = Column(Text, nullable=False)
+    # プロンプトと生成結果の本文は ai_blobs に保存し、ハッシュで参照する
+    prompt_hash = Column(String(64), ForeignKey("ai_blobs.hash"), nullable=False)
     ai_provider = Column(String(50), nullable=False)
-    generated_content = Column(Text, nullable=False)
-    created_date = Column(DateTime, default=func.now(), nullable=False)
+    content_hash = Column(String(64), ForeignKey("ai_blobs.hash"), nullable=False)
+    created_date = Column(
+        DateTime, primary_key=True, default=func.now(), server_default=func.now()
+    )
+
+    __table_args__ = (
+        # 履歴一覧用（作成日時の降順で新しいパーティションから読む）
+        Index("idx_user_created", "user_id", "created_date"),
+        # 参照されなくなったBLOBを削除する際の外部キー検査用
+        Index("idx_ai_generations_prompt_hash", "prompt_hash"),
+        Index("idx_ai_generations_content_hash", "content_hash"),
+        {"postgresql_partition_by": "RANGE (created_date)"},
+    )
+
+
+# 月別パーティションのテーブル名（例: ai_generations_y2025m01）
+PARTITION_NAME_PATTERN = re.compile(r"^ai_generations_y(\d{4})m(\d{2})$")
+
+
+def add_months(month: date, months: int) -> date:
+    """月初の日付に months か月を加算（負の値で減算）"""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """月初の日付からパーティション名を生成"""
+    return f"ai_generations_y{month.year:04d}m{month.month:02d}"
+
+
+def create_partition_ddl(month: date) -> str:
+    """month（月初）の1か月分のパーティションを作成するDDL（既存の場合は何もしない）"""
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} "
+        f"PARTITION OF ai_generations "
+        f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+    )
+
+
+# ai_blobs.refcount を参照数に合わせて更新する（ユーザー削除時のCASCADEも含む）
+BLOB_REFCOUNT_FUNCTION = """
+CREATE OR REPLACE FUNCTION ai_generation_blob_refcount() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE ai_blobs
+        SET refcount = refcount
+            + (hash = NEW.prompt_hash)::int + (hash = NEW.content_hash)::int
+        WHERE hash IN (NEW.prompt_hash, NEW.content_hash);
+        RETURN NEW;
+    END IF;
+    UPDATE ai_blobs
+    SET refcount = refcount
+        - (hash = OLD.prompt_hash)::int - (hash = OLD.content_hash)::int
+    WHERE hash IN (OLD.prompt_hash, OLD.content_hash);
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+BLOB_REFCOUNT_TRIGGER = """
+CREATE TRIGGER ai_generations_blob_refcount
+AFTER INSERT OR DELETE ON ai_generations
+FOR EACH ROW EXECUTE FUNCTION ai_generation_blob_refcount()
+"""
+
+event.listen(AIGeneration.__table__, "after_create", DDL(BLOB_REFCOUNT_FUNCTION))
+event.listen(AIGeneration.__table__, "after_create", DDL(BLOB_REFCOUNT_TRIGGER))
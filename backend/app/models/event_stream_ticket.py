@@ -0,0 +1,28 @@
+# EventStreamTicket SQLAlchemy model
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class EventStreamTicket(Base):
+    """
+    変更イベントのストリーム（/api/events）に接続するための使い捨てのチケット
+
+    ブラウザの EventSource はリクエストヘッダーを付けられないため、アクセストークンで
+    発行したチケットをクエリパラメータで渡す。チケット本体は保存せず、SHA-256 の
+    ダイジェストで検索し、接続時に削除する（どのワーカーでも1回だけ使える）。
+    """
+
+    __tablename__ = "event_stream_tickets"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    token_hash = Column(String(64), unique=True, nullable=False)
+    # 発行に使ったアクセストークンの jti（失効させたらストリームも閉じる）
+    jti = Column(String(32), nullable=True)
+    expires_at = Column(DateTime, nullable=False)
+    created_date = Column(DateTime, default=func.now(), nullable=False)
+
+    __table_args__ = (Index("idx_event_stream_tickets_expires", "expires_at"),)
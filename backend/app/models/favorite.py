@@ -1,5 +1,5 @@
 # Favorite SQLAlchemy model
-from sqlalchemy import Column, Integer, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -15,4 +15,6 @@ class Favorite(Base):
     # ユーザーとノートの組み合わせは一意
     __table_args__ = (
         UniqueConstraint("user_id", "note_id", name="unique_user_note_favorite"),
+        # ノート削除時の外部キー検査と、削除するノートのお気に入りの検索用
+        Index("idx_favorites_note", "note_id"),
     )
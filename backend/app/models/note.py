@@ -1,5 +1,14 @@
 # Note SQLAlchemy model
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import (
+    Column,
+    Integer,
+    BigInteger,
+    String,
+    Text,
+    DateTime,
+    ForeignKey,
+    Index,
+)
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -15,3 +24,14 @@ class Note(Base):
     updated_date = Column(
         DateTime, default=func.now(), onupdate=func.now(), nullable=False
     )
+    # 差分同期用の変更シーケンス番号（sync_counters から割り当て）
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0")
+    # 現在のリビジョン番号（note_revisions に対応する）
+    revision = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __table_args__ = (
+        # ユーザーごとの一覧取得・バージョン確認用
+        Index("idx_notes_user_updated", "user_id", "updated_date"),
+        # 差分同期用
+        Index("idx_notes_user_seq", "user_id", "change_seq", "id"),
+    )
@@ -0,0 +1,36 @@
+# NoteRevision SQLAlchemy model
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class NoteRevision(Base):
+    """
+    ノートの編集履歴
+
+    一定間隔ごとに全文（content）を保存し、その間のリビジョンは
+    直前のリビジョンからの差分（delta）のみを保存する
+    """
+
+    __tablename__ = "note_revisions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    note_id = Column(
+        Integer, ForeignKey("notes.id", ondelete="CASCADE"), nullable=False
+    )
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    revision = Column(Integer, nullable=False)
+    title = Column(String(200), nullable=False)
+    # スナップショットの場合は全文、差分の場合は NULL
+    content = Column(Text, nullable=True)
+    # 直前のリビジョンからの行単位の差分（JSON）、スナップショットの場合は NULL
+    delta = Column(Text, nullable=True)
+    created_date = Column(DateTime, default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("idx_note_revisions_note_rev", "note_id", "revision", unique=True),
+        # アカウント削除時のバッチ削除と、ユーザー削除時の外部キー検査用
+        Index("idx_note_revisions_user", "user_id"),
+    )
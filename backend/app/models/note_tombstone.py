@@ -0,0 +1,23 @@
+# NoteTombstone SQLAlchemy model
+from sqlalchemy import Column, Integer, BigInteger, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class NoteTombstone(Base):
+    """削除されたノートの記録（差分同期で削除を伝えるため）"""
+
+    __tablename__ = "note_tombstones"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    note_id = Column(Integer, nullable=False)
+    change_seq = Column(BigInteger, nullable=False)
+    deleted_date = Column(DateTime, default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("idx_tombstones_user_seq", "user_id", "change_seq", "note_id"),
+        Index("idx_tombstones_deleted", "deleted_date"),
+    )
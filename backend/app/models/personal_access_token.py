@@ -0,0 +1,31 @@
+# PersonalAccessToken SQLAlchemy model
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class PersonalAccessToken(Base):
+    """
+    パーソナルアクセストークン（スクリプトなどから使う長期間有効なトークン）
+
+    トークン本体は保存せず、SHA-256 のダイジェストで検索する
+    """
+
+    __tablename__ = "personal_access_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    name = Column(String(100), nullable=False)
+    token_hash = Column(String(64), unique=True, nullable=False)
+    # 一覧で見分けるためのトークンの先頭部分
+    token_prefix = Column(String(16), nullable=False)
+    # "notes:read" のような <API>:<read|write> のリスト
+    scopes = Column(ARRAY(String(32)), nullable=False)
+    expires_at = Column(DateTime, nullable=True)
+    # まとめて書き込むため、最大で PAT_LAST_USED_FLUSH_SECONDS 遅れる
+    last_used_date = Column(DateTime, nullable=True)
+    revoked_date = Column(DateTime, nullable=True)
+    created_date = Column(DateTime, default=func.now(), nullable=False)
@@ -0,0 +1,16 @@
+# RateLimitBucket SQLAlchemy model
+from sqlalchemy import Column, String, Float, Boolean, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class RateLimitBucket(Base):
+    """レート制限のトークンバケット（RATE_LIMIT_BACKEND=postgres の場合に使用）"""
+
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String(200), primary_key=True)
+    tokens = Column(Float, nullable=False)
+    # 直近の消費が許可されたか（RETURNING で結果を返すため）
+    allowed = Column(Boolean, nullable=False, default=True)
+    updated_at = Column(DateTime(timezone=True), default=func.now(), nullable=False)
@@ -0,0 +1,31 @@
+# RefreshToken SQLAlchemy model
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class RefreshToken(Base):
+    """
+    リフレッシュトークン（ローテーションごとに1行）
+
+    トークン本体は保存せず、SHA-256 のダイジェストで検索する。
+    同じログインから続くトークンは family_id が共通で、使用済みのトークンが
+    再び使われた場合は漏洩とみなして系列ごと失効させる。
+    """
+
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    token_hash = Column(String(64), unique=True, nullable=False)
+    family_id = Column(String(32), nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False)
+    # ローテーションで新しいトークンに置き換えた日時
+    used_date = Column(DateTime, nullable=True)
+    # ログアウト・再利用の検出により失効した日時
+    revoked_date = Column(DateTime, nullable=True)
+    created_date = Column(DateTime, default=func.now(), nullable=False)
+
+    __table_args__ = (Index("idx_refresh_tokens_expires", "expires_at"),)
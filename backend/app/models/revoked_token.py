@@ -0,0 +1,26 @@
+# RevokedToken SQLAlchemy model
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class RevokedToken(Base):
+    """
+    期限前に失効させたJWTアクセストークン（jti クレームで識別）
+
+    各ワーカーはこの表をブルームフィルタに読み込み、created_date 順に差分を取り込む。
+    JWT の期限（expires_at）を過ぎた行は不要になるため定期的に削除する。
+    """
+
+    __tablename__ = "revoked_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    jti = Column(String(32), unique=True, nullable=False)
+    # JWT の exp（これ以降はトークン自体が無効）
+    expires_at = Column(DateTime, nullable=False)
+    created_date = Column(DateTime, default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("idx_revoked_tokens_created", "created_date"),
+        Index("idx_revoked_tokens_expires", "expires_at"),
+    )
@@ -0,0 +1,17 @@
+# SyncCounter SQLAlchemy model
+from sqlalchemy import Column, Integer, BigInteger, ForeignKey
+from app.database import Base
+
+
+class SyncCounter(Base):
+    """ユーザーごとのノート変更シーケンス（差分同期用）"""
+
+    __tablename__ = "sync_counters"
+
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    # 最後に割り当てた変更シーケンス番号
+    last_seq = Column(BigInteger, nullable=False, default=0)
+    # この番号以下の墓標は削除済み（これより古いカーソルは全件再同期が必要）
+    compacted_seq = Column(BigInteger, nullable=False, default=0, server_default="0")
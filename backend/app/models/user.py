@@ -1,5 +1,5 @@
 # User SQLAlchemy model
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Index
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -12,3 +12,6 @@ class User(Base):
     password_hash = Column(String(128), nullable=False)
     is_active = Column(Boolean, default=True)
     created_date = Column(DateTime, default=func.now(), nullable=False)
+
+    # 一覧のキーセットページネーション（created_date, id 順）と作成日時での絞り込み
+    __table_args__ = (Index("idx_users_created", "created_date", "id"),)
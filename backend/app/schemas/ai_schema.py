@@ -31,6 +31,23 @@ class AIGenerationResponse(BaseModel):
         from_attributes = True
 
 
+class AIGenerationSummary(BaseModel):
+    """生成履歴の要約（生成結果は先頭部分と文字数のみ）"""
+
+    id: int
+    preview: str
+    content_length: int
+    ai_provider: str
+    note_ids: List[int]
+    prompt: str
+    created_date: datetime
+
+
+# レコードを直接JSON化する際に出力するフィールド
+AI_GENERATION_RESPONSE_FIELDS = tuple(AIGenerationResponse.model_fields)
+AI_GENERATION_SUMMARY_FIELDS = tuple(AIGenerationSummary.model_fields)
+
+
 class SaveAsNoteRequest(BaseModel):
     generation_id: int
     title: str = Field(..., min_length=1, max_length=200)
@@ -41,3 +58,10 @@ class GenerationListResponse(BaseModel):
     total: int
     page: int
     per_page: int
+
+
+class GenerationSummaryListResponse(BaseModel):
+    items: List[AIGenerationSummary]
+    total: int
+    page: int
+    per_page: int
@@ -0,0 +1,10 @@
+# Event stream Pydantic schemas
+from pydantic import BaseModel
+
+
+class EventStreamTicketResponse(BaseModel):
+    """変更イベントのストリームの接続チケット（GET /api/events?ticket=... で1回だけ使える）"""
+
+    ticket: str
+    # 有効期間（秒）
+    expires_in: int
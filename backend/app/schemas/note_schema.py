@@ -1,7 +1,7 @@
 # Note Pydantic schemas
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import Annotated, List, Literal, Optional, Union
 
 
 class NoteCreate(BaseModel):
@@ -14,6 +14,47 @@ class NoteUpdate(BaseModel):
     content: Optional[str] = Field(None, min_length=1)
 
 
+class TextEdit(BaseModel):
+    # ベースリビジョンの本文に対する文字位置（Unicodeコードポイント単位）
+    start: int = Field(..., ge=0)
+    end: int = Field(..., ge=0)
+    text: str = ""
+
+
+class NotePatch(BaseModel):
+    base_revision: int = Field(..., ge=1)
+    title: Optional[str] = Field(None, min_length=1, max_length=200)
+    edits: List[TextEdit] = Field(default_factory=list)
+
+
+class NoteBatchCreate(BaseModel):
+    op: Literal["create"]
+    title: str = Field(..., min_length=1, max_length=200)
+    content: str = Field(..., min_length=1)
+
+
+class NoteBatchUpdate(BaseModel):
+    op: Literal["update"]
+    id: int
+    title: Optional[str] = Field(None, min_length=1, max_length=200)
+    content: Optional[str] = Field(None, min_length=1)
+
+
+class NoteBatchDelete(BaseModel):
+    op: Literal["delete"]
+    id: int
+
+
+NoteBatchOperation = Annotated[
+    Union[NoteBatchCreate, NoteBatchUpdate, NoteBatchDelete],
+    Field(discriminator="op"),
+]
+
+
+class NoteBatchRequest(BaseModel):
+    operations: List[NoteBatchOperation] = Field(..., min_length=1, max_length=500)
+
+
 class NoteResponse(BaseModel):
     id: int
     title: str
@@ -21,6 +62,82 @@ class NoteResponse(BaseModel):
     user_id: int
     created_date: datetime
     updated_date: datetime
+    revision: int
 
     class ConfigDict:
         from_attributes = True
+
+
+class NoteSummary(BaseModel):
+    """ノート一覧の要約（view=summary、本文は先頭部分の preview のみ）"""
+
+    id: int
+    title: str
+    preview: str
+    updated_date: datetime
+    revision: int
+
+
+class NoteFieldsResponse(BaseModel):
+    """fields= で指定したフィールドのみのノート（id 以外は指定した場合のみ含む）"""
+
+    id: int
+    title: Optional[str] = None
+    content: Optional[str] = None
+    user_id: Optional[int] = None
+    created_date: Optional[datetime] = None
+    updated_date: Optional[datetime] = None
+    revision: Optional[int] = None
+    preview: Optional[str] = None
+
+
+# ノート・お気に入りの一覧のレスポンス（view=full / view=summary / fields=）
+NoteListResponse = Union[
+    List[NoteResponse], List[NoteSummary], List[NoteFieldsResponse]
+]
+
+
+class NoteBatchResult(BaseModel):
+    index: int
+    op: str
+    id: Optional[int] = None
+    # 操作ごとのステータス（201: 作成, 200: 更新, 204: 削除, 404: 見つからない）
+    status: int
+    note: Optional[NoteResponse] = None
+
+
+class NoteBatchResponse(BaseModel):
+    results: List[NoteBatchResult]
+
+
+class NoteRevisionSummary(BaseModel):
+    revision: int
+    title: str
+    is_snapshot: bool
+    created_date: datetime
+
+
+class NoteRevisionResponse(BaseModel):
+    note_id: int
+    revision: int
+    title: str
+    content: str
+    created_date: datetime
+
+
+class NoteChangesResponse(BaseModel):
+    changes: List[NoteResponse]
+    deleted: List[int]
+    cursor: str
+    has_more: bool
+    reset: bool
+
+
+# レコードを直接JSON化する際に出力するフィールド（SELECTするカラムと一致）
+NOTE_RESPONSE_FIELDS = tuple(NoteResponse.model_fields)
+
+# 一覧で fields= に指定できるフィールド（preview は本文の先頭部分）
+NOTE_LIST_FIELDS = tuple(NoteFieldsResponse.model_fields)
+
+# view=summary で返すフィールド（本文は含まない）
+NOTE_SUMMARY_FIELDS = tuple(NoteSummary.model_fields)
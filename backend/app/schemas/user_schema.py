@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional
 
 
 # ユーザー作成時のリクエスト
@@ -26,18 +26,77 @@ class UserResponse(BaseModel):
         from_attributes = True
 
 
+# レコードを直接JSON化する際に出力するフィールド（SELECTするカラムと一致）
+USER_RESPONSE_FIELDS = tuple(UserResponse.model_fields)
+
+
 # ユーザー更新時のリクエスト
 class UserUpdate(BaseModel):
     password: Optional[str] = Field(None, min_length=8)
     is_active: Optional[bool] = None
 
 
-# ログイン成功時のトークンレスポンス
+# アカウント削除の進捗（stage は削除中の段階、完了後は "completed"）
+class AccountDeletionResponse(BaseModel):
+    user_id: int
+    stage: str
+    favorites_deleted: int
+    generations_deleted: int
+    revisions_deleted: int
+    notes_deleted: int
+    last_error: Optional[str] = None
+    requested_date: datetime
+    updated_date: datetime
+    completed_date: Optional[datetime] = None
+
+
+# ログイン・トークン更新時のトークンレスポンス
 class Token(BaseModel):
     access_token: str
+    refresh_token: str
     token_type: str = "bearer"
 
 
+# トークン更新・ログアウト時のリクエスト
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str = Field(..., min_length=1, max_length=128)
+
+
 # トークンのペイロード
 class TokenData(BaseModel):
     username: Optional[str] = None
+
+
+# パーソナルアクセストークンのスコープ（<API>:<read|write>、write は read を含む）
+PersonalAccessTokenScope = Literal[
+    "notes:read",
+    "notes:write",
+    "favorites:read",
+    "favorites:write",
+    "ai:read",
+    "ai:write",
+]
+
+
+# パーソナルアクセストークン作成時のリクエスト
+class PersonalAccessTokenCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+    scopes: List[PersonalAccessTokenScope] = Field(..., min_length=1)
+    # 有効期限（日数、省略時は無期限）
+    expires_in_days: Optional[int] = Field(None, ge=1, le=3650)
+
+
+# パーソナルアクセストークンのレスポンス（トークン本体は含めない）
+class PersonalAccessTokenResponse(BaseModel):
+    id: int
+    name: str
+    token_prefix: str
+    scopes: List[str]
+    expires_at: Optional[datetime] = None
+    last_used_date: Optional[datetime] = None
+    created_date: datetime
+
+
+# パーソナルアクセストークン作成時のレスポンス（トークン本体はこの時だけ返す）
+class PersonalAccessTokenCreated(PersonalAccessTokenResponse):
+    token: str
@@ -1,9 +1,52 @@
 """Factory for creating AI provider instances"""
 
+import importlib
+import logging
+from typing import List
+
 from .base import AIProviderBase
-from .openai_provider import OpenAIProvider
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
+# Provider modules import heavy SDKs (openai, anthropic, google.generativeai),
+# so they are imported on first use or by warm_up_providers() after startup
+_PROVIDER_MODULES = {
+    "openai": ".openai_provider",
+    "anthropic": ".anthropic_provider",
+    "gemini": ".gemini_provider",
+}
+
+
+def _configured_providers() -> List[str]:
+    """Names of providers whose API key is configured"""
+    keys = {
+        "openai": settings.OPENAI_API_KEY,
+        "anthropic": settings.ANTHROPIC_API_KEY,
+        "gemini": settings.GEMINI_API_KEY,
+    }
+    return [name for name, key in keys.items() if key]
+
+
+def warm_up_providers() -> List[str]:
+    """
+    Import the provider modules (and their SDKs) for all configured providers
+
+    Blocking; call it in a thread (asyncio.to_thread) after startup so the
+    first AI request does not pay the SDK import cost.
+
+    Returns:
+        Names of the providers that were imported
+    """
+    loaded = []
+    for name in _configured_providers():
+        try:
+            importlib.import_module(_PROVIDER_MODULES[name], __package__)
+            loaded.append(name)
+        except ImportError as e:
+            logger.warning(f"Failed to preload AI provider {name}: {str(e)}")
+    return loaded
+
 
 def get_ai_provider(provider_name: str) -> AIProviderBase:
     """
@@ -25,6 +68,8 @@ def get_ai_provider(provider_name: str) -> AIProviderBase:
             raise ValueError(
                 "AI機能は現在利用できません。OpenAI APIキーが設定されていません。"
             )
+        from .openai_provider import OpenAIProvider
+
         return OpenAIProvider(
             api_key=settings.OPENAI_API_KEY,
             timeout=settings.AI_REQUEST_TIMEOUT,
@@ -32,13 +77,12 @@ def get_ai_provider(provider_name: str) -> AIProviderBase:
         )
 
     elif provider_name == "anthropic":
-        # Import here to avoid circular dependency
-        from .anthropic_provider import AnthropicProvider
-
         if not settings.ANTHROPIC_API_KEY:
             raise ValueError(
                 "AI機能は現在利用できません。Anthropic APIキーが設定されていません。"
             )
+        from .anthropic_provider import AnthropicProvider
+
         return AnthropicProvider(
             api_key=settings.ANTHROPIC_API_KEY,
             timeout=settings.AI_REQUEST_TIMEOUT,
@@ -46,13 +90,12 @@ def get_ai_provider(provider_name: str) -> AIProviderBase:
         )
 
     elif provider_name == "gemini":
-        # Import here to avoid circular dependency
-        from .gemini_provider import GeminiProvider
-
         if not settings.GEMINI_API_KEY:
             raise ValueError(
                 "AI機能は現在利用できません。Gemini APIキーが設定されていません。"
             )
+        from .gemini_provider import GeminiProvider
+
         return GeminiProvider(
             api_key=settings.GEMINI_API_KEY, timeout=settings.AI_REQUEST_TIMEOUT
         )
@@ -1,18 +1,305 @@
 # AI Service - Business logic for AI idea generation
 import asyncio
+import hashlib
 import logging
+import time
+from contextlib import contextmanager
 from typing import List, Optional, Dict, Any
-from datetime import datetime
+from datetime import date, datetime
 from fastapi import HTTPException, status
-from sqlalchemy import select, insert, desc, func
+from sqlalchemy import Date, select, insert, delete, desc, func, literal, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from app.database import database
 from app.models.note import Note
-from app.models.ai_generation import AIGeneration
+from app.models.ai_generation import (
+    AIGeneration,
+    PARTITION_NAME_PATTERN,
+    add_months,
+    create_partition_ddl,
+)
+from app.models.ai_blob import AIBlob
 from app.services.ai_providers.factory import get_ai_provider
+from app.services import note_service
 from app.core.config import settings
+from app.core.events import change_event, event_hub
+from app.core.semantic_cache import SemanticCache
 
 logger = logging.getLogger(__name__)
 
+# 実行中のAI生成（シャットダウン時に完了を待つため）
+_inflight_generations = 0
+_generations_idle = asyncio.Event()
+_generations_idle.set()
+
+
+@contextmanager
+def _track_inflight_generation():
+    """実行中のAI生成数を数える"""
+    global _inflight_generations
+    _inflight_generations += 1
+    _generations_idle.clear()
+    try:
+        yield
+    finally:
+        _inflight_generations -= 1
+        if _inflight_generations == 0:
+            _generations_idle.set()
+
+
+async def wait_for_inflight_generations(timeout: float) -> int:
+    """
+    実行中のAI生成が完了するまで待つ
+
+    Args:
+        timeout: 最大待ち時間（秒）
+
+    Returns:
+        タイムアウト時点で残っている生成数
+    """
+    try:
+        await asyncio.wait_for(_generations_idle.wait(), timeout=timeout)
+    except asyncio.TimeoutError:
+        pass
+    return _inflight_generations
+
+
+_semantic_cache: Optional[SemanticCache] = None
+
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """設定（AI_SEMANTIC_CACHE）が有効な場合のみ、類似生成のキャッシュを取得"""
+    global _semantic_cache
+    if not settings.AI_SEMANTIC_CACHE:
+        return None
+    if _semantic_cache is None:
+        _semantic_cache = SemanticCache(
+            threshold=settings.AI_SEMANTIC_CACHE_THRESHOLD,
+            prompt_threshold=settings.AI_SEMANTIC_CACHE_PROMPT_THRESHOLD,
+            max_entries=settings.AI_SEMANTIC_CACHE_MAX_ENTRIES,
+            max_users=settings.AI_SEMANTIC_CACHE_MAX_USERS,
+            ttl_seconds=settings.AI_SEMANTIC_CACHE_TTL_SECONDS,
+        )
+    return _semantic_cache
+
+
+def blob_hash(content: str) -> str:
+    """BLOBのキー（本文のSHA-256）"""
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def _generation_query(summary: bool = False):
+    """
+    生成履歴を従来の形（prompt, generated_content を含む）で取得するクエリ
+
+    本文は ai_blobs から結合して取得する。summary の場合は生成結果の代わりに
+    先頭部分（preview）と文字数（content_length）をDB側で計算して返す
+    """
+    generation = AIGeneration.__table__
+    prompt_blob = AIBlob.__table__.alias("prompt_blob")
+    content_blob = AIBlob.__table__.alias("content_blob")
+    if summary:
+        content_columns = [
+            func.left(
+                content_blob.c.content, settings.AI_GENERATION_PREVIEW_LENGTH
+            ).label("preview"),
+            func.char_length(content_blob.c.content).label("content_length"),
+        ]
+    else:
+        content_columns = [content_blob.c.content.label("generated_content")]
+    return select(
+        generation.c.id,
+        generation.c.user_id,
+        generation.c.note_ids,
+        prompt_blob.c.content.label("prompt"),
+        generation.c.ai_provider,
+        *content_columns,
+        generation.c.created_date,
+    ).select_from(
+        generation.join(prompt_blob, prompt_blob.c.hash == generation.c.prompt_hash).join(
+            content_blob, content_blob.c.hash == generation.c.content_hash
+        )
+    )
+
+
+async def insert_generation(
+    user_id: int,
+    note_ids: List[int],
+    prompt: str,
+    ai_provider: str,
+    generated_content: str,
+) -> Dict[str, Any]:
+    """
+    生成履歴を保存
+
+    プロンプトと生成結果は ai_blobs に重複排除して保存し（既存の場合は再利用）、
+    生成履歴には参照のみを保存する。BLOBと履歴の挿入は1ステートメントで行う。
+
+    Returns:
+        保存した生成履歴（_generation_query と同じ形）
+    """
+    blobs = {blob_hash(prompt): prompt, blob_hash(generated_content): generated_content}
+    blob_table = AIBlob.__table__
+    stored_blobs = (
+        pg_insert(blob_table)
+        .values(
+            [
+                {
+                    "hash": key,
+                    "content": content,
+                    "refcount": 0,
+                    "created_date": func.now(),
+                }
+                for key, content in blobs.items()
+            ]
+        )
+        # 既存のBLOBは行ロックだけ取り、参照を追加する前に削除されないようにする
+        .on_conflict_do_update(
+            index_elements=[blob_table.c.hash],
+            set_={"refcount": blob_table.c.refcount},
+        )
+        .returning(blob_table.c.hash)
+        .cte("stored_blobs")
+    )
+    query = (
+        insert(AIGeneration.__table__)
+        .values(
+            user_id=user_id,
+            note_ids=note_ids,
+            prompt_hash=blob_hash(prompt),
+            ai_provider=ai_provider,
+            content_hash=blob_hash(generated_content),
+        )
+        .add_cte(stored_blobs)
+        .returning(
+            AIGeneration.id,
+            AIGeneration.user_id,
+            AIGeneration.note_ids,
+            AIGeneration.ai_provider,
+            AIGeneration.created_date,
+        )
+    )
+    generation = await database.fetch_one(query=query)
+    event_hub.publish(
+        user_id,
+        [
+            change_event(
+                "generation", generation["id"], "created", generation["created_date"]
+            )
+        ],
+    )
+    # 本文は保存した値と同じため、再取得せずに組み立てる
+    return {
+        **dict(generation),
+        "prompt": prompt,
+        "generated_content": generated_content,
+    }
+
+
+async def compact_blobs() -> int:
+    """
+    参照されなくなったBLOB（refcount が 0）を削除
+
+    Returns:
+        削除した件数
+    """
+    query = delete(AIBlob.__table__).where(AIBlob.refcount <= 0).returning(AIBlob.hash)
+    return len(await database.fetch_all(query=query))
+
+
+# パーティション操作を複数のワーカーで同時に行わないためのアドバイザリロックのキー
+_PARTITION_LOCK_KEY = 0x41494745  # "AIGE"
+
+
+async def _lock_partitions() -> None:
+    """パーティション操作のロックを取得（トランザクション終了まで保持）"""
+    await database.execute(select(func.pg_advisory_xact_lock(_PARTITION_LOCK_KEY)))
+
+
+async def _partition_state(name: str) -> Optional[bool]:
+    """テーブルが存在しなければ None、パーティションとして接続中なら True"""
+    return await database.fetch_val(
+        query="SELECT relispartition FROM pg_class WHERE oid = to_regclass(:name)",
+        values={"name": name},
+    )
+
+
+async def maintain_generation_partitions(drop_expired: bool = True) -> int:
+    """
+    生成履歴の月別パーティションを維持
+
+    当月から AI_GENERATION_PARTITIONS_AHEAD か月先までのパーティションを作成し、
+    AI_GENERATION_RETENTION_MONTHS が設定されている場合は保持期間を過ぎた月の
+    パーティションを丸ごと削除する（DELETE と違い不要タプルやインデックスの肥大化が残らない）。
+
+    Args:
+        drop_expired: False の場合は作成のみ行う（起動時）
+
+    Returns:
+        削除したパーティションの数
+    """
+    async with database.transaction():
+        await _lock_partitions()
+        # created_date と同じくDBの現在時刻で月を決める
+        current = await database.fetch_val(
+            select(func.date_trunc("month", func.now()).cast(Date))
+        )
+        for months in range(settings.AI_GENERATION_PARTITIONS_AHEAD + 1):
+            await database.execute(text(create_partition_ddl(add_months(current, months))))
+
+    if not drop_expired or settings.AI_GENERATION_RETENTION_MONTHS <= 0:
+        return 0
+    cutoff = add_months(current, -settings.AI_GENERATION_RETENTION_MONTHS)
+
+    # 切り離し済みで削除されていないもの（前回の途中で失敗した場合）も対象にする
+    tables = await database.fetch_all(
+        query="SELECT relname FROM pg_class"
+        " WHERE relkind = 'r' AND relname ~ :pattern AND pg_table_is_visible(oid)"
+        " ORDER BY relname",
+        values={"pattern": PARTITION_NAME_PATTERN.pattern},
+    )
+    dropped = 0
+    for table in tables:
+        name = table["relname"]
+        year, month = PARTITION_NAME_PATTERN.match(name).groups()
+        if date(int(year), int(month), 1) >= cutoff:
+            continue
+
+        # 親テーブルの排他ロックは切り離しの間だけ保持する
+        async with database.transaction():
+            await _lock_partitions()
+            if await _partition_state(name):
+                await database.execute(
+                    text(f"ALTER TABLE ai_generations DETACH PARTITION {name}")
+                )
+        async with database.transaction():
+            await _lock_partitions()
+            if await _partition_state(name) is not False:
+                # 他のワーカーが削除済み
+                continue
+            # DROP では行トリガーが実行されないため、BLOBの参照数を先に減らす
+            await database.execute(
+                text(
+                    f"""
+                    UPDATE ai_blobs
+                    SET refcount = ai_blobs.refcount - released.count
+                    FROM (
+                        SELECT hash, count(*) AS count
+                        FROM (
+                            SELECT prompt_hash AS hash FROM {name}
+                            UNION ALL
+                            SELECT content_hash FROM {name}
+                        ) AS refs
+                        GROUP BY hash
+                    ) AS released
+                    WHERE ai_blobs.hash = released.hash
+                    """
+                )
+            )
+            await database.execute(text(f"DROP TABLE {name}"))
+        dropped += 1
+        logger.info(f"Dropped expired AI generation partition {name}")
+    return dropped
+
 
 async def get_notes_for_context(note_ids: List[int], user_id: int) -> List[dict]:
     """
@@ -216,32 +503,52 @@ async def generate_idea(
     if not prompt:
         prompt = "これらのノートから新しいアイデアを生成してください"
 
-    # AIプロバイダーを使用してアイデア生成（リトライ付き）
-    generated_content = await call_ai_with_retry(
-        ai_provider, prompt, context, max_retries=settings.AI_MAX_RETRIES
-    )
+    # ほぼ同じプロンプトとノートで生成済みなら、AIを呼ばずにその結果を返す
+    cache = get_semantic_cache()
+    if cache:
+        start = time.perf_counter()
+        embedding = await asyncio.to_thread(cache.embed, prompt, context)
+        cached_id = cache.lookup(user_id, ai_provider, embedding)
+        generation = await get_generation(cached_id, user_id) if cached_id else None
+        cache.stats.record_lookup(generation is not None, time.perf_counter() - start)
+        if generation:
+            logger.debug(f"Semantic cache hit: generation {cached_id}")
+            return generation
+        if cached_id:
+            # 生成履歴が削除済み
+            cache.discard(user_id, ai_provider, cached_id)
+
+    with _track_inflight_generation():
+        # AIプロバイダーを使用してアイデア生成（リトライ付き）
+        start = time.perf_counter()
+        generated_content = await call_ai_with_retry(
+            ai_provider, prompt, context, max_retries=settings.AI_MAX_RETRIES
+        )
+        if cache:
+            cache.stats.record_generation(time.perf_counter() - start)
 
-    # 生成履歴をデータベースに保存
-    query = insert(AIGeneration.__table__).values(
-        user_id=user_id,
-        note_ids=note_ids,
-        prompt=prompt,
-        ai_provider=ai_provider,
-        generated_content=generated_content,
-    )
-    generation_id = await database.execute(query=query)
+        # 生成履歴をデータベースに保存
+        generation = await insert_generation(
+            user_id, note_ids, prompt, ai_provider, generated_content
+        )
+
+    if cache:
+        cache.add(user_id, ai_provider, embedding, generation["id"])
+
+    return generation
 
-    # 保存した履歴を取得して返す
-    select_query = select(AIGeneration.__table__).where(
-        AIGeneration.id == generation_id
-    )
-    generation = await database.fetch_one(query=select_query)
 
-    return dict(generation)
+async def get_generations_version(user_id: int):
+    """生成履歴のバージョン（件数と最新の作成日時）を取得"""
+    query = select(
+        func.count().label("count"),
+        func.max(AIGeneration.created_date).label("last_modified"),
+    ).where(AIGeneration.user_id == user_id)
+    return await database.fetch_one(query=query)
 
 
 async def get_generations(
-    user_id: int, page: int = 1, per_page: int = 20
+    user_id: int, page: int = 1, per_page: int = 20, summary: bool = False
 ) -> Dict[str, Any]:
     """
     ユーザーのAI生成履歴を取得
@@ -250,6 +557,7 @@ async def get_generations(
         user_id: ユーザーID
         page: ページ番号
         per_page: 1ページあたりの件数
+        summary: 生成結果の全文の代わりに preview と content_length を返す
 
     Returns:
         ページネーション付き生成履歴
@@ -267,7 +575,7 @@ async def get_generations(
 
     # 生成履歴を取得（作成日時の降順）
     query = (
-        select(AIGeneration.__table__)
+        _generation_query(summary)
         .where(AIGeneration.user_id == user_id)
         .order_by(desc(AIGeneration.created_date))
         .limit(per_page)
@@ -276,13 +584,21 @@ async def get_generations(
     generations = await database.fetch_all(query=query)
 
     return {
-        "items": [dict(gen) for gen in generations],
+        "items": generations,
         "total": total,
         "page": page,
         "per_page": per_page,
     }
 
 
+async def get_generation(generation_id: int, user_id: int):
+    """生成履歴を1件取得（自分の生成履歴のみ、生成結果の全文を含む）"""
+    query = _generation_query().where(
+        AIGeneration.id == generation_id, AIGeneration.user_id == user_id
+    )
+    return await database.fetch_one(query=query)
+
+
 async def save_generation_as_note(
     generation_id: int, user_id: int, title: str
 ) -> Dict[str, Any]:
@@ -300,28 +616,24 @@ async def save_generation_as_note(
     Raises:
         HTTPException: 生成履歴が見つからない、またはアクセス権限がない場合
     """
-    # 生成履歴を取得（ユーザー所有権も検証）
-    query = select(AIGeneration.__table__).where(
-        AIGeneration.id == generation_id, AIGeneration.user_id == user_id
+    # 生成結果（ユーザー所有権も検証）から新しいノートを作成する（1ステートメント）
+    content_blob = AIBlob.__table__
+    source = (
+        select(literal(title).label("title"), content_blob.c.content)
+        .select_from(
+            AIGeneration.__table__.join(
+                content_blob, content_blob.c.hash == AIGeneration.content_hash
+            )
+        )
+        .where(AIGeneration.id == generation_id, AIGeneration.user_id == user_id)
+        .subquery()
     )
-    generation = await database.fetch_one(query=query)
+    note = await note_service.insert_note_from_select(source, user_id)
 
-    if not generation:
+    if not note:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Generation not found or access denied",
         )
 
-    # 新しいノートを作成
-    insert_query = insert(Note.__table__).values(
-        title=title,
-        content=generation["generated_content"],
-        user_id=user_id,
-    )
-    note_id = await database.execute(query=insert_query)
-
-    # 作成したノートを取得して返す
-    select_query = select(Note.__table__).where(Note.id == note_id)
-    note = await database.fetch_one(query=select_query)
-
-    return dict(note)
+    return note
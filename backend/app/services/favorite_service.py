@@ -1,34 +1,49 @@
 # Favorite business logic and CRUD operations
+from typing import Tuple
 from app.schemas.favorite_schema import FavoriteCreate
 from app.database import database
 from app.models.favorite import Favorite
 from app.models.note import Note
-from sqlalchemy import select, insert, delete, join
+from app.core.events import change_event, event_hub
+from app.schemas.note_schema import NOTE_RESPONSE_FIELDS
+from app.services.note_service import note_columns, read_cache
+from sqlalchemy import select, delete, distinct, join, func, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 
 async def add_favorite(payload: FavoriteCreate, user_id: int):
-    """お気に入り追加"""
-    # ノートが存在するか確認
-    note_query = select(Note.__table__).where(Note.id == payload.note_id)
-    note = await database.fetch_one(query=note_query)
-    if not note:
-        return None
-
-    # 既にお気に入りに追加されているか確認
-    existing_query = select(Favorite.__table__).where(
-        Favorite.user_id == user_id, Favorite.note_id == payload.note_id
-    )
-    existing = await database.fetch_one(query=existing_query)
-    if existing:
-        return existing
-
-    # お気に入り追加
-    query = (
-        insert(Favorite.__table__)
-        .values(user_id=user_id, note_id=payload.note_id)
-        .returning(Favorite.__table__)
+    """
+    お気に入り追加（既に追加済みの場合は既存のお気に入りを返す）
+
+    ノートの存在確認と追加を1ステートメントで行う。重複時も行を返すよう
+    ON CONFLICT DO UPDATE（値は変えない）にしているため、同時に追加されても競合しない
+
+    Returns:
+        お気に入り、ノートが存在しない場合は None
+    """
+    table = Favorite.__table__
+    query = pg_insert(table).from_select(
+        ["user_id", "note_id", "created_date"],
+        select(literal(user_id), Note.id, func.now()).where(
+            Note.id == payload.note_id
+        ),
     )
-    return await database.fetch_one(query=query)
+    query = query.on_conflict_do_update(
+        constraint="unique_user_note_favorite",
+        set_={"note_id": query.excluded.note_id},
+    ).returning(table)
+    favorite = await database.fetch_one(query=query)
+    read_cache.bump(user_id)
+    if favorite:
+        event_hub.publish(
+            user_id,
+            [
+                change_event(
+                    "favorite", favorite["note_id"], "created", favorite["created_date"]
+                )
+            ],
+        )
+    return favorite
 
 
 async def remove_favorite(note_id: int, user_id: int):
@@ -36,21 +51,40 @@ async def remove_favorite(note_id: int, user_id: int):
     query = delete(Favorite.__table__).where(
         Favorite.user_id == user_id, Favorite.note_id == note_id
     )
-    return await database.execute(query=query)
+    result = await database.execute(query=query)
+    read_cache.bump(user_id)
+    # 削除した件数は取得できない場合がある（asyncpg）ため、常に送る
+    event_hub.publish(user_id, [change_event("favorite", note_id, "deleted")])
+    return result
+
+
+def _note_owners(favorites) -> set:
+    """お気に入りのノートの所有者（ノートの変更でもキャッシュを無効にするため）"""
+    return {favorite["owner_id"] for favorite in favorites}
+
+
+async def get_favorites(user_id: int, fields: Tuple[str, ...] = NOTE_RESPONSE_FIELDS):
+    """
+    お気に入り一覧取得（ノート情報の指定したフィールドを含む、読み取りキャッシュを経由）
 
+    他のユーザーのノートも含むため、キャッシュはノートの所有者の書き込みでも無効になる
+    """
 
-async def get_favorites(user_id: int):
-    """お気に入り一覧取得（ノート情報も含む）"""
-    # JOINしてノート情報を取得
-    query = (
-        select(Note.__table__)
-        .select_from(
-            join(Favorite.__table__, Note.__table__, Favorite.note_id == Note.id)
+    async def load():
+        # JOINしてノート情報を取得
+        query = (
+            select(*note_columns(fields), Note.user_id.label("owner_id"))
+            .select_from(
+                join(Favorite.__table__, Note.__table__, Favorite.note_id == Note.id)
+            )
+            .where(Favorite.user_id == user_id)
+            .order_by(Favorite.created_date.desc())
         )
-        .where(Favorite.user_id == user_id)
-        .order_by(Favorite.created_date.desc())
+        return await database.fetch_all(query=query)
+
+    return await read_cache.get_or_load(
+        ("favorites", user_id, fields), user_id, load, owners=_note_owners
     )
-    return await database.fetch_all(query=query)
 
 
 async def is_favorite(note_id: int, user_id: int):
@@ -60,3 +94,30 @@ async def is_favorite(note_id: int, user_id: int):
     )
     result = await database.fetch_one(query=query)
     return result is not None
+
+
+async def get_favorites_version(user_id: int):
+    """お気に入り一覧のバージョン（件数と最終更新日時）を取得（読み取りキャッシュを経由）"""
+
+    async def load():
+        query = (
+            select(
+                func.count().label("count"),
+                func.max(
+                    func.greatest(Favorite.created_date, Note.updated_date)
+                ).label("last_modified"),
+                func.array_agg(distinct(Note.user_id)).label("owner_ids"),
+            )
+            .select_from(
+                join(Favorite.__table__, Note.__table__, Favorite.note_id == Note.id)
+            )
+            .where(Favorite.user_id == user_id)
+        )
+        return await database.fetch_one(query=query)
+
+    return await read_cache.get_or_load(
+        ("favorites_version", user_id),
+        user_id,
+        load,
+        owners=lambda version: version["owner_ids"] or (),
+    )
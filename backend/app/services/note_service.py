@@ -1,38 +1,348 @@
 # Note business logic and CRUD operations
-from app.schemas.note_schema import NoteCreate, NoteUpdate
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from app.schemas.note_schema import (
+    NoteCreate,
+    NoteUpdate,
+    NotePatch,
+    NOTE_RESPONSE_FIELDS,
+    NOTE_LIST_FIELDS,
+    NOTE_SUMMARY_FIELDS,
+)
 from app.database import database
 from app.models.note import Note
-from sqlalchemy import select, insert, update, delete
+from app.models.note_tombstone import NoteTombstone
+from app.models.sync_counter import SyncCounter
+from app.models.note_revision import NoteRevision
+from app.core.config import settings
+from app.core.events import change_event, event_hub
+from app.core.invalidation import invalidation_bus
+from app.core.read_cache import ReadCache
+from app.core.text_delta import (
+    make_delta,
+    apply_delta,
+    apply_edits,
+    encode_delta,
+    decode_delta,
+)
+from sqlalchemy import (
+    select,
+    insert,
+    update,
+    delete,
+    func,
+    tuple_,
+    cast,
+    any_,
+    values,
+    column,
+    literal,
+    exists,
+    Integer,
+    String,
+    Text,
+    Interval,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
 
 
-async def create_note(payload: NoteCreate, user_id: int):
-    """ノート作成"""
-    query = (
+# ノート・お気に入りの読み取りキャッシュ（書き込みのたびにユーザーの世代を更新し、
+# 無効化バスで他のワーカーにも伝える）
+read_cache = ReadCache(
+    max_entries=settings.READ_CACHE_MAX_ENTRIES,
+    max_bytes=settings.READ_CACHE_MAX_BYTES,
+    ttl_seconds=settings.READ_CACHE_TTL_SECONDS,
+    on_bump=lambda user_ids: invalidation_bus.publish("read_cache", user_ids),
+)
+
+
+def _invalidate_read_cache(user_ids: Optional[List[str]]) -> None:
+    """他のワーカーでの書き込みを読み取りキャッシュに反映"""
+    if user_ids is None:
+        read_cache.clear()
+    else:
+        read_cache.bump(*(int(user_id) for user_id in user_ids), notify=False)
+
+
+invalidation_bus.subscribe("read_cache", _invalidate_read_cache)
+
+
+def _publish_note_events(user_id: int, op: str, notes) -> None:
+    """ノートの変更をユーザーのイベントストリームに送る（コミット後に呼び出す）"""
+    event_hub.publish(
+        user_id,
+        [change_event("note", note["id"], op, note["updated_date"]) for note in notes],
+    )
+
+
+# インポートで1ステートメントにまとめるノート数（asyncpg のパラメータ数の上限は 32767）
+_IMPORT_CHUNK_SIZE = 500
+
+
+class RevisionConflictError(Exception):
+    """パッチのベースリビジョンが現在のリビジョンと一致しない"""
+
+    def __init__(self, current_revision: int):
+        super().__init__(f"Note is at revision {current_revision}")
+        self.current_revision = current_revision
+
+
+def next_change_seq(user_id: int, when=None):
+    """
+    ユーザーの変更シーケンスを1つ進め、その値を返すスカラーサブクエリ
+
+    書き込みクエリに埋め込んで1ステートメントで採番する。
+    sync_counters の行ロックにより、同一ユーザーの書き込みはシーケンス順にコミットされる。
+    CTE は書き込む行がなくても実行されるため、when（条件式）を指定した場合は
+    その条件を満たすときだけ採番する。
+    """
+    counter = SyncCounter.__table__
+    if when is None:
+        upsert = pg_insert(counter).values(user_id=user_id, last_seq=1, compacted_seq=0)
+    else:
+        upsert = pg_insert(counter).from_select(
+            ["user_id", "last_seq", "compacted_seq"],
+            select(literal(user_id), literal(1), literal(0)).where(when),
+        )
+    upsert = (
+        upsert.on_conflict_do_update(
+            index_elements=[counter.c.user_id],
+            set_={"last_seq": counter.c.last_seq + 1},
+        )
+        .returning(counter.c.last_seq)
+        .cte("next_seq")
+    )
+    return select(upsert.c.last_seq).scalar_subquery()
+
+
+def _revision_values(note, base_content: Optional[str] = None) -> dict:
+    """
+    ノートの現在の状態を記録するリビジョンの値を生成
+
+    NOTE_REVISION_SNAPSHOT_INTERVAL ごと（または差分が全文より大きい場合）は全文を、
+    それ以外は直前のリビジョン（base_content）からの差分を保存する
+    """
+    values = {
+        "note_id": note["id"],
+        "user_id": note["user_id"],
+        "revision": note["revision"],
+        "title": note["title"],
+    }
+    interval = settings.NOTE_REVISION_SNAPSHOT_INTERVAL
+    if base_content is not None and (note["revision"] - 1) % interval != 0:
+        delta = encode_delta(make_delta(base_content, note["content"]))
+        if len(delta) < len(note["content"]):
+            values["delta"] = delta
+            return values
+    values["content"] = note["content"]
+    return values
+
+
+async def insert_notes(notes: List[Tuple[str, str]], user_id: int):
+    """
+    複数のノートを作成し、それぞれ最初のリビジョン（全文）を記録
+
+    ノートとリビジョンの挿入を1ステートメント（複数行のINSERT）で行う
+
+    Args:
+        notes: (title, content) のリスト
+        user_id: ユーザーID
+
+    Returns:
+        作成されたノート（notes と同じ順序）
+    """
+    if not notes:
+        return []
+    change_seq = next_change_seq(user_id)
+    created = (
         insert(Note.__table__)
-        .values(title=payload.title, content=payload.content, user_id=user_id)
+        .values(
+            [
+                {
+                    "title": title,
+                    "content": content,
+                    "user_id": user_id,
+                    "created_date": func.now(),
+                    "updated_date": func.now(),
+                    "change_seq": change_seq,
+                    "revision": 1,
+                }
+                for title, content in notes
+            ]
+        )
         .returning(Note.__table__)
+        .cte("created")
     )
-    return await database.fetch_one(query=query)
+    # IDはVALUESの順に採番される
+    return await database.fetch_all(query=_with_first_revisions(created))
 
 
-async def get_note(note_id: int, user_id: int):
-    """ノート取得（自分のノートのみ）"""
-    query = select(Note.__table__).where(Note.id == note_id, Note.user_id == user_id)
-    return await database.fetch_one(query=query)
+def _with_first_revisions(created):
+    """作成したノート（RETURNING の CTE）の最初のリビジョン（全文）も記録して返すクエリ"""
+    first_revision = (
+        insert(NoteRevision.__table__)
+        .from_select(
+            ["note_id", "user_id", "revision", "title", "content", "created_date"],
+            select(
+                created.c.id,
+                created.c.user_id,
+                created.c.revision,
+                created.c.title,
+                created.c.content,
+                created.c.created_date,
+            ),
+        )
+        .cte("first_revision")
+    )
+    return select(created).add_cte(first_revision).order_by(created.c.id)
 
 
-async def get_all_notes(user_id: int):
-    """全ノート取得（自分のノートのみ）"""
-    query = (
-        select(Note.__table__)
-        .where(Note.user_id == user_id)
-        .order_by(Note.updated_date.desc())
+async def insert_note(title: str, content: str, user_id: int):
+    """ノートを作成し、最初のリビジョン（全文）を記録"""
+    notes = await insert_notes([(title, content)], user_id)
+    return notes[0]
+
+
+async def insert_note_from_select(source, user_id: int):
+    """
+    source（title, content の列を持つサブクエリ）の行からノートを作成し、
+    最初のリビジョン（全文）を記録
+
+    元の行の取得とノート・リビジョンの挿入を1ステートメントで行う
+
+    Returns:
+        作成されたノート、source が行を返さない場合は None
+    """
+    created = (
+        insert(Note.__table__)
+        .from_select(
+            [
+                "title",
+                "content",
+                "user_id",
+                "created_date",
+                "updated_date",
+                "change_seq",
+                "revision",
+            ],
+            select(
+                source.c.title,
+                source.c.content,
+                literal(user_id),
+                func.now(),
+                func.now(),
+                # 元の行がない場合は変更シーケンスを進めない
+                next_change_seq(user_id, when=exists().select_from(source)),
+                literal(1),
+            ),
+        )
+        .returning(Note.__table__)
+        .cte("created")
     )
-    return await database.fetch_all(query=query)
+    note = await database.fetch_one(query=_with_first_revisions(created))
+    read_cache.bump(user_id)
+    if note:
+        _publish_note_events(user_id, "created", [note])
+    return note
 
 
-async def update_note(note_id: int, user_id: int, payload: NoteUpdate):
-    """ノート更新"""
+async def create_note(payload: NoteCreate, user_id: int):
+    """ノート作成"""
+    note = await insert_note(payload.title, payload.content, user_id)
+    read_cache.bump(user_id)
+    _publish_note_events(user_id, "created", [note])
+    return note
+
+
+async def get_note(note_id: int, user_id: int):
+    """ノート取得（自分のノートのみ、読み取りキャッシュを経由）"""
+
+    async def load():
+        query = select(Note.__table__).where(
+            Note.id == note_id, Note.user_id == user_id
+        )
+        return await database.fetch_one(query=query)
+
+    return await read_cache.get_or_load(("note", user_id, note_id), user_id, load)
+
+
+def parse_note_fields(
+    fields: Optional[str] = None, view: str = "full"
+) -> Tuple[str, ...]:
+    """
+    一覧で返すフィールドを決定
+
+    fields（カンマ区切り）が指定された場合はそれを優先し、id は常に含める。
+    それ以外は view に応じて全フィールド（full）または要約（summary）を返す。
+
+    Raises:
+        ValueError: 未知のフィールドが指定された場合
+    """
+    if fields:
+        requested = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = sorted(set(requested) - set(NOTE_LIST_FIELDS))
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return tuple(dict.fromkeys(["id", *requested]))
+    if view == "summary":
+        return NOTE_SUMMARY_FIELDS
+    return NOTE_RESPONSE_FIELDS
+
+
+def note_columns(fields: Tuple[str, ...]) -> list:
+    """
+    フィールド名をSELECTするカラムに変換
+
+    preview は left(content, N) としてDB側で切り出すため、
+    content を選択しない限り本文全体を読み出さない
+    """
+    return [
+        func.left(Note.content, settings.NOTE_PREVIEW_LENGTH).label("preview")
+        if field == "preview"
+        else Note.__table__.c[field]
+        for field in fields
+    ]
+
+
+async def get_all_notes(user_id: int, fields: Tuple[str, ...] = NOTE_RESPONSE_FIELDS):
+    """全ノート取得（自分のノートのみ、指定したフィールドのみ、読み取りキャッシュを経由）"""
+
+    async def load():
+        query = (
+            select(*note_columns(fields))
+            .where(Note.user_id == user_id)
+            .order_by(Note.updated_date.desc())
+        )
+        return await database.fetch_all(query=query)
+
+    return await read_cache.get_or_load(("notes", user_id, fields), user_id, load)
+
+
+async def get_notes_version(user_id: int):
+    """ノート一覧のバージョン（件数と最終更新日時）を取得（読み取りキャッシュを経由）"""
+
+    async def load():
+        query = select(
+            func.count().label("count"),
+            func.max(Note.updated_date).label("last_modified"),
+        ).where(Note.user_id == user_id)
+        return await database.fetch_one(query=query)
+
+    return await read_cache.get_or_load(("notes_version", user_id), user_id, load)
+
+
+async def update_note(
+    note_id: int,
+    user_id: int,
+    payload: NoteUpdate,
+    expected_updated_date: Optional[datetime] = None,
+):
+    """
+    ノート更新
+
+    expected_updated_date が指定された場合は、更新日時が一致するときのみ更新する
+    （楽観的同時実行制御）。一致しない場合は None を返す。
+    """
     values = {}
     if payload.title is not None:
         values["title"] = payload.title
@@ -40,37 +350,504 @@ async def update_note(note_id: int, user_id: int, payload: NoteUpdate):
         values["content"] = payload.content
 
     if not values:
-        return await get_note(note_id, user_id)
+        note = await get_note(note_id, user_id)
+        if note and expected_updated_date is not None:
+            if note["updated_date"] != expected_updated_date:
+                return None
+        return note
+
+    async with database.transaction():
+        current = await _lock_note(note_id, user_id)
+        if not current:
+            return None
+        if (
+            expected_updated_date is not None
+            and current["updated_date"] != expected_updated_date
+        ):
+            return None
+        note = await _write_revision(current, values)
+    read_cache.bump(user_id)
+    _publish_note_events(user_id, "updated", [note])
+    return note
+
+
+async def patch_note(note_id: int, user_id: int, patch: NotePatch):
+    """
+    ノートの部分更新（本文への文字範囲の編集を適用）
+
+    編集はベースリビジョンの本文に対して適用するため、
+    base_revision が現在のリビジョンと一致しない場合は拒否する。
+
+    Returns:
+        更新後のノート（存在しない場合は None）
 
+    Raises:
+        RevisionConflictError: ベースリビジョンが古い場合
+        ValueError: 編集範囲が不正、または本文が空になる場合
+    """
+    async with database.transaction():
+        current = await _lock_note(note_id, user_id)
+        if not current:
+            return None
+        if current["revision"] != patch.base_revision:
+            raise RevisionConflictError(current["revision"])
+
+        values = {}
+        if patch.title is not None:
+            values["title"] = patch.title
+        if patch.edits:
+            content = apply_edits(
+                current["content"],
+                ((edit.start, edit.end, edit.text) for edit in patch.edits),
+            )
+            if not content:
+                raise ValueError("Note content cannot be empty")
+            values["content"] = content
+        if not values:
+            return current
+        note = await _write_revision(current, values)
+    read_cache.bump(user_id)
+    _publish_note_events(user_id, "updated", [note])
+    return note
+
+
+async def _lock_note(note_id: int, user_id: int):
+    """更新対象のノートを行ロックして取得（トランザクション内で呼び出す）"""
     query = (
-        update(Note.__table__)
+        select(Note.__table__)
         .where(Note.id == note_id, Note.user_id == user_id)
-        .values(**values)
-        .returning(Note.__table__)
+        .with_for_update()
     )
     return await database.fetch_one(query=query)
 
 
+async def _write_revision(current, values: dict):
+    """
+    ロック済みのノートを更新し、新しいリビジョンを記録
+
+    差分は更新前の本文（current）から計算する
+    """
+    query = (
+        update(Note.__table__)
+        .where(Note.id == current["id"])
+        .values(
+            **values,
+            revision=Note.revision + 1,
+            change_seq=next_change_seq(current["user_id"]),
+        )
+        .returning(Note.__table__)
+    )
+    note = await database.fetch_one(query=query)
+    await database.execute(
+        query=insert(NoteRevision.__table__).values(
+            **_revision_values(note, current["content"])
+        )
+    )
+    return note
+
+
+async def delete_notes(note_ids: List[int], user_id: int) -> List[int]:
+    """
+    複数のノートを削除（DELETE ... WHERE id = ANY(...)）
+
+    削除と同時に墓標を記録する（差分同期で削除を伝えるため）
+
+    Returns:
+        削除したノートのID
+    """
+    if not note_ids:
+        return []
+    deleted = (
+        delete(Note.__table__)
+        .where(Note.id == any_(cast(note_ids, ARRAY(Integer))), Note.user_id == user_id)
+        .returning(Note.id, Note.user_id)
+        .cte("deleted")
+    )
+    query = (
+        insert(NoteTombstone.__table__)
+        .from_select(
+            ["note_id", "user_id", "change_seq"],
+            select(deleted.c.id, deleted.c.user_id, next_change_seq(user_id)),
+        )
+        .returning(NoteTombstone.note_id)
+    )
+    tombstones = await database.fetch_all(query=query)
+    return [tombstone["note_id"] for tombstone in tombstones]
+
+
 async def delete_note(note_id: int, user_id: int):
-    """ノート削除"""
-    query = delete(Note.__table__).where(Note.id == note_id, Note.user_id == user_id)
-    return await database.execute(query=query)
+    """
+    ノート削除
+
+    Returns:
+        削除した件数（0 または 1）
+    """
+    deleted = await delete_notes([note_id], user_id)
+    read_cache.bump(user_id)
+    event_hub.publish(
+        user_id, [change_event("note", note_id, "deleted") for note_id in deleted]
+    )
+    return len(deleted)
+
+
+async def _update_notes(
+    changes: List[Tuple[int, Optional[str], Optional[str]]], user_id: int
+):
+    """
+    複数のノートを更新（UPDATE ... FROM (VALUES ...)）し、リビジョンを記録
+
+    トランザクション内で呼び出す
+
+    Args:
+        changes: (note_id, title, content) のリスト（None の項目は変更しない）
+        user_id: ユーザーID
+
+    Returns:
+        ノートIDから更新後（変更がない場合は現在）のノートへの辞書
+        （存在しないノートは含まない）
+    """
+    if not changes:
+        return {}
+    note_ids = cast([note_id for note_id, _, _ in changes], ARRAY(Integer))
+    # 差分の計算に更新前の本文が必要なため、行をロックして取得する
+    current = {
+        note["id"]: note
+        for note in await database.fetch_all(
+            query=select(Note.__table__)
+            .where(Note.id == any_(note_ids), Note.user_id == user_id)
+            .with_for_update()
+        )
+    }
+    changes = [
+        change
+        for change in changes
+        if change[0] in current and (change[1] is not None or change[2] is not None)
+    ]
+    if not changes:
+        return current
+
+    new_values = values(
+        column("id", Integer),
+        column("title", String),
+        column("content", Text),
+        name="new_values",
+    ).data(
+        # VALUES 内のパラメータは型が推論されない（text になる）ためIDはキャストする
+        [(cast(note_id, Integer), title, content) for note_id, title, content in changes]
+    )
+    query = (
+        update(Note.__table__)
+        .where(Note.id == new_values.c.id)
+        .values(
+            title=func.coalesce(new_values.c.title, Note.title),
+            content=func.coalesce(new_values.c.content, Note.content),
+            revision=Note.revision + 1,
+            change_seq=next_change_seq(user_id),
+        )
+        .returning(Note.__table__)
+    )
+    updated = await database.fetch_all(query=query)
+    await database.execute(
+        query=insert(NoteRevision.__table__).values(
+            [
+                {
+                    "content": None,
+                    "delta": None,
+                    **_revision_values(note, current[note["id"]]["content"]),
+                }
+                for note in updated
+            ]
+        )
+    )
+    return {**current, **{note["id"]: note for note in updated}}
+
+
+async def batch_notes(operations: list, user_id: int) -> List[dict]:
+    """
+    複数の作成・更新・削除を1トランザクションで実行
+
+    種類ごとに1つの複数行ステートメントで実行する（削除 → 更新 → 作成）。
+    同じノートを複数の操作で対象にすることはできない。
+
+    Args:
+        operations: NoteBatchCreate / NoteBatchUpdate / NoteBatchDelete のリスト
+        user_id: ユーザーID
+
+    Returns:
+        操作ごとの結果（index, op, id, status, note）のリスト
+
+    Raises:
+        ValueError: 同じノートIDが複数の操作に含まれる場合
+    """
+    targets = [operation.id for operation in operations if operation.op != "create"]
+    if len(targets) != len(set(targets)):
+        raise ValueError("Each note can be targeted by only one operation")
+
+    async with database.transaction():
+        deleted = set(
+            await delete_notes(
+                [op.id for op in operations if op.op == "delete"], user_id
+            )
+        )
+        updated = await _update_notes(
+            [(op.id, op.title, op.content) for op in operations if op.op == "update"],
+            user_id,
+        )
+        created = await insert_notes(
+            [(op.title, op.content) for op in operations if op.op == "create"],
+            user_id,
+        )
+    read_cache.bump(user_id)
+    # 変更がなかった更新対象も updated として送る（クライアントは読み直すだけ）
+    event_hub.publish(
+        user_id, [change_event("note", note_id, "deleted") for note_id in deleted]
+    )
+    _publish_note_events(user_id, "updated", updated.values())
+    _publish_note_events(user_id, "created", created)
+    created = iter(created)
+
+    results = []
+    for index, operation in enumerate(operations):
+        result = {"index": index, "op": operation.op}
+        if operation.op == "create":
+            note = next(created)
+            result.update(id=note["id"], status=201, note=note)
+        elif operation.op == "update":
+            note = updated.get(operation.id)
+            result.update(id=operation.id, status=200 if note else 404, note=note)
+        else:
+            found = operation.id in deleted
+            result.update(id=operation.id, status=204 if found else 404)
+        results.append(result)
+    return results
 
 
 async def import_notes(notes_data: list, user_id: int):
-    """ノートをインポート"""
-    imported_count = 0
-    for note_data in notes_data:
-        # IDとuser_idを除外して、新しいノートとして作成
-        query = (
-            insert(Note.__table__)
-            .values(
-                title=note_data.get("title", "Untitled"),
-                content=note_data.get("content", ""),
-                user_id=user_id,
+    """
+    ノートをインポート
+
+    _IMPORT_CHUNK_SIZE 件ずつの複数行INSERTで、すべてを1トランザクションで作成する
+    （1ステートメントのパラメータ数の上限を超えないようにする）
+    """
+    # IDとuser_idを除外して、新しいノートとして作成
+    rows = [
+        (note_data.get("title", "Untitled"), note_data.get("content", ""))
+        for note_data in notes_data
+    ]
+    notes = []
+    async with database.transaction():
+        for start in range(0, len(rows), _IMPORT_CHUNK_SIZE):
+            notes.extend(
+                await insert_notes(rows[start : start + _IMPORT_CHUNK_SIZE], user_id)
+            )
+    read_cache.bump(user_id)
+    _publish_note_events(user_id, "created", notes)
+    return len(notes)
+
+
+async def get_revisions(
+    note_id: int, user_id: int, before: Optional[int] = None, limit: int = 50
+):
+    """
+    ノートのリビジョン一覧を新しい順に取得（本文は含まない）
+
+    Args:
+        note_id: ノートID
+        user_id: ユーザーID
+        before: このリビジョン番号より古いものを取得（ページング用）
+        limit: 最大件数
+    """
+    query = select(
+        NoteRevision.revision,
+        NoteRevision.title,
+        NoteRevision.content.isnot(None).label("is_snapshot"),
+        NoteRevision.created_date,
+    ).where(NoteRevision.note_id == note_id, NoteRevision.user_id == user_id)
+    if before is not None:
+        query = query.where(NoteRevision.revision < before)
+    query = query.order_by(NoteRevision.revision.desc()).limit(limit)
+    return await database.fetch_all(query=query)
+
+
+async def get_revision(note_id: int, user_id: int, revision: int):
+    """
+    指定したリビジョンのノートを復元
+
+    直近のスナップショットから対象リビジョンまでの行を1クエリで取得し、
+    差分を順に適用する（適用する差分は最大 NOTE_REVISION_SNAPSHOT_INTERVAL - 1 個）
+
+    Returns:
+        note_id, revision, title, content, created_date を含む辞書
+        （リビジョンが存在しない場合は None）
+    """
+    snapshot = (
+        select(func.max(NoteRevision.revision))
+        .where(
+            NoteRevision.note_id == note_id,
+            NoteRevision.user_id == user_id,
+            NoteRevision.revision <= revision,
+            NoteRevision.content.isnot(None),
+        )
+        .scalar_subquery()
+    )
+    rows = await database.fetch_all(
+        query=select(NoteRevision.__table__)
+        .where(
+            NoteRevision.note_id == note_id,
+            NoteRevision.user_id == user_id,
+            NoteRevision.revision.between(snapshot, revision),
+        )
+        .order_by(NoteRevision.revision)
+    )
+    if not rows or rows[-1]["revision"] != revision:
+        return None
+
+    content = rows[0]["content"]
+    for row in rows[1:]:
+        content = apply_delta(content, decode_delta(row["delta"]))
+    last = rows[-1]
+    return {
+        "note_id": last["note_id"],
+        "revision": last["revision"],
+        "title": last["title"],
+        "content": content,
+        "created_date": last["created_date"],
+    }
+
+
+def parse_sync_cursor(token: Optional[str]) -> Optional[Tuple[int, int, int]]:
+    """
+    同期カーソル（"<change_seq>.<note_id>.<horizon>"）を解析
+
+    horizon は、クライアントの状態がどの圧縮済みシーケンスまで整合しているかを表す
+
+    Raises:
+        ValueError: 形式が不正な場合
+    """
+    if not token:
+        return None
+    seq, note_id, horizon = token.split(".")
+    return int(seq), int(note_id), int(horizon)
+
+
+def format_sync_cursor(cursor: Tuple[int, int, int]) -> str:
+    """同期カーソルを文字列化"""
+    return ".".join(str(part) for part in cursor)
+
+
+async def get_changes(
+    user_id: int, since: Optional[Tuple[int, int, int]], limit: int
+):
+    """
+    カーソル以降に変更されたノートと削除されたノートIDを取得
+
+    変更と墓標を (change_seq, note_id) 順にマージし、limit 件までを返す
+    （1つの REPEATABLE READ トランザクションで読む）。
+    カーソル以降の墓標が既に圧縮されている（またはカーソル未指定の）場合は
+    reset=True とし、現存するノートを最初から返す
+    （クライアントはローカル状態を破棄して再構築する）。
+
+    Args:
+        user_id: ユーザーID
+        since: 前回のカーソル（None の場合は全件同期）
+        limit: 1回で返す最大件数
+
+    Returns:
+        changes, deleted, cursor, has_more, reset を含む辞書
+    """
+    # ノートと墓標を同じスナップショットで読む（別々に読むと、間にコミットされた
+    # 更新と削除のうち削除だけが見え、カーソルが更新を飛び越えることがある）
+    async with database.transaction(isolation="repeatable_read", readonly=True):
+        compacted_seq = (
+            await database.fetch_val(
+                query=select(SyncCounter.compacted_seq).where(
+                    SyncCounter.user_id == user_id
+                )
             )
-            .returning(Note.__table__)
+            or 0
+        )
+        reset = since is None or compacted_seq > max(since[0], since[2])
+        if reset:
+            position, horizon = (0, 0), compacted_seq
+        else:
+            position, horizon = since[:2], since[2]
+
+        notes = await database.fetch_all(
+            query=select(Note.__table__)
+            .where(
+                Note.user_id == user_id,
+                tuple_(Note.change_seq, Note.id) > tuple_(*position),
+            )
+            .order_by(Note.change_seq, Note.id)
+            .limit(limit + 1)
+        )
+
+        # 全件再同期の場合、ローカル状態は破棄されるため墓標は不要
+        tombstones = []
+        if not reset:
+            tombstones = await database.fetch_all(
+                query=select(NoteTombstone.note_id, NoteTombstone.change_seq)
+                .where(
+                    NoteTombstone.user_id == user_id,
+                    tuple_(NoteTombstone.change_seq, NoteTombstone.note_id)
+                    > tuple_(*position),
+                )
+                .order_by(NoteTombstone.change_seq, NoteTombstone.note_id)
+                .limit(limit + 1)
+            )
+
+    # (change_seq, note_id) 順にマージ
+    merged = sorted(
+        [((note["change_seq"], note["id"]), note) for note in notes]
+        + [((tomb["change_seq"], tomb["note_id"]), None) for tomb in tombstones],
+        key=lambda item: item[0],
+    )
+    page = merged[:limit]
+    last = page[-1][0] if page else position
+
+    return {
+        "changes": [note for _, note in page if note is not None],
+        "deleted": [key[1] for key, note in page if note is None],
+        "cursor": format_sync_cursor((*last, horizon)),
+        "has_more": len(merged) > limit,
+        "reset": reset,
+    }
+
+
+async def compact_tombstones(retention_days: Optional[int] = None) -> int:
+    """
+    保持期間を過ぎた墓標を削除し、ユーザーごとの圧縮済みシーケンスを更新
+
+    Returns:
+        削除した墓標の件数
+    """
+    if retention_days is None:
+        retention_days = settings.SYNC_TOMBSTONE_RETENTION_DAYS
+
+    purged = (
+        delete(NoteTombstone.__table__)
+        .where(
+            NoteTombstone.deleted_date
+            < func.now() - cast(timedelta(days=retention_days), Interval)
         )
-        await database.fetch_one(query=query)
-        imported_count += 1
-    return imported_count
+        .returning(NoteTombstone.user_id, NoteTombstone.change_seq)
+        .cte("purged")
+    )
+    per_user = (
+        select(
+            purged.c.user_id,
+            func.max(purged.c.change_seq).label("max_seq"),
+            func.count().label("purged_count"),
+        )
+        .group_by(purged.c.user_id)
+        .subquery("per_user")
+    )
+    counter = SyncCounter.__table__
+    query = (
+        update(counter)
+        .where(counter.c.user_id == per_user.c.user_id)
+        .values(compacted_seq=func.greatest(counter.c.compacted_seq, per_user.c.max_seq))
+        .returning(per_user.c.purged_count)
+    )
+    rows = await database.fetch_all(query=query)
+    return sum(row["purged_count"] for row in rows)
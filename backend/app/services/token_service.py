@@ -0,0 +1,700 @@
+# Token Service - refresh token sessions, personal access tokens and JWT revocation
+import hashlib
+import logging
+import secrets
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional
+from sqlalchemy import (
+    select,
+    insert,
+    update,
+    delete,
+    func,
+    cast,
+    bindparam,
+    values,
+    column,
+    desc,
+    exists,
+    Integer,
+    Float,
+    Interval,
+    String,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, psycopg2, insert as pg_insert
+from app.database import database
+from app.core.bloom_filter import BloomFilter
+from app.core.events import event_hub
+from app.core.invalidation import invalidation_bus
+from app.models.refresh_token import RefreshToken
+from app.models.revoked_token import RevokedToken
+from app.models.event_stream_ticket import EventStreamTicket
+from app.models.personal_access_token import PersonalAccessToken
+from app.models.user import User
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# パーソナルアクセストークンの接頭辞（JWT と見分けるため）
+PAT_PREFIX = "mpat_"
+# パーソナルアクセストークンで使えるAPI（/api/<API>/...）。認証・ユーザー管理は使えない
+# （スコープは <API>:<read|write>、user_schema.PersonalAccessTokenScope を参照）
+PAT_AREAS = ("notes", "favorites", "ai")
+
+
+def generate_token() -> str:
+    """推測できないランダムなトークン（256ビット）"""
+    return secrets.token_urlsafe(32)
+
+
+def token_hash(token: str) -> str:
+    """
+    トークンの SHA-256 ダイジェスト（16進）
+
+    トークンは十分なエントロピーを持つため、パスワードと違いストレッチングは不要
+    """
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _expires_at():
+    return func.now() + cast(
+        timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS), Interval
+    )
+
+
+async def issue_refresh_token(user_id: int) -> str:
+    """ログイン時に新しい系列のリフレッシュトークンを発行"""
+    token = generate_token()
+    query = insert(RefreshToken.__table__).values(
+        user_id=user_id,
+        token_hash=token_hash(token),
+        family_id=uuid.uuid4().hex,
+        expires_at=_expires_at(),
+        created_date=func.now(),
+    )
+    await database.execute(query=query)
+    return token
+
+
+@lru_cache(maxsize=None)
+def _rotate_query() -> str:
+    """
+    ローテーションのSQL（初回にコンパイルし、以降は文字列を再利用する）
+
+    CTE を含む文のコンパイルは数ミリ秒かかり、DBでの実行より遅いため
+    """
+    table = RefreshToken.__table__
+    rotated = (
+        update(table)
+        .where(
+            table.c.token_hash == bindparam("token_hash"),
+            table.c.used_date.is_(None),
+            table.c.revoked_date.is_(None),
+            table.c.expires_at > func.now(),
+            table.c.user_id == User.id,
+            User.is_active.is_(True),
+        )
+        .values(used_date=func.now())
+        .returning(table.c.user_id, table.c.family_id, User.username)
+        .cte("rotated")
+    )
+    issued = (
+        insert(table)
+        .from_select(
+            ["user_id", "token_hash", "family_id", "expires_at", "created_date"],
+            select(
+                rotated.c.user_id,
+                cast(bindparam("new_token_hash"), String),
+                rotated.c.family_id,
+                func.now() + cast(bindparam("lifetime"), Interval),
+                func.now(),
+            ),
+        )
+        .cte("issued")
+    )
+    query = select(rotated.c.user_id, rotated.c.username).add_cte(issued)
+    # databases が解釈できる :name 形式で、バインドのキャスト（::VARCHAR）を付けない方言で出力
+    dialect = psycopg2.dialect(paramstyle="named")
+    return str(query.compile(dialect=dialect))
+
+
+async def rotate_refresh_token(token: str) -> Optional[dict]:
+    """
+    リフレッシュトークンを使用済みにし、同じ系列の新しいトークンを発行
+
+    使用済みへの更新と新しいトークンの挿入を1ステートメントで行う（ダイジェストの
+    一意インデックスで検索するため、ユーザー数によらず一定時間）。
+    使用済みのトークンが再び使われた場合は系列ごと失効させる。ただし使用から
+    REFRESH_TOKEN_REUSE_GRACE_SECONDS 以内の再利用は、同じトークンでの同時の更新
+    （複数のタブなど）とみなし、失効させずに None を返す。
+
+    Returns:
+        {"user_id", "username", "refresh_token"}、無効なトークンの場合は None
+    """
+    new_token = generate_token()
+    row = await database.fetch_one(
+        query=_rotate_query(),
+        values={
+            "token_hash": token_hash(token),
+            "new_token_hash": token_hash(new_token),
+            "lifetime": timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+        },
+    )
+    if row:
+        return {
+            "user_id": row["user_id"],
+            "username": row["username"],
+            "refresh_token": new_token,
+        }
+
+    # 使用済みのトークンの再利用（漏洩したトークンか、正規の利用者の古いトークン）
+    revoked = await _revoke_family(token, reused_only=True)
+    if revoked:
+        logger.warning(
+            f"Refresh token reuse detected for user {revoked}; revoked the session"
+        )
+    return None
+
+
+async def _revoke_family(token: str, reused_only: bool = False) -> Optional[int]:
+    """
+    トークンと同じ系列の有効なトークンをすべて失効させる
+
+    reused_only が True の場合は、猶予時間より前に使用済みになったトークンのみ対象とする
+
+    Returns:
+        失効させた系列のユーザーID、該当しない場合は None
+    """
+    table = RefreshToken.__table__
+    family = select(table.c.family_id).where(table.c.token_hash == token_hash(token))
+    if reused_only:
+        grace = timedelta(seconds=settings.REFRESH_TOKEN_REUSE_GRACE_SECONDS)
+        family = family.where(table.c.used_date < func.now() - cast(grace, Interval))
+    query = (
+        update(table)
+        .where(
+            table.c.family_id.in_(family.scalar_subquery()),
+            table.c.revoked_date.is_(None),
+        )
+        .values(revoked_date=func.now())
+        .returning(table.c.user_id)
+    )
+    rows = await database.fetch_all(query=query)
+    return rows[0]["user_id"] if rows else None
+
+
+async def revoke_refresh_token(token: str) -> bool:
+    """ログアウト: トークンの系列を失効させる"""
+    return await _revoke_family(token) is not None
+
+
+async def delete_expired_refresh_tokens() -> int:
+    """
+    期限切れのリフレッシュトークンを削除
+
+    使用済み・失効済みのトークンも期限までは再利用の検出のため残す
+
+    Returns:
+        削除した件数
+    """
+    table = RefreshToken.__table__
+    purged = (
+        delete(table).where(table.c.expires_at < func.now()).returning(table.c.id)
+    ).cte("purged")
+    return await database.fetch_val(query=select(func.count()).select_from(purged))
+
+
+@dataclass
+class CachedAccessToken:
+    """検証済みのパーソナルアクセストークン（プロセス内キャッシュ）"""
+
+    token_id: int
+    user: dict
+    scopes: FrozenSet[str]
+    # time.monotonic() での有効期限（None: 無期限）
+    expires_at: Optional[float]
+    cached_at: float
+
+
+# ダイジェストから検証結果へのキャッシュ（LRU）
+_access_tokens: "OrderedDict[str, CachedAccessToken]" = OrderedDict()
+# トークンIDから最後に使われた時刻（time.monotonic()、まだDBに書き込んでいないもの）
+_last_used: Dict[int, float] = {}
+
+
+def required_scope(method: str, path: str) -> Optional[str]:
+    """
+    リクエストに必要なスコープ（"notes:read" など）
+
+    Returns:
+        スコープ、パーソナルアクセストークンで使えないAPIの場合は None
+    """
+    parts = path.split("/")
+    if len(parts) < 3 or parts[1] != "api" or parts[2] not in PAT_AREAS:
+        return None
+    access = "read" if method in ("GET", "HEAD") else "write"
+    return f"{parts[2]}:{access}"
+
+
+def scope_allows(scopes: FrozenSet[str], method: str, path: str) -> bool:
+    """トークンのスコープでリクエストを許可するか（write は read を含む）"""
+    scope = required_scope(method, path)
+    if scope is None:
+        return False
+    area = scope.split(":")[0]
+    return scope in scopes or f"{area}:write" in scopes
+
+
+# 一覧・作成時に返す列（ダイジェストは返さない）
+_PUBLIC_COLUMNS = [
+    PersonalAccessToken.id,
+    PersonalAccessToken.name,
+    PersonalAccessToken.token_prefix,
+    PersonalAccessToken.scopes,
+    PersonalAccessToken.expires_at,
+    PersonalAccessToken.last_used_date,
+    PersonalAccessToken.created_date,
+]
+
+
+async def create_personal_access_token(
+    user_id: int, name: str, scopes: List[str], expires_in_days: Optional[int]
+) -> dict:
+    """
+    パーソナルアクセストークンを作成
+
+    Returns:
+        作成したトークンの情報と、トークン本体（token、作成時のみ返す）
+    """
+    token = PAT_PREFIX + generate_token()
+    table = PersonalAccessToken.__table__
+    query = (
+        insert(table)
+        .values(
+            user_id=user_id,
+            name=name,
+            token_hash=token_hash(token),
+            token_prefix=token[: len(PAT_PREFIX) + 6],
+            scopes=sorted(set(scopes)),
+            expires_at=(
+                func.now() + cast(timedelta(days=expires_in_days), Interval)
+                if expires_in_days
+                else None
+            ),
+            created_date=func.now(),
+        )
+        .returning(*_PUBLIC_COLUMNS)
+    )
+    created = await database.fetch_one(query=query)
+    return {**dict(created), "token": token}
+
+
+async def get_personal_access_tokens(user_id: int):
+    """ユーザーの有効なパーソナルアクセストークンの一覧（新しい順）"""
+    query = (
+        select(*_PUBLIC_COLUMNS)
+        .where(
+            PersonalAccessToken.user_id == user_id,
+            PersonalAccessToken.revoked_date.is_(None),
+        )
+        .order_by(desc(PersonalAccessToken.id))
+    )
+    return await database.fetch_all(query=query)
+
+
+async def revoke_personal_access_token(token_id: int, user_id: int) -> bool:
+    """
+    パーソナルアクセストークンを失効させる
+
+    このプロセスのキャッシュからは即座に削除し、無効化バスで他のワーカーにも伝える
+    （伝わらなかった場合も PAT_CACHE_TTL_SECONDS 以内に無効になる）
+
+    Returns:
+        失効させた場合は True、存在しない（失効済み）場合は False
+    """
+    table = PersonalAccessToken.__table__
+    query = (
+        update(table)
+        .where(
+            table.c.id == token_id,
+            table.c.user_id == user_id,
+            table.c.revoked_date.is_(None),
+        )
+        .values(revoked_date=func.now())
+        .returning(table.c.token_hash)
+    )
+    revoked = await database.fetch_one(query=query)
+    if not revoked:
+        return False
+    _access_tokens.pop(revoked["token_hash"], None)
+    _last_used.pop(token_id, None)
+    invalidation_bus.publish("access_tokens", [revoked["token_hash"]])
+    return True
+
+
+def evict_personal_access_tokens(user_id: int, notify: bool = True) -> None:
+    """
+    無効化したユーザーのトークンをキャッシュから削除
+
+    notify が True の場合は無効化バスで他のワーカーにも伝える
+    （伝わらなかった場合も PAT_CACHE_TTL_SECONDS 以内に無効になる）
+    """
+    if notify:
+        invalidation_bus.publish("access_token_users", [user_id])
+    for digest in [
+        digest
+        for digest, entry in _access_tokens.items()
+        if entry.user["id"] == user_id
+    ]:
+        del _access_tokens[digest]
+
+
+def _invalidate_access_tokens(digests: Optional[List[str]]) -> None:
+    """他のワーカーで失効させたトークンをキャッシュから削除"""
+    if digests is None:
+        _access_tokens.clear()
+        return
+    for digest in digests:
+        _access_tokens.pop(digest, None)
+
+
+def _invalidate_access_token_users(user_ids: Optional[List[str]]) -> None:
+    """他のワーカーで無効化したユーザーのトークンをキャッシュから削除"""
+    if user_ids is None:
+        _access_tokens.clear()
+        return
+    for user_id in user_ids:
+        evict_personal_access_tokens(int(user_id), notify=False)
+
+
+invalidation_bus.subscribe("access_tokens", _invalidate_access_tokens)
+invalidation_bus.subscribe("access_token_users", _invalidate_access_token_users)
+
+
+async def authenticate_personal_access_token(
+    token: str,
+) -> Optional[CachedAccessToken]:
+    """
+    パーソナルアクセストークンを検証
+
+    ダイジェストの一意インデックスで1回検索し、結果を PAT_CACHE_TTL_SECONDS の間
+    プロセス内にキャッシュする。最後に使われた時刻はメモリに記録し、
+    flush_personal_access_token_usage でまとめて書き込む。
+
+    Returns:
+        検証結果、無効なトークンの場合は None
+    """
+    digest = token_hash(token)
+    now = time.monotonic()
+    entry = _access_tokens.get(digest)
+    if entry is None or now - entry.cached_at > settings.PAT_CACHE_TTL_SECONDS:
+        pat = PersonalAccessToken.__table__
+        query = (
+            select(
+                User.__table__,
+                pat.c.id.label("token_id"),
+                pat.c.scopes.label("token_scopes"),
+                func.extract("epoch", pat.c.expires_at - func.now()).label(
+                    "token_expires_in"
+                ),
+            )
+            .join(pat, pat.c.user_id == User.id)
+            .where(
+                pat.c.token_hash == digest,
+                pat.c.revoked_date.is_(None),
+                User.is_active.is_(True),
+            )
+        )
+        row = await database.fetch_one(query=query)
+        if row is None:
+            _access_tokens.pop(digest, None)
+            return None
+        row = dict(row)
+        expires_in = row.pop("token_expires_in")
+        entry = CachedAccessToken(
+            token_id=row.pop("token_id"),
+            scopes=frozenset(row.pop("token_scopes")),
+            user=row,
+            expires_at=now + float(expires_in) if expires_in is not None else None,
+            cached_at=now,
+        )
+        _access_tokens[digest] = entry
+        while len(_access_tokens) > settings.PAT_CACHE_MAX_ENTRIES:
+            _access_tokens.popitem(last=False)
+    _access_tokens.move_to_end(digest)
+
+    if entry.expires_at is not None and now >= entry.expires_at:
+        return None
+    _last_used[entry.token_id] = now
+    return entry
+
+
+async def flush_personal_access_token_usage() -> int:
+    """
+    メモリに記録した最後に使われた時刻を1ステートメントでまとめて書き込む
+
+    Returns:
+        更新したトークンの件数
+    """
+    if not _last_used:
+        return 0
+    used = list(_last_used.items())
+    _last_used.clear()
+    now = time.monotonic()
+    used_values = values(
+        column("id", Integer), column("age", Float), name="used"
+    ).data(
+        # VALUES 内のパラメータは型が推論されない（text になる）ためキャストする
+        [
+            (cast(token_id, Integer), cast(now - used_at, Float))
+            for token_id, used_at in used
+        ]
+    )
+    table = PersonalAccessToken.__table__
+    query = (
+        update(table)
+        .where(table.c.id == used_values.c.id)
+        .values(
+            last_used_date=func.now()
+            - func.make_interval(0, 0, 0, 0, 0, 0, used_values.c.age)
+        )
+    )
+    try:
+        await database.execute(query=query)
+    except Exception:
+        # 次回にまとめて書き込む（その間に使われた場合は新しい時刻を残す）
+        for token_id, used_at in used:
+            _last_used[token_id] = max(used_at, _last_used.get(token_id, used_at))
+        raise
+    return len(used)
+
+
+@dataclass
+class RevocationStats:
+    """アクセストークンの失効確認の統計（プロセスごと）"""
+
+    checks: int = 0
+    # ブルームフィルタが陽性で、DBで確認した回数
+    lookups: int = 0
+    # そのうち失効していなかった（偽陽性の）回数
+    false_positives: int = 0
+
+
+# 失効させたアクセストークンの jti（ワーカーごとのブルームフィルタ）
+_revoked_filter = BloomFilter(
+    settings.JWT_REVOCATION_BLOOM_CAPACITY, settings.JWT_REVOCATION_BLOOM_ERROR_RATE
+)
+# 取り込み済みの失効の created_date の最大値（DBの時刻）
+_revoked_since: Optional[datetime] = None
+# 差分の取り込みで、前回の最大値より前から読み直す幅（created_date はトランザクションの
+# 開始時刻のため、コミットの順序が前後した行を取りこぼさないよう）
+_REVOCATION_OVERLAP = timedelta(seconds=10)
+revocation_stats = RevocationStats()
+
+
+async def _fetch_revoked_tokens(since: Optional[datetime]):
+    """期限内の失効の jti のリストと created_date の最大値（1行にまとめて転送する）"""
+    table = RevokedToken.__table__
+    query = select(
+        func.coalesce(func.array_agg(table.c.jti), cast([], ARRAY(String))).label(
+            "jtis"
+        ),
+        func.max(table.c.created_date).label("latest"),
+    ).where(table.c.expires_at > func.now())
+    if since is not None:
+        query = query.where(table.c.created_date > since - _REVOCATION_OVERLAP)
+    row = await database.fetch_one(query=query)
+    return row["jtis"], row["latest"]
+
+
+async def load_revoked_tokens() -> int:
+    """
+    期限内の失効からブルームフィルタを作り直す
+
+    起動時と、定期メンテナンスのたびに（すべてのワーカーで）呼ぶ。ブルームフィルタから
+    期限切れの失効を削除できないため、作り直して除く
+
+    Returns:
+        読み込んだ件数
+    """
+    global _revoked_filter, _revoked_since
+    jtis, latest = await _fetch_revoked_tokens(None)
+    # 想定要素数を超えると偽陽性率が上がるため、超えている場合は余裕を持って確保する
+    revoked = BloomFilter(
+        max(settings.JWT_REVOCATION_BLOOM_CAPACITY, len(jtis) * 2),
+        settings.JWT_REVOCATION_BLOOM_ERROR_RATE,
+    )
+    for jti in jtis:
+        revoked.add(jti)
+    _revoked_filter = revoked
+    _revoked_since = latest
+    return len(jtis)
+
+
+async def refresh_revoked_tokens() -> int:
+    """
+    他のワーカーで追加された失効をブルームフィルタに取り込む
+
+    created_date のインデックスで前回以降の行のみを読む
+
+    Returns:
+        読み込んだ件数（読み直した行を含む）
+    """
+    global _revoked_since
+    jtis, latest = await _fetch_revoked_tokens(_revoked_since)
+    for jti in jtis:
+        _revoked_filter.add(jti)
+    if latest is not None and (_revoked_since is None or latest > _revoked_since):
+        _revoked_since = latest
+    return len(jtis)
+
+
+async def revoke_access_token(jti: str, expires_at: int) -> bool:
+    """
+    アクセストークンを期限前に失効させる
+
+    このワーカーでは即座に、他のワーカーでは無効化バスで伝わり次第（伝わらなかった
+    場合も JWT_REVOCATION_REFRESH_SECONDS 以内に）無効になる。
+    トークンで開いた変更イベントのストリームも閉じる
+
+    Args:
+        jti: トークンの jti クレーム
+        expires_at: トークンの exp クレーム（UNIX時刻）
+
+    Returns:
+        失効させた場合は True、失効済みの場合は False
+    """
+    table = RevokedToken.__table__
+    query = (
+        pg_insert(table)
+        .values(
+            jti=jti,
+            expires_at=func.to_timestamp(expires_at),
+            created_date=func.now(),
+        )
+        .on_conflict_do_nothing(index_elements=["jti"])
+        .returning(table.c.id)
+    )
+    revoked = await database.fetch_one(query=query)
+    _revoked_filter.add(jti)
+    invalidation_bus.publish("revoked_access_tokens", [jti])
+    # このトークンで開いた変更イベントのストリームも閉じる
+    event_hub.disconnect(jti=jti)
+    return revoked is not None
+
+
+def _add_revoked_access_tokens(jtis: Optional[List[str]]) -> None:
+    """他のワーカーで失効させたアクセストークンをブルームフィルタに追加"""
+    # 全体（切断中に取りこぼした可能性がある）の場合は、定期的な差分の取り込みに任せる
+    for jti in jtis or ():
+        _revoked_filter.add(jti)
+
+
+invalidation_bus.subscribe("revoked_access_tokens", _add_revoked_access_tokens)
+
+
+async def is_access_token_revoked(jti: str) -> bool:
+    """
+    アクセストークンが失効しているか
+
+    ほとんどのトークン（失効していないもの）はブルームフィルタのみで判定し、
+    陽性の場合のみDBで確認する
+    """
+    revocation_stats.checks += 1
+    if jti not in _revoked_filter:
+        return False
+    revocation_stats.lookups += 1
+    table = RevokedToken.__table__
+    revoked = await database.fetch_val(
+        query=select(exists().where(table.c.jti == jti))
+    )
+    if not revoked:
+        revocation_stats.false_positives += 1
+    return bool(revoked)
+
+
+async def delete_expired_revoked_tokens() -> int:
+    """
+    期限を過ぎたトークンの失効を削除（トークン自体が無効なため不要）
+
+    Returns:
+        削除した件数
+    """
+    table = RevokedToken.__table__
+    purged = (
+        delete(table).where(table.c.expires_at < func.now()).returning(table.c.id)
+    ).cte("purged")
+    return await database.fetch_val(query=select(func.count()).select_from(purged))
+
+
+async def issue_event_stream_ticket(user_id: int, jti: Optional[str]) -> str:
+    """
+    変更イベントのストリームに接続するための使い捨てのチケットを発行
+
+    Args:
+        user_id: ユーザーID
+        jti: 発行に使ったアクセストークンの jti（失効させたらストリームも閉じる）
+    """
+    ticket = generate_token()
+    query = insert(EventStreamTicket.__table__).values(
+        user_id=user_id,
+        token_hash=token_hash(ticket),
+        jti=jti,
+        expires_at=func.now()
+        + cast(timedelta(seconds=settings.EVENT_STREAM_TICKET_SECONDS), Interval),
+        created_date=func.now(),
+    )
+    await database.execute(query=query)
+    return ticket
+
+
+async def redeem_event_stream_ticket(ticket: str) -> Optional[dict]:
+    """
+    チケットを使用済み（削除）にし、発行したユーザーを返す
+
+    削除とユーザーの取得を1ステートメントで行うため、同じチケットで接続できるのは1回だけ
+
+    Returns:
+        有効なユーザーと発行に使ったアクセストークンの jti（{"user", "jti"}）、
+        無効・期限切れ・使用済みのチケット、または失効させたトークンで発行した場合は None
+    """
+    table = EventStreamTicket.__table__
+    redeemed = (
+        delete(table)
+        .where(
+            table.c.token_hash == token_hash(ticket),
+            table.c.expires_at > func.now(),
+        )
+        .returning(table.c.user_id, table.c.jti)
+        .cte("redeemed")
+    )
+    query = select(User.__table__, redeemed.c.jti.label("ticket_jti")).where(
+        User.id == redeemed.c.user_id, User.is_active.is_(True)
+    )
+    row = await database.fetch_one(query=query)
+    if row is None:
+        return None
+    user = dict(row)
+    jti = user.pop("ticket_jti")
+    if jti and await is_access_token_revoked(jti):
+        return None
+    return {"user": user, "jti": jti}
+
+
+async def delete_expired_event_stream_tickets() -> int:
+    """
+    期限切れのストリームの接続チケットを削除
+
+    Returns:
+        削除した件数
+    """
+    table = EventStreamTicket.__table__
+    purged = (
+        delete(table).where(table.c.expires_at < func.now()).returning(table.c.id)
+    ).cte("purged")
+    return await database.fetch_val(query=select(func.count()).select_from(purged))
@@ -1,18 +1,62 @@
 # User business logic and CRUD operations
-from app.schemas.user_schema import UserCreate, UserUpdate
-from app.core.security import get_password_hash, verify_password
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, List, Optional, Tuple
+from app.schemas.user_schema import UserCreate, UserUpdate, USER_RESPONSE_FIELDS
+from app.core.security import get_password_hash
+from app.core import password_hashing
+from app.core.config import settings
+from app.core.events import event_hub
 from app.database import database
 from app.models.user import User
-from sqlalchemy import select, insert, update, delete
+from app.models.account_deletion import AccountDeletion
+from app.models.favorite import Favorite
+from app.models.ai_generation import AIGeneration
+from app.models.note import Note
+from app.models.note_revision import NoteRevision
+from app.services.note_service import read_cache
+from sqlalchemy import (
+    select,
+    update,
+    delete,
+    tuple_,
+    func,
+    cast,
+    exists,
+    literal,
+    or_,
+    Interval,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+logger = logging.getLogger(__name__)
+
+# アカウント削除の段階（この順に削除し、最後にユーザーを削除する）
+ACCOUNT_DELETION_STAGES = ("favorites", "generations", "revisions", "notes", "user")
+ACCOUNT_DELETION_COMPLETED = "completed"
+# ジョブを占有するワーカーの識別子
+_WORKER_ID = uuid.uuid4().hex
+# 削除の受付をこのワーカーの削除処理に知らせる（待機中のみ）
+_deletion_wakeup: Optional[asyncio.Event] = None
 
 
 async def create_user(payload: UserCreate):
-    """ユーザー作成（パスワードハッシュ化）"""
-    password_hash = get_password_hash(payload.password)
+    """
+    ユーザー作成（パスワードハッシュ化）
+
+    ユーザー名の重複は一意制約で判定する（同時に登録されても競合しない）
+
+    Returns:
+        作成したユーザー、ユーザー名が既に存在する場合は None
+    """
+    password_hash = await asyncio.to_thread(get_password_hash, payload.password)
 
     query = (
-        insert(User.__table__)
+        pg_insert(User.__table__)
         .values(username=payload.username, password_hash=password_hash, is_active=True)
+        .on_conflict_do_nothing(index_elements=[User.username])
         .returning(User.__table__)
     )
 
@@ -31,40 +75,507 @@ async def get_by_username(username: str):
     return await database.fetch_one(query=query)
 
 
-async def get_all_users():
-    """全ユーザー取得"""
-    query = select(User.__table__)
-    return await database.fetch_all(query=query)
+# 一覧で SELECT するカラム（password_hash は読み込まない）
+_LIST_COLUMNS = [User.__table__.c[field] for field in USER_RESPONSE_FIELDS]
+# エクスポートで1回に読み込む件数
+_EXPORT_BATCH_SIZE = 1000
+_EPOCH = datetime(1970, 1, 1)
+
+
+def parse_user_cursor(token: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """
+    一覧のカーソル（"<created_date のUNIX時刻（マイクロ秒）>.<id>"）を解析
+
+    Raises:
+        ValueError: 形式が不正な場合
+        OverflowError: 日時が表現できる範囲外の場合
+    """
+    if not token:
+        return None
+    created, user_id = token.split(".")
+    user_id = int(user_id)
+    # users.id は32ビット整数（範囲外の値はDBでエラーになる）
+    if not 0 < user_id < 2**31:
+        raise ValueError(f"Invalid user id in cursor: {user_id}")
+    return _EPOCH + timedelta(microseconds=int(created)), user_id
+
+
+def format_user_cursor(position: Tuple[datetime, int]) -> str:
+    """一覧のカーソルを文字列化"""
+    created, user_id = position
+    return f"{(created - _EPOCH) // timedelta(microseconds=1)}.{user_id}"
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    # created_date はタイムゾーンなし（UTC）で保存されている
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _users_query(
+    after: Optional[Tuple[datetime, int]],
+    limit: int,
+    is_active: Optional[bool],
+    created_from: Optional[datetime],
+    created_to: Optional[datetime],
+):
+    query = select(*_LIST_COLUMNS).order_by(User.created_date, User.id).limit(limit)
+    if is_active is not None:
+        query = query.where(User.is_active.is_(is_active))
+    if created_from is not None:
+        query = query.where(User.created_date >= _utc(created_from))
+    if created_to is not None:
+        query = query.where(User.created_date < _utc(created_to))
+    if after is not None:
+        # (created_date, id) のインデックスで前のページの続きから読む（OFFSET を使わない）
+        query = query.where(tuple_(User.created_date, User.id) > tuple_(*after))
+    return query
+
+
+async def get_users(
+    after: Optional[Tuple[datetime, int]] = None,
+    limit: int = 100,
+    is_active: Optional[bool] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+) -> Tuple[List, Optional[Tuple[datetime, int]]]:
+    """
+    ユーザー一覧を作成日時順に1ページ取得
+
+    Args:
+        after: 前のページの最後の (created_date, id)
+        limit: 最大件数
+        is_active: 有効・無効で絞り込む（None の場合はすべて）
+        created_from: 作成日時の下限（以上）
+        created_to: 作成日時の上限（未満）
+
+    Returns:
+        (ユーザーのリスト, 次のページの位置（最後のページの場合は None）)
+    """
+    users = await database.fetch_all(
+        query=_users_query(after, limit + 1, is_active, created_from, created_to)
+    )
+    if len(users) <= limit:
+        return users, None
+    users = users[:limit]
+    return users, (users[-1]["created_date"], users[-1]["id"])
+
+
+async def iter_users(
+    after: Optional[Tuple[datetime, int]] = None,
+    is_active: Optional[bool] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    batch_size: int = _EXPORT_BATCH_SIZE,
+) -> AsyncIterator[List]:
+    """
+    条件に一致するユーザーを batch_size 件ずつ返す（エクスポート用）
+
+    キーセットで1バッチずつ問い合わせるため、件数によらずメモリ使用量は一定で、
+    バッチの間はDB接続を保持しない
+    """
+    while True:
+        users = await database.fetch_all(
+            query=_users_query(after, batch_size, is_active, created_from, created_to)
+        )
+        if users:
+            yield users
+        if len(users) < batch_size:
+            return
+        after = (users[-1]["created_date"], users[-1]["id"])
 
 
 async def update_user(user_id: int, payload: UserUpdate):
-    """ユーザー更新"""
+    """
+    ユーザー更新
+
+    Returns:
+        更新後のユーザー、存在しない場合は None
+    """
     values = {}
     if payload.password:
-        values["password_hash"] = get_password_hash(payload.password)
+        values["password_hash"] = await asyncio.to_thread(
+            get_password_hash, payload.password
+        )
     if payload.is_active is not None:
         values["is_active"] = payload.is_active
+    if not values:
+        return await get_user(user_id)
 
+    # 削除中のユーザーは存在しないものとして扱う（有効に戻さない）
     query = (
         update(User.__table__)
-        .where(User.id == user_id)
+        .where(
+            User.id == user_id,
+            ~exists().where(AccountDeletion.user_id == user_id),
+        )
         .values(**values)
         .returning(User.__table__)
     )
-    return await database.fetch_one(query=query)
+    user = await database.fetch_one(query=query)
+    if user and payload.is_active is False:
+        _disconnect_user(user_id)
+    return user
+
+
+def _disconnect_user(user_id: int) -> None:
+    """無効化したユーザーのトークンのキャッシュと変更イベントのストリームを破棄"""
+    # Import here to avoid circular dependency
+    from app.services import token_service
+
+    token_service.evict_personal_access_tokens(user_id)
+    event_hub.disconnect(user_id=user_id)
 
 
 async def delete_user(user_id: int):
-    """ユーザー削除"""
-    query = delete(User.__table__).where(User.id == user_id)
-    return await database.execute(query=query)
+    """
+    ユーザー削除（無効化して、データの削除をバックグラウンドで行う）
+
+    無効化と削除ジョブの登録を1ステートメントで行うため、以降はログイン・API呼び出しが
+    できなくなる。ノートなどのデータは process_account_deletions が少しずつ削除する。
+    既に削除中の場合は何もしない。
+
+    Returns:
+        無効化したユーザー、存在しない場合は None
+    """
+    deactivated = (
+        update(User.__table__)
+        .where(User.id == user_id)
+        .values(is_active=False)
+        .returning(User.__table__)
+        .cte("deactivated")
+    )
+    job = (
+        pg_insert(AccountDeletion.__table__)
+        .from_select(
+            ["user_id", "stage", "requested_date", "updated_date"],
+            select(
+                deactivated.c.id,
+                literal(ACCOUNT_DELETION_STAGES[0]),
+                func.now(),
+                func.now(),
+            ),
+        )
+        .on_conflict_do_nothing(index_elements=["user_id"])
+        .cte("job")
+    )
+    user = await database.fetch_one(query=select(deactivated).add_cte(job))
+    if user:
+        _disconnect_user(user_id)
+        if _deletion_wakeup:
+            _deletion_wakeup.set()
+    return user
+
+
+async def get_account_deletion(user_id: int):
+    """アカウント削除の進捗"""
+    query = select(AccountDeletion.__table__).where(
+        AccountDeletion.user_id == user_id
+    )
+    return await database.fetch_one(query=query)
+
+
+def _lease_until():
+    return func.now() + cast(
+        timedelta(seconds=settings.ACCOUNT_DELETION_LEASE_SECONDS), Interval
+    )
+
+
+def _owns_job(user_id: int):
+    """このワーカーがジョブを占有しているか（占有していない場合は何も削除しない）"""
+    return exists().where(
+        AccountDeletion.user_id == user_id,
+        AccountDeletion.lease_owner == _WORKER_ID,
+    )
+
+
+async def _claim_account_deletion():
+    """
+    未完了で、どのワーカーも占有していない（期限切れを含む）ジョブを1件占有する
+
+    Returns:
+        (user_id, stage)、該当しない場合は None
+    """
+    table = AccountDeletion.__table__
+    candidate = (
+        select(table.c.user_id)
+        .where(
+            table.c.completed_date.is_(None),
+            or_(table.c.lease_until.is_(None), table.c.lease_until < func.now()),
+        )
+        .order_by(table.c.requested_date)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    query = (
+        update(table)
+        .where(table.c.user_id == candidate)
+        .values(
+            lease_owner=_WORKER_ID, lease_until=_lease_until(), updated_date=func.now()
+        )
+        .returning(table.c.user_id, table.c.stage)
+    )
+    return await database.fetch_one(query=query)
+
+
+def _deleted_rows(stage: str, user_id: int, batch_size: int):
+    """
+    段階ごとの、最大 batch_size 行を削除する CTE
+
+    Returns:
+        (削除する CTE, 同時に削除して他の段階の件数に数える CTE の辞書（段階: CTE）)
+    """
+    owned = _owns_job(user_id)
+    if stage == "favorites":
+        batch = select(Favorite.id).where(Favorite.user_id == user_id, owned)
+        deleted = delete(Favorite.__table__).where(
+            Favorite.id.in_(batch.limit(batch_size))
+        )
+        return deleted.returning(Favorite.id).cte("deleted"), {}
+    if stage == "generations":
+        # パーティションをまたぐため、主キー（id, created_date）で指定する
+        batch = select(AIGeneration.id, AIGeneration.created_date).where(
+            AIGeneration.user_id == user_id, owned
+        )
+        deleted = delete(AIGeneration.__table__).where(
+            tuple_(AIGeneration.id, AIGeneration.created_date).in_(
+                batch.limit(batch_size)
+            )
+        )
+        return deleted.returning(AIGeneration.id).cte("deleted"), {}
+    if stage == "revisions":
+        batch = select(NoteRevision.id).where(NoteRevision.user_id == user_id, owned)
+        deleted = delete(NoteRevision.__table__).where(
+            NoteRevision.id.in_(batch.limit(batch_size))
+        )
+        return deleted.returning(NoteRevision.id).cte("deleted"), {}
+    # notes: 他のユーザーがお気に入りに追加している場合は、そのお気に入りも削除する
+    # （favorites_deleted に数える）
+    batch = (
+        select(Note.id)
+        .where(Note.user_id == user_id, owned)
+        .limit(batch_size)
+        .cte("batch")
+    )
+    unfavorited = (
+        delete(Favorite.__table__)
+        .where(Favorite.note_id.in_(select(batch.c.id)))
+        .returning(Favorite.id)
+        .cte("unfavorited")
+    )
+    deleted = (
+        delete(Note.__table__)
+        .where(Note.id.in_(select(batch.c.id)))
+        .returning(Note.id)
+        .cte("deleted")
+    )
+    return deleted, {"favorites": unfavorited}
+
+
+async def _delete_account_batch(
+    user_id: int, stage: str, batch_size: int
+) -> Optional[int]:
+    """
+    1バッチを削除し、同じステートメントで進捗と占有期限を更新する
+
+    Returns:
+        削除した行数、占有を失った（他のワーカーが引き継いだ）場合は None
+    """
+    deleted, counted = _deleted_rows(stage, user_id, batch_size)
+    count = select(func.count()).select_from(deleted).scalar_subquery()
+    table = AccountDeletion.__table__
+    progress = table.c[f"{stage}_deleted"]
+    values = {
+        progress: progress + count,
+        table.c.lease_until: _lease_until(),
+        table.c.updated_date: func.now(),
+    }
+    for other_stage, cte in counted.items():
+        column = table.c[f"{other_stage}_deleted"]
+        values[column] = (
+            column + select(func.count()).select_from(cte).scalar_subquery()
+        )
+    query = (
+        update(table)
+        .where(table.c.user_id == user_id, table.c.lease_owner == _WORKER_ID)
+        .values(values)
+        .returning(count.label("deleted"))
+    )
+    deleted = await database.fetch_val(query=query)
+    # 他のユーザーのお気に入り一覧も、ノートの所有者の世代で無効になる
+    read_cache.bump(user_id)
+    return deleted
+
+
+async def _set_account_deletion_stage(user_id: int, stage: str) -> bool:
+    """次の段階に進める（占有を失った場合は False）"""
+    table = AccountDeletion.__table__
+    query = (
+        update(table)
+        .where(table.c.user_id == user_id, table.c.lease_owner == _WORKER_ID)
+        .values(stage=stage, lease_until=_lease_until(), updated_date=func.now())
+        .returning(table.c.user_id)
+    )
+    return await database.fetch_val(query=query) is not None
+
+
+async def _delete_account_user(user_id: int) -> bool:
+    """
+    データが残っていなければユーザーを削除し、ジョブを完了にする
+
+    リフレッシュトークンなどの小さな表は外部キーの CASCADE で削除される
+
+    Returns:
+        完了した場合は True、削除中に作成されたデータが残っている場合は False
+    """
+    remaining = or_(
+        exists().where(Note.user_id == user_id),
+        exists().where(Favorite.user_id == user_id),
+        exists().where(AIGeneration.user_id == user_id),
+    )
+    removed = (
+        delete(User.__table__)
+        .where(User.id == user_id, _owns_job(user_id), ~remaining)
+        .returning(User.id)
+        .cte("removed")
+    )
+    table = AccountDeletion.__table__
+    query = (
+        update(table)
+        .where(
+            table.c.user_id == user_id,
+            table.c.lease_owner == _WORKER_ID,
+            or_(
+                exists(select(removed.c.id)),
+                # 削除済み（完了の記録前に停止した場合など）
+                ~exists().where(User.id == user_id),
+            ),
+        )
+        .values(
+            stage=ACCOUNT_DELETION_COMPLETED,
+            lease_owner=None,
+            lease_until=None,
+            last_error=None,
+            updated_date=func.now(),
+            completed_date=func.now(),
+        )
+        .returning(table.c.user_id)
+    )
+    return await database.fetch_val(query=query) is not None
+
+
+async def _run_account_deletion(user_id: int, stage: str) -> bool:
+    """
+    占有したジョブを stage から最後まで進める
+
+    Returns:
+        完了した場合は True、占有を失った場合は False
+    """
+    batch_size = settings.ACCOUNT_DELETION_BATCH_SIZE
+    index = ACCOUNT_DELETION_STAGES.index(stage)
+    while True:
+        stage = ACCOUNT_DELETION_STAGES[index]
+        if stage == "user":
+            if await _delete_account_user(user_id):
+                return True
+            # 削除の受付前に始まったリクエストが作成したデータを最初から削除し直す
+            index = 0
+        else:
+            deleted = await _delete_account_batch(user_id, stage, batch_size)
+            if deleted is None:
+                return False
+            if deleted == batch_size:
+                # DBへの負荷（ロック・WAL）を抑えるため、バッチの間隔を空ける
+                await asyncio.sleep(settings.ACCOUNT_DELETION_BATCH_DELAY_MS / 1000)
+                continue
+            index += 1
+        if not await _set_account_deletion_stage(
+            user_id, ACCOUNT_DELETION_STAGES[index]
+        ):
+            return False
+
+
+async def _record_account_deletion_error(user_id: int, error: Exception) -> None:
+    """失敗を記録し、占有期限の経過後に（いずれかのワーカーで）再開させる"""
+    table = AccountDeletion.__table__
+    query = (
+        update(table)
+        .where(table.c.user_id == user_id, table.c.lease_owner == _WORKER_ID)
+        .values(lease_owner=None, last_error=str(error)[:1000], updated_date=func.now())
+    )
+    await database.execute(query=query)
+
+
+async def process_account_deletions() -> int:
+    """
+    削除待ちのアカウントを1件ずつ占有して削除する
+
+    ワーカーが停止した場合は、占有期限（ACCOUNT_DELETION_LEASE_SECONDS）の経過後に
+    いずれかのワーカーが記録された段階から再開する（削除は何度実行してもよい）
+
+    Returns:
+        完了した件数
+    """
+    completed = 0
+    while (job := await _claim_account_deletion()) is not None:
+        user_id, stage = job["user_id"], job["stage"]
+        logger.info(f"Deleting account {user_id} from stage {stage}")
+        try:
+            done = await _run_account_deletion(user_id, stage)
+        except Exception as e:
+            logger.error(f"Account deletion {user_id} failed: {str(e)}")
+            await _record_account_deletion_error(user_id, e)
+            break
+        if done:
+            completed += 1
+            progress = await get_account_deletion(user_id)
+            logger.info(
+                f"Deleted account {user_id}: "
+                f"{progress['notes_deleted']} notes, "
+                f"{progress['revisions_deleted']} revisions, "
+                f"{progress['favorites_deleted']} favorites, "
+                f"{progress['generations_deleted']} generations"
+            )
+    return completed
+
+
+async def wait_for_account_deletions(timeout: float) -> None:
+    """このワーカーで削除を受け付けるか、timeout 秒が経過するまで待つ"""
+    global _deletion_wakeup
+    _deletion_wakeup = asyncio.Event()
+    try:
+        await asyncio.wait_for(_deletion_wakeup.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        _deletion_wakeup = None
 
 
 async def authenticate_user(username: str, password: str):
-    """ユーザー認証"""
+    """
+    ユーザー認証
+
+    保存されているハッシュが現在の方式・コストより弱い場合は、検証に成功した
+    パスワードでハッシュを作り直して保存する
+    """
     user = await get_by_username(username)
-    if not user:
+    # 無効化（削除中を含む）されたユーザーはログインできない
+    if not user or not user["is_active"]:
         return None
-    if not verify_password(password, user["password_hash"]):
+    # ハッシュの検証はCPUを使うため、イベントループを止めないようスレッドで実行
+    verified, new_hash = await asyncio.to_thread(
+        password_hashing.verify_and_update, password, user["password_hash"]
+    )
+    if not verified:
         return None
+    if new_hash:
+        # 同時にパスワードが変更されていた場合は上書きしない
+        query = (
+            update(User.__table__)
+            .where(User.id == user["id"], User.password_hash == user["password_hash"])
+            .values(password_hash=new_hash)
+        )
+        await database.execute(query=query)
     return user
@@ -0,0 +1,19 @@
+# Gunicorn worker class for production
+from uvicorn_worker import UvicornWorker
+
+from app.core.config import settings
+
+
+class MemoriaUvicornWorker(UvicornWorker):
+    """
+    本番用のUvicornワーカー
+
+    uvloop / httptools を明示的に指定する（未インストールの場合は起動時にエラー）
+    """
+
+    CONFIG_KWARGS = {
+        "loop": "uvloop",
+        "http": "httptools",
+        "lifespan": "on",
+        "timeout_graceful_shutdown": settings.SHUTDOWN_GRACE_SECONDS,
+    }
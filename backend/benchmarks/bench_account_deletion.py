@@ -0,0 +1,184 @@
+"""
+ベンチマーク - アカウント削除: 1トランザクションでの一括削除 / バックグラウンドのバッチ削除
+
+ノート --notes 件（1件あたりリビジョン --revisions 件）と、他のユーザーからのお気に入りを
+持つユーザーを作成し、以下の方法で削除して比較します:
+- single:  1トランザクションでお気に入り・リビジョン・ノート・ユーザーを削除する
+- batched: delete_user で受け付け、process_account_deletions でバッチごとに削除する
+
+比較する値:
+- total:    削除全体の所要時間（batched はバッチ間の待ち時間 --delay-ms を含む）
+- longest:  最も長いトランザクション（削除した行のロックを保持し続ける時間）
+- wal:      生成したWALの量（レプリケーションの遅延やチェックポイントの負荷の目安）
+
+AI生成履歴（ai_blobs を参照する）は作成しません。作成したデータは終了時に削除します。
+
+DATABASE_URL / SECRET_KEY が設定された環境で実行してください。
+
+使い方（backend ディレクトリで実行）:
+    python -m benchmarks.bench_account_deletion --notes 5000 --revisions 10
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import delete, or_, select
+
+from app.core.config import settings
+from app.database import database
+from app.main import app  # noqa: F401  テーブル作成
+from app.models.account_deletion import AccountDeletion
+from app.models.favorite import Favorite
+from app.models.note import Note
+from app.models.note_revision import NoteRevision
+from app.models.user import User
+from app.services import user_service
+
+
+async def create_account(prefix: str, notes: int, revisions: int) -> int:
+    """ノート・リビジョンと、他のユーザーからのお気に入りを持つユーザーを作成"""
+    user_id = await database.fetch_val(
+        query="INSERT INTO users (username, password_hash, is_active, created_date)"
+        " VALUES (:username, repeat('x', 60), true, now()) RETURNING id",
+        values={"username": f"{prefix}{uuid.uuid4().hex[:8]}"},
+    )
+    await database.execute(
+        query="INSERT INTO notes (title, content, user_id, created_date, updated_date)"
+        " SELECT 'note ' || i, repeat('content ', 50), CAST(:user_id AS integer),"
+        " now(), now() FROM generate_series(1, CAST(:count AS integer)) AS i",
+        values={"user_id": user_id, "count": notes},
+    )
+    await database.execute(
+        query="INSERT INTO note_revisions"
+        " (note_id, user_id, revision, title, content, created_date)"
+        " SELECT n.id, n.user_id, r, n.title, n.content, now()"
+        " FROM notes n, generate_series(1, CAST(:count AS integer)) AS r"
+        " WHERE n.user_id = CAST(:user_id AS integer)",
+        values={"user_id": user_id, "count": revisions},
+    )
+    # 他のユーザーが1割のノートをお気に入りに追加している
+    fan_id = await database.fetch_val(
+        query="INSERT INTO users (username, password_hash, is_active, created_date)"
+        " VALUES (:username, repeat('x', 60), true, now()) RETURNING id",
+        values={"username": f"{prefix}{uuid.uuid4().hex[:8]}"},
+    )
+    await database.execute(
+        query="INSERT INTO favorites (user_id, note_id, created_date)"
+        " SELECT CAST(:fan_id AS integer), id, now() FROM notes"
+        " WHERE user_id = CAST(:user_id AS integer) AND id % 10 = 0",
+        values={"fan_id": fan_id, "user_id": user_id},
+    )
+    await database.execute(query="ANALYZE notes, note_revisions, favorites")
+    return user_id
+
+
+async def wal_position() -> int:
+    """現在のWALの位置（バイト）"""
+    return await database.fetch_val(
+        query="SELECT CAST(pg_wal_lsn_diff(pg_current_wal_lsn(), '0/0') AS bigint)"
+    )
+
+
+async def delete_single(user_id: int) -> list:
+    """1トランザクションで削除する（旧 DELETE /api/users/{id}/ 相当）"""
+    start = time.perf_counter()
+    async with database.transaction():
+        notes = select(Note.id).where(Note.user_id == user_id)
+        await database.execute(
+            query=delete(Favorite.__table__).where(
+                or_(Favorite.user_id == user_id, Favorite.note_id.in_(notes))
+            )
+        )
+        await database.execute(
+            query=delete(NoteRevision.__table__).where(NoteRevision.user_id == user_id)
+        )
+        await database.execute(
+            query=delete(Note.__table__).where(Note.user_id == user_id)
+        )
+        await database.execute(query=delete(User.__table__).where(User.id == user_id))
+    return [(time.perf_counter() - start) * 1000]
+
+
+async def delete_batched(user_id: int) -> list:
+    """受け付けてバックグラウンドと同じ処理でバッチごとに削除する"""
+    batches = []
+    delete_batch = user_service._delete_account_batch
+
+    async def timed_delete_batch(*args):
+        start = time.perf_counter()
+        try:
+            return await delete_batch(*args)
+        finally:
+            batches.append((time.perf_counter() - start) * 1000)
+
+    user_service._delete_account_batch = timed_delete_batch
+    try:
+        await user_service.delete_user(user_id)
+        assert await user_service.process_account_deletions() == 1
+    finally:
+        user_service._delete_account_batch = delete_batch
+    return batches
+
+
+async def run(notes: int, revisions: int, batch_size: int, delay_ms: int) -> None:
+    settings.ACCOUNT_DELETION_BATCH_SIZE = batch_size
+    settings.ACCOUNT_DELETION_BATCH_DELAY_MS = delay_ms
+    await database.connect()
+    prefix = f"b{uuid.uuid4().hex[:8]}_"
+    user_ids = []
+    try:
+        print(
+            f"notes={notes} revisions/note={revisions} "
+            f"batch_size={batch_size} delay={delay_ms} ms"
+        )
+        for name, remove in (("single", delete_single), ("batched", delete_batched)):
+            user_id = await create_account(prefix, notes, revisions)
+            user_ids.append(user_id)
+            since = await wal_position()
+            start = time.perf_counter()
+            transactions = await remove(user_id)
+            total = (time.perf_counter() - start) * 1000
+            wal = await wal_position() - since
+            print(
+                f"{name:<8} total={total:>9.1f} ms  "
+                f"transactions={len(transactions):<5} "
+                f"longest={max(transactions):>8.1f} ms  "
+                f"wal={wal / 1024 / 1024:>7.1f} MiB"
+            )
+    finally:
+        await database.execute(
+            query=delete(AccountDeletion.__table__).where(
+                AccountDeletion.user_id.in_(user_ids)
+            )
+        )
+        users = select(User.id).where(User.username.startswith(prefix))
+        await database.execute(
+            query=delete(Favorite.__table__).where(Favorite.user_id.in_(users))
+        )
+        await database.execute(
+            query=delete(Note.__table__).where(Note.user_id.in_(users))
+        )
+        await database.execute(
+            query=delete(User.__table__).where(User.username.startswith(prefix))
+        )
+        await database.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--notes", type=int, default=5000)
+    parser.add_argument("--revisions", type=int, default=10)
+    parser.add_argument(
+        "--batch-size", type=int, default=settings.ACCOUNT_DELETION_BATCH_SIZE
+    )
+    parser.add_argument(
+        "--delay-ms", type=int, default=settings.ACCOUNT_DELETION_BATCH_DELAY_MS
+    )
+    args = parser.parse_args()
+    asyncio.run(run(args.notes, args.revisions, args.batch_size, args.delay_ms))
+
+
+if __name__ == "__main__":
+    main()
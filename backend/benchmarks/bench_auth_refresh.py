@@ -0,0 +1,96 @@
+"""
+ベンチマーク - ログイン（bcrypt）とリフレッシュトークンによるトークン更新
+
+サービス層で以下のサーバー時間（経過時間の中央値とCPU時間）を計測します:
+- login:   authenticate_user（bcrypt の検証）+ アクセストークン + リフレッシュトークン発行
+- refresh: rotate_refresh_token（1ステートメント）+ アクセストークン
+
+そのうえで、--clients 人が1日 --hours 時間利用するときの1日あたりのサーバーCPU時間を
+- アクセストークンが切れるたびに再ログインする場合
+- 1日1回ログインし、以降はリフレッシュトークンで更新する場合
+で比較します（トークンの寿命は ACCESS_TOKEN_EXPIRE_MINUTES）。
+
+DATABASE_URL / SECRET_KEY が設定された環境で実行してください。
+
+使い方（backend ディレクトリで実行）:
+    python -m benchmarks.bench_auth_refresh --requests 50 --clients 5000 --hours 8
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.database import database
+from app.main import app  # noqa: F401  テーブル作成
+from app.schemas.user_schema import UserCreate
+from app.services import token_service, user_service
+
+
+async def measure(requests: int) -> dict:
+    """login / refresh それぞれの (経過時間の中央値, CPU時間の平均) をミリ秒で返す"""
+    await database.connect()
+    try:
+        username = f"bench_{uuid.uuid4().hex[:12]}"
+        password = "benchmark-password"
+        await user_service.create_user(UserCreate(username=username, password=password))
+
+        async def login():
+            user = await user_service.authenticate_user(username, password)
+            create_access_token(data={"sub": user["username"]})
+            return await token_service.issue_refresh_token(user["id"])
+
+        refresh_token = await login()
+
+        async def refresh():
+            nonlocal refresh_token
+            session = await token_service.rotate_refresh_token(refresh_token)
+            create_access_token(data={"sub": session["username"]})
+            refresh_token = session["refresh_token"]
+
+        results = {}
+        for name, operation in (("login", login), ("refresh", refresh)):
+            latencies = []
+            cpu_start = time.process_time()
+            for _ in range(requests):
+                start = time.perf_counter()
+                await operation()
+                latencies.append((time.perf_counter() - start) * 1000)
+            cpu = (time.process_time() - cpu_start) / requests * 1000
+            results[name] = (statistics.median(latencies), cpu)
+        return results
+    finally:
+        await database.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--hours", type=float, default=8)
+    args = parser.parse_args()
+
+    results = asyncio.run(measure(args.requests))
+    for name, (p50, cpu) in results.items():
+        print(f"{name:<8} p50={p50:>8.2f} ms cpu={cpu:>8.2f} ms")
+
+    # 利用時間中にアクセストークンを取得し直す回数（最初の1回を含む）
+    renewals = max(1, round(args.hours * 60 / settings.ACCESS_TOKEN_EXPIRE_MINUTES))
+    login_cpu = results["login"][1]
+    refresh_cpu = results["refresh"][1]
+    relogin = args.clients * renewals * login_cpu / 1000
+    with_refresh = args.clients * (login_cpu + (renewals - 1) * refresh_cpu) / 1000
+    print(
+        f"clients={args.clients} hours={args.hours} "
+        f"token lifetime={settings.ACCESS_TOKEN_EXPIRE_MINUTES} min "
+        f"(renewals/client/day={renewals})"
+    )
+    print(f"re-login      cpu/day={relogin:>8.1f} s")
+    print(f"refresh token cpu/day={with_refresh:>8.1f} s")
+
+
+if __name__ == "__main__":
+    main()
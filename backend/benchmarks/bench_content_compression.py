@@ -0,0 +1,128 @@
+"""
+ベンチマーク - 本文カラムのTOAST圧縮方式
+
+ノート本文に近い合成テキスト（Markdown風の文章、一部は巨大なインポート）を
+圧縮方式ごとの一時テーブルに書き込み、以下を比較します:
+- 保存サイズ（pg_total_relation_size）
+- 書き込み時間
+- 読み出し時間（本文全体 / left(content, 200) のプレビュー）
+
+比較する方式:
+- external: 圧縮なし（STORAGE EXTERNAL）
+- pglz: Postgres の既定
+- lz4: Postgres 14+ かつ lz4 付きでビルドされたサーバーのみ（非対応なら省略）
+
+CONTENT_COMPRESSION=lz4 を設定すると、アプリの起動時（またはマイグレーション）に
+notes.content などへ lz4 が設定されます。
+
+DATABASE_URL が設定された環境で実行してください。
+
+使い方（backend ディレクトリで実行）:
+    python -m benchmarks.bench_content_compression --notes 500 --content-kb 64
+"""
+
+import argparse
+import random
+import time
+
+from sqlalchemy import text
+
+from app.database import engine
+
+WORDS = (
+    "note idea meeting project design review memo todo database query index "
+    "response cache server client release schedule budget report summary "
+    "ノート アイデア 会議 設計 レビュー 予定 課題 改善 検討 共有"
+).split()
+
+
+def build_body(rng: random.Random, size: int) -> str:
+    """Markdown風の合成テキスト（見出し・箇条書き・文章）"""
+    parts = []
+    length = 0
+    while length < size:
+        kind = rng.random()
+        if kind < 0.1:
+            line = "## " + " ".join(rng.choices(WORDS, k=4))
+        elif kind < 0.4:
+            line = "- " + " ".join(rng.choices(WORDS, k=rng.randint(3, 10)))
+        else:
+            line = " ".join(rng.choices(WORDS, k=rng.randint(10, 30))) + "."
+        parts.append(line)
+        length += len(line) + 1
+    return "\n".join(parts)
+
+
+def bench(connection, method: str, bodies) -> dict:
+    table = f"bench_compression_{method}"
+    connection.execute(text(f"DROP TABLE IF EXISTS {table}"))
+    if method == "external":
+        connection.execute(text(f"CREATE TEMP TABLE {table} (id serial, content text)"))
+        connection.execute(
+            text(f"ALTER TABLE {table} ALTER COLUMN content SET STORAGE EXTERNAL")
+        )
+    else:
+        connection.execute(
+            text(
+                f"CREATE TEMP TABLE {table} (id serial, content text COMPRESSION {method})"
+            )
+        )
+
+    start = time.perf_counter()
+    for body in bodies:
+        connection.execute(
+            text(f"INSERT INTO {table} (content) VALUES (:content)"), {"content": body}
+        )
+    write_ms = (time.perf_counter() - start) * 1000
+
+    size = connection.execute(
+        text(f"SELECT pg_total_relation_size('{table}')")
+    ).scalar()
+
+    start = time.perf_counter()
+    connection.execute(text(f"SELECT content FROM {table}")).all()
+    read_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    connection.execute(text(f"SELECT left(content, 200) FROM {table}")).all()
+    preview_ms = (time.perf_counter() - start) * 1000
+
+    return {"size": size, "write_ms": write_ms, "read_ms": read_ms, "preview_ms": preview_ms}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--notes", type=int, default=500)
+    parser.add_argument("--content-kb", type=int, default=64)
+    parser.add_argument("--large", type=int, default=5, help="2 MiB のノートの件数")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    bodies = [build_body(rng, args.content_kb * 1024) for _ in range(args.notes)]
+    bodies += [build_body(rng, 2 * 1024 * 1024) for _ in range(args.large)]
+    raw = sum(len(body.encode()) for body in bodies)
+
+    with engine.connect() as connection:
+        supported = connection.execute(
+            text(
+                "SELECT enumvals FROM pg_settings WHERE name = 'default_toast_compression'"
+            )
+        ).scalar()
+        methods = ["external"] + [m for m in ("pglz", "lz4") if m in supported]
+        if "lz4" not in supported:
+            print("lz4: not supported by this server (skipped)")
+
+        print(f"notes={len(bodies)} raw={raw / 1024 / 1024:.1f} MiB")
+        print(f"{'method':<9} {'size':>10} {'ratio':>7} {'write':>10} {'read':>10} {'preview':>10}")
+        for method in methods:
+            result = bench(connection, method, bodies)
+            print(
+                f"{method:<9} {result['size'] / 1024 / 1024:>6.1f} MiB "
+                f"{result['size'] / raw:>6.1%} {result['write_ms']:>7.0f} ms "
+                f"{result['read_ms']:>7.0f} ms {result['preview_ms']:>7.1f} ms"
+            )
+        connection.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+ベンチマーク - 変更イベントのストリーム（/api/events）の配信
+
+1つのワーカー（EventHub）に --connections 本の待機中の接続（--users ユーザーに分散）を
+作り、以下を計測します:
+- メモリ: 待機中の接続1本あたりの使用量（イベントのバッファを含み、ソケット・ASGI の
+  バッファを除く、tracemalloc）
+- 配信時間: 他のワーカー（別の InvalidationBus）で publish してから、
+  対象ユーザーの接続の next_batch が返るまで（--messages 回の中央値と p99、
+  coalesce の待ち時間を含む）。待機中の接続の数に比例しないことを確認する
+- 読み出さない接続: バッファの上限（--buffer）を超えた接続のメモリが増えないこと
+
+DATABASE_URL が設定された環境で実行してください。
+
+使い方（backend ディレクトリで実行）:
+    python -m benchmarks.bench_event_stream --connections 10000 --users 2000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+import uuid
+
+from app.core import events
+from app.core.config import settings
+from app.core.events import EventHub, change_event
+from app.core.invalidation import InvalidationBus
+
+DSN = settings.DATABASE_URL.replace("postgresql+psycopg", "postgresql")
+
+
+async def run(
+    connections: int, users: int, messages: int, buffer: int, coalesce_ms: int
+) -> None:
+    channel = f"bench_events_{uuid.uuid4().hex[:8]}"
+    sender_bus, receiver_bus = (
+        InvalidationBus(channel, coalesce_seconds=coalesce_ms / 1000) for _ in range(2)
+    )
+    sender, receiver = EventHub(buffer), EventHub(buffer)
+    receiver.open()
+    receiver_bus.subscribe("events", receiver._on_remote_events)
+    events.invalidation_bus = sender_bus
+    await sender_bus.start(DSN)
+    await receiver_bus.start(DSN)
+    try:
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        subscriptions = [receiver.subscribe(i % users) for i in range(connections)]
+        # 待機中の接続（ハートビートまで next_batch で待つ）
+        waiters = [
+            asyncio.create_task(subscription.next_batch(3600))
+            for subscription in subscriptions[1:]
+        ]
+        await asyncio.sleep(0)
+        idle = tracemalloc.get_traced_memory()[0] - before
+        print(
+            f"{connections} idle connections ({users} users): "
+            f"{idle / 1024 / 1024:.1f} MiB, {idle / connections:.0f} bytes each"
+        )
+
+        target = subscriptions[0]
+        latencies = []
+        for i in range(messages):
+            start = time.perf_counter()
+            sender.publish(target.user_id, [change_event("note", i, "updated")])
+            batch = await target.next_batch(5)
+            assert batch, "event was not delivered"
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        print(
+            f"cross-worker delivery (coalesce={coalesce_ms} ms) "
+            f"p50={statistics.median(latencies):.2f} ms "
+            f"p99={latencies[int(len(latencies) * 0.99) - 1]:.2f} ms"
+        )
+
+        # 読み出さない接続には、上限を超えたイベントをためない
+        stalled = receiver.subscribe(users + 1)
+        for i in range(buffer * 100):
+            receiver._deliver(stalled.user_id, [change_event("note", i, "updated")])
+        print(
+            f"stalled connection after {buffer * 100} events: "
+            f"{len(stalled.events)} buffered (limit {buffer}), "
+            f"resync pending={events.RESYNC in stalled.events}"
+        )
+        tracemalloc.stop()
+        for waiter in waiters:
+            waiter.cancel()
+    finally:
+        await sender_bus.stop()
+        await receiver_bus.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--connections", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument(
+        "--buffer", type=int, default=settings.EVENT_STREAM_BUFFER_SIZE
+    )
+    parser.add_argument(
+        "--coalesce-ms", type=int, default=settings.INVALIDATION_COALESCE_MS
+    )
+    args = parser.parse_args()
+    asyncio.run(
+        run(args.connections, args.users, args.messages, args.buffer, args.coalesce_ms)
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+ベンチマーク - AI生成履歴の月別パーティション
+
+過去 --months か月分の生成履歴を作成し、GET /api/ai/generations と同じクエリを
+EXPLAIN ANALYZE して、実際に読み出したパーティションを表示します。
+
+一覧は作成日時の降順に LIMIT するため、各パーティションの idx_user_created を
+新しい月から順に読む（ordered Append）。ページに必要な行が揃った時点で古い月の
+パーティションは実行されない（never executed）ことを確認します。
+
+DATABASE_URL / SECRET_KEY が設定された環境で実行してください。
+
+使い方（backend ディレクトリで実行）:
+    python -m benchmarks.bench_generation_partitions --months 12 --per-month 20000
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from app.database import database, engine
+from app.main import app  # noqa: F401  テーブル作成
+from app.models.ai_generation import add_months, create_partition_ddl
+from app.services import ai_service
+
+
+def seed(months: int, per_month: int, users: int) -> int:
+    """過去 months か月分の生成履歴を作成し、計測対象のユーザーIDを返す"""
+    with engine.begin() as connection:
+        user_ids = connection.execute(
+            text(
+                "INSERT INTO users (username, password_hash, is_active, created_date)"
+                " SELECT :prefix || n, 'x', true, now() FROM generate_series(1, :users) n"
+                " RETURNING id"
+            ),
+            {"prefix": f"bench_{uuid.uuid4().hex[:8]}_", "users": users},
+        ).scalars().all()
+        current = connection.execute(
+            text("SELECT date_trunc('month', now())::date")
+        ).scalar()
+        for offset in range(months):
+            connection.execute(text(create_partition_ddl(add_months(current, -offset))))
+
+        for hash_value, content in (("p" * 64, "Prompt"), ("c" * 64, "Generated " * 500)):
+            connection.execute(
+                text(
+                    "INSERT INTO ai_blobs (hash, content, refcount, created_date)"
+                    " VALUES (:hash, :content, 0, now()) ON CONFLICT DO NOTHING"
+                ),
+                {"hash": hash_value, "content": content},
+            )
+        # 各月に均等に、ユーザーをまたいで行を作成する
+        # （同じBLOBを参照する大量の行を作るため、参照数のトリガーを止めてまとめて加算）
+        connection.execute(text("SET LOCAL session_replication_role = replica"))
+        connection.execute(
+            text(
+                "INSERT INTO ai_generations"
+                " (user_id, note_ids, prompt_hash, ai_provider, content_hash, created_date)"
+                " SELECT (:user_ids)[1 + n % :users], '{}', :prompt, 'openai', :content,"
+                "   date_trunc('month', now())"
+                "   - make_interval(months => (n % :months))"
+                "   + make_interval(secs => n % 86400)"
+                " FROM generate_series(0, :total - 1) n"
+            ),
+            {
+                "user_ids": user_ids,
+                "users": users,
+                "months": months,
+                "total": months * per_month,
+                "prompt": "p" * 64,
+                "content": "c" * 64,
+            },
+        )
+        connection.execute(
+            text(
+                "UPDATE ai_blobs SET refcount = refcount + :total"
+                " WHERE hash IN (:prompt, :content)"
+            ),
+            {"total": months * per_month, "prompt": "p" * 64, "content": "c" * 64},
+        )
+        connection.execute(text("ANALYZE ai_generations"))
+    return user_ids[0]
+
+
+def scanned_partitions(plan: dict) -> dict:
+    """プランのノードからパーティションごとの実行回数を集計"""
+    loops = {}
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        relation = node.get("Relation Name", "")
+        if relation.startswith("ai_generations_y"):
+            loops[relation] = loops.get(relation, 0) + node.get("Actual Loops", 0)
+        stack.extend(node.get("Plans", []))
+    return loops
+
+
+async def measure(user_id: int, requests: int) -> None:
+    await database.connect()
+    try:
+        for page in (1, 50):
+            latencies = []
+            for _ in range(requests):
+                start = time.perf_counter()
+                await ai_service.get_generations(user_id, page=page, per_page=20)
+                latencies.append((time.perf_counter() - start) * 1000)
+            print(f"page={page:<3} p50={statistics.median(latencies):>7.1f} ms")
+    finally:
+        await database.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--per-month", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    user_id = seed(args.months, args.per_month, args.users)
+    print(
+        f"months={args.months} rows={args.months * args.per_month} "
+        f"users={args.users} (rows/user/month={args.per_month // args.users})"
+    )
+
+    for page in (1, 50):
+        query = (
+            ai_service._generation_query(summary=True)
+            .where(ai_service.AIGeneration.user_id == user_id)
+            .order_by(ai_service.AIGeneration.created_date.desc())
+            .limit(20)
+            .offset((page - 1) * 20)
+        )
+        sql = str(
+            query.compile(
+                dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+            )
+        )
+        with engine.connect() as connection:
+            plan = connection.execute(
+                text(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}")
+            ).scalar()
+        plan = plan[0] if isinstance(plan, list) else json.loads(plan)[0]
+        loops = scanned_partitions(plan["Plan"])
+        executed = sorted(name for name, count in loops.items() if count)
+        print(
+            f"page={page:<3} partitions executed {len(executed)}/{len(loops)}: "
+            f"{', '.join(executed)}"
+        )
+
+    asyncio.run(measure(user_id, args.requests))
+
+
+if __name__ == "__main__":
+    main()
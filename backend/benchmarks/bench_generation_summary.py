@@ -0,0 +1,91 @@
+"""
+ベンチマーク - AI生成履歴: 全文 と view=summary
+
+大きな生成結果を持つ生成履歴を作成し、GET /api/ai/generations の
+- view=full（generated_content の全文）
+- view=summary（preview と content_length のみ）
+のレスポンスサイズとレイテンシ（中央値）を比較します。
+
+AIプロバイダーを呼ばずに計測するため、生成履歴はサービス層から直接作成します。
+
+DATABASE_URL / SECRET_KEY が設定された環境で実行してください。
+
+使い方（backend ディレクトリで実行）:
+    python -m benchmarks.bench_generation_summary --generations 100 --content-kb 8
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import string
+import subprocess
+import sys
+import time
+
+import httpx
+
+from app.database import database
+from app.services import ai_service
+from benchmarks.bench_note_patch import BASE_URL, PORT, login, wait_until_ready
+
+
+async def seed_generations(user_id: int, count: int, content_kb: int) -> None:
+    """生成履歴を直接作成"""
+    rng = random.Random(0)
+    await database.connect()
+    try:
+        for i in range(count):
+            content = "".join(
+                rng.choices(string.ascii_letters + " \n", k=content_kb * 1024)
+            )
+            await ai_service.insert_generation(
+                user_id, [], f"Prompt {i}", "openai", content
+            )
+    finally:
+        await database.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--generations", type=int, default=100)
+    parser.add_argument("--content-kb", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(PORT)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready()
+        with httpx.Client(base_url=BASE_URL, timeout=120) as client:
+            headers = login(client)
+            user_id = client.get("/api/auth/me", headers=headers).json()["id"]
+            asyncio.run(seed_generations(user_id, args.generations, args.content_kb))
+
+            print(f"generations={args.generations} content={args.content_kb} KiB")
+            for view in ("full", "summary"):
+                latencies = []
+                size = 0
+                for _ in range(args.requests):
+                    start = time.perf_counter()
+                    response = client.get(
+                        "/api/ai/generations",
+                        params={"view": view, "per_page": 100},
+                        headers=headers,
+                    )
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    size = len(response.content)
+                print(
+                    f"{view:<8} body={size / 1024:>10.1f} KiB "
+                    f"p50={statistics.median(latencies):>8.1f} ms"
+                )
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
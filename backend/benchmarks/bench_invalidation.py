@@ -0,0 +1,92 @@
+"""
+ベンチマーク - ワーカー間のキャッシュ無効化（LISTEN/NOTIFY）
+
+同じチャンネルを購読する2つの InvalidationBus（2つのワーカーに相当）で、以下を計測します:
+- 伝達時間: 一方で publish してから他方のハンドラーが呼ばれるまで（--messages 回の
+  中央値と p99、coalesce の待ち時間を含む）
+- バースト: --burst 件の publish（一括インポートなどの書き込み）に対して送られた
+  NOTIFY の数
+
+DATABASE_URL が設定された環境で実行してください。
+
+使い方（backend ディレクトリで実行）:
+    python -m benchmarks.bench_invalidation --messages 200 --burst 10000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from app.core.config import settings
+from app.core.invalidation import InvalidationBus
+
+DSN = settings.DATABASE_URL.replace("postgresql+psycopg", "postgresql")
+
+
+async def run(messages: int, burst: int, coalesce_ms: int) -> None:
+    channel = f"bench_invalidation_{uuid.uuid4().hex[:8]}"
+    sender, receiver = (
+        InvalidationBus(channel, coalesce_seconds=coalesce_ms / 1000) for _ in range(2)
+    )
+    arrived = asyncio.Event()
+    received = []
+
+    def handler(keys):
+        received.append(keys)
+        arrived.set()
+
+    receiver.subscribe("read_cache", handler)
+    await sender.start(DSN)
+    await receiver.start(DSN)
+    try:
+        received.clear()
+        latencies = []
+        for i in range(messages):
+            arrived.clear()
+            start = time.perf_counter()
+            sender.publish("read_cache", [i])
+            await arrived.wait()
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        print(
+            f"propagation (coalesce={coalesce_ms} ms) "
+            f"p50={statistics.median(latencies):.2f} ms "
+            f"p99={latencies[int(len(latencies) * 0.99) - 1]:.2f} ms"
+        )
+
+        # 最後のメッセージの送信が終わるのを待つ
+        await asyncio.sleep(0.1)
+        sent_before = sender.stats.notifications_sent
+        received.clear()
+        for i in range(burst):
+            # 同じユーザーへの書き込みが多い（1000ユーザーに分散）
+            sender.publish("read_cache", [i % 1000])
+        await asyncio.sleep(coalesce_ms / 1000 + 0.5)
+        keys = sum(len(keys) if keys else 0 for keys in received)
+        print(
+            f"burst of {burst} publishes: "
+            f"{sender.stats.notifications_sent - sent_before} NOTIFY, "
+            f"{len(received)} messages received "
+            f"({keys} keys, "
+            f"{sum(keys is None for keys in received)} full invalidations)"
+        )
+    finally:
+        await sender.stop()
+        await receiver.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--burst", type=int, default=10000)
+    parser.add_argument(
+        "--coalesce-ms", type=int, default=settings.INVALIDATION_COALESCE_MS
+    )
+    args = parser.parse_args()
+    asyncio.run(run(args.messages, args.burst, args.coalesce_ms))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+ベンチマーク - アクセストークンの失効確認: リクエストごとのDB確認 / ブルームフィルタ
+
+失効済みのトークンを --revoked 件登録した状態で、失効していないトークン --checks 件を
+以下の方法で確認し、1件あたりの時間（中央値）とDBへの問い合わせ回数を比較します:
+- db:    リクエストごとに revoked_tokens を検索する
+- bloom: is_access_token_revoked（ブルームフィルタが陽性の場合のみDBで確認）
+
+あわせて、ブルームフィルタの作り直し（起動時）と差分の取り込みにかかる時間、
+偽陽性率、メモリ使用量を表示します。登録した失効は終了時に削除します。
+
+DATABASE_URL / SECRET_KEY が設定された環境で実行してください。
+
+使い方（backend ディレクトリで実行）:
+    python -m benchmarks.bench_jwt_revocation --revoked 10000 --checks 2000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from datetime import timedelta
+
+from sqlalchemy import delete, exists, func, select
+
+from app.database import database
+from app.main import app  # noqa: F401  テーブル作成
+from app.models.revoked_token import RevokedToken
+from app.services import token_service
+
+
+async def timed(operation) -> float:
+    start = time.perf_counter()
+    await operation()
+    return (time.perf_counter() - start) * 1000
+
+
+async def run(revoked: int, checks: int) -> None:
+    await database.connect()
+    table = RevokedToken.__table__
+    marker = uuid.uuid4().hex[:8]
+    try:
+        # jti は先頭8文字を共通にして、終了時にまとめて削除する
+        # （以前に失効させたものとして、作成日時は1時間前にする）
+        await database.execute(
+            query="INSERT INTO revoked_tokens (jti, expires_at, created_date)"
+            " SELECT CAST(:marker AS text) || substr(md5(random()::text), 1, 24),"
+            " now() + interval '30 minutes', now() - interval '1 hour'"
+            " FROM generate_series(1, CAST(:count AS integer))",
+            values={"marker": marker, "count": revoked},
+        )
+        load_ms = await timed(token_service.load_revoked_tokens)
+        # 他のワーカーで1件失効させた後の差分の取り込み
+        await database.execute(
+            query=RevokedToken.__table__.insert().values(
+                jti=marker + uuid.uuid4().hex[:24],
+                expires_at=func.now() + timedelta(minutes=30),
+                created_date=func.now(),
+            )
+        )
+        refresh_ms = await timed(token_service.refresh_revoked_tokens)
+        bloom = token_service._revoked_filter
+        print(
+            f"load {revoked} revocations: {load_ms:.1f} ms "
+            f"(filter {len(bloom._bits) / 1024:.0f} KiB, k={bloom.hash_count}); "
+            f"incremental refresh: {refresh_ms:.2f} ms"
+        )
+
+        jtis = [uuid.uuid4().hex for _ in range(checks)]
+
+        async def db_check(jti):
+            return await database.fetch_val(
+                query=select(exists().where(table.c.jti == jti))
+            )
+
+        for name, check in (
+            ("db", db_check),
+            ("bloom", token_service.is_access_token_revoked),
+        ):
+            stats_before = token_service.revocation_stats.lookups
+            latencies = []
+            for jti in jtis:
+                start = time.perf_counter()
+                assert not await check(jti)
+                latencies.append((time.perf_counter() - start) * 1000)
+            lookups = (
+                checks
+                if name == "db"
+                else token_service.revocation_stats.lookups - stats_before
+            )
+            print(
+                f"{name:<6} checks={checks:<6} p50={statistics.median(latencies):>7.3f}"
+                f" ms db lookups={lookups} ({lookups / checks:.2%})"
+            )
+    finally:
+        await database.execute(
+            query=delete(table).where(table.c.jti.startswith(marker))
+        )
+        await database.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--revoked", type=int, default=10000)
+    parser.add_argument("--checks", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(run(args.revoked, args.checks))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+ベンチマーク - 大きなノートの更新: PUT（全文）と PATCH（編集範囲のみ）
+
+大きなノート（既定 2 MB）の1文字を書き換える更新を繰り返し、
+以下を比較します:
+- リクエストボディのサイズ（アップロード量）
+- レイテンシ（中央値 / p95）
+
+PATCH でもサーバー側では本文全体を書き換える（Postgres の text は部分更新できない）ため、
+差が出るのは主に転送量・JSONのパース・検証のコストです。
+
+DATABASE_URL / SECRET_KEY が設定された環境で実行してください。
+
+使い方（backend ディレクトリで実行）:
+    python -m benchmarks.bench_note_patch --size-mb 2 --edits 50
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+
+PORT = 8767
+BASE_URL = f"http://127.0.0.1:{PORT}"
+
+
+def wait_until_ready(timeout: float = 30.0) -> None:
+    """サーバーが応答するまで待つ"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{BASE_URL}/").status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def login(client: httpx.Client) -> dict:
+    """ベンチマーク用のユーザーを作成し、認証ヘッダーを返す"""
+    username = f"bench_{uuid.uuid4().hex[:12]}"
+    password = "benchmark-password"
+    client.post("/api/auth/register", json={"username": username, "password": password})
+    token = client.post(
+        "/api/auth/login", data={"username": username, "password": password}
+    ).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def summarize(name: str, sizes, latencies) -> None:
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{name:<6} body={statistics.mean(sizes) / 1024:>9.1f} KiB "
+        f"p50={statistics.median(latencies):>7.1f} ms p95={p95:>7.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=float, default=2.0)
+    parser.add_argument("--edits", type=int, default=50)
+    args = parser.parse_args()
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(PORT)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready()
+        with httpx.Client(base_url=BASE_URL, timeout=60) as client:
+            headers = {**login(client), "Content-Type": "application/json"}
+            line = "0123456789" * 7 + "\n"
+            content = line * int(args.size_mb * 1024 * 1024 / len(line))
+            note = client.post(
+                "/api/notes", json={"title": "Large", "content": content}, headers=headers
+            ).json()
+
+            results = {"PUT": ([], []), "PATCH": ([], [])}
+            revision = note["revision"]
+            for i in range(args.edits * 2):
+                # PUT と PATCH を交互に、それぞれ別の位置の1文字を書き換える
+                position = (i * 7919) % len(content)
+                char = "abcdefghij"[i % 10]
+                content = content[:position] + char + content[position + 1 :]
+
+                if i % 2 == 0:
+                    name = method = "PUT"
+                    payload = {"content": content}
+                else:
+                    name = method = "PATCH"
+                    payload = {
+                        "base_revision": revision,
+                        "edits": [{"start": position, "end": position + 1, "text": char}],
+                    }
+                body = json.dumps(payload).encode()
+                start = time.perf_counter()
+                response = client.request(
+                    method, f"/api/notes/{note['id']}", content=body, headers=headers
+                )
+                elapsed = (time.perf_counter() - start) * 1000
+                response.raise_for_status()
+                revision = response.json()["revision"]
+                results[name][0].append(len(body))
+                results[name][1].append(elapsed)
+
+            final = client.get(f"/api/notes/{note['id']}", headers=headers).json()
+            assert final["content"] == content
+
+        print(f"note size={len(content) / 1024 / 1024:.1f} MiB edits={args.edits}")
+        for name, (sizes, latencies) in results.items():
+            summarize(name, sizes, latencies)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
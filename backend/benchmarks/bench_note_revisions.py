@@ -0,0 +1,100 @@
+"""
+ベンチマーク - ノートのリビジョン保存（スナップショット + 差分）
+
+合成した編集履歴（行の置換・挿入・削除をランダムに繰り返す）について、
+スナップショット間隔ごとに以下を比較します:
+- 保存サイズ（全リビジョンを全文で保存した場合との比）
+- 1リビジョンあたりの差分計算時間（更新時のコスト）
+- 最悪ケースの復元時間（スナップショットから間隔-1個の差分を適用）
+
+note_service と同じ保存方針（_revision_values）で計測するため、DBは不要です。
+
+使い方（backend ディレクトリで実行）:
+    python -m benchmarks.bench_note_revisions --lines 2000 --edits 200
+"""
+
+import argparse
+import random
+import time
+from typing import List
+
+from app.core.config import settings
+from app.core.text_delta import apply_delta, decode_delta
+from app.services.note_service import _revision_values
+
+
+def build_history(lines: int, edits: int, seed: int) -> List[str]:
+    """ランダムな行編集を繰り返した本文の履歴を生成"""
+    rng = random.Random(seed)
+    doc = [f"line {i}: {'x' * rng.randint(20, 80)}\n" for i in range(lines)]
+    history = ["".join(doc)]
+    for n in range(edits):
+        for _ in range(rng.randint(1, 3)):
+            pos = rng.randrange(len(doc))
+            action = rng.random()
+            if action < 0.6:
+                doc[pos] = f"edited {n}: {'y' * rng.randint(20, 80)}\n"
+            elif action < 0.85:
+                doc.insert(pos, f"inserted {n}\n")
+            elif len(doc) > 1:
+                del doc[pos]
+        history.append("".join(doc))
+    return history
+
+
+def bench(history: List[str], interval: int) -> dict:
+    """指定したスナップショット間隔で履歴を保存・復元"""
+    settings.NOTE_REVISION_SNAPSHOT_INTERVAL = interval
+    rows = []
+    start = time.perf_counter()
+    previous = None
+    for revision, content in enumerate(history, start=1):
+        note = {"id": 1, "user_id": 1, "revision": revision, "title": "T", "content": content}
+        rows.append(_revision_values(note, previous))
+        previous = content
+    encode_ms = (time.perf_counter() - start) * 1000 / len(history)
+
+    stored = sum(len(row.get("content") or row.get("delta")) for row in rows)
+
+    # 最悪ケース: 直近のスナップショットから最も遠いリビジョン
+    worst = 0.0
+    for target in range(len(rows)):
+        base = max(i for i in range(target + 1) if "content" in rows[i])
+        if target - base < interval - 1 and target != len(rows) - 1:
+            continue
+        start = time.perf_counter()
+        content = rows[base]["content"]
+        for row in rows[base + 1 : target + 1]:
+            content = apply_delta(content, decode_delta(row["delta"]))
+        worst = max(worst, (time.perf_counter() - start) * 1000)
+        assert content == history[target]
+
+    return {"stored": stored, "encode_ms": encode_ms, "worst_ms": worst}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=2000)
+    parser.add_argument("--edits", type=int, default=200)
+    parser.add_argument("--intervals", type=int, nargs="+", default=[1, 5, 20, 50])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    history = build_history(args.lines, args.edits, args.seed)
+    full = sum(len(content) for content in history)
+    print(
+        f"revisions={len(history)} avg size={full / len(history) / 1024:.0f} KiB "
+        f"full copies={full / 1024 / 1024:.1f} MiB"
+    )
+    print(f"{'interval':>8} {'stored':>10} {'ratio':>7} {'diff/rev':>10} {'worst restore':>14}")
+    for interval in args.intervals:
+        result = bench(history, interval)
+        print(
+            f"{interval:>8} {result['stored'] / 1024:>7.0f} KiB "
+            f"{result['stored'] / full:>6.1%} {result['encode_ms']:>7.2f} ms "
+            f"{result['worst_ms']:>11.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
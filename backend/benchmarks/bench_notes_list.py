@@ -0,0 +1,89 @@
+"""
+ベンチマーク - GET /api/notes のレスポンスシリアライズ
+
+1万件のノートについて、以下の2つの経路のCPU時間とピークメモリを比較します:
+1. response_model 経由（List[NoteResponse] で検証してから JSON 化）
+2. RecordListResponse 経由（既知のカラムを射影して orjson で直接 JSON 化）
+
+使い方（backend ディレクトリで実行）:
+    python -m benchmarks.bench_notes_list --notes 10000 --content-size 2000
+"""
+
+import argparse
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import List
+
+from pydantic import TypeAdapter
+
+from app.core.responses import RecordListResponse
+from app.schemas.note_schema import NoteResponse, NOTE_RESPONSE_FIELDS
+
+
+def build_records(count: int, content_size: int) -> List[dict]:
+    """DBから取得したレコード相当のデータを生成"""
+    base = datetime(2024, 1, 1)
+    content = "あ" * content_size
+    return [
+        {
+            "id": i,
+            "title": f"Note {i}",
+            "content": content,
+            "user_id": 1,
+            "created_date": base + timedelta(seconds=i),
+            "updated_date": base + timedelta(seconds=i, microseconds=123),
+            "revision": 1,
+        }
+        for i in range(count)
+    ]
+
+
+def serialize_validated(records: List[dict]) -> bytes:
+    """FastAPIのresponse_modelと同じ経路（検証 → JSON）"""
+    adapter = TypeAdapter(List[NoteResponse])
+    return adapter.dump_json(adapter.validate_python(records, from_attributes=True))
+
+
+def serialize_fast(records: List[dict]) -> bytes:
+    """レコードを射影してorjsonで直接JSON化"""
+    return RecordListResponse(records, NOTE_RESPONSE_FIELDS).body
+
+
+def measure(name: str, func, records: List[dict], repeat: int) -> None:
+    """CPU時間とピークメモリを計測して表示"""
+    func(records)  # ウォームアップ
+
+    cpu_start = time.process_time()
+    for _ in range(repeat):
+        body = func(records)
+    cpu_ms = (time.process_time() - cpu_start) * 1000 / repeat
+
+    tracemalloc.start()
+    func(records)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"{name:<12} cpu={cpu_ms:8.2f} ms/req  "
+        f"peak={peak / 1024 / 1024:8.2f} MiB  body={len(body) / 1024 / 1024:.2f} MiB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--notes", type=int, default=10000)
+    parser.add_argument("--content-size", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    records = build_records(args.notes, args.content_size)
+    assert serialize_validated(records[:10]) == serialize_fast(records[:10])
+
+    print(f"notes={args.notes} content_size={args.content_size}")
+    measure("validated", serialize_validated, records, args.repeat)
+    measure("orjson", serialize_fast, records, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
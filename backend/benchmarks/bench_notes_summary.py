@@ -0,0 +1,81 @@
+"""
+ベンチマーク - ノート一覧: 全フィールド と view=summary
+
+大きな本文を持つノートを作成し、GET /api/notes の
+- view=full（content を含む全フィールド）
+- view=summary（id, title, preview, updated_date, revision）
+のレスポンスサイズとレイテンシ（中央値）を比較します。
+
+summary は left(content, NOTE_PREVIEW_LENGTH) をDB側で計算するため、
+TOASTされた本文全体の読み出し・展開・転送を避けられます。
+
+DATABASE_URL / SECRET_KEY が設定された環境で実行してください。
+
+使い方（backend ディレクトリで実行）:
+    python -m benchmarks.bench_notes_summary --notes 200 --content-kb 100
+"""
+
+import argparse
+import random
+import statistics
+import string
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.bench_note_patch import BASE_URL, PORT, login, wait_until_ready
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--notes", type=int, default=200)
+    parser.add_argument("--content-kb", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(PORT)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready()
+        with httpx.Client(base_url=BASE_URL, timeout=120) as client:
+            headers = login(client)
+            rng = random.Random(0)
+            # 圧縮が効きにくい本文にして、TOASTの読み出しコストを現実的にする
+            batch = [
+                {
+                    "title": f"Note {i}",
+                    "content": "".join(
+                        rng.choices(string.ascii_letters + " \n", k=args.content_kb * 1024)
+                    ),
+                }
+                for i in range(args.notes)
+            ]
+            client.post("/api/notes/import", json=batch, headers=headers)
+
+            print(f"notes={args.notes} content={args.content_kb} KiB")
+            for view in ("full", "summary"):
+                latencies = []
+                size = 0
+                for _ in range(args.requests):
+                    start = time.perf_counter()
+                    response = client.get(
+                        "/api/notes", params={"view": view}, headers=headers
+                    )
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    size = len(response.content)
+                print(
+                    f"{view:<8} body={size / 1024:>10.1f} KiB "
+                    f"p50={statistics.median(latencies):>8.1f} ms"
+                )
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+ベンチマーク - パスワードハッシュのコスト計測（PASSWORD_HASH_TARGET_MS）
+
+このマシンで方式ごとに計測したパラメータと、そのパラメータでの
+ハッシュ化・検証の実測時間（中央値）を表示し、目標時間との差を確認します。
+比較のため、従来の固定コスト（bcrypt.gensalt() の既定値 12）も計測します。
+
+また、ログイン --concurrency 件を同時に処理したときの
+- 検証をイベントループ上で実行（従来）
+- 検証をスレッドで実行（authenticate_user）
+の所要時間と、その間の他のリクエストの待ち時間（イベントループの遅延の最大値）を比較します。
+
+DBは使いません。
+
+使い方（backend ディレクトリで実行）:
+    python -m benchmarks.bench_password_hashing --target-ms 250
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.core import password_hashing
+from app.core.password_hashing import HashParams
+
+
+def measure(params: HashParams, repeat: int):
+    """(ハッシュ化, 検証) の中央値（ミリ秒）とハッシュを返す"""
+    hash_times, verify_times = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        hashed = password_hashing._hash("benchmark-password", params)
+        hash_times.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        password_hashing.verify_password("benchmark-password", hashed)
+        verify_times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(hash_times), statistics.median(verify_times), hashed
+
+
+async def concurrent_logins(hashed: str, concurrency: int, threaded: bool):
+    """(全体の所要時間, イベントループの遅延の最大値) をミリ秒で返す"""
+    stop = asyncio.Event()
+    max_lag = 0.0
+
+    async def ticker():
+        # 他のリクエストの代わりに、1ミリ秒ごとに起きるタスクの遅れを計測
+        nonlocal max_lag
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            max_lag = max(max_lag, (time.perf_counter() - start) * 1000 - 1)
+
+    async def login():
+        if threaded:
+            await asyncio.to_thread(
+                password_hashing.verify_and_update, "benchmark-password", hashed
+            )
+        else:
+            password_hashing.verify_password("benchmark-password", hashed)
+
+    ticker_task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(concurrency)))
+    elapsed = (time.perf_counter() - start) * 1000
+    stop.set()
+    await ticker_task
+    return elapsed, max_lag
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--target-ms", type=float, default=250)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    candidates = [("bcrypt (fixed 12)", HashParams(rounds=12))]
+    start = time.perf_counter()
+    calibrated = password_hashing.calibrate("bcrypt", target_ms=args.target_ms)
+    calibration_ms = (time.perf_counter() - start) * 1000
+    candidates.append((f"bcrypt (calibrated, {calibration_ms:.0f} ms)", calibrated))
+    try:
+        start = time.perf_counter()
+        argon2_params = password_hashing.calibrate("argon2id", target_ms=args.target_ms)
+        calibration_ms = (time.perf_counter() - start) * 1000
+        candidates.append(
+            (f"argon2id (calibrated, {calibration_ms:.0f} ms)", argon2_params)
+        )
+    except ImportError:
+        print("argon2-cffi is not installed; skipping argon2id")
+
+    print(f"target={args.target_ms:.0f} ms")
+    for name, params in candidates:
+        hash_ms, verify_ms, hashed = measure(params, args.repeat)
+        print(
+            f"{name:<34} hash p50={hash_ms:>7.1f} ms verify p50={verify_ms:>7.1f} ms "
+            f"{hashed[:30]}..."
+        )
+
+    password_hashing.set_params(calibrated)
+    hashed = password_hashing.hash_password("benchmark-password")
+    for threaded in (False, True):
+        elapsed, lag = asyncio.run(
+            concurrent_logins(hashed, args.concurrency, threaded)
+        )
+        mode = "thread" if threaded else "event loop"
+        print(
+            f"{args.concurrency} concurrent logins ({mode:<10}) "
+            f"total={elapsed:>7.0f} ms max loop lag={lag:>7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
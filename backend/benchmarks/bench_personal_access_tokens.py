@@ -0,0 +1,115 @@
+"""
+ベンチマーク - スクリプトからのAPI呼び出し: 再ログイン / JWT / パーソナルアクセストークン
+
+GET /api/notes/{id} を以下の認証で --requests 回呼び出し、レイテンシ（中央値）を比較します:
+- login: 呼び出しごとにログインし直す（bcrypt の検証 + JWT）
+- jwt:   ログインして得たアクセストークン（リクエストごとにユーザーを検索）
+- pat:   パーソナルアクセストークン（検証結果はプロセス内にキャッシュ）
+
+また、パーソナルアクセストークンの最後に使われた時刻の書き込みがリクエストごとではなく
+まとめて行われることを、personal_access_tokens テーブルの更新行数（pg_stat）で確認します。
+
+DATABASE_URL / SECRET_KEY が設定された環境で実行してください。
+
+使い方（backend ディレクトリで実行）:
+    python -m benchmarks.bench_personal_access_tokens --requests 200
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+from sqlalchemy import text
+
+from app.database import engine
+from benchmarks.bench_note_patch import BASE_URL, PORT, wait_until_ready
+
+
+def table_updates() -> int:
+    """personal_access_tokens の更新行数の累計"""
+    with engine.connect() as connection:
+        connection.execute(text("SELECT pg_stat_force_next_flush()"))
+        return connection.execute(
+            text(
+                "SELECT coalesce(n_tup_upd, 0) FROM pg_stat_user_tables"
+                " WHERE relname = 'personal_access_tokens'"
+            )
+        ).scalar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--logins", type=int, default=10)
+    args = parser.parse_args()
+
+    # 最後に使われた時刻は終了時にまとめて書き込まれる
+    env = {**os.environ, "PAT_LAST_USED_FLUSH_SECONDS": "3600"}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(PORT)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready()
+        with httpx.Client(base_url=BASE_URL, timeout=60) as client:
+            credentials = {
+                "username": f"bench_{uuid.uuid4().hex[:12]}",
+                "password": "benchmark-password",
+            }
+            client.post("/api/auth/register", json=credentials)
+
+            def login() -> dict:
+                token = client.post("/api/auth/login", data=credentials).json()[
+                    "access_token"
+                ]
+                return {"Authorization": f"Bearer {token}"}
+
+            jwt_headers = login()
+            note_id = client.post(
+                "/api/notes",
+                json={"title": "Bench", "content": "x"},
+                headers=jwt_headers,
+            ).json()["id"]
+            pat = client.post(
+                "/api/auth/tokens",
+                json={"name": "bench", "scopes": ["notes:read"]},
+                headers=jwt_headers,
+            ).json()["token"]
+            pat_headers = {"Authorization": f"Bearer {pat}"}
+
+            modes = (
+                ("login", args.logins, login),
+                ("jwt", args.requests, lambda: jwt_headers),
+                ("pat", args.requests, lambda: pat_headers),
+            )
+            updates_before = table_updates()
+            for name, count, headers in modes:
+                latencies = []
+                for _ in range(count):
+                    start = time.perf_counter()
+                    response = client.get(f"/api/notes/{note_id}", headers=headers())
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    assert response.status_code == 200, response.text
+                print(
+                    f"{name:<6} requests={count:<5} "
+                    f"p50={statistics.median(latencies):>8.2f} ms"
+                )
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(
+        f"personal_access_tokens rows updated for {args.requests} PAT requests: "
+        f"{table_updates() - updates_before}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+ベンチマーク - ノート・お気に入りの読み取りキャッシュ
+
+ノート --notes 件（うち1割をお気に入りに追加）を持つユーザーで、GET /api/notes・
+GET /api/favorites と同じサービス呼び出し（バージョン + 一覧）の1回あたりの時間
+（中央値）を、キャッシュなし（READ_CACHE_MAX_ENTRIES=0 相当）とありで比較します。
+
+あわせて、書き込みの割合を --write-ratio とした読み書きの混在（書き込みはノートの更新）
+について、キャッシュのヒット率とDBへの読み込み回数を表示します。
+作成したデータは終了時に削除します。
+
+DATABASE_URL / SECRET_KEY が設定された環境で実行してください。
+
+使い方（backend ディレクトリで実行）:
+    python -m benchmarks.bench_read_cache --notes 200 --reads 500 --write-ratio 0.05
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+
+from sqlalchemy import delete, select
+
+from app.database import database
+from app.main import app  # noqa: F401  テーブル作成
+from app.models.favorite import Favorite
+from app.models.note import Note
+from app.models.user import User
+from app.schemas.note_schema import NoteUpdate
+from app.services import favorite_service, note_service
+
+
+async def read_notes(user_id: int) -> None:
+    await note_service.get_notes_version(user_id)
+    await note_service.get_all_notes(user_id)
+
+
+async def read_favorites(user_id: int) -> None:
+    await favorite_service.get_favorites_version(user_id)
+    await favorite_service.get_favorites(user_id)
+
+
+async def p50(operation, user_id: int, reads: int) -> float:
+    latencies = []
+    for _ in range(reads):
+        start = time.perf_counter()
+        await operation(user_id)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies)
+
+
+async def run(notes: int, reads: int, write_ratio: float) -> None:
+    await database.connect()
+    cache = note_service.read_cache
+    username = f"bench_{uuid.uuid4().hex[:12]}"
+    try:
+        user_id = await database.fetch_val(
+            query="INSERT INTO users (username, password_hash, is_active, created_date)"
+            " VALUES (:username, repeat('x', 60), true, now()) RETURNING id",
+            values={"username": username},
+        )
+        created = await note_service.insert_notes(
+            [(f"Note {i}", "content " * 100) for i in range(notes)], user_id
+        )
+        note_ids = [note["id"] for note in created]
+        await database.execute(
+            query="INSERT INTO favorites (user_id, note_id, created_date)"
+            " SELECT CAST(:user_id AS integer), id, now() FROM notes"
+            " WHERE user_id = CAST(:user_id AS integer) AND id % 10 = 0",
+            values={"user_id": user_id},
+        )
+        print(f"notes={notes} reads={reads}")
+
+        max_entries = cache.max_entries
+        for name, operation in (("notes", read_notes), ("favorites", read_favorites)):
+            cache.max_entries = 0
+            uncached = await p50(operation, user_id, reads)
+            cache.max_entries = max_entries
+            cache.clear()
+            cached = await p50(operation, user_id, reads)
+            print(
+                f"{name:<10} uncached p50={uncached:>7.3f} ms  "
+                f"cached p50={cached:>7.3f} ms  ({uncached / cached:.0f}x)"
+            )
+
+        # 読み書きの混在（書き込みのたびにユーザーの世代が進み、次の読み込みはミス）
+        cache.clear()
+        cache.stats = type(cache.stats)()
+        rng = random.Random(0)
+        writes = 0
+        for _ in range(reads):
+            if rng.random() < write_ratio:
+                writes += 1
+                await note_service.update_note(
+                    rng.choice(note_ids), user_id, NoteUpdate(title="Edited")
+                )
+            await read_notes(user_id)
+        summary = cache.summary()
+        print(
+            f"mixed      writes={writes} hit_rate={summary['hit_rate']:.1%} "
+            f"db reads={summary['misses']} / {2 * reads}  "
+            f"cache={summary['bytes'] / 1024:.0f} KiB in {summary['entries']} entries"
+        )
+    finally:
+        users = select(User.id).where(User.username == username)
+        await database.execute(
+            query=delete(Favorite.__table__).where(Favorite.user_id.in_(users))
+        )
+        await database.execute(
+            query=delete(Note.__table__).where(Note.user_id.in_(users))
+        )
+        await database.execute(
+            query=delete(User.__table__).where(User.username == username)
+        )
+        await database.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--notes", type=int, default=200)
+    parser.add_argument("--reads", type=int, default=500)
+    parser.add_argument("--write-ratio", type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(run(args.notes, args.reads, args.write_ratio))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+ベンチマーク - AI生成の類似キャッシュ（AI_SEMANTIC_CACHE）
+
+ユーザーごとに生成を登録したうえで、
+- ほぼ同じリクエスト（空白・句読点の違い、ノートへの1文の追加）
+- 別のリクエスト（別のプロンプト、または別のノート）
+で検索し、ヒット率・誤ヒット数・検索のレイテンシ（埋め込み + 検索）を表示します。
+
+AIプロバイダーやDBは使わず、キャッシュ単体を計測します。
+
+使い方（backend ディレクトリで実行）:
+    python -m benchmarks.bench_semantic_cache --users 100 --notes-kb 20
+"""
+
+import argparse
+import random
+import statistics
+import string
+import time
+
+from app.core.config import settings
+from app.core.semantic_cache import SemanticCache
+
+PROMPTS = [
+    "これらのノートから新しいアイデアを生成してください",
+    "Summarize these notes into three bullet points",
+    "Suggest next actions based on these notes",
+    "これらのノートの共通点を挙げてください",
+]
+
+
+def make_notes(rng: random.Random, size: int) -> str:
+    """単語をランダムに並べた文からなるノート本文"""
+    words = [
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10)))
+        for _ in range(3000)
+    ]
+    sentences = []
+    while sum(len(sentence) for sentence in sentences) < size:
+        sentences.append(" ".join(rng.choices(words, k=rng.randint(6, 16))) + ".")
+    return "\n".join(sentences)
+
+
+def near_duplicate(rng: random.Random, prompt: str, context: str):
+    """空白・句読点の違い、またはノートへの1文の追加"""
+    variant = rng.randrange(3)
+    if variant == 0:
+        return "  " + prompt.lower() + " ", context.replace("\n", "\n\n")
+    if variant == 1:
+        return prompt + "。", context.replace(". ", ", ")
+    middle = len(context) // 2
+    return prompt, context[:middle] + " Added one more sentence here. " + context[middle:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--notes-kb", type=int, default=20)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    cache = SemanticCache(
+        threshold=settings.AI_SEMANTIC_CACHE_THRESHOLD,
+        prompt_threshold=settings.AI_SEMANTIC_CACHE_PROMPT_THRESHOLD,
+        max_entries=settings.AI_SEMANTIC_CACHE_MAX_ENTRIES,
+        max_users=settings.AI_SEMANTIC_CACHE_MAX_USERS,
+        ttl_seconds=settings.AI_SEMANTIC_CACHE_TTL_SECONDS,
+    )
+
+    stored = {}
+    for user_id in range(args.users):
+        for generation in range(4):
+            prompt = PROMPTS[generation]
+            context = make_notes(rng, args.notes_kb * 1024)
+            generation_id = user_id * 10 + generation
+            cache.add(user_id, "openai", cache.embed(prompt, context), generation_id)
+            stored[generation_id] = (user_id, prompt, context)
+
+    expected_hits = hits = false_hits = 0
+    latencies = []
+    for _ in range(args.lookups):
+        generation_id = rng.choice(list(stored))
+        user_id, prompt, context = stored[generation_id]
+        if rng.random() < 0.5:
+            prompt, context = near_duplicate(rng, prompt, context)
+            expected = generation_id
+            expected_hits += 1
+        elif rng.random() < 0.5:
+            prompt = rng.choice([p for p in PROMPTS if p != prompt])
+            expected = None
+        else:
+            context = make_notes(rng, args.notes_kb * 1024)
+            expected = None
+
+        start = time.perf_counter()
+        found = cache.lookup(user_id, "openai", cache.embed(prompt, context))
+        latencies.append((time.perf_counter() - start) * 1000)
+        if found is not None and found == expected:
+            hits += 1
+        elif found is not None:
+            false_hits += 1
+
+    print(f"users={args.users} notes={args.notes_kb} KiB lookups={args.lookups}")
+    print(
+        f"near-duplicate hit rate={hits / expected_hits:.1%} "
+        f"false hits={false_hits} "
+        f"lookup p50={statistics.median(latencies):.2f} ms "
+        f"p99={sorted(latencies)[int(len(latencies) * 0.99)]:.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
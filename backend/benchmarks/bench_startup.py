@@ -0,0 +1,126 @@
+"""
+ベンチマーク - コールドスタート時間
+
+スケールtoゼロのホストでは、起動から最初のリクエストに応答するまでの時間が
+そのままユーザーの待ち時間になります。以下を計測し、目標値と比較します:
+1. `python -X importtime -c "import app.main"` による app.main の import 時間
+   （重いモジュールの上位も表示）
+2. uvicorn を起動してから GET / が 200 を返すまでの時間（time-to-first-request）
+
+目標値（開発用コンテナ、1 vCPU で計測）:
+- import app.main: 1200 ms 以下
+- time-to-first-request: 2500 ms 以下
+
+AI SDK（openai / anthropic / google.generativeai）は起動後にバックグラウンドで
+読み込まれるため、どちらの計測にも含まれないはずです。
+
+DATABASE_URL / SECRET_KEY が設定された環境で実行してください（app.main の import 時に
+テーブル作成のためDBへ接続します）。目標値を超えた場合は終了コード 1 を返します。
+
+使い方（backend ディレクトリで実行）:
+    python -m benchmarks.bench_startup --runs 5
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+import urllib.request
+
+PORT = 8766
+
+IMPORT_BUDGET_MS = 1200
+FIRST_REQUEST_BUDGET_MS = 2500
+
+
+def measure_import(top: int):
+    """-X importtime の出力から app.main の累積import時間と重いモジュールを取得"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:") :].split("|")
+        modules.append((int(self_us) / 1000, int(cumulative) / 1000, name.strip()))
+
+    total = next(cum for _, cum, name in modules if name == "app.main")
+    # トップレベルのパッケージ単位で自身のimport時間を集計
+    packages: dict = {}
+    for self_ms, _, name in modules:
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0.0) + self_ms
+    heaviest = sorted(
+        ((ms, package) for package, ms in packages.items()), reverse=True
+    )[:top]
+    loaded_sdks = [
+        sdk
+        for sdk in ("openai", "anthropic", "google.generativeai")
+        if any(name == sdk for _, _, name in modules)
+    ]
+    return total, heaviest, loaded_sdks
+
+
+def measure_first_request(timeout: float = 30.0) -> float:
+    """uvicornを起動してから最初のリクエストに応答するまでの時間（ms）"""
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(PORT)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{PORT}/") as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError("server did not start")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--import-budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument(
+        "--first-request-budget-ms", type=float, default=FIRST_REQUEST_BUDGET_MS
+    )
+    args = parser.parse_args()
+
+    imports = [measure_import(args.top) for _ in range(args.runs)]
+    import_ms, heaviest, loaded_sdks = min(imports, key=lambda item: item[0])
+    first_request_ms = min(measure_first_request() for _ in range(args.runs))
+
+    print(f"heaviest packages by import time (best of {args.runs}):")
+    for ms, name in heaviest:
+        print(f"  {ms:8.1f} ms  {name}")
+    print(f"AI SDKs imported at startup: {', '.join(loaded_sdks) or 'none'}")
+    print(
+        f"import app.main:        {import_ms:8.1f} ms "
+        f"(budget {args.import_budget_ms:.0f})"
+    )
+    print(
+        f"time-to-first-request:  {first_request_ms:8.1f} ms "
+        f"(budget {args.first_request_budget_ms:.0f})"
+    )
+
+    if (
+        import_ms > args.import_budget_ms
+        or first_request_ms > args.first_request_budget_ms
+    ):
+        print("over budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+ベンチマーク - GET /api/users/ のユーザー一覧
+
+--users 人のユーザーを登録した状態で、以下の経路の所要時間とピークメモリを比較します:
+1. 全件取得（password_hash を含む全カラムを読み込み、List[UserResponse] で検証）
+2. ページ取得（--limit 件、キーセット、password_hash なし）の先頭ページと最終ページ
+3. NDJSON エクスポート（1000件ずつのバッチを順に JSON 化、全件をメモリに載せない）
+
+登録したユーザーは終了時に削除します。
+
+DATABASE_URL / SECRET_KEY が設定された環境で実行してください。
+
+使い方（backend ディレクトリで実行）:
+    python -m benchmarks.bench_users_list --users 100000 --limit 100
+"""
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+import uuid
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import delete, select
+
+from app.core.responses import NDJSONRecordStreamResponse, RecordListResponse
+from app.database import database
+from app.main import app  # noqa: F401  テーブル作成
+from app.models.user import User
+from app.schemas.user_schema import UserResponse, USER_RESPONSE_FIELDS
+from app.services import user_service
+
+
+async def measure(name: str, operation) -> None:
+    # 時間とメモリは別々に計測する（tracemalloc は実行を大きく遅くするため）
+    start = time.perf_counter()
+    size = await operation()
+    elapsed = (time.perf_counter() - start) * 1000
+    tracemalloc.start()
+    await operation()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name:<28} {elapsed:>9.1f} ms  peak={peak / 1024 / 1024:>7.1f} MiB "
+        f"body={size / 1024:>8.0f} KiB"
+    )
+
+
+async def run(users: int, limit: int) -> None:
+    await database.connect()
+    prefix = f"b{uuid.uuid4().hex[:8]}_"
+    try:
+        # bcrypt のハッシュと同じ長さのダミー
+        await database.execute(
+            query="INSERT INTO users (username, password_hash, is_active, created_date)"
+            " SELECT CAST(:prefix AS text) || i, repeat('x', 60), i % 10 <> 0,"
+            " now() - make_interval(secs => i)"
+            " FROM generate_series(1, CAST(:count AS integer)) AS i",
+            values={"prefix": prefix, "count": users},
+        )
+        await database.execute(query="ANALYZE users")
+
+        async def full():
+            rows = await database.fetch_all(query=select(User.__table__))
+            validated = TypeAdapter(List[UserResponse]).validate_python(
+                [dict(row) for row in rows]
+            )
+            return len(TypeAdapter(List[UserResponse]).dump_json(validated))
+
+        async def first_page():
+            page, _ = await user_service.get_users(limit=limit)
+            return len(RecordListResponse(page, USER_RESPONSE_FIELDS).body)
+
+        last_position = await database.fetch_one(
+            query=select(User.created_date, User.id)
+            .order_by(User.created_date.desc(), User.id.desc())
+            .offset(limit)
+            .limit(1)
+        )
+
+        async def last_page():
+            page, _ = await user_service.get_users(
+                (last_position["created_date"], last_position["id"]), limit=limit
+            )
+            return len(RecordListResponse(page, USER_RESPONSE_FIELDS).body)
+
+        async def export():
+            response = NDJSONRecordStreamResponse(
+                user_service.iter_users(), USER_RESPONSE_FIELDS
+            )
+            size = 0
+            async for chunk in response.body_iterator:
+                size += len(chunk)
+            return size
+
+        total = await database.fetch_val(query="SELECT count(*) FROM users")
+        print(f"users={total} limit={limit}")
+        await measure("all users (validated)", full)
+        await measure(f"first page ({limit})", first_page)
+        await measure(f"last page ({limit})", last_page)
+        await measure("ndjson export", export)
+    finally:
+        await database.execute(
+            query=delete(User.__table__).where(User.username.startswith(prefix))
+        )
+        await database.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(run(args.users, args.limit))
+
+
+if __name__ == "__main__":
+    main()
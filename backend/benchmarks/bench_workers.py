@@ -0,0 +1,135 @@
+"""
+ベンチマーク - ワーカー数ごとのスループット
+
+gunicorn.conf.py の本番構成でサーバーを起動し、ワーカー数（1/2/4/8）ごとに
+以下のエンドポイントのスループットを計測します:
+- GET  /api/notes       （JSONシリアライズが中心）
+- POST /api/auth/login  （bcryptのハッシュ検証が中心、CPUバウンド）
+
+DATABASE_URL / SECRET_KEY が設定された環境で実行してください。
+負荷生成側もCPUを使うため、サーバーとは別のマシンで実行するのが理想です。
+
+使い方（backend ディレクトリで実行）:
+    python -m benchmarks.bench_workers --workers 1 2 4 8 --duration 10
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+
+PORT = 8765
+BASE_URL = f"http://127.0.0.1:{PORT}"
+
+
+def start_server(workers: int) -> subprocess.Popen:
+    """指定したワーカー数でgunicornを起動"""
+    env = {**os.environ, "WEB_CONCURRENCY": str(workers), "PORT": str(PORT)}
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "app.main:app", "-c", "gunicorn.conf.py"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_until_ready(timeout: float = 30.0) -> None:
+    """サーバーが応答するまで待つ"""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=BASE_URL) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def seed(notes: int) -> dict:
+    """ベンチマーク用のユーザーとノートを作成し、認証情報を返す"""
+    username = f"bench_{uuid.uuid4().hex[:12]}"
+    password = "benchmark-password"
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=30) as client:
+        await client.post(
+            "/api/auth/register", json={"username": username, "password": password}
+        )
+        token = (
+            await client.post(
+                "/api/auth/login", data={"username": username, "password": password}
+            )
+        ).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        batch = [{"title": f"Note {i}", "content": "x" * 500} for i in range(notes)]
+        await client.post("/api/notes/import", json=batch, headers=headers)
+    return {"username": username, "password": password, "headers": headers}
+
+
+async def run_load(request, concurrency: int, duration: float) -> float:
+    """一定時間リクエストを送り続け、1秒あたりの成功数を返す"""
+    done = 0
+    deadline = time.monotonic() + duration
+
+    async def worker(client):
+        nonlocal done
+        while time.monotonic() < deadline:
+            response = await request(client)
+            if response.status_code < 400:
+                done += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=60, limits=limits) as client:
+        start = time.monotonic()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.monotonic() - start
+    return done / elapsed
+
+
+async def bench(workers: int, args) -> dict:
+    """1つのワーカー数について計測"""
+    server = start_server(workers)
+    try:
+        await wait_until_ready()
+        user = await seed(args.notes)
+
+        async def get_notes(client):
+            return await client.get("/api/notes", headers=user["headers"])
+
+        async def login(client):
+            return await client.post(
+                "/api/auth/login",
+                data={"username": user["username"], "password": user["password"]},
+            )
+
+        return {
+            "notes": await run_load(get_notes, args.concurrency, args.duration),
+            "login": await run_load(login, args.concurrency, args.duration),
+        }
+    finally:
+        server.terminate()
+        server.wait()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--notes", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"cpus={os.cpu_count()} concurrency={args.concurrency}")
+    print(f"{'workers':>8} {'GET /api/notes':>16} {'POST login':>12}")
+    for workers in args.workers:
+        result = await bench(workers, args)
+        print(f"{workers:>8} {result['notes']:>12.1f} r/s {result['login']:>8.1f} r/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
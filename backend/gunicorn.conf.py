@@ -0,0 +1,40 @@
+# Gunicorn configuration for production
+#
+# 使い方: gunicorn app.main:app -c gunicorn.conf.py
+import os
+
+
+def _available_cpus() -> int:
+    """コンテナのCPU制限（affinity）を考慮したコア数"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+# 非同期ワーカーなので1コアにつき1プロセス（WEB_CONCURRENCY で上書き可能）
+workers = int(os.getenv("WEB_CONCURRENCY", "0")) or _available_cpus()
+worker_class = "app.workers.MemoriaUvicornWorker"
+
+# アプリケーションをマスターで読み込んでからforkする（起動時間とメモリの削減）
+preload_app = True
+
+# SIGTERM後、実行中のリクエスト（AI呼び出しを含む）が終わるまで待つ時間
+graceful_timeout = int(os.getenv("SHUTDOWN_GRACE_SECONDS", "45")) + 5
+timeout = 120
+keepalive = 5
+
+# メモリリーク対策として一定リクエストごとにワーカーを入れ替える
+max_requests = 2000
+max_requests_jitter = 200
+
+accesslog = "-"
+
+
+def post_fork(server, worker):
+    """fork後、マスターで作成したDB接続をワーカーで使わないよう破棄"""
+    from app.database import engine
+
+    engine.dispose(close=False)
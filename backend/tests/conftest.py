@@ -1,7 +1,21 @@
+import uuid
+
 import pytest
 from starlette.testclient import TestClient
 from app.main import app
+from app.database import database
 from app.core.security import create_access_token, get_current_user
+from app.schemas.user_schema import UserCreate
+from app.services import user_service
+from app.services.note_service import read_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_read_cache():
+    """テスト間で読み取りキャッシュを共有しない（DBのモックがテストごとに異なるため）"""
+    read_cache.clear()
+    yield
+    read_cache.clear()
 
 
 @pytest.fixture
@@ -55,3 +69,22 @@ def test_app_no_auth():
 
     # クリーンアップ
     app.dependency_overrides.clear()
+
+
+@pytest.fixture
+async def db():
+    """実際のDB（DATABASE_URL、ローカルの Postgres）に接続する"""
+    await database.connect()
+    try:
+        yield database
+    finally:
+        await database.disconnect()
+
+
+@pytest.fixture
+async def db_user(db):
+    """実際のDBに作成したユーザー（ユーザー名はテストごとに異なる）"""
+    payload = UserCreate(
+        username=f"test_{uuid.uuid4().hex[:12]}", password="password123"
+    )
+    return dict(await user_service.create_user(payload))
@@ -1,6 +1,7 @@
 """AI Service のテスト"""
 
 import pytest
+from datetime import datetime
 from fastapi import HTTPException
 from app.services import ai_service
 
@@ -179,6 +180,45 @@ async def test_generate_idea_basic(monkeypatch):
     assert result["generated_content"] == "Generated test content"
 
 
+@pytest.mark.asyncio
+async def test_insert_generation_deduplicates_blobs(monkeypatch):
+    """同じ内容のプロンプトと生成結果は1つのBLOBとして保存される"""
+    from sqlalchemy.dialects import postgresql
+
+    queries = []
+
+    async def mock_fetch_one(query):
+        queries.append(query.compile(dialect=postgresql.dialect()))
+        return {
+            "id": 7,
+            "user_id": 1,
+            "note_ids": [1],
+            "ai_provider": "openai",
+            "created_date": "2024-01-01T00:00:00",
+        }
+
+    from app import database
+
+    monkeypatch.setattr(database.database, "fetch_one", mock_fetch_one)
+
+    generation = await ai_service.insert_generation(
+        user_id=1,
+        note_ids=[1],
+        prompt="same",
+        ai_provider="openai",
+        generated_content="same",
+    )
+
+    assert generation["id"] == 7
+    assert generation["generated_content"] == "same"
+    compiled = queries[0]
+    assert "ON CONFLICT (hash) DO UPDATE" in str(compiled)
+    # BLOBの行は1つだけ
+    assert list(compiled.params.values()).count("same") == 1
+    assert compiled.params["prompt_hash"] == ai_service.blob_hash("same")
+    assert compiled.params["content_hash"] == ai_service.blob_hash("same")
+
+
 @pytest.mark.asyncio
 async def test_generate_idea_default_prompt(monkeypatch):
     """正常系: デフォルトプロンプトの使用"""
@@ -230,6 +270,113 @@ async def test_generate_idea_default_prompt(monkeypatch):
     assert result["prompt"] == "これらのノートから新しいアイデアを生成してください"
 
 
+def test_semantic_cache_matches_near_duplicates():
+    """空白の違いや小さな編集は一致し、別のプロンプト・ノートや期限切れは一致しない"""
+    pytest.importorskip("numpy")
+    from app.core.semantic_cache import SemanticCache
+
+    now = [0.0]
+    cache = SemanticCache(
+        threshold=0.95,
+        prompt_threshold=0.8,
+        max_entries=2,
+        max_users=1,
+        ttl_seconds=60,
+        clock=lambda: now[0],
+    )
+    context = "\n".join(
+        [
+            "# Project plan",
+            "Ship the mobile app in spring, then localize it for Japan and Korea.",
+            "Hire two backend engineers before the summer release.",
+            "Customer interviews showed that offline sync is the top request.",
+            "Budget review is scheduled for the second week of March.",
+            "Marketing wants a landing page with screenshots and a demo video.",
+            "Support tickets mostly mention login problems on older Android devices.",
+        ]
+    )
+    cache.add(1, "openai", cache.embed("Generate new ideas", context), 10)
+
+    def lookup(prompt, text, user_id=1, provider="openai"):
+        return cache.lookup(user_id, provider, cache.embed(prompt, text))
+
+    assert lookup("generate  new ideas!", context.replace("\n", "\n\n")) == 10
+    assert lookup("Generate new ideas", context + "One more line.\n") == 10
+    assert lookup("Summarize these notes", context) is None
+    assert lookup("Generate new ideas", "# Recipes\nBake bread at 220 degrees.") is None
+    assert lookup("Generate new ideas", context, provider="anthropic") is None
+    assert lookup("Generate new ideas", context, user_id=2) is None
+
+    now[0] = 61
+    assert lookup("Generate new ideas", context) is None
+
+    # 容量を超えると古いエントリから置き換え、ユーザー数の上限を超えると破棄する
+    cache.add(1, "openai", cache.embed("A", context), 11)
+    cache.add(1, "openai", cache.embed("B", context), 12)
+    cache.add(1, "openai", cache.embed("C", context), 13)
+    assert lookup("A", context) is None
+    assert lookup("C", context) == 13
+    cache.discard(1, "openai", 13)
+    assert lookup("C", context) is None
+    cache.add(2, "openai", cache.embed("C", context), 14)
+    assert lookup("B", context) is None
+
+    assert cache.stats.summary()["hits"] == 0  # 統計は ai_service が記録する
+
+
+@pytest.mark.asyncio
+async def test_generate_idea_semantic_cache_hit(monkeypatch):
+    """ほぼ同じプロンプトとノートではAIを呼ばずに過去の生成結果を返す"""
+    pytest.importorskip("numpy")
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "AI_SEMANTIC_CACHE", True)
+    monkeypatch.setattr(ai_service, "_semantic_cache", None)
+
+    notes = [
+        {"id": 1, "title": "Plan", "content": "Ship the mobile app in spring."},
+    ]
+    generation = {
+        "id": 5,
+        "user_id": 1,
+        "note_ids": [1],
+        "prompt": "Generate ideas",
+        "ai_provider": "openai",
+        "generated_content": "Idea",
+        "created_date": "2024-01-01T00:00:00",
+    }
+    calls = []
+
+    class MockAIProvider:
+        async def generate(self, prompt, context):
+            calls.append(prompt)
+            return "Idea"
+
+    async def mock_fetch_all(query):
+        return notes
+
+    async def mock_fetch_one(query):
+        return generation
+
+    async def mock_execute(query):
+        return 5
+
+    from app import database
+
+    monkeypatch.setattr(database.database, "fetch_all", mock_fetch_all)
+    monkeypatch.setattr(database.database, "fetch_one", mock_fetch_one)
+    monkeypatch.setattr(database.database, "execute", mock_execute)
+    monkeypatch.setattr(ai_service, "get_ai_provider", lambda name: MockAIProvider())
+
+    first = await ai_service.generate_idea([1], 1, "Generate ideas", "openai")
+    second = await ai_service.generate_idea([1], 1, "  generate ideas. ", "openai")
+
+    assert first["id"] == second["id"] == 5
+    assert calls == ["Generate ideas"]
+    summary = ai_service.get_semantic_cache().stats.summary()
+    assert (summary["hits"], summary["misses"]) == (1, 1)
+
+
 @pytest.mark.asyncio
 async def test_generate_idea_note_not_found(monkeypatch):
     """異常系: ノートが見つからない場合"""
@@ -282,18 +429,128 @@ async def test_get_generations(monkeypatch):
     assert result["items"][0]["id"] == 1
 
 
+def test_generation_summary_query():
+    """要約では生成結果の全文を選択せず、先頭部分と文字数をDB側で計算する"""
+    summary_columns = ai_service._generation_query(summary=True).selected_columns.keys()
+    assert "generated_content" not in summary_columns
+    assert {"preview", "content_length"} <= set(summary_columns)
+
+    full_columns = ai_service._generation_query().selected_columns.keys()
+    assert "generated_content" in full_columns
+
+
+def test_get_generations_summary_view(
+    test_app, auth_headers, mock_current_user, monkeypatch
+):
+    """view=summary では preview と content_length を返す"""
+    calls = []
+
+    async def mock_get_generations_version(user_id):
+        return {"count": 1, "last_modified": datetime(2024, 1, 1)}
+
+    async def mock_get_generations(user_id, page, per_page, summary=False):
+        calls.append(summary)
+        record = {
+            "id": 1,
+            "user_id": 1,
+            "note_ids": [1],
+            "prompt": "Test prompt",
+            "ai_provider": "openai",
+            "created_date": datetime(2024, 1, 1),
+        }
+        if summary:
+            record.update(preview="Generated", content_length=5000)
+        else:
+            record["generated_content"] = "Generated" * 500
+        return {"items": [record], "total": 1, "page": page, "per_page": per_page}
+
+    monkeypatch.setattr(
+        ai_service, "get_generations_version", mock_get_generations_version
+    )
+    monkeypatch.setattr(ai_service, "get_generations", mock_get_generations)
+
+    response = test_app.get("/api/ai/generations?view=summary", headers=auth_headers)
+    assert response.status_code == 200
+    item = response.json()["items"][0]
+    assert item["preview"] == "Generated"
+    assert item["content_length"] == 5000
+    assert "generated_content" not in item
+    summary_etag = response.headers["etag"]
+
+    response = test_app.get("/api/ai/generations", headers=auth_headers)
+    assert response.status_code == 200
+    assert calls == [True, False]
+    assert "generated_content" in response.json()["items"][0]
+    # 表現が異なればETagも異なる
+    assert response.headers["etag"] != summary_etag
+
+
+def test_get_generation(test_app, auth_headers, mock_current_user, monkeypatch):
+    """生成履歴を1件取得（全文を含む）"""
+
+    async def mock_get_generation(generation_id, user_id):
+        if generation_id != 1:
+            return None
+        return {
+            "id": 1,
+            "user_id": user_id,
+            "note_ids": [1],
+            "prompt": "Test prompt",
+            "ai_provider": "openai",
+            "generated_content": "Full content",
+            "created_date": datetime(2024, 1, 1),
+        }
+
+    monkeypatch.setattr(ai_service, "get_generation", mock_get_generation)
+
+    response = test_app.get("/api/ai/generations/1", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["generated_content"] == "Full content"
+    assert "user_id" not in response.json()
+
+    response = test_app.get(
+        "/api/ai/generations/1",
+        headers={**auth_headers, "If-None-Match": response.headers["etag"]},
+    )
+    assert response.status_code == 304
+
+    response = test_app.get("/api/ai/generations/999", headers=auth_headers)
+    assert response.status_code == 404
+
+
+def test_generation_partition_ddl():
+    """月別パーティションの名前と範囲"""
+    from datetime import date
+    from app.models.ai_generation import (
+        AIGeneration,
+        PARTITION_NAME_PATTERN,
+        add_months,
+        create_partition_ddl,
+        partition_name,
+    )
+
+    assert add_months(date(2025, 11, 1), 2) == date(2026, 1, 1)
+    assert add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+
+    assert partition_name(date(2025, 1, 1)) == "ai_generations_y2025m01"
+    assert PARTITION_NAME_PATTERN.match("ai_generations_y2025m01").groups() == (
+        "2025",
+        "01",
+    )
+    assert create_partition_ddl(date(2025, 12, 1)).endswith(
+        "FOR VALUES FROM ('2025-12-01') TO ('2026-01-01')"
+    )
+
+    # パーティションキーは主キーに含める必要がある
+    table = AIGeneration.__table__
+    assert table.dialect_options["postgresql"]["partition_by"] == "RANGE (created_date)"
+    assert {column.name for column in table.primary_key} == {"id", "created_date"}
+
+
 @pytest.mark.asyncio
 async def test_save_generation_as_note(monkeypatch):
     """正常系: 生成結果をノートとして保存"""
-    test_generation = {
-        "id": 1,
-        "user_id": 1,
-        "note_ids": [1],
-        "prompt": "Test prompt",
-        "ai_provider": "openai",
-        "generated_content": "Generated content to save",
-        "created_date": "2024-01-01T00:00:00",
-    }
+    from sqlalchemy.dialects import postgresql
 
     test_note = {
         "id": 10,
@@ -303,25 +560,16 @@ async def test_save_generation_as_note(monkeypatch):
         "created_date": "2024-01-01T00:00:00",
         "updated_date": "2024-01-01T00:00:00",
     }
+    queries = []
 
     async def mock_fetch_one(query):
-        # 最初の呼び出しは生成履歴、2回目はノート
-        if not hasattr(mock_fetch_one, "call_count"):
-            mock_fetch_one.call_count = 0
-        mock_fetch_one.call_count += 1
-
-        if mock_fetch_one.call_count == 1:
-            return test_generation
-        else:
-            return test_note
-
-    async def mock_execute(query):
-        return 10
+        # 生成履歴の参照、ノートと最初のリビジョンの作成を1ステートメントで行う
+        queries.append(str(query.compile(dialect=postgresql.dialect())))
+        return test_note
 
     from app import database
 
     monkeypatch.setattr(database.database, "fetch_one", mock_fetch_one)
-    monkeypatch.setattr(database.database, "execute", mock_execute)
 
     result = await ai_service.save_generation_as_note(
         generation_id=1, user_id=1, title="New Note"
@@ -330,6 +578,9 @@ async def test_save_generation_as_note(monkeypatch):
     assert result["id"] == 10
     assert result["title"] == "New Note"
     assert result["content"] == "Generated content to save"
+    assert len(queries) == 1
+    assert "INSERT INTO notes" in queries[0]
+    assert "FROM ai_generations" in queries[0]
 
 
 @pytest.mark.asyncio
@@ -349,3 +600,58 @@ async def test_save_generation_as_note_not_found(monkeypatch):
         )
 
     assert exc.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_wait_for_inflight_generations(monkeypatch):
+    """シャットダウン時に実行中のAI生成の完了を待つ"""
+    import asyncio
+
+    release = asyncio.Event()
+
+    async def mock_fetch_all(query):
+        return [{"id": 1, "title": "Note", "content": "Content"}]
+
+    async def mock_fetch_one(query):
+        return {"id": 1, "generated_content": "Generated", "created_date": None}
+
+    async def mock_execute(query):
+        return 1
+
+    class SlowAIProvider:
+        async def generate(self, prompt, context):
+            await release.wait()
+            return "Generated"
+
+    from app import database
+
+    monkeypatch.setattr(database.database, "fetch_all", mock_fetch_all)
+    monkeypatch.setattr(database.database, "fetch_one", mock_fetch_one)
+    monkeypatch.setattr(database.database, "execute", mock_execute)
+    monkeypatch.setattr(ai_service, "get_ai_provider", lambda name: SlowAIProvider())
+
+    task = asyncio.create_task(ai_service.generate_idea(note_ids=[1], user_id=1))
+    await asyncio.sleep(0)
+
+    # 完了しない間はタイムアウトし、残り件数を返す
+    assert await ai_service.wait_for_inflight_generations(timeout=0.01) == 1
+
+    release.set()
+    assert await ai_service.wait_for_inflight_generations(timeout=1) == 0
+    assert (await task)["id"] == 1
+
+
+def test_app_import_does_not_load_ai_sdks():
+    """起動時（app.main の import）にAI SDKを読み込まない"""
+    import subprocess
+    import sys
+
+    code = (
+        "import sys, app.main; "
+        "print(','.join(m for m in ('openai', 'anthropic', 'google.generativeai') "
+        "if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == ""
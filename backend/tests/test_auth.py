@@ -1,17 +1,16 @@
 """認証APIのテスト"""
 
 import json
-from app.services import user_service
+from app.services import user_service, token_service
 from app.core.security import verify_password
+from app.core.config import settings
+from jose import jwt
 
 
 def test_register_user(test_app, monkeypatch):
     """ユーザー登録のテスト"""
     test_payload = {"username": "newuser", "password": "password123"}
 
-    async def mock_get_by_username(username):
-        return None
-
     async def mock_create_user(payload):
         return {
             "id": 1,
@@ -20,7 +19,6 @@ def test_register_user(test_app, monkeypatch):
             "created_date": "2024-01-01T00:00:00",
         }
 
-    monkeypatch.setattr(user_service, "get_by_username", mock_get_by_username)
     monkeypatch.setattr(user_service, "create_user", mock_create_user)
 
     response = test_app.post("/api/auth/register", json=test_payload)
@@ -33,10 +31,11 @@ def test_register_duplicate_username(test_app, monkeypatch):
     """重複ユーザー名での登録テスト"""
     test_payload = {"username": "existinguser", "password": "password123"}
 
-    async def mock_get_by_username(username):
-        return {"id": 1, "username": "existinguser"}
+    async def mock_create_user(payload):
+        # 一意制約により作成されない
+        return None
 
-    monkeypatch.setattr(user_service, "get_by_username", mock_get_by_username)
+    monkeypatch.setattr(user_service, "create_user", mock_create_user)
 
     response = test_app.post("/api/auth/register", json=test_payload)
 
@@ -55,7 +54,11 @@ def test_login_success(test_app, monkeypatch):
             "created_date": "2024-01-01T00:00:00",
         }
 
+    async def mock_issue_refresh_token(user_id):
+        return "refresh-token"
+
     monkeypatch.setattr(user_service, "authenticate_user", mock_authenticate_user)
+    monkeypatch.setattr(token_service, "issue_refresh_token", mock_issue_refresh_token)
 
     response = test_app.post(
         "/api/auth/login",
@@ -64,9 +67,242 @@ def test_login_success(test_app, monkeypatch):
 
     assert response.status_code == 200
     assert "access_token" in response.json()
+    assert response.json()["refresh_token"] == "refresh-token"
     assert response.json()["token_type"] == "bearer"
 
 
+def test_refresh_token(test_app, monkeypatch):
+    """リフレッシュトークンでアクセストークンを更新（パスワードの検証なし）"""
+
+    async def mock_rotate_refresh_token(token):
+        assert token == "old-token"
+        return {"user_id": 1, "username": "testuser", "refresh_token": "new-token"}
+
+    async def mock_authenticate_user(username, password):
+        raise AssertionError("password must not be verified on refresh")
+
+    monkeypatch.setattr(
+        token_service, "rotate_refresh_token", mock_rotate_refresh_token
+    )
+    monkeypatch.setattr(user_service, "authenticate_user", mock_authenticate_user)
+
+    response = test_app.post("/api/auth/refresh", json={"refresh_token": "old-token"})
+
+    assert response.status_code == 200
+    assert response.json()["refresh_token"] == "new-token"
+    payload = jwt.decode(
+        response.json()["access_token"],
+        settings.SECRET_KEY,
+        algorithms=[settings.ALGORITHM],
+    )
+    assert payload["sub"] == "testuser"
+
+
+def test_refresh_token_invalid(test_app, monkeypatch):
+    """無効・使用済みのリフレッシュトークンは401"""
+
+    async def mock_rotate_refresh_token(token):
+        return None
+
+    monkeypatch.setattr(
+        token_service, "rotate_refresh_token", mock_rotate_refresh_token
+    )
+
+    response = test_app.post("/api/auth/refresh", json={"refresh_token": "reused"})
+
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Invalid refresh token"
+
+
+def test_logout(test_app, monkeypatch):
+    """ログアウトでリフレッシュトークンを失効させる"""
+    revoked = []
+
+    async def mock_revoke_refresh_token(token):
+        revoked.append(token)
+        return True
+
+    monkeypatch.setattr(
+        token_service, "revoke_refresh_token", mock_revoke_refresh_token
+    )
+
+    response = test_app.post("/api/auth/logout", json={"refresh_token": "token"})
+
+    assert response.status_code == 204
+    assert revoked == ["token"]
+
+
+def test_logout_revokes_access_token(test_app_no_auth, auth_headers, monkeypatch):
+    """ログアウト時にAuthorizationヘッダーのアクセストークンも失効させる"""
+    revoked = []
+
+    async def mock_revoke_refresh_token(token):
+        return True
+
+    async def mock_revoke_access_token(jti, expires_at):
+        revoked.append((jti, expires_at))
+        return True
+
+    monkeypatch.setattr(
+        token_service, "revoke_refresh_token", mock_revoke_refresh_token
+    )
+    monkeypatch.setattr(token_service, "revoke_access_token", mock_revoke_access_token)
+
+    response = test_app_no_auth.post(
+        "/api/auth/logout", json={"refresh_token": "token"}, headers=auth_headers
+    )
+
+    assert response.status_code == 204
+    claims = jwt.decode(
+        auth_headers["Authorization"].split()[1],
+        settings.SECRET_KEY,
+        algorithms=[settings.ALGORITHM],
+    )
+    assert revoked == [(claims["jti"], claims["exp"])]
+
+
+def test_revoked_access_token_rejected(test_app_no_auth, auth_headers, monkeypatch):
+    """失効していないトークンはDBを参照せず、ブルームフィルタが陽性の場合のみ確認する"""
+    from app import database
+    from app.core.bloom_filter import BloomFilter
+
+    lookups = []
+
+    async def mock_get_by_username(username):
+        return {
+            "id": 1,
+            "username": username,
+            "is_active": True,
+            "created_date": "2024-01-01T00:00:00",
+        }
+
+    async def mock_fetch_val(query):
+        lookups.append(query)
+        return True
+
+    monkeypatch.setattr(user_service, "get_by_username", mock_get_by_username)
+    monkeypatch.setattr(database.database, "fetch_val", mock_fetch_val)
+    monkeypatch.setattr(token_service, "_revoked_filter", BloomFilter(100))
+
+    response = test_app_no_auth.get("/api/auth/me", headers=auth_headers)
+    assert response.status_code == 200
+    assert lookups == []
+
+    # 他のワーカーで失効させ、差分の取り込みでブルームフィルタに入った状態
+    claims = jwt.decode(
+        auth_headers["Authorization"].split()[1],
+        settings.SECRET_KEY,
+        algorithms=[settings.ALGORITHM],
+    )
+    token_service._revoked_filter.add(claims["jti"])
+
+    response = test_app_no_auth.get("/api/auth/me", headers=auth_headers)
+    assert response.status_code == 401
+    assert len(lookups) == 1
+
+
+def test_refresh_revoked_tokens_incremental(monkeypatch):
+    """差分の取り込みは前回取り込んだ最新の失効以降（重なりを含む）のみを読む"""
+    import asyncio
+    from datetime import datetime
+    from sqlalchemy.dialects import postgresql
+    from app import database
+    from app.core.bloom_filter import BloomFilter
+
+    queries = []
+    created = datetime(2025, 1, 1, 12, 0, 0)
+
+    async def mock_fetch_one(query):
+        queries.append(query.compile(dialect=postgresql.dialect()))
+        return {"jtis": ["a" * 32], "latest": created}
+
+    monkeypatch.setattr(database.database, "fetch_one", mock_fetch_one)
+    monkeypatch.setattr(token_service, "_revoked_filter", BloomFilter(100))
+    monkeypatch.setattr(token_service, "_revoked_since", None)
+
+    asyncio.run(token_service.load_revoked_tokens())
+    assert "a" * 32 in token_service._revoked_filter
+    assert "b" * 32 not in token_service._revoked_filter
+    assert "created_date >" not in str(queries[0])
+
+    asyncio.run(token_service.refresh_revoked_tokens())
+    assert "created_date >" in str(queries[1])
+    assert created - token_service._REVOCATION_OVERLAP in queries[1].params.values()
+
+
+def test_revocation_filter_rebuilt_every_compaction(monkeypatch):
+    """
+    失効を削除しなかった（他のワーカーが削除した）ワーカーも、定期メンテナンスの
+    たびにブルームフィルタを作り直す
+    """
+    import asyncio
+    from app import main
+
+    sleeps, reloads = [], []
+
+    async def mock_sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) > 2:
+            raise asyncio.CancelledError
+
+    async def mock_delete_expired_revoked_tokens():
+        return 0
+
+    async def mock_load_revoked_tokens():
+        reloads.append(True)
+        return 0
+
+    monkeypatch.setattr(main.asyncio, "sleep", mock_sleep)
+    monkeypatch.setattr(
+        token_service,
+        "delete_expired_revoked_tokens",
+        mock_delete_expired_revoked_tokens,
+    )
+    monkeypatch.setattr(token_service, "load_revoked_tokens", mock_load_revoked_tokens)
+
+    # DBに接続していないため、他のメンテナンスは失敗してログに記録される
+    try:
+        asyncio.run(main.compact_periodically())
+    except asyncio.CancelledError:
+        pass
+    assert len(reloads) == 2
+
+
+def test_bloom_filter_error_rate():
+    """追加した要素は必ず陽性になり、偽陽性率は設定値程度に収まる"""
+    from app.core.bloom_filter import BloomFilter
+
+    bloom = BloomFilter(1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"revoked-{i}")
+
+    assert all(f"revoked-{i}" in bloom for i in range(1000))
+    false_positives = sum(f"active-{i}" in bloom for i in range(10000))
+    assert false_positives < 200
+
+
+def test_rotate_refresh_token_single_statement(monkeypatch):
+    """ローテーションは使用済みへの更新と新しいトークンの挿入を1ステートメントで行う"""
+    import asyncio
+    from app import database
+
+    queries = []
+
+    async def mock_fetch_one(query, values=None):
+        queries.append(str(query))
+        return {"user_id": 1, "username": "testuser"}
+
+    monkeypatch.setattr(database.database, "fetch_one", mock_fetch_one)
+
+    session = asyncio.run(token_service.rotate_refresh_token("token"))
+
+    assert session["username"] == "testuser"
+    assert session["refresh_token"] != "token"
+    assert len(queries) == 1
+    assert "UPDATE refresh_tokens" in queries[0]
+    assert "INSERT INTO refresh_tokens" in queries[0]
+
+
 def test_login_invalid_credentials(test_app, monkeypatch):
     """無効な認証情報でのログインテスト"""
 
@@ -103,8 +339,215 @@ def test_get_current_user(test_app, auth_headers, mock_current_user, monkeypatch
     assert response.json()["username"] == "testuser"
 
 
+def test_get_current_user_deactivated(test_app_no_auth, auth_headers, monkeypatch):
+    """無効化（削除中を含む）されたユーザーのトークンは期限前でも401"""
+
+    async def mock_get_by_username(username):
+        return {
+            "id": 1,
+            "username": "testuser",
+            "is_active": False,
+            "created_date": "2024-01-01T00:00:00",
+        }
+
+    monkeypatch.setattr(user_service, "get_by_username", mock_get_by_username)
+
+    response = test_app_no_auth.get("/api/auth/me", headers=auth_headers)
+
+    assert response.status_code == 401
+
+
 def test_get_current_user_unauthorized(test_app_no_auth):
     """認証なしでのユーザー情報取得テスト"""
     response = test_app_no_auth.get("/api/auth/me")
 
     assert response.status_code == 401
+
+
+def test_create_personal_access_token(test_app, auth_headers, monkeypatch):
+    """パーソナルアクセストークンの作成（トークン本体は作成時のみ返す）"""
+
+    async def mock_create(user_id, name, scopes, expires_in_days):
+        return {
+            "id": 1,
+            "name": name,
+            "token_prefix": "mpat_abcdef",
+            "scopes": scopes,
+            "expires_at": None,
+            "last_used_date": None,
+            "created_date": "2024-01-01T00:00:00",
+            "token": "mpat_abcdef-secret",
+        }
+
+    monkeypatch.setattr(token_service, "create_personal_access_token", mock_create)
+
+    response = test_app.post(
+        "/api/auth/tokens",
+        json={"name": "script", "scopes": ["notes:read"]},
+        headers=auth_headers,
+    )
+
+    assert response.status_code == 201
+    assert response.json()["token"] == "mpat_abcdef-secret"
+
+    response = test_app.post(
+        "/api/auth/tokens",
+        json={"name": "script", "scopes": ["users:write"]},
+        headers=auth_headers,
+    )
+    assert response.status_code == 422
+
+
+def test_revoke_personal_access_token_not_found(test_app, auth_headers, monkeypatch):
+    """存在しない（他のユーザーの）トークンの失効は404"""
+
+    async def mock_revoke(token_id, user_id):
+        return False
+
+    monkeypatch.setattr(token_service, "revoke_personal_access_token", mock_revoke)
+
+    response = test_app.delete("/api/auth/tokens/1", headers=auth_headers)
+
+    assert response.status_code == 404
+
+
+def test_personal_access_token_scopes(test_app_no_auth, monkeypatch):
+    """パーソナルアクセストークンはスコープに含まれるAPIのみ使える"""
+    from app.services import note_service
+
+    async def mock_authenticate(token):
+        if token != "mpat_valid":
+            return None
+        return token_service.CachedAccessToken(
+            token_id=1,
+            user={"id": 1, "username": "testuser", "is_active": True},
+            scopes=frozenset({"notes:read"}),
+            expires_at=None,
+            cached_at=0.0,
+        )
+
+    async def mock_get_note(note_id, user_id):
+        return None
+
+    monkeypatch.setattr(
+        token_service, "authenticate_personal_access_token", mock_authenticate
+    )
+    monkeypatch.setattr(note_service, "get_note", mock_get_note)
+    headers = {"Authorization": "Bearer mpat_valid"}
+
+    # 認証を通過し、ノートが存在しないため404
+    assert test_app_no_auth.get("/api/notes/1", headers=headers).status_code == 404
+    response = test_app_no_auth.post(
+        "/api/notes", json={"title": "t", "content": "c"}, headers=headers
+    )
+    assert response.status_code == 403
+    # トークンの管理など、認証APIには使えない
+    response = test_app_no_auth.get("/api/auth/tokens", headers=headers)
+    assert response.status_code == 403
+    response = test_app_no_auth.get(
+        "/api/notes", headers={"Authorization": "Bearer mpat_invalid"}
+    )
+    assert response.status_code == 401
+
+
+def test_personal_access_token_cache_and_usage_flush(monkeypatch):
+    """検証結果はキャッシュし、最後に使われた時刻はまとめて1回で書き込む"""
+    import asyncio
+    from collections import OrderedDict
+    from sqlalchemy.dialects import postgresql
+    from app import database
+
+    queries = []
+
+    async def mock_fetch_one(query):
+        queries.append(query)
+        return {
+            "id": 1,
+            "username": "testuser",
+            "is_active": True,
+            "token_id": 7,
+            "token_scopes": ["notes:write"],
+            "token_expires_in": None,
+        }
+
+    async def mock_execute(query):
+        queries.append(str(query.compile(dialect=postgresql.dialect())))
+        return 1
+
+    monkeypatch.setattr(database.database, "fetch_one", mock_fetch_one)
+    monkeypatch.setattr(database.database, "execute", mock_execute)
+    monkeypatch.setattr(token_service, "_access_tokens", OrderedDict())
+    monkeypatch.setattr(token_service, "_last_used", {})
+
+    async def run():
+        for _ in range(5):
+            entry = await token_service.authenticate_personal_access_token("mpat_x")
+            assert entry.user["username"] == "testuser"
+            assert token_service.scope_allows(entry.scopes, "DELETE", "/api/notes/1")
+            assert token_service.scope_allows(entry.scopes, "GET", "/api/notes")
+            assert not token_service.scope_allows(
+                entry.scopes, "GET", "/api/favorites"
+            )
+        assert len(queries) == 1
+        assert await token_service.flush_personal_access_token_usage() == 1
+        assert await token_service.flush_personal_access_token_usage() == 0
+
+    asyncio.run(run())
+    assert len(queries) == 2
+    assert "UPDATE personal_access_tokens" in queries[1]
+
+
+def test_concurrent_refresh_keeps_session():
+    """
+    同じリフレッシュトークンでの同時の更新（別のワーカー）は1つだけ成功し、系列は
+    失効しない。猶予時間を過ぎてからの再利用では系列ごと失効する
+    """
+    import time
+    import uuid
+    from concurrent.futures import ThreadPoolExecutor
+
+    import httpx
+    from test_invalidation import free_port, start_worker, wait_until_ready
+
+    urls = [f"http://127.0.0.1:{free_port()}" for _ in range(2)]
+    workers = [
+        start_worker(
+            int(url.rsplit(":", 1)[1]), REFRESH_TOKEN_REUSE_GRACE_SECONDS="2"
+        )
+        for url in urls
+    ]
+    try:
+        for url in urls:
+            wait_until_ready(url)
+        clients = [httpx.Client(base_url=url, timeout=30) for url in urls]
+        credentials = {
+            "username": f"test_{uuid.uuid4().hex[:12]}",
+            "password": "password123",
+        }
+        clients[0].post("/api/auth/register", json=credentials)
+        token = clients[0].post("/api/auth/login", data=credentials).json()[
+            "refresh_token"
+        ]
+
+        def refresh(client, refresh_token):
+            return client.post(
+                "/api/auth/refresh", json={"refresh_token": refresh_token}
+            )
+
+        with ThreadPoolExecutor(2) as pool:
+            responses = list(pool.map(refresh, clients, [token, token]))
+        assert sorted(response.status_code for response in responses) == [200, 401]
+        winner = next(r for r in responses if r.status_code == 200).json()
+
+        # 同時の更新では系列を失効させない
+        rotated = refresh(clients[1], winner["refresh_token"])
+        assert rotated.status_code == 200
+
+        time.sleep(2.5)
+        assert refresh(clients[0], token).status_code == 401
+        latest = rotated.json()["refresh_token"]
+        assert refresh(clients[1], latest).status_code == 401
+    finally:
+        for worker in workers:
+            worker.terminate()
+            worker.wait(timeout=10)
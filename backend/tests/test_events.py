@@ -0,0 +1,334 @@
+"""ユーザーごとの変更イベント（/api/events）のテスト
+
+ワーカー間の配信とストリームのテストはローカルの Postgres（DATABASE_URL）に接続して実行する
+"""
+
+import asyncio
+import subprocess
+import time
+import uuid
+from datetime import datetime
+
+import httpx
+import orjson
+import pytest
+from app.api.events import stream_events
+from app.core import events
+from app.core.config import settings
+from app.core.events import RESYNC, EventHub, change_event
+from app.core.invalidation import InvalidationBus
+from test_invalidation import (
+    DSN,
+    free_port,
+    start_worker,
+    wait_until,
+    wait_until_ready,
+)
+
+
+@pytest.fixture
+def hub():
+    hub = EventHub(buffer_size=4)
+    hub.open()
+    return hub
+
+
+def test_change_event():
+    assert change_event("note", 1, "updated", datetime(2024, 1, 2, 3, 4, 5)) == {
+        "type": "note",
+        "id": 1,
+        "op": "updated",
+        "updated_date": "2024-01-02T03:04:05",
+    }
+    assert change_event("favorite", 1, "deleted")["updated_date"] is None
+
+
+async def test_publish_to_own_subscriptions_only(hub):
+    """ユーザーのすべての接続に配信し、他のユーザーの接続には配信しない"""
+    first, second = hub.subscribe(1), hub.subscribe(1)
+    other = hub.subscribe(2)
+    event = change_event("note", 10, "created")
+
+    hub.publish(1, [event])
+
+    assert await first.next_batch(0) == [event]
+    assert await second.next_batch(0) == [event]
+    assert await other.next_batch(0) == []
+    hub.unsubscribe(first)
+    hub.unsubscribe(second)
+    assert hub.connections == 1
+    assert 1 not in hub.subscriptions
+
+
+async def test_overflow_replaced_by_resync(hub):
+    """読み出しが追いつかない接続はイベントを捨てて resync を1つだけ受け取る"""
+    subscription = hub.subscribe(1)
+    for note_id in range(10):
+        hub.publish(1, [change_event("note", note_id, "updated")])
+
+    batch = await subscription.next_batch(0)
+    assert RESYNC in batch
+    assert batch.count(RESYNC) == 1
+    assert len(batch) <= hub.buffer_size
+    # resync の後のイベントは順に届く
+    assert [event["id"] for event in batch[batch.index(RESYNC) + 1 :]] == list(
+        range(10 - len(batch) + 1, 10)
+    )
+
+
+async def test_remote_events_in_order_and_resync(hub):
+    """他のワーカーからのキー（順不同）を送信順に配信し、取りこぼしは resync にする"""
+    subscription = hub.subscribe(1)
+    hub._on_remote_events(
+        [
+            "11|1|note|deleted|5|",
+            "2|2|note|created|6|2024-01-01T00:00:00",
+            "10|1|note|created|5|2024-01-01T00:00:00",
+        ]
+    )
+    assert await subscription.next_batch(0) == [
+        change_event("note", 5, "created", datetime(2024, 1, 1)),
+        change_event("note", 5, "deleted"),
+    ]
+
+    hub._on_remote_events(None)
+    assert await subscription.next_batch(0) == [RESYNC]
+
+
+async def test_close_ends_streams(hub):
+    """終了時は開いている接続を閉じ、以降の接続もすぐに閉じる"""
+    subscription = hub.subscribe(1)
+    hub.close()
+    assert subscription.closed
+    assert await asyncio.wait_for(subscription.next_batch(60), 1) == []
+    assert hub.subscribe(1).closed
+
+
+async def test_disconnect_user_and_token(hub, monkeypatch):
+    """ユーザーまたはアクセストークンの接続を閉じ、他のワーカーにも伝える"""
+    published = []
+    monkeypatch.setattr(
+        events.invalidation_bus, "publish", lambda topic, keys: published.append(keys)
+    )
+    first, second = hub.subscribe(1, "jti-a"), hub.subscribe(1, "jti-b")
+    other = hub.subscribe(2, "jti-c")
+
+    hub.disconnect(jti="jti-a")
+    assert (first.closed, second.closed, other.closed) == (True, False, False)
+    hub.disconnect(user_id=1)
+    assert second.closed and not other.closed
+    assert published == [["token:jti-a"], ["user:1"]]
+
+    hub._on_remote_disconnect(["token:jti-c"])
+    assert other.closed
+    assert len(published) == 2
+
+
+async def test_remote_disconnect_missed_closes_all(hub):
+    """閉じる対象を取りこぼした可能性がある場合は、すべての接続を閉じて再接続させる"""
+    subscriptions = [hub.subscribe(user_id) for user_id in (1, 2)]
+    hub._on_remote_disconnect(None)
+    assert all(subscription.closed for subscription in subscriptions)
+    assert not hub.closed
+
+
+async def test_stream_frames(hub, monkeypatch):
+    """ready・change・resync のフレームとハートビートを送り、終了時に購読を解除する"""
+    monkeypatch.setattr("app.api.events.event_hub", hub)
+    monkeypatch.setattr(settings, "EVENT_STREAM_HEARTBEAT_SECONDS", 0.05)
+    subscription = hub.subscribe(1)
+    stream = stream_events(subscription)
+
+    assert await anext(stream) == b"retry: 3000\n\nevent: ready\n\n"
+    assert await anext(stream) == b": ping\n\n"
+    event = change_event("note", 3, "created")
+    hub.publish(1, [event])
+    subscription.push(RESYNC)
+    assert await anext(stream) == (
+        b"event: change\ndata: " + orjson.dumps(event) + b"\n\nevent: resync\n\n"
+    )
+    hub.close()
+    with pytest.raises(StopAsyncIteration):
+        await anext(stream)
+    assert hub.connections == 0
+
+
+async def test_events_delivered_across_workers(monkeypatch):
+    """他のワーカーで publish したイベントが、複数の NOTIFY に分かれても送信順に届く"""
+    channel = f"test_events_{uuid.uuid4().hex[:8]}"
+    sender_bus, receiver_bus = (
+        InvalidationBus(channel, coalesce_seconds=0.02) for _ in range(2)
+    )
+    sender, receiver = EventHub(buffer_size=500), EventHub(buffer_size=500)
+    receiver.open()
+    receiver_bus.subscribe("events", receiver._on_remote_events)
+    monkeypatch.setattr(events, "invalidation_bus", sender_bus)
+    await sender_bus.start(DSN)
+    await receiver_bus.start(DSN)
+    try:
+        subscription = receiver.subscribe(1)
+        for note_id in range(300):
+            sender.publish(
+                1, [change_event("note", note_id, "updated", datetime(2024, 1, 1))]
+            )
+        sender.publish(2, [change_event("note", 99, "updated")])
+
+        received = []
+
+        async def collect():
+            received.extend(await subscription.next_batch(1))
+            return len(received) >= 300
+
+        deadline = time.monotonic() + 5
+        while not await collect():
+            assert time.monotonic() < deadline, "events were not delivered"
+        assert [event["id"] for event in received] == list(range(300))
+        # 送信の完了（統計の更新）は受信より後になることがある
+        await wait_until(lambda: sender_bus.stats.notifications_sent > 1)
+    finally:
+        await sender_bus.stop()
+        await receiver_bus.stop()
+
+
+def read_events(lines, count: int) -> list:
+    """SSEの行から count 件のイベント（名前, データ）を読む（コメント行は無視）"""
+    received, name, data = [], None, None
+    for line in lines:
+        if line.startswith("event: "):
+            name = line[len("event: ") :]
+        elif line.startswith("data: "):
+            data = orjson.loads(line[len("data: ") :])
+        elif line == "" and name is not None:
+            received.append((name, data))
+            name, data = None, None
+            if len(received) == count:
+                return received
+    raise AssertionError("stream ended")
+
+
+@pytest.fixture
+def workers():
+    """別プロセスの2つのワーカー（URL と Popen）"""
+    urls = [f"http://127.0.0.1:{free_port()}" for _ in range(2)]
+    processes = [start_worker(int(url.rsplit(":", 1)[1])) for url in urls]
+    try:
+        for url in urls:
+            wait_until_ready(url)
+        yield list(zip(urls, processes))
+    finally:
+        for process in processes:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+
+def login(client: httpx.Client, credentials: dict) -> dict:
+    """ログインしてトークン（access_token, refresh_token）を返す"""
+    return client.post("/api/auth/login", data=credentials).json()
+
+
+def register_and_login(client: httpx.Client):
+    credentials = {
+        "username": f"test_{uuid.uuid4().hex[:12]}",
+        "password": "password123",
+    }
+    client.post("/api/auth/register", json=credentials)
+    return credentials, login(client, credentials)
+
+
+def assert_stream_closed(lines, timeout: float = 5) -> None:
+    """ストリームが閉じられる（閉じない場合はハートビートの受信時に失敗する）"""
+    start = time.monotonic()
+    for _ in lines:
+        assert time.monotonic() - start < timeout, "stream was not closed"
+
+
+def test_stream_across_workers_and_shutdown(workers):
+    """
+    別プロセスのワーカーでの書き込みがストリームに届き、
+    終了シグナルを受けたワーカーは開いているストリームを閉じてすぐに終了する
+    """
+    (writer_url, _), (reader_url, reader) = workers
+    writer = httpx.Client(base_url=writer_url, timeout=30)
+    _, tokens = register_and_login(writer)
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    with httpx.stream(
+        "GET", f"{reader_url}/api/events", headers=headers, timeout=30
+    ) as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        lines = response.iter_lines()
+        assert read_events(lines, 1) == [("ready", None)]
+
+        note = writer.post(
+            "/api/notes", json={"title": "T", "content": "C"}, headers=headers
+        ).json()
+        writer.post("/api/favorites", json={"note_id": note["id"]}, headers=headers)
+        writer.delete(f"/api/favorites/{note['id']}", headers=headers)
+        writer.delete(f"/api/notes/{note['id']}", headers=headers)
+
+        received = [data for _, data in read_events(lines, 4)]
+        assert [(data["type"], data["op"]) for data in received] == [
+            ("note", "created"),
+            ("favorite", "created"),
+            ("favorite", "deleted"),
+            ("note", "deleted"),
+        ]
+        assert {data["id"] for data in received} == {note["id"]}
+        assert received[0]["updated_date"] == note["updated_date"]
+
+        start = time.monotonic()
+        reader.terminate()
+        # 閉じないと uvicorn はレスポンスの終了を待ち続ける
+        assert_stream_closed(lines)
+        reader.wait(timeout=5)
+        assert time.monotonic() - start < 5
+
+
+def test_stream_ticket_and_disconnect(workers):
+    """
+    EventSource 用のチケット（使い捨て）で別のワーカーに接続でき、ログアウト・
+    ユーザーの削除で（他のワーカーの）ストリームが閉じられる
+    """
+    (writer_url, _), (reader_url, _) = workers
+    writer = httpx.Client(base_url=writer_url, timeout=30)
+    reader = httpx.Client(base_url=reader_url, timeout=30)
+    credentials, tokens = register_and_login(writer)
+
+    def open_ticket(tokens: dict) -> str:
+        response = writer.post(
+            "/api/events/tickets",
+            headers={"Authorization": f"Bearer {tokens['access_token']}"},
+        )
+        assert response.status_code == 200
+        assert response.json()["expires_in"] == settings.EVENT_STREAM_TICKET_SECONDS
+        return response.json()["ticket"]
+
+    ticket = open_ticket(tokens)
+    with reader.stream("GET", "/api/events", params={"ticket": ticket}) as response:
+        assert response.status_code == 200
+        lines = response.iter_lines()
+        assert read_events(lines, 1) == [("ready", None)]
+        # 使用済みのチケット
+        assert reader.get("/api/events", params={"ticket": ticket}).status_code == 401
+
+        writer.post(
+            "/api/auth/logout",
+            json={"refresh_token": tokens["refresh_token"]},
+            headers={"Authorization": f"Bearer {tokens['access_token']}"},
+        )
+        assert_stream_closed(lines)
+    assert reader.get("/api/events").status_code == 401
+
+    tokens = login(writer, credentials)
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    user_id = writer.get("/api/auth/me", headers=headers).json()["id"]
+    ticket = open_ticket(tokens)
+    with reader.stream("GET", "/api/events", params={"ticket": ticket}) as response:
+        lines = response.iter_lines()
+        assert read_events(lines, 1) == [("ready", None)]
+        writer.delete(f"/api/users/{user_id}/")
+        assert_stream_closed(lines)
@@ -1,5 +1,6 @@
 """お気に入りAPIのテスト"""
 
+from datetime import datetime
 from app.services import favorite_service
 
 
@@ -75,6 +76,7 @@ def test_get_favorites(test_app, auth_headers, mock_current_user, monkeypatch):
             "user_id": 1,
             "created_date": "2024-01-01T00:00:00",
             "updated_date": "2024-01-01T00:00:00",
+            "revision": 1,
         },
         {
             "id": 2,
@@ -83,19 +85,33 @@ def test_get_favorites(test_app, auth_headers, mock_current_user, monkeypatch):
             "user_id": 1,
             "created_date": "2024-01-02T00:00:00",
             "updated_date": "2024-01-02T00:00:00",
+            "revision": 1,
         },
     ]
 
-    async def mock_get_favorites(user_id):
+    async def mock_get_favorites(user_id, fields=None):
         return test_data
 
+    async def mock_get_favorites_version(user_id):
+        return {"count": len(test_data), "last_modified": datetime(2024, 1, 2)}
+
     monkeypatch.setattr(favorite_service, "get_favorites", mock_get_favorites)
+    monkeypatch.setattr(
+        favorite_service, "get_favorites_version", mock_get_favorites_version
+    )
 
     response = test_app.get("/api/favorites", headers=auth_headers)
 
     assert response.status_code == 200
     assert len(response.json()) == 2
 
+    # 変更がなければ304
+    response = test_app.get(
+        "/api/favorites",
+        headers={**auth_headers, "If-None-Match": response.headers["etag"]},
+    )
+    assert response.status_code == 304
+
 
 def test_check_favorite(test_app, auth_headers, mock_current_user, monkeypatch):
     """お気に入りチェックのテスト"""
@@ -0,0 +1,170 @@
+"""ワーカー間のキャッシュ無効化（LISTEN/NOTIFY）のテスト
+
+ローカルの Postgres（DATABASE_URL）に接続して実行する
+"""
+
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+
+import asyncpg
+import httpx
+import pytest
+from app.core import invalidation
+from app.core.config import settings
+from app.core.invalidation import InvalidationBus, decode_message, encode_messages
+
+DSN = settings.DATABASE_URL.replace("postgresql+psycopg", "postgresql")
+
+
+def test_encode_messages_split_and_collapse():
+    """
+    ペイロードの上限で publish された順のまま分割し、キーが多すぎる場合は
+    トピック全体を無効にする
+    """
+    # 文字列として並べ替えると "10|..." が "2|..." より先になる
+    keys = [f"{i}|{'x' * 40}" for i in range(400)]
+    messages = encode_messages("w1", "events", keys)
+    assert len(messages) > 1
+    assert all(len(message) <= invalidation._MAX_PAYLOAD for message in messages)
+    decoded = [decode_message(message) for message in messages]
+    assert {sender for sender, _, _ in decoded} == {"w1"}
+    assert [key for _, _, chunk in decoded for key in chunk] == keys
+
+    messages = encode_messages("w1", "read_cache", range(invalidation._MAX_KEYS + 1))
+    assert [decode_message(message) for message in messages] == [
+        ("w1", "read_cache", None)
+    ]
+
+
+async def wait_until(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        await asyncio.sleep(0.02)
+
+
+@pytest.fixture
+async def buses():
+    """同じチャンネルを購読する2つのバス（2つのワーカーに相当）"""
+    channel = f"test_invalidation_{uuid.uuid4().hex[:8]}"
+    pair = [InvalidationBus(channel, coalesce_seconds=0.05) for _ in range(2)]
+    received = [[], []]
+    for bus, log in zip(pair, received):
+        bus.subscribe("read_cache", log.append)
+    for bus in pair:
+        await bus.start(DSN)
+    # 接続時の全体の無効化は除く
+    for log in received:
+        assert log == [None]
+        log.clear()
+    yield pair, received
+    for bus in pair:
+        await bus.stop()
+
+
+async def test_publish_coalesced_and_delivered(buses):
+    """まとめて1回の NOTIFY で送り、他のワーカーだけが受け取る"""
+    (sender, receiver), (own, remote) = buses
+
+    for user_id in [1, 2, 3, 2, 1] * 20:
+        sender.publish("read_cache", [user_id])
+    await wait_until(lambda: remote)
+
+    assert sorted(remote[0]) == ["1", "2", "3"]
+    assert sender.stats.published == 100
+    assert sender.stats.notifications_sent == 1
+    await asyncio.sleep(0.1)
+    assert own == []
+    assert len(remote) == 1
+
+
+async def test_reconnect_invalidates_everything(buses):
+    """受信用コネクションが切断されたら再接続し、取りこぼした分を含めて全体を無効にする"""
+    (sender, receiver), (_, remote) = buses
+    pid = receiver._connection.get_server_pid()
+
+    admin = await asyncpg.connect(DSN)
+    try:
+        await admin.execute("SELECT pg_terminate_backend($1)", pid)
+    finally:
+        await admin.close()
+    await wait_until(lambda: receiver.stats.reconnects == 1)
+    assert remote == [None]
+
+    sender.publish("read_cache", [7])
+    await wait_until(lambda: len(remote) == 2)
+    assert remote[1] == ["7"]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_worker(port: int, **overrides: str) -> subprocess.Popen:
+    # キャッシュのTTLでは反映されないよう長くする（無効化バスでのみ伝わる）
+    env = {**os.environ, "READ_CACHE_TTL_SECONDS": "3600", **overrides}
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def wait_until_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/").status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("worker did not start")
+
+
+def test_write_in_one_worker_visible_in_another():
+    """別プロセスのワーカーで作成・お気に入り追加したノートが、キャッシュ済みの一覧に反映される"""
+    urls = [f"http://127.0.0.1:{free_port()}" for _ in range(2)]
+    workers = [start_worker(int(url.rsplit(":", 1)[1])) for url in urls]
+    try:
+        for url in urls:
+            wait_until_ready(url)
+        writer, reader = (httpx.Client(base_url=url, timeout=30) for url in urls)
+        credentials = {
+            "username": f"test_{uuid.uuid4().hex[:12]}",
+            "password": "password123",
+        }
+        writer.post("/api/auth/register", json=credentials)
+        token = writer.post("/api/auth/login", data=credentials).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        # 読み取り側のワーカーに空の一覧をキャッシュさせる
+        for _ in range(2):
+            assert reader.get("/api/notes", headers=headers).json() == []
+            assert reader.get("/api/favorites", headers=headers).json() == []
+
+        note = writer.post(
+            "/api/notes", json={"title": "T", "content": "C"}, headers=headers
+        ).json()
+        writer.post("/api/favorites", json={"note_id": note["id"]}, headers=headers)
+
+        deadline = time.monotonic() + 5
+        while True:
+            notes = reader.get("/api/notes", headers=headers).json()
+            favorites = reader.get("/api/favorites", headers=headers).json()
+            if len(notes) == 1 and len(favorites) == 1:
+                break
+            assert time.monotonic() < deadline, "write was not propagated"
+            time.sleep(0.05)
+    finally:
+        for worker in workers:
+            worker.terminate()
+            worker.wait()
@@ -0,0 +1,148 @@
+"""ノートのリビジョン履歴のテスト"""
+
+import pytest
+from datetime import datetime
+from app.core import text_delta
+from app.core.config import settings
+from app.services import note_service
+
+
+@pytest.mark.parametrize(
+    "base,target",
+    [
+        ("a\nb\nc\n", "a\nB\nc\n"),
+        ("a\nb\nc", "a\nb\nc\nd"),
+        ("", "new\n"),
+        ("old\n", ""),
+        ("same\n" * 50, "same\n" * 20 + "changed\n" + "same\n" * 30),
+    ],
+)
+def test_delta_round_trip(base, target):
+    """差分を適用すると元のテキストが復元される"""
+    delta = text_delta.decode_delta(
+        text_delta.encode_delta(text_delta.make_delta(base, target))
+    )
+    assert text_delta.apply_delta(base, delta) == target
+
+
+def test_apply_edits():
+    """文字範囲の編集を元のテキストの位置で適用"""
+    text = "hello world"
+    edits = [(6, 11, "there"), (0, 0, ">> "), (5, 5, ",")]
+    assert text_delta.apply_edits(text, edits) == ">> hello, there"
+
+    with pytest.raises(ValueError):
+        text_delta.apply_edits(text, [(0, 5, ""), (3, 7, "")])
+    with pytest.raises(ValueError):
+        text_delta.apply_edits(text, [(10, 20, "")])
+
+
+def test_revision_values_snapshot_interval(monkeypatch):
+    """間隔ごとに全文、それ以外は差分を保存する"""
+    monkeypatch.setattr(settings, "NOTE_REVISION_SNAPSHOT_INTERVAL", 3)
+    base = "line\n" * 100
+    note = {"id": 1, "user_id": 1, "title": "T", "content": base + "more\n"}
+
+    assert "content" in note_service._revision_values({**note, "revision": 1})
+    assert "delta" in note_service._revision_values({**note, "revision": 2}, base)
+    assert "delta" in note_service._revision_values({**note, "revision": 3}, base)
+    assert "content" in note_service._revision_values({**note, "revision": 4}, base)
+
+    # 差分が全文より大きくなる場合は全文を保存
+    rewritten = {**note, "revision": 2, "content": "x"}
+    assert "content" in note_service._revision_values(rewritten, base)
+
+
+@pytest.mark.asyncio
+async def test_get_revision_applies_deltas(monkeypatch):
+    """スナップショットから差分を順に適用してリビジョンを復元"""
+    v1 = "a\nb\nc\n"
+    v2 = "a\nB\nc\n"
+    v3 = "a\nB\nc\nd\n"
+    rows = [
+        {"note_id": 1, "revision": 1, "title": "T1", "content": v1, "delta": None},
+        {
+            "note_id": 1,
+            "revision": 2,
+            "title": "T2",
+            "content": None,
+            "delta": text_delta.encode_delta(text_delta.make_delta(v1, v2)),
+        },
+        {
+            "note_id": 1,
+            "revision": 3,
+            "title": "T3",
+            "content": None,
+            "delta": text_delta.encode_delta(text_delta.make_delta(v2, v3)),
+            "created_date": datetime(2024, 1, 3),
+        },
+    ]
+
+    async def mock_fetch_all(query):
+        return rows
+
+    from app import database
+
+    monkeypatch.setattr(database.database, "fetch_all", mock_fetch_all)
+
+    result = await note_service.get_revision(1, 1, 3)
+    assert result["content"] == v3
+    assert result["title"] == "T3"
+
+    # 要求したリビジョンが存在しない
+    assert await note_service.get_revision(1, 1, 4) is None
+
+
+def test_get_note_revisions(test_app, auth_headers, mock_current_user, monkeypatch):
+    """リビジョン一覧の取得"""
+
+    async def mock_get_revisions(note_id, user_id, before=None, limit=50):
+        if note_id != 1:
+            return []
+        return [
+            {
+                "revision": 2,
+                "title": "Edited",
+                "is_snapshot": False,
+                "created_date": "2024-01-02T00:00:00",
+            },
+            {
+                "revision": 1,
+                "title": "Original",
+                "is_snapshot": True,
+                "created_date": "2024-01-01T00:00:00",
+            },
+        ]
+
+    monkeypatch.setattr(note_service, "get_revisions", mock_get_revisions)
+
+    response = test_app.get("/api/notes/1/revisions", headers=auth_headers)
+    assert response.status_code == 200
+    assert [r["revision"] for r in response.json()] == [2, 1]
+
+    response = test_app.get("/api/notes/999/revisions", headers=auth_headers)
+    assert response.status_code == 404
+
+
+def test_get_note_revision(test_app, auth_headers, mock_current_user, monkeypatch):
+    """特定リビジョンの取得"""
+
+    async def mock_get_revision(note_id, user_id, revision):
+        if revision != 1:
+            return None
+        return {
+            "note_id": note_id,
+            "revision": 1,
+            "title": "Original",
+            "content": "Original content",
+            "created_date": "2024-01-01T00:00:00",
+        }
+
+    monkeypatch.setattr(note_service, "get_revision", mock_get_revision)
+
+    response = test_app.get("/api/notes/1/revisions/1", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["content"] == "Original content"
+
+    response = test_app.get("/api/notes/1/revisions/5", headers=auth_headers)
+    assert response.status_code == 404
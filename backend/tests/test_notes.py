@@ -3,6 +3,7 @@
 import json
 from datetime import datetime
 from app.services import note_service
+from app.schemas.note_schema import NOTE_LIST_FIELDS, NOTE_SUMMARY_FIELDS
 
 
 def test_create_note(test_app, auth_headers, mock_current_user, monkeypatch):
@@ -17,6 +18,7 @@ def test_create_note(test_app, auth_headers, mock_current_user, monkeypatch):
             "user_id": user_id,
             "created_date": "2024-01-01T00:00:00",
             "updated_date": "2024-01-01T00:00:00",
+            "revision": 1,
         }
 
     monkeypatch.setattr(note_service, "create_note", mock_create_note)
@@ -47,6 +49,7 @@ def test_get_notes(test_app, auth_headers, mock_current_user, monkeypatch):
             "user_id": 1,
             "created_date": "2024-01-01T00:00:00",
             "updated_date": "2024-01-01T00:00:00",
+            "revision": 1,
         },
         {
             "id": 2,
@@ -55,13 +58,18 @@ def test_get_notes(test_app, auth_headers, mock_current_user, monkeypatch):
             "user_id": 1,
             "created_date": "2024-01-02T00:00:00",
             "updated_date": "2024-01-02T00:00:00",
+            "revision": 1,
         },
     ]
 
-    async def mock_get_all_notes(user_id):
+    async def mock_get_all_notes(user_id, fields=None):
         return test_data
 
+    async def mock_get_notes_version(user_id):
+        return {"count": len(test_data), "last_modified": datetime(2024, 1, 2)}
+
     monkeypatch.setattr(note_service, "get_all_notes", mock_get_all_notes)
+    monkeypatch.setattr(note_service, "get_notes_version", mock_get_notes_version)
 
     response = test_app.get("/api/notes", headers=auth_headers)
 
@@ -69,6 +77,49 @@ def test_get_notes(test_app, auth_headers, mock_current_user, monkeypatch):
     assert len(response.json()) == 2
 
 
+def test_get_notes_serializes_records(
+    test_app, auth_headers, mock_current_user, monkeypatch
+):
+    """ノート一覧がレコードから直接JSON化されるテスト"""
+    test_data = [
+        {
+            "id": 1,
+            "title": "Note 1",
+            "content": "Content 1",
+            "user_id": 1,
+            "created_date": datetime(2024, 1, 1),
+            "updated_date": datetime(2024, 1, 1, 12, 30, 0, 123456),
+            "revision": 1,
+            "extra_column": "should not be returned",
+        }
+    ]
+
+    async def mock_get_all_notes(user_id, fields=None):
+        return test_data
+
+    async def mock_get_notes_version(user_id):
+        return {"count": len(test_data), "last_modified": datetime(2024, 1, 2)}
+
+    monkeypatch.setattr(note_service, "get_all_notes", mock_get_all_notes)
+    monkeypatch.setattr(note_service, "get_notes_version", mock_get_notes_version)
+
+    response = test_app.get("/api/notes", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == [
+        {
+            "id": 1,
+            "title": "Note 1",
+            "content": "Content 1",
+            "user_id": 1,
+            "created_date": "2024-01-01T00:00:00",
+            "updated_date": "2024-01-01T12:30:00.123456",
+            "revision": 1,
+        }
+    ]
+
+
 def test_get_note(test_app, auth_headers, mock_current_user, monkeypatch):
     """ノート詳細取得のテスト"""
     test_data = {
@@ -78,6 +129,7 @@ def test_get_note(test_app, auth_headers, mock_current_user, monkeypatch):
         "user_id": 1,
         "created_date": "2024-01-01T00:00:00",
         "updated_date": "2024-01-01T00:00:00",
+        "revision": 1,
     }
 
     async def mock_get_note(note_id, user_id):
@@ -108,7 +160,7 @@ def test_update_note(test_app, auth_headers, mock_current_user, monkeypatch):
     """ノート更新のテスト"""
     test_payload = {"title": "Updated Title", "content": "Updated content"}
 
-    async def mock_update_note(note_id, user_id, payload):
+    async def mock_update_note(note_id, user_id, payload, expected_updated_date=None):
         return {
             "id": 1,
             "title": "Updated Title",
@@ -116,6 +168,7 @@ def test_update_note(test_app, auth_headers, mock_current_user, monkeypatch):
             "user_id": user_id,
             "created_date": "2024-01-01T00:00:00",
             "updated_date": "2024-01-02T00:00:00",
+            "revision": 1,
         }
 
     monkeypatch.setattr(note_service, "update_note", mock_update_note)
@@ -130,7 +183,7 @@ def test_update_note_not_found(test_app, auth_headers, mock_current_user, monkey
     """存在しないノートの更新テスト"""
     test_payload = {"title": "Updated Title"}
 
-    async def mock_update_note(note_id, user_id, payload):
+    async def mock_update_note(note_id, user_id, payload, expected_updated_date=None):
         return None
 
     monkeypatch.setattr(note_service, "update_note", mock_update_note)
@@ -140,6 +193,187 @@ def test_update_note_not_found(test_app, auth_headers, mock_current_user, monkey
     assert response.status_code == 404
 
 
+def test_get_notes_not_modified(
+    test_app, auth_headers, mock_current_user, monkeypatch
+):
+    """ETagが一致する場合は一覧を取得せずに304を返すテスト"""
+
+    fetch_calls = []
+
+    async def mock_get_notes_version(user_id):
+        return {"count": 0, "last_modified": None}
+
+    async def mock_get_all_notes(user_id, fields=None):
+        fetch_calls.append(user_id)
+        return []
+
+    monkeypatch.setattr(note_service, "get_notes_version", mock_get_notes_version)
+    monkeypatch.setattr(note_service, "get_all_notes", mock_get_all_notes)
+
+    response = test_app.get("/api/notes", headers=auth_headers)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"')
+    assert len(fetch_calls) == 1
+
+    response = test_app.get(
+        "/api/notes", headers={**auth_headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert len(fetch_calls) == 1
+
+
+def test_get_note_not_modified(test_app, auth_headers, mock_current_user, monkeypatch):
+    """単一ノートのETagが一致する場合は304を返すテスト"""
+    test_data = {
+        "id": 1,
+        "title": "Test Note",
+        "content": "Test content",
+        "user_id": 1,
+        "created_date": datetime(2024, 1, 1),
+        "updated_date": datetime(2024, 1, 1),
+        "revision": 1,
+    }
+
+    async def mock_get_note(note_id, user_id):
+        return test_data
+
+    monkeypatch.setattr(note_service, "get_note", mock_get_note)
+
+    response = test_app.get("/api/notes/1", headers=auth_headers)
+    etag = response.headers["etag"]
+
+    response = test_app.get(
+        "/api/notes/1", headers={**auth_headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+def test_update_note_if_match(test_app, auth_headers, mock_current_user, monkeypatch):
+    """If-Matchによる楽観的同時実行制御のテスト"""
+    current = {
+        "id": 1,
+        "title": "Test Note",
+        "content": "Test content",
+        "user_id": 1,
+        "created_date": datetime(2024, 1, 1),
+        "updated_date": datetime(2024, 1, 1),
+        "revision": 1,
+    }
+    calls = []
+
+    async def mock_get_note(note_id, user_id):
+        return current
+
+    async def mock_update_note(note_id, user_id, payload, expected_updated_date=None):
+        calls.append(expected_updated_date)
+        return {**current, "title": payload.title, "updated_date": datetime(2024, 1, 2)}
+
+    monkeypatch.setattr(note_service, "get_note", mock_get_note)
+    monkeypatch.setattr(note_service, "update_note", mock_update_note)
+
+    etag = test_app.get("/api/notes/1", headers=auth_headers).headers["etag"]
+
+    # 古いETagでは更新できない
+    response = test_app.put(
+        "/api/notes/1",
+        json={"title": "Updated"},
+        headers={**auth_headers, "If-Match": 'W/"1-0"'},
+    )
+    assert response.status_code == 412
+    assert calls == []
+
+    response = test_app.put(
+        "/api/notes/1",
+        json={"title": "Updated"},
+        headers={**auth_headers, "If-Match": etag},
+    )
+    assert response.status_code == 200
+    assert calls == [datetime(2024, 1, 1)]
+    assert response.headers["etag"] != etag
+
+
+def test_update_note_if_match_lost_race(
+    test_app, auth_headers, mock_current_user, monkeypatch
+):
+    """確認後に他で更新された場合は412を返すテスト"""
+    current = {
+        "id": 1,
+        "title": "Test Note",
+        "content": "Test content",
+        "user_id": 1,
+        "created_date": datetime(2024, 1, 1),
+        "updated_date": datetime(2024, 1, 1),
+        "revision": 1,
+    }
+
+    async def mock_get_note(note_id, user_id):
+        return current
+
+    async def mock_update_note(note_id, user_id, payload, expected_updated_date=None):
+        return None
+
+    monkeypatch.setattr(note_service, "get_note", mock_get_note)
+    monkeypatch.setattr(note_service, "update_note", mock_update_note)
+
+    etag = test_app.get("/api/notes/1", headers=auth_headers).headers["etag"]
+    response = test_app.put(
+        "/api/notes/1",
+        json={"title": "Updated"},
+        headers={**auth_headers, "If-Match": etag},
+    )
+    assert response.status_code == 412
+
+
+def test_get_note_changes(test_app, auth_headers, mock_current_user, monkeypatch):
+    """差分同期のテスト"""
+    calls = []
+
+    async def mock_get_changes(user_id, since, limit):
+        calls.append((since, limit))
+        return {
+            "changes": [
+                {
+                    "id": 1,
+                    "title": "Note 1",
+                    "content": "Content 1",
+                    "user_id": 1,
+                    "created_date": datetime(2024, 1, 1),
+                    "updated_date": datetime(2024, 1, 2),
+                    "revision": 1,
+                    "change_seq": 5,
+                }
+            ],
+            "deleted": [2],
+            "cursor": "6.2.0",
+            "has_more": False,
+            "reset": False,
+        }
+
+    monkeypatch.setattr(note_service, "get_changes", mock_get_changes)
+
+    response = test_app.get(
+        "/api/notes/changes?since=4.3.0&limit=50", headers=auth_headers
+    )
+
+    assert response.status_code == 200
+    assert calls == [((4, 3, 0), 50)]
+    data = response.json()
+    assert data["changes"][0]["id"] == 1
+    assert "change_seq" not in data["changes"][0]
+    assert data["deleted"] == [2]
+    assert data["cursor"] == "6.2.0"
+
+
+def test_get_note_changes_invalid_cursor(test_app, auth_headers, mock_current_user):
+    """不正な同期カーソルのテスト"""
+    response = test_app.get("/api/notes/changes?since=abc", headers=auth_headers)
+
+    assert response.status_code == 400
+
+
 def test_delete_note(test_app, auth_headers, mock_current_user, monkeypatch):
     """ノート削除のテスト"""
 
@@ -186,8 +420,247 @@ def test_import_notes(test_app, auth_headers, mock_current_user, monkeypatch):
     assert response.json()["count"] == 2
 
 
+def test_import_notes_in_chunks(test_app, auth_headers, mock_current_user, monkeypatch):
+    """1ステートメントの上限を超えないよう、複数の INSERT に分けてインポートする"""
+    chunks = []
+
+    async def mock_insert_notes(notes, user_id):
+        chunks.append(len(notes))
+        return [{"id": i, "updated_date": None} for i in range(len(notes))]
+
+    monkeypatch.setattr(note_service, "insert_notes", mock_insert_notes)
+    monkeypatch.setattr(note_service, "_IMPORT_CHUNK_SIZE", 3)
+
+    response = test_app.post(
+        "/api/notes/import",
+        json=[{"title": f"Note {i}", "content": "Content"} for i in range(7)],
+        headers=auth_headers,
+    )
+
+    assert response.status_code == 201
+    assert response.json()["count"] == 7
+    assert chunks == [3, 3, 1]
+
+
 def test_import_notes_empty(test_app, auth_headers, mock_current_user):
     """空のノートインポートテスト"""
     response = test_app.post("/api/notes/import", json=[], headers=auth_headers)
 
     assert response.status_code == 400
+
+
+def test_patch_note(test_app, auth_headers, mock_current_user, monkeypatch):
+    """編集範囲のみを送る部分更新"""
+    calls = []
+
+    async def mock_patch_note(note_id, user_id, patch):
+        calls.append(patch)
+        if note_id == 999:
+            return None
+        if patch.base_revision != 3:
+            raise note_service.RevisionConflictError(3)
+        if patch.edits and patch.edits[0].end > 100:
+            raise ValueError("Edit range 0-1000 is out of bounds")
+        return {
+            "id": note_id,
+            "title": "Note",
+            "content": "Hello, World",
+            "user_id": user_id,
+            "created_date": datetime(2024, 1, 1),
+            "updated_date": datetime(2024, 1, 2),
+            "revision": 4,
+        }
+
+    monkeypatch.setattr(note_service, "patch_note", mock_patch_note)
+
+    payload = {"base_revision": 3, "edits": [{"start": 5, "end": 5, "text": ","}]}
+    response = test_app.patch("/api/notes/1", json=payload, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["revision"] == 4
+    assert "etag" in response.headers
+    assert calls[0].edits[0].text == ","
+
+    # 古いベースリビジョン
+    response = test_app.patch(
+        "/api/notes/1", json={**payload, "base_revision": 2}, headers=auth_headers
+    )
+    assert response.status_code == 409
+
+    # 不正な編集範囲
+    response = test_app.patch(
+        "/api/notes/1",
+        json={"base_revision": 3, "edits": [{"start": 0, "end": 1000, "text": ""}]},
+        headers=auth_headers,
+    )
+    assert response.status_code == 400
+
+    response = test_app.patch("/api/notes/999", json=payload, headers=auth_headers)
+    assert response.status_code == 404
+
+
+def test_batch_notes(test_app, auth_headers, mock_current_user, monkeypatch):
+    """複数の作成・更新・削除を1リクエストで実行"""
+    note = {
+        "id": 5,
+        "title": "Created",
+        "content": "Content",
+        "user_id": 1,
+        "created_date": datetime(2024, 1, 1),
+        "updated_date": datetime(2024, 1, 1),
+        "revision": 1,
+    }
+
+    async def mock_batch_notes(operations, user_id):
+        assert [op.op for op in operations] == ["create", "update", "delete"]
+        return [
+            {"index": 0, "op": "create", "id": 5, "status": 201, "note": note},
+            {"index": 1, "op": "update", "id": 2, "status": 404, "note": None},
+            {"index": 2, "op": "delete", "id": 3, "status": 204},
+        ]
+
+    monkeypatch.setattr(note_service, "batch_notes", mock_batch_notes)
+
+    payload = {
+        "operations": [
+            {"op": "create", "title": "Created", "content": "Content"},
+            {"op": "update", "id": 2, "title": "Renamed"},
+            {"op": "delete", "id": 3},
+        ]
+    }
+    response = test_app.post("/api/notes/batch", json=payload, headers=auth_headers)
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == [201, 404, 204]
+    assert results[0]["note"]["title"] == "Created"
+
+
+def test_batch_notes_invalid(test_app, auth_headers, mock_current_user, monkeypatch):
+    """不正な操作・同じノートへの重複した操作"""
+
+    async def mock_batch_notes(operations, user_id):
+        raise ValueError("Each note can be targeted by only one operation")
+
+    monkeypatch.setattr(note_service, "batch_notes", mock_batch_notes)
+
+    response = test_app.post(
+        "/api/notes/batch",
+        json={"operations": [{"op": "move", "id": 1}]},
+        headers=auth_headers,
+    )
+    assert response.status_code == 422
+
+    response = test_app.post(
+        "/api/notes/batch",
+        json={"operations": [{"op": "delete", "id": 1}, {"op": "delete", "id": 1}]},
+        headers=auth_headers,
+    )
+    assert response.status_code == 400
+
+
+def test_get_notes_summary_view(test_app, auth_headers, mock_current_user, monkeypatch):
+    """view=summary / fields= で指定したフィールドのみ返す"""
+    calls = []
+
+    async def mock_get_notes_version(user_id):
+        return {"count": 1, "last_modified": datetime(2024, 1, 1)}
+
+    async def mock_get_all_notes(user_id, fields=None):
+        calls.append(fields)
+        record = {
+            "id": 1,
+            "title": "Note",
+            "preview": "Long content...",
+            "updated_date": datetime(2024, 1, 1),
+            "revision": 1,
+        }
+        return [{field: record[field] for field in fields}]
+
+    monkeypatch.setattr(note_service, "get_notes_version", mock_get_notes_version)
+    monkeypatch.setattr(note_service, "get_all_notes", mock_get_all_notes)
+
+    response = test_app.get("/api/notes?view=summary", headers=auth_headers)
+    assert response.status_code == 200
+    assert set(response.json()[0]) == {
+        "id",
+        "title",
+        "preview",
+        "updated_date",
+        "revision",
+    }
+    summary_etag = response.headers["etag"]
+
+    response = test_app.get("/api/notes?fields=title,preview", headers=auth_headers)
+    assert response.status_code == 200
+    assert calls[-1] == ("id", "title", "preview")
+    assert response.json() == [{"id": 1, "title": "Note", "preview": "Long content..."}]
+
+    # フィールドが異なればETagも異なる
+    assert response.headers["etag"] != summary_etag
+
+    response = test_app.get("/api/notes?fields=title,password", headers=auth_headers)
+    assert response.status_code == 400
+
+    response = test_app.get("/api/notes?view=compact", headers=auth_headers)
+    assert response.status_code == 422
+
+
+def test_list_response_schema_documents_projections(test_app):
+    """一覧の OpenAPI スキーマは view=summary / fields= の形も含む"""
+    spec = test_app.get("/openapi.json").json()
+    schemas = spec["components"]["schemas"]
+    assert set(schemas["NoteSummary"]["required"]) == set(NOTE_SUMMARY_FIELDS)
+    assert schemas["NoteFieldsResponse"]["required"] == ["id"]
+    assert set(schemas["NoteFieldsResponse"]["properties"]) == set(NOTE_LIST_FIELDS)
+    for path in ("/api/notes", "/api/favorites"):
+        content = spec["paths"][path]["get"]["responses"]["200"]["content"]
+        variants = content["application/json"]["schema"]["anyOf"]
+        assert [variant["items"]["$ref"].rsplit("/", 1)[1] for variant in variants] == [
+            "NoteResponse",
+            "NoteSummary",
+            "NoteFieldsResponse",
+        ]
+
+
+async def test_get_changes_reads_one_snapshot(db, db_user, monkeypatch):
+    """
+    ノートと墓標の読み取りの間にコミットされた更新・削除で、カーソルが更新を
+    飛び越えない（同じスナップショットで読む）
+    """
+    import asyncio
+    from app.schemas.note_schema import NoteCreate, NoteUpdate
+
+    user_id = db_user["id"]
+    first, second = [
+        await note_service.create_note(NoteCreate(title=title, content="C"), user_id)
+        for title in ("first", "second")
+    ]
+    synced = await note_service.get_changes(user_id, None, 100)
+    since = note_service.parse_sync_cursor(synced["cursor"])
+
+    fetch_all = db.fetch_all
+    calls = []
+
+    async def fetch_all_with_concurrent_writes(query, values=None):
+        rows = await fetch_all(query, values)
+        calls.append(query)
+        if len(calls) == 1:
+            # 別のコネクション（タスク）で更新と削除をコミットする
+            async def write():
+                await note_service.update_note(
+                    first["id"], user_id, NoteUpdate(title="updated")
+                )
+                await note_service.delete_note(second["id"], user_id)
+
+            await asyncio.create_task(write())
+        return rows
+
+    monkeypatch.setattr(db, "fetch_all", fetch_all_with_concurrent_writes)
+    result = await note_service.get_changes(user_id, since, 100)
+    monkeypatch.setattr(db, "fetch_all", fetch_all)
+    assert (result["changes"], result["deleted"]) == ([], [])
+
+    result = await note_service.get_changes(
+        user_id, note_service.parse_sync_cursor(result["cursor"]), 100
+    )
+    assert [note["title"] for note in result["changes"]] == ["updated"]
+    assert result["deleted"] == [second["id"]]
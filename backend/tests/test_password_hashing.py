@@ -0,0 +1,115 @@
+"""パスワードハッシュのコスト計測と作り直しのテスト"""
+
+import pytest
+from app.core import password_hashing
+from app.core.config import settings
+from app.core.password_hashing import HashParams
+from app.services import user_service
+
+
+@pytest.fixture(autouse=True)
+def reset_params():
+    """テストごとにパラメータを計測前の状態に戻す"""
+    yield
+    password_hashing.set_params(None)
+
+
+def test_calibrate_bcrypt_rounds(monkeypatch):
+    """計測した時間から、目標時間に収まる最も重いコストを選ぶ"""
+    monkeypatch.setattr(settings, "PASSWORD_HASH_BCRYPT_ROUNDS", 0)
+    # コスト8のハッシュが1回2ミリ秒かかる時計
+    ticks = iter(i * 0.001 for i in range(100))
+
+    def clock():
+        return next(ticks) * 2
+
+    # 2ms × 2^(r-8) <= 300ms → r = 15
+    params = password_hashing.calibrate("bcrypt", target_ms=300, clock=clock)
+    assert params.rounds == 15
+
+    # 目標が短すぎても下限（以前の既定値12）より軽くはしない
+    ticks = iter(i * 0.001 for i in range(100))
+    params = password_hashing.calibrate("bcrypt", target_ms=1, clock=clock)
+    assert params.rounds == 12
+    # 遅いCPU（コスト8で40ms）で目標に収まらない場合も同じ
+    ticks = iter(i * 0.001 for i in range(100))
+    params = password_hashing.calibrate(
+        "bcrypt", target_ms=250, clock=lambda: next(ticks) * 40
+    )
+    assert params.rounds == 12
+
+
+def test_calibrate_fixed_rounds(monkeypatch):
+    """設定でコストを固定した場合は計測しない（下限より低いコストも明示すれば使える）"""
+    monkeypatch.setattr(settings, "PASSWORD_HASH_BCRYPT_ROUNDS", 5)
+
+    def clock():
+        raise AssertionError("must not measure")
+
+    assert password_hashing.calibrate("bcrypt", clock=clock).rounds == 5
+
+
+def test_verify_and_update_upgrades_weaker_hash():
+    """保存されたハッシュが現在のコストより弱い場合のみ作り直す"""
+    password_hashing.set_params(HashParams(rounds=4))
+    weak = password_hashing.hash_password("password123")
+    assert weak.startswith("$2b$04$")
+
+    password_hashing.set_params(HashParams(rounds=5))
+    assert password_hashing.verify_and_update("wrong", weak) == (False, None)
+    verified, new_hash = password_hashing.verify_and_update("password123", weak)
+    assert verified
+    assert new_hash.startswith("$2b$05$")
+    assert password_hashing.verify_password("password123", new_hash)
+
+    # 強いハッシュは（計測結果が低いワーカーでも）作り直さない
+    password_hashing.set_params(HashParams(rounds=4))
+    assert password_hashing.verify_and_update("password123", new_hash) == (True, None)
+
+
+def test_verify_and_update_switches_scheme():
+    """方式を argon2id に変更すると、ログイン時に bcrypt のハッシュを置き換える"""
+    pytest.importorskip("argon2")
+    password_hashing.set_params(HashParams(rounds=4))
+    old = password_hashing.hash_password("password123")
+
+    password_hashing.set_params(
+        HashParams(scheme="argon2id", time_cost=2, memory_cost=1024)
+    )
+    verified, new_hash = password_hashing.verify_and_update("password123", old)
+    assert verified
+    assert new_hash.startswith("$argon2id$v=19$m=1024,t=2,p=1$")
+    assert password_hashing.verify_and_update("password123", new_hash) == (True, None)
+    assert not password_hashing.verify_password("wrong", new_hash)
+
+
+@pytest.mark.asyncio
+async def test_authenticate_user_rehashes(monkeypatch):
+    """ログイン成功時に、弱いハッシュを作り直して保存する"""
+    from sqlalchemy.dialects import postgresql
+    from app import database
+
+    password_hashing.set_params(HashParams(rounds=4))
+    old = password_hashing.hash_password("password123")
+    password_hashing.set_params(HashParams(rounds=5))
+    updates = []
+
+    async def mock_get_by_username(username):
+        return {"id": 1, "username": username, "is_active": True, "password_hash": old}
+
+    async def mock_execute(query):
+        updates.append(query.compile(dialect=postgresql.dialect()).params)
+        return 1
+
+    monkeypatch.setattr(user_service, "get_by_username", mock_get_by_username)
+    monkeypatch.setattr(database.database, "execute", mock_execute)
+
+    assert await user_service.authenticate_user("testuser", "wrong") is None
+    assert updates == []
+
+    user = await user_service.authenticate_user("testuser", "password123")
+    assert user["id"] == 1
+    assert len(updates) == 1
+    assert updates[0]["password_hash"].startswith("$2b$05$")
+    # 同時にパスワードが変更されていた場合は上書きしない
+    assert updates[0]["password_hash_1"] == old
@@ -0,0 +1,242 @@
+"""エンドポイントごとのクエリ数のテスト
+
+作成・更新・削除は存在確認や重複チェックを含めて1ステートメントで行う。
+末尾のテストは、それらのステートメントを実際のDB（ローカルの Postgres）で実行する。
+"""
+
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from app import database
+from app.core import rate_limit
+from app.schemas.favorite_schema import FavoriteCreate
+from app.schemas.note_schema import NoteCreate
+from app.schemas.user_schema import UserCreate
+from app.services import ai_service, favorite_service, note_service, user_service
+
+USER = {
+    "id": 1,
+    "username": "testuser",
+    "is_active": True,
+    "created_date": datetime(2024, 1, 1),
+}
+NOTE = {
+    "id": 1,
+    "title": "Test Note",
+    "content": "Test Content",
+    "user_id": 1,
+    "created_date": datetime(2024, 1, 1),
+    "updated_date": datetime(2024, 1, 1),
+    "revision": 1,
+}
+
+
+@pytest.fixture
+def queries(test_app, monkeypatch):
+    """DBへのクエリを記録し、row に設定した行を返す"""
+
+    class QueryLog(list):
+        row = None
+
+    log = QueryLog()
+
+    async def mock_fetch_one(query, values=None):
+        log.append(query)
+        return log.row
+
+    async def mock_fetch_all(query, values=None):
+        log.append(query)
+        return [log.row] if log.row else []
+
+    async def mock_fetch_val(query, values=None, column=0):
+        log.append(query)
+        return None
+
+    async def mock_execute(query, values=None):
+        log.append(query)
+        return 1
+
+    monkeypatch.setattr(database.database, "fetch_one", mock_fetch_one)
+    monkeypatch.setattr(database.database, "fetch_all", mock_fetch_all)
+    monkeypatch.setattr(database.database, "fetch_val", mock_fetch_val)
+    monkeypatch.setattr(database.database, "execute", mock_execute)
+
+    # 削除の受付で起こされるバックグラウンドの削除処理のクエリは数えない
+    async def mock_process_account_deletions():
+        return 0
+
+    monkeypatch.setattr(
+        user_service, "process_account_deletions", mock_process_account_deletions
+    )
+    return log
+
+
+def test_add_favorite_query_count(test_app, auth_headers, queries):
+    """お気に入り追加: ノートの存在確認と追加（重複時は既存を返す）で1クエリ"""
+    queries.row = {
+        "id": 1,
+        "user_id": 1,
+        "note_id": 1,
+        "created_date": datetime(2024, 1, 1),
+    }
+
+    response = test_app.post(
+        "/api/favorites", json={"note_id": 1}, headers=auth_headers
+    )
+
+    assert response.status_code == 201
+    assert len(queries) == 1
+
+
+def test_register_query_count(test_app, queries):
+    """ユーザー登録: 重複チェックと作成で1クエリ"""
+    queries.row = USER
+
+    response = test_app.post(
+        "/api/auth/register", json={"username": "testuser", "password": "password123"}
+    )
+
+    assert response.status_code == 201
+    assert len(queries) == 1
+
+
+@pytest.mark.parametrize(
+    "method, kwargs, status_code",
+    [
+        ["put", {"json": {"is_active": False}}, 200],
+        ["delete", {}, 202],
+    ],
+)
+def test_user_mutation_query_count(test_app, queries, method, kwargs, status_code):
+    """ユーザー更新・削除（無効化と削除ジョブの登録）: 存在確認を兼ねて1クエリ"""
+    queries.row = USER
+
+    response = getattr(test_app, method)("/api/users/1/", **kwargs)
+
+    assert response.status_code == status_code
+    assert len(queries) == 1
+
+
+def test_generate_idea_query_count(test_app, auth_headers, queries, monkeypatch):
+    """アイデア生成: ノートの取得と生成履歴の保存で2クエリ"""
+
+    class MockAIProvider:
+        async def generate(self, prompt, context):
+            return "Generated content"
+
+    monkeypatch.setattr(ai_service, "get_ai_provider", lambda name: MockAIProvider())
+    monkeypatch.setattr(rate_limit, "_backend", rate_limit.MemoryRateLimitBackend())
+    queries.row = {
+        **NOTE,
+        "note_ids": [1],
+        "ai_provider": "openai",
+    }
+
+    response = test_app.post(
+        "/api/ai/generate-idea", json={"note_ids": [1]}, headers=auth_headers
+    )
+
+    assert response.status_code == 200
+    assert response.json()["generated_content"] == "Generated content"
+    assert len(queries) == 2
+
+
+def test_save_generation_as_note_query_count(test_app, auth_headers, queries):
+    """生成結果のノート保存: 生成履歴の参照とノートの作成で1クエリ"""
+    queries.row = NOTE
+
+    response = test_app.post(
+        "/api/ai/save-as-note",
+        json={"generation_id": 1, "title": "Test Note"},
+        headers=auth_headers,
+    )
+
+    assert response.status_code == 201
+    assert len(queries) == 1
+
+
+def test_note_reads_cached_until_write(test_app, auth_headers, queries):
+    """ノート一覧・詳細: 2回目以降はキャッシュから返し、書き込み後は読み直す"""
+    queries.row = {**NOTE, "count": 1, "last_modified": datetime(2024, 1, 1)}
+
+    for _ in range(2):
+        assert test_app.get("/api/notes", headers=auth_headers).status_code == 200
+        assert test_app.get("/api/notes/1", headers=auth_headers).status_code == 200
+    # バージョン・一覧・詳細で3クエリ（2回目は0クエリ）
+    assert len(queries) == 3
+
+    queries.clear()
+    response = test_app.post(
+        "/api/notes", json={"title": "New", "content": "x"}, headers=auth_headers
+    )
+    assert response.status_code == 201
+    assert test_app.get("/api/notes", headers=auth_headers).status_code == 200
+    # 作成で1クエリ、一覧はバージョンと一覧を読み直して2クエリ
+    assert len(queries) == 3
+
+
+def test_favorites_cached_until_note_owner_writes(test_app, auth_headers, queries):
+    """お気に入り一覧: 他のユーザーのノートが更新されると読み直す"""
+    queries.row = {
+        **NOTE,
+        "user_id": 2,
+        "owner_id": 2,
+        "owner_ids": [2],
+        "count": 1,
+        "last_modified": datetime(2024, 1, 1),
+    }
+
+    for _ in range(2):
+        assert test_app.get("/api/favorites", headers=auth_headers).status_code == 200
+    assert len(queries) == 2
+
+    note_service.read_cache.bump(2)
+    assert test_app.get("/api/favorites", headers=auth_headers).status_code == 200
+    assert len(queries) == 4
+
+
+
+async def last_change_seq(db, user_id: int) -> int:
+    return await db.fetch_val(
+        "SELECT coalesce(max(last_seq), 0) FROM sync_counters WHERE user_id = :id",
+        {"id": user_id},
+    )
+
+
+async def test_add_favorite_against_database(db, db_user):
+    """実際のDBで: 重複時は既存のお気に入りを返し、存在しないノートには追加しない"""
+    user_id = db_user["id"]
+    note = await note_service.create_note(NoteCreate(title="T", content="C"), user_id)
+    payload = FavoriteCreate(note_id=note["id"])
+
+    first = await favorite_service.add_favorite(payload, user_id)
+    again = await favorite_service.add_favorite(payload, user_id)
+    assert (again["id"], again["created_date"]) == (first["id"], first["created_date"])
+
+    missing = await db.fetch_val("SELECT coalesce(max(id), 0) + 1000 FROM notes")
+    payload = FavoriteCreate(note_id=missing)
+    assert await favorite_service.add_favorite(payload, user_id) is None
+    favorites = await favorite_service.get_favorites(user_id)
+    assert [favorite["id"] for favorite in favorites] == [note["id"]]
+
+
+async def test_save_missing_generation_against_database(db, db_user):
+    """実際のDBで: 存在しない生成履歴からはノートを作らず、変更シーケンスも進めない"""
+    user_id = db_user["id"]
+    await note_service.create_note(NoteCreate(title="T", content="C"), user_id)
+    before = await last_change_seq(db, user_id)
+
+    with pytest.raises(HTTPException) as error:
+        await ai_service.save_generation_as_note(0, user_id, "title")
+    assert error.value.status_code == 404
+    assert await last_change_seq(db, user_id) == before
+    assert len(await note_service.get_all_notes(user_id)) == 1
+
+
+async def test_create_duplicate_user_against_database(db, db_user):
+    """実際のDBで: 既存のユーザー名では作成せず None を返す"""
+    payload = UserCreate(username=db_user["username"], password="password123")
+    assert await user_service.create_user(payload) is None
+    user = await user_service.get_by_username(db_user["username"])
+    assert user["id"] == db_user["id"]
@@ -0,0 +1,126 @@
+"""レート制限のテスト
+
+Postgres のバックエンドはローカルの Postgres（DATABASE_URL）、Redis のバックエンドは
+RATE_LIMIT_REDIS_URL のサーバーで実行する（Redis に接続できない場合はスキップ）
+"""
+
+import asyncio
+import uuid
+
+import pytest
+from app.core import rate_limit
+from app.core.config import settings
+from app.services import ai_service
+
+
+def test_parse_rate():
+    """レート指定の解析"""
+    assert rate_limit.parse_rate("10/hour") == (10, 10 / 3600)
+    assert rate_limit.parse_rate("5/minutes") == (5, 5 / 60)
+
+    with pytest.raises(ValueError):
+        rate_limit.parse_rate("10/fortnight")
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_token_bucket():
+    """トークンバケット: 容量まで許可し、時間経過で補充される"""
+    now = [0.0]
+    backend = rate_limit.MemoryRateLimitBackend(clock=lambda: now[0])
+
+    results = [await backend.consume("scope:1", 3, 1.0) for _ in range(4)]
+    assert [r.allowed for r in results] == [True, True, True, False]
+    assert results[2].remaining == 0
+    assert results[3].retry_after == 1
+
+    # 別ユーザーのバケットは独立
+    assert (await backend.consume("scope:2", 3, 1.0)).allowed
+
+    now[0] = 1.5
+    result = await backend.consume("scope:1", 3, 1.0)
+    assert result.allowed
+    assert result.remaining == 0
+    assert result.headers()["RateLimit-Reset"] == "3"
+
+
+def test_generate_idea_rate_limited(
+    test_app, auth_headers, mock_current_user, monkeypatch
+):
+    """ユーザーごとの上限を超えると429とRateLimitヘッダーを返す"""
+
+    async def mock_generate_idea(note_ids, user_id, prompt, ai_provider):
+        return {
+            "id": 1,
+            "user_id": user_id,
+            "note_ids": note_ids,
+            "prompt": "Test prompt",
+            "ai_provider": ai_provider,
+            "generated_content": "Generated content",
+            "created_date": "2024-01-01T00:00:00",
+        }
+
+    monkeypatch.setattr(ai_service, "generate_idea", mock_generate_idea)
+    monkeypatch.setattr(rate_limit, "_backend", rate_limit.MemoryRateLimitBackend())
+
+    payload = {"note_ids": [1]}
+    for i in range(10):
+        response = test_app.post(
+            "/api/ai/generate-idea", json=payload, headers=auth_headers
+        )
+        assert response.status_code == 200
+        assert response.headers["ratelimit-limit"] == "10"
+        assert response.headers["ratelimit-remaining"] == str(9 - i)
+
+    response = test_app.post(
+        "/api/ai/generate-idea", json=payload, headers=auth_headers
+    )
+    assert response.status_code == 429
+    assert response.headers["ratelimit-remaining"] == "0"
+    assert int(response.headers["retry-after"]) > 0
+
+    # 検証エラー（422）のリクエストは回数に数えない
+    monkeypatch.setattr(rate_limit, "_backend", rate_limit.MemoryRateLimitBackend())
+    response = test_app.post(
+        "/api/ai/generate-idea", json={"note_ids": []}, headers=auth_headers
+    )
+    assert response.status_code == 422
+    response = test_app.post(
+        "/api/ai/generate-idea", json=payload, headers=auth_headers
+    )
+    assert response.headers["ratelimit-remaining"] == "9"
+
+
+async def assert_token_bucket(backend: rate_limit.RateLimitBackend) -> None:
+    """容量まで許可して拒否し、時間経過で補充される（1秒あたり10トークン）"""
+    key = f"test:{uuid.uuid4().hex}"
+    results = [await backend.consume(key, 2, 10.0) for _ in range(3)]
+    assert [r.allowed for r in results] == [True, True, False]
+    assert results[2].remaining == 0
+    assert results[2].retry_after == 1
+
+    # 別のキーのバケットは独立
+    assert (await backend.consume(f"{key}:other", 2, 10.0)).allowed
+
+    await asyncio.sleep(0.15)
+    result = await backend.consume(key, 2, 10.0)
+    assert result.allowed
+    assert 0 < result.tokens < 1
+
+
+async def test_postgres_backend_token_bucket(db):
+    """Postgres のバックエンド（INSERT ... ON CONFLICT DO UPDATE）"""
+    await assert_token_bucket(rate_limit.PostgresRateLimitBackend())
+
+
+async def test_redis_backend_token_bucket():
+    """Redis のバックエンド（Lua スクリプト）"""
+    pytest.importorskip("redis")
+    backend = rate_limit.RedisRateLimitBackend(settings.RATE_LIMIT_REDIS_URL)
+    try:
+        await backend.client.ping()
+    except Exception:
+        pytest.skip("Redis is not available")
+    try:
+        await assert_token_bucket(backend)
+    finally:
+        await backend.client.aclose()
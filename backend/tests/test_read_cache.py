@@ -0,0 +1,139 @@
+"""読み取りキャッシュのテスト"""
+
+import asyncio
+
+import pytest
+from app.core.read_cache import ReadCache
+
+
+def make_cache(**kwargs):
+    options = {"max_entries": 100, "max_bytes": 1024 * 1024, "ttl_seconds": 60}
+    return ReadCache(**{**options, **kwargs})
+
+
+def loader(value):
+    """呼び出し回数を数えるローダー"""
+
+    async def load():
+        load.calls += 1
+        return value
+
+    load.calls = 0
+    return load
+
+
+@pytest.mark.asyncio
+async def test_hit_until_user_writes():
+    """書き込み（世代の更新）まではキャッシュを返し、他のユーザーの書き込みでは無効にならない"""
+    cache = make_cache()
+    load = loader([{"id": 1, "title": "a"}])
+
+    await cache.get_or_load(("notes", 1), 1, load)
+    await cache.get_or_load(("notes", 1), 1, load)
+    assert load.calls == 1
+
+    cache.bump(2)
+    await cache.get_or_load(("notes", 1), 1, load)
+    assert load.calls == 1
+
+    cache.bump(1)
+    await cache.get_or_load(("notes", 1), 1, load)
+    assert load.calls == 2
+    assert cache.stats.summary()["hit_rate"] == 0.5
+    assert cache.stats.stale == 1
+
+
+@pytest.mark.asyncio
+async def test_owner_write_invalidates():
+    """他のユーザーのノートを含む結果は、ノートの所有者の書き込みでも無効になる"""
+    cache = make_cache()
+    load = loader([{"id": 1, "owner_id": 2}])
+
+    def owners(rows):
+        return {row["owner_id"] for row in rows}
+
+    await cache.get_or_load(("favorites", 1), 1, load, owners=owners)
+    await cache.get_or_load(("favorites", 1), 1, load, owners=owners)
+    assert load.calls == 1
+
+    cache.bump(2)
+    await cache.get_or_load(("favorites", 1), 1, load, owners=owners)
+    assert load.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_write_during_load_not_cached():
+    """読み込み中に書き込まれた場合、古い可能性がある結果は保存しない"""
+    cache = make_cache()
+    loading = asyncio.Event()
+    written = asyncio.Event()
+
+    async def slow_load():
+        loading.set()
+        await written.wait()
+        return [{"id": 1}]
+
+    async def write():
+        await loading.wait()
+        cache.bump(1)
+        written.set()
+
+    await asyncio.gather(cache.get_or_load(("notes", 1), 1, slow_load), write())
+    assert ("notes", 1) not in cache.entries
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_by_entries_and_bytes():
+    """エントリ数・推定メモリ使用量の上限を超えたら最近使われていないものから破棄する"""
+    cache = make_cache(max_entries=2)
+    for key in ("a", "b"):
+        await cache.get_or_load(key, 1, loader([{"id": 1}]))
+    await cache.get_or_load("a", 1, loader(None))
+    await cache.get_or_load("c", 1, loader([{"id": 1}]))
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.stats.evictions == 1
+
+    cache = make_cache(max_bytes=2000)
+    row = {"content": "x" * 500}
+    for key in ("a", "b", "c"):
+        await cache.get_or_load(key, 1, loader([row]))
+    assert list(cache.entries) == ["b", "c"]
+    assert cache.size <= 2000
+
+    # 上限より大きい結果は保存しない
+    await cache.get_or_load("d", 1, loader([row] * 10))
+    assert "d" not in cache.entries
+
+
+@pytest.mark.asyncio
+async def test_ttl_and_generation_table_eviction():
+    """期限切れで無効になり、世代の表から破棄したユーザーの書き込みも見逃さない"""
+    now = [0.0]
+    cache = make_cache(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+    load = loader([{"id": 1}])
+
+    await cache.get_or_load("notes", 1, load)
+    now[0] = 10.0
+    await cache.get_or_load("notes", 1, load)
+    assert load.calls == 2
+
+    # ユーザー1の世代を表から押し出しても、以前の世代のエントリは有効にならない
+    cache.bump(1)
+    await cache.get_or_load("notes", 1, load)
+    cache.bump(1, 2, 3)
+    await cache.get_or_load("notes", 1, load)
+    cache.bump(4, 5)
+    assert 1 not in cache._generations
+    await cache.get_or_load("notes", 1, load)
+    assert load.calls == 5
+
+
+@pytest.mark.asyncio
+async def test_disabled():
+    """max_entries が 0 の場合は常に読み込む"""
+    cache = make_cache(max_entries=0)
+    load = loader([{"id": 1}])
+    await cache.get_or_load("notes", 1, load)
+    await cache.get_or_load("notes", 1, load)
+    assert load.calls == 2
+    assert not cache.entries
@@ -15,9 +15,6 @@ def test_create_user(test_app, monkeypatch):
         "created_date": "2024-01-01T00:00:00",
     }
 
-    async def mock_get_by_username(username):
-        return None
-
     async def mock_create_user(payload):
         return {
             "id": 1,
@@ -26,10 +23,9 @@ def test_create_user(test_app, monkeypatch):
             "created_date": datetime(2024, 1, 1),
         }
 
-    monkeypatch.setattr(user_service, "get_by_username", mock_get_by_username)
     monkeypatch.setattr(user_service, "create_user", mock_create_user)
 
-    response = test_app.post("/api/users/", content=json.dumps(test_request_payload))
+    response = test_app.post("/api/users/", json=test_request_payload)
 
     assert response.status_code == 201
     assert response.json()["username"] == "testuser"
@@ -40,12 +36,13 @@ def test_create_user_duplicate_username(test_app, monkeypatch):
     """重複ユーザー名のテスト"""
     test_request_payload = {"username": "testuser", "password": "password123"}
 
-    async def mock_get_by_username(username):
-        return {"id": 1, "username": "testuser"}
+    async def mock_create_user(payload):
+        # 一意制約により作成されない
+        return None
 
-    monkeypatch.setattr(user_service, "get_by_username", mock_get_by_username)
+    monkeypatch.setattr(user_service, "create_user", mock_create_user)
 
-    response = test_app.post("/api/users/", content=json.dumps(test_request_payload))
+    response = test_app.post("/api/users/", json=test_request_payload)
 
     assert response.status_code == 400
     assert response.json()["detail"] == "Username already exists"
@@ -55,20 +52,18 @@ def test_create_user_invalid_json(test_app):
     """無効なユーザーデータのテスト"""
     # パスワードが短すぎる
     response = test_app.post(
-        "/api/users/", content=json.dumps({"username": "testuser", "password": "123"})
+        "/api/users/", json={"username": "testuser", "password": "123"}
     )
     assert response.status_code == 422
 
     # ユーザー名が短すぎる
     response = test_app.post(
-        "/api/users/", content=json.dumps({"username": "ab", "password": "password123"})
+        "/api/users/", json={"username": "ab", "password": "password123"}
     )
     assert response.status_code == 422
 
     # パスワードが欠落
-    response = test_app.post(
-        "/api/users/", content=json.dumps({"username": "testuser"})
-    )
+    response = test_app.post("/api/users/", json={"username": "testuser"})
     assert response.status_code == 422
 
 
@@ -127,28 +122,114 @@ def test_read_all_users(test_app, monkeypatch):
         },
     ]
 
-    async def mock_get_all_users():
-        return test_data
+    async def mock_get_users(after, limit, is_active, created_from, created_to):
+        return test_data, None
 
-    monkeypatch.setattr(user_service, "get_all_users", mock_get_all_users)
+    monkeypatch.setattr(user_service, "get_users", mock_get_users)
 
     response = test_app.get("/api/users/")
     assert response.status_code == 200
     assert len(response.json()) == 2
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_read_all_users_pagination(test_app, monkeypatch):
+    """次のページがある場合はカーソルを返し、after に指定すると続きから取得する"""
+    calls = []
+
+    async def mock_get_users(after, limit, is_active, created_from, created_to):
+        calls.append((after, limit, is_active, created_from))
+        user = {
+            "id": 5,
+            "username": "user5",
+            "is_active": False,
+            "created_date": datetime(2024, 1, 5),
+        }
+        return [user], (user["created_date"], user["id"])
+
+    monkeypatch.setattr(user_service, "get_users", mock_get_users)
+
+    response = test_app.get(
+        "/api/users/",
+        params={"limit": 1, "is_active": "false", "created_from": "2024-01-01"},
+    )
+    assert response.status_code == 200
+    assert response.json()[0]["username"] == "user5"
+    cursor = response.headers["X-Next-Cursor"]
+    assert calls[0] == (None, 1, False, datetime(2024, 1, 1))
+
+    response = test_app.get("/api/users/", params={"after": cursor})
+    assert response.status_code == 200
+    assert calls[1][0] == (datetime(2024, 1, 5), 5)
+
+    # 形式が不正・日時が範囲外のカーソル
+    for after in ("invalid", f"{10**30}.1", f"0.{2**31}"):
+        response = test_app.get("/api/users/", params={"after": after})
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_read_all_users_ndjson(test_app, monkeypatch):
+    """format=ndjson の場合はバッチごとに1行1件のJSONで送る"""
+
+    async def mock_iter_users(after, is_active, created_from, created_to):
+        for batch in range(2):
+            yield [
+                {
+                    "id": batch * 2 + i,
+                    "username": f"user{batch * 2 + i}",
+                    "is_active": True,
+                    "created_date": datetime(2024, 1, 1),
+                }
+                for i in (1, 2)
+            ]
+
+    monkeypatch.setattr(user_service, "iter_users", mock_iter_users)
+
+    response = test_app.get("/api/users/", params={"format": "ndjson"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = response.text.splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [1, 2, 3, 4]
+    assert json.loads(lines[0])["created_date"] == "2024-01-01T00:00:00"
+
+
+def test_get_users_keyset_query(monkeypatch):
+    """一覧は password_hash を読み込まず、OFFSET ではなくキーセットで続きを読む"""
+    import asyncio
+    from sqlalchemy.dialects import postgresql
+    from app import database
+
+    queries = []
+
+    async def mock_fetch_all(query):
+        queries.append(str(query.compile(dialect=postgresql.dialect())))
+        users = [{"id": i, "created_date": datetime(2024, 1, i)} for i in range(1, 4)]
+        # 1ページ目は limit + 1 件、エクスポートは1件の後に空のバッチ
+        return {1: users, 2: users[2:]}.get(len(queries), [])
+
+    monkeypatch.setattr(database.database, "fetch_all", mock_fetch_all)
+
+    users, position = asyncio.run(user_service.get_users(limit=2, is_active=True))
+    assert [user["id"] for user in users] == [1, 2]
+    assert position == (datetime(2024, 1, 2), 2)
+    assert "password_hash" not in queries[0]
+    assert "OFFSET" not in queries[0]
+
+    async def export():
+        batches = user_service.iter_users(position, batch_size=1)
+        return [batch async for batch in batches]
+
+    batches = asyncio.run(export())
+    assert [[user["id"] for user in batch] for batch in batches] == [[3]]
+    assert "(users.created_date, users.id) >" in queries[1]
+    assert len(queries) == 3
 
 
 def test_update_user(test_app, monkeypatch):
     """ユーザー更新のテスト"""
     test_payload = {"password": "newpassword123", "is_active": False}
 
-    async def mock_get_user(user_id):
-        return {
-            "id": 1,
-            "username": "testuser",
-            "is_active": True,
-            "created_date": datetime(2024, 1, 1),
-        }
-
     async def mock_update_user(user_id, payload):
         return {
             "id": 1,
@@ -157,10 +238,9 @@ def test_update_user(test_app, monkeypatch):
             "created_date": datetime(2024, 1, 1),
         }
 
-    monkeypatch.setattr(user_service, "get_user", mock_get_user)
     monkeypatch.setattr(user_service, "update_user", mock_update_user)
 
-    response = test_app.put("/api/users/1/", content=json.dumps(test_payload))
+    response = test_app.put("/api/users/1/", json=test_payload)
     assert response.status_code == 200
     assert response.json()["is_active"] is False
 
@@ -169,12 +249,12 @@ def test_update_user_not_found(test_app, monkeypatch):
     """存在しないユーザーの更新テスト"""
     test_payload = {"password": "newpassword123"}
 
-    async def mock_get_user(user_id):
+    async def mock_update_user(user_id, payload):
         return None
 
-    monkeypatch.setattr(user_service, "get_user", mock_get_user)
+    monkeypatch.setattr(user_service, "update_user", mock_update_user)
 
-    response = test_app.put("/api/users/999/", content=json.dumps(test_payload))
+    response = test_app.put("/api/users/999/", json=test_payload)
     assert response.status_code == 404
     assert response.json()["detail"] == "User not found"
 
@@ -199,7 +279,7 @@ def test_update_user_invalid(test_app, monkeypatch, user_id, payload, status_cod
 
     monkeypatch.setattr(user_service, "get_user", mock_get_user)
 
-    response = test_app.put(f"/api/users/{user_id}/", content=json.dumps(payload))
+    response = test_app.put(f"/api/users/{user_id}/", json=payload)
     assert response.status_code == status_code
 
 
@@ -208,31 +288,143 @@ def test_delete_user(test_app, monkeypatch):
     test_data = {
         "id": 1,
         "username": "testuser",
-        "is_active": True,
+        "is_active": False,
         "created_date": datetime(2024, 1, 1),
     }
 
-    async def mock_get_user(user_id):
-        return test_data
-
     async def mock_delete_user(user_id):
-        return user_id
+        return test_data
 
-    monkeypatch.setattr(user_service, "get_user", mock_get_user)
     monkeypatch.setattr(user_service, "delete_user", mock_delete_user)
 
+    # 無効化して受け付け、データはバックグラウンドで削除する
     response = test_app.delete("/api/users/1/")
-    assert response.status_code == 200
+    assert response.status_code == 202
     assert response.json()["username"] == "testuser"
+    assert response.json()["is_active"] is False
+
+
+def test_read_user_deletion(test_app, monkeypatch):
+    """ユーザー削除の進捗の取得"""
+
+    async def mock_get_account_deletion(user_id):
+        if user_id != 1:
+            return None
+        return {
+            "user_id": 1,
+            "stage": "notes",
+            "favorites_deleted": 3,
+            "generations_deleted": 10,
+            "revisions_deleted": 1500,
+            "notes_deleted": 500,
+            "last_error": None,
+            "requested_date": datetime(2024, 1, 1),
+            "updated_date": datetime(2024, 1, 1, 0, 1),
+            "completed_date": None,
+        }
+
+    monkeypatch.setattr(
+        user_service, "get_account_deletion", mock_get_account_deletion
+    )
+
+    response = test_app.get("/api/users/1/deletion")
+    assert response.status_code == 200
+    assert response.json()["stage"] == "notes"
+    assert response.json()["notes_deleted"] == 500
+
+    response = test_app.get("/api/users/2/deletion")
+    assert response.status_code == 404
+
+
+def test_account_deletion_batch_single_statement():
+    """1バッチの削除と進捗・占有期限の更新は1ステートメントで、占有中の場合のみ削除する"""
+    from sqlalchemy import update
+    from sqlalchemy.dialects import postgresql
+    from app.models.account_deletion import AccountDeletion
+
+    deleted, counted = user_service._deleted_rows("notes", 1, 500)
+    assert list(counted) == ["favorites"]
+    query = update(AccountDeletion.__table__).values(
+        notes_deleted=AccountDeletion.notes_deleted + 1
+    )
+    for cte in [deleted, *counted.values()]:
+        query = query.add_cte(cte)
+    sql = str(query.compile(dialect=postgresql.dialect()))
+
+    assert "DELETE FROM notes" in sql
+    # 他のユーザーがお気に入りに追加したノートも削除できるよう、お気に入りも削除する
+    assert "DELETE FROM favorites" in sql
+    assert "account_deletions.lease_owner" in sql
+    assert "LIMIT" in sql
+
+
+def test_account_deletion_resumes_and_restarts(monkeypatch):
+    """記録された段階から再開し、削除中に作成されたデータがあれば最初から削除し直す"""
+    import asyncio
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "ACCOUNT_DELETION_BATCH_SIZE", 2)
+    monkeypatch.setattr(settings, "ACCOUNT_DELETION_BATCH_DELAY_MS", 0)
+    remaining = {"favorites": 0, "generations": 0, "revisions": 3, "notes": 3}
+    calls = []
+
+    async def mock_delete_batch(user_id, stage, batch_size):
+        deleted = min(remaining[stage], batch_size)
+        remaining[stage] -= deleted
+        calls.append((stage, deleted))
+        return deleted
+
+    async def mock_set_stage(user_id, stage):
+        calls.append(("stage", stage))
+        return True
+
+    users_deleted = iter([False, True])
+
+    async def mock_delete_user(user_id):
+        calls.append(("user", None))
+        if not calls.count(("user", None)) > 1:
+            # 受付前に始まったリクエストがノートを作成していた
+            remaining["notes"] = 1
+        return next(users_deleted)
+
+    monkeypatch.setattr(user_service, "_delete_account_batch", mock_delete_batch)
+    monkeypatch.setattr(user_service, "_set_account_deletion_stage", mock_set_stage)
+    monkeypatch.setattr(user_service, "_delete_account_user", mock_delete_user)
+
+    assert asyncio.run(user_service._run_account_deletion(1, "revisions"))
+    assert calls[:8] == [
+        ("revisions", 2),
+        ("revisions", 1),
+        ("stage", "notes"),
+        ("notes", 2),
+        ("notes", 1),
+        ("stage", "user"),
+        ("user", None),
+        ("stage", "favorites"),
+    ]
+    assert ("notes", 1) in calls[8:]
+    assert calls[-1] == ("user", None)
+
+
+def test_account_deletion_stops_when_lease_lost(monkeypatch):
+    """占有期限が切れて他のワーカーが引き継いだ場合は処理をやめる"""
+    import asyncio
+
+    async def mock_delete_batch(user_id, stage, batch_size):
+        return None
+
+    monkeypatch.setattr(user_service, "_delete_account_batch", mock_delete_batch)
+
+    assert not asyncio.run(user_service._run_account_deletion(1, "favorites"))
 
 
 def test_delete_user_not_found(test_app, monkeypatch):
     """存在しないユーザーの削除テスト"""
 
-    async def mock_get_user(user_id):
+    async def mock_delete_user(user_id):
         return None
 
-    monkeypatch.setattr(user_service, "get_user", mock_get_user)
+    monkeypatch.setattr(user_service, "delete_user", mock_delete_user)
 
     response = test_app.delete("/api/users/999/")
     assert response.status_code == 404
@@ -243,3 +435,68 @@ def test_delete_user_invalid_id(test_app):
     """無効なIDでの削除テスト"""
     response = test_app.delete("/api/users/0/")
     assert response.status_code == 422
+
+
+async def test_account_deletion_against_database(db, db_user, monkeypatch):
+    """
+    実際のDBでの削除: ノート・リビジョン・お気に入り・生成履歴を複数のバッチで削除し、
+    他のユーザーのお気に入り（削除するノートへの）も削除して数える
+    """
+    import uuid
+    from app.core.config import settings
+    from app.schemas.favorite_schema import FavoriteCreate
+    from app.schemas.note_schema import NoteCreate, NoteUpdate
+    from app.schemas.user_schema import UserCreate
+    from app.services import ai_service, favorite_service, note_service
+
+    monkeypatch.setattr(settings, "ACCOUNT_DELETION_BATCH_SIZE", 2)
+    monkeypatch.setattr(settings, "ACCOUNT_DELETION_BATCH_DELAY_MS", 0)
+    await ai_service.maintain_generation_partitions(drop_expired=False)
+    user_id = db_user["id"]
+    other = await user_service.create_user(
+        UserCreate(username=f"test_{uuid.uuid4().hex[:12]}", password="password123")
+    )
+    other_note = await note_service.create_note(
+        NoteCreate(title="other", content="C"), other["id"]
+    )
+    notes = [
+        await note_service.create_note(NoteCreate(title=f"n{i}", content="C"), user_id)
+        for i in range(3)
+    ]
+    await note_service.update_note(notes[0]["id"], user_id, NoteUpdate(content="C2"))
+    for note in [notes[0], notes[1], other_note]:
+        await favorite_service.add_favorite(FavoriteCreate(note_id=note["id"]), user_id)
+    await favorite_service.add_favorite(
+        FavoriteCreate(note_id=notes[2]["id"]), other["id"]
+    )
+    await ai_service.insert_generation(
+        user_id, [notes[0]["id"]], "prompt", "openai", "generated"
+    )
+    revisions = await db.fetch_val(
+        "SELECT count(*) FROM note_revisions WHERE user_id = :user_id",
+        {"user_id": user_id},
+    )
+
+    assert await user_service.delete_user(user_id)
+    assert await user_service.process_account_deletions() >= 1
+
+    progress = await user_service.get_account_deletion(user_id)
+    assert progress["stage"] == "completed"
+    assert progress["favorites_deleted"] == 4
+    assert progress["notes_deleted"] == 3
+    assert progress["revisions_deleted"] == revisions > 0
+    assert progress["generations_deleted"] == 1
+    assert await user_service.get_user(user_id) is None
+    for table, column in [
+        ("notes", "user_id"),
+        ("note_revisions", "user_id"),
+        ("favorites", "user_id"),
+        ("ai_generations", "user_id"),
+    ]:
+        assert not await db.fetch_val(
+            f"SELECT count(*) FROM {table} WHERE {column} = :user_id",
+            {"user_id": user_id},
+        )
+    # 他のユーザーのノートは残り、削除したノートへのお気に入りだけが消える
+    assert await note_service.get_note(other_note["id"], other["id"])
+    assert not await favorite_service.is_favorite(notes[2]["id"], other["id"])
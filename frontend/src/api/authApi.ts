@@ -12,6 +12,7 @@ export interface RegisterRequest {
 
 export interface AuthResponse {
   access_token: string;
+  refresh_token: string;
   token_type: string;
 }
 
@@ -37,6 +38,7 @@ export const login = async (data: LoginRequest): Promise<AuthResponse> => {
   
   // トークンをローカルストレージに保存
   localStorage.setItem('access_token', response.data.access_token);
+  localStorage.setItem('refresh_token', response.data.refresh_token);
   localStorage.setItem('username', data.username);
   
   return response.data;
@@ -48,9 +50,23 @@ export const register = async (data: RegisterRequest): Promise<UserResponse> =>
   return response.data;
 };
 
-// ログアウト
+// ログアウト（アクセストークンとリフレッシュトークンをサーバー側でも失効させる）
 export const logout = () => {
+  const accessToken = localStorage.getItem('access_token');
+  const refreshToken = localStorage.getItem('refresh_token');
+  if (refreshToken) {
+    // リクエストインターセプターは非同期に実行され、その時点では下でトークンを
+    // 削除済みのため、アクセストークンは削除前に読み出して明示的に付ける
+    apiClient
+      .post(
+        '/api/auth/logout',
+        { refresh_token: refreshToken },
+        accessToken ? { headers: { Authorization: `Bearer ${accessToken}` } } : undefined
+      )
+      .catch(() => {});
+  }
   localStorage.removeItem('access_token');
+  localStorage.removeItem('refresh_token');
   localStorage.removeItem('username');
 };
 
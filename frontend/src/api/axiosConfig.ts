@@ -1,6 +1,6 @@
 import axios from 'axios';
 
-const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
+export const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
 // Axiosインスタンスを作成
 export const apiClient = axios.create({
@@ -24,13 +24,73 @@ apiClient.interceptors.request.use(
     }
 );
 
-// レスポンスインターセプター：401エラーでログアウト
+// リフレッシュトークンでアクセストークンを更新
+// 使用済みのリフレッシュトークンを再び使うとセッションごと失効するため、同じタブの
+// 同時の401は1回の更新にまとめ、タブ間では Web Locks で順番に更新する
+let refreshing: Promise<string | null> | null = null;
+
+const postRefresh = async (failedToken: string | null): Promise<string | null> => {
+    // 待っている間に別のタブが更新していれば、その結果を使う
+    const accessToken = localStorage.getItem('access_token');
+    if (accessToken && accessToken !== failedToken) {
+        return accessToken;
+    }
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (!refreshToken) {
+        return null;
+    }
+    try {
+        const response = await axios.post(`${API_BASE_URL}/api/auth/refresh`, {
+            refresh_token: refreshToken,
+        });
+        localStorage.setItem('access_token', response.data.access_token);
+        localStorage.setItem('refresh_token', response.data.refresh_token);
+        return response.data.access_token as string;
+    } catch {
+        return null;
+    }
+};
+
+const refreshAccessToken = (failedToken: string | null): Promise<string | null> => {
+    if (!refreshing) {
+        refreshing = (
+            navigator.locks
+                ? navigator.locks.request('memoria-token-refresh', () =>
+                      postRefresh(failedToken)
+                  )
+                : postRefresh(failedToken)
+        ).finally(() => {
+            refreshing = null;
+        });
+    }
+    return refreshing;
+};
+
+// レスポンスインターセプター：401エラーでトークンを更新して再試行、更新できなければログアウト
 apiClient.interceptors.response.use(
     (response) => response,
-    (error) => {
+    async (error) => {
+        const request = error.config;
+        if (
+            error.response?.status === 401 &&
+            request &&
+            !request._retried &&
+            !request.url?.startsWith('/api/auth/')
+        ) {
+            request._retried = true;
+            // 401になったリクエストで送ったアクセストークン
+            const failedToken =
+                String(request.headers.Authorization ?? '').replace(/^Bearer /, '') || null;
+            const token = await refreshAccessToken(failedToken);
+            if (token) {
+                request.headers.Authorization = `Bearer ${token}`;
+                return apiClient(request);
+            }
+        }
         if (error.response?.status === 401) {
             // トークンが無効な場合、ローカルストレージをクリア
             localStorage.removeItem('access_token');
+            localStorage.removeItem('refresh_token');
             localStorage.removeItem('username');
             // ログインページにリダイレクト
             window.location.href = '/login';
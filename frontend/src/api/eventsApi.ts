@@ -0,0 +1,24 @@
+import { apiClient, API_BASE_URL } from './axiosConfig';
+
+export type ChangeEventType = 'note' | 'favorite' | 'generation';
+
+// 変更イベント（favorite の id はノートID）
+export interface ChangeEvent {
+  type: ChangeEventType;
+  id: number;
+  op: 'created' | 'updated' | 'deleted';
+  updated_date: string | null;
+}
+
+interface StreamTicketResponse {
+  ticket: string;
+  expires_in: number;
+}
+
+// 変更イベントのストリームを開く
+// EventSource は Authorization ヘッダーを付けられないため、使い捨てのチケットで接続する
+export const openChangeStream = async (): Promise<EventSource> => {
+  const response = await apiClient.post<StreamTicketResponse>('/api/events/tickets');
+  const ticket = encodeURIComponent(response.data.ticket);
+  return new EventSource(`${API_BASE_URL}/api/events?ticket=${ticket}`);
+};
@@ -0,0 +1,72 @@
+import { useEffect, useRef } from 'react';
+import { ChangeEvent, ChangeEventType, openChangeStream } from '../api/eventsApi';
+
+// 続けて届いたイベントはまとめて1回だけ読み直す
+const RELOAD_DELAY_MS = 300;
+// 切断後に新しいチケットで接続し直すまでの時間
+const RECONNECT_DELAY_MS = 3000;
+
+// 自分のデータの変更（他のタブ・端末での変更を含む）を受け取り、reload で読み直す
+// 切断中の変更は受け取れないため、再接続した時と resync を受け取った時も読み直す
+export const useChangeEvents = (types: ChangeEventType[], reload: () => void) => {
+  const reloadRef = useRef(reload);
+  reloadRef.current = reload;
+  const typesKey = types.join(',');
+
+  useEffect(() => {
+    let source: EventSource | null = null;
+    let stopped = false;
+    let connected = false;
+    let reloadTimer: ReturnType<typeof setTimeout> | undefined;
+    let reconnectTimer: ReturnType<typeof setTimeout> | undefined;
+
+    const scheduleReload = () => {
+      clearTimeout(reloadTimer);
+      reloadTimer = setTimeout(() => reloadRef.current(), RELOAD_DELAY_MS);
+    };
+
+    const reconnect = () => {
+      if (!stopped) {
+        reconnectTimer = setTimeout(connect, RECONNECT_DELAY_MS);
+      }
+    };
+
+    const connect = async () => {
+      let opened: EventSource;
+      try {
+        opened = await openChangeStream();
+      } catch {
+        reconnect();
+        return;
+      }
+      if (stopped) {
+        opened.close();
+        return;
+      }
+      opened.addEventListener('ready', () => {
+        if (connected) scheduleReload();
+        connected = true;
+      });
+      opened.addEventListener('change', (message) => {
+        const event: ChangeEvent = JSON.parse((message as MessageEvent).data);
+        if (typesKey.split(',').includes(event.type)) scheduleReload();
+      });
+      opened.addEventListener('resync', scheduleReload);
+      opened.onerror = () => {
+        // チケットは使い捨てのため、EventSource の自動再接続ではなく新しいチケットで接続する
+        opened.close();
+        source = null;
+        reconnect();
+      };
+      source = opened;
+    };
+
+    connect();
+    return () => {
+      stopped = true;
+      source?.close();
+      clearTimeout(reloadTimer);
+      clearTimeout(reconnectTimer);
+    };
+  }, [typesKey]);
+};
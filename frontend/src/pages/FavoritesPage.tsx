@@ -3,6 +3,7 @@ import { useNavigate } from 'react-router-dom';
 import { getFavorites, removeFavorite } from '../api/favoriteApi';
 import { Note, deleteNote } from '../api/noteApi';
 import { useAuthStore } from '../store/authStore';
+import { useChangeEvents } from '../hooks/useChangeEvents';
 
 export default function FavoritesPage() {
   const [favorites, setFavorites] = useState<Note[]>([]);
@@ -14,6 +15,9 @@ export default function FavoritesPage() {
     loadFavorites();
   }, []);
 
+  // 他のタブ・端末での変更を反映する
+  useChangeEvents(['favorite', 'note'], () => loadFavorites());
+
   const loadFavorites = async () => {
     try {
       const data = await getFavorites();
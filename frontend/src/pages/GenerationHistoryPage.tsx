@@ -3,6 +3,7 @@ import { useNavigate } from 'react-router-dom';
 import { useAuthStore } from '../store/authStore';
 import { useAIStore } from '../store/aiStore';
 import { AIGenerationResponse } from '../api/aiApi';
+import { useChangeEvents } from '../hooks/useChangeEvents';
 
 export default function GenerationHistoryPage() {
     const [savingId, setSavingId] = useState<number | null>(null);
@@ -28,6 +29,9 @@ export default function GenerationHistoryPage() {
         fetchGenerationHistory(1);
     }, []);
 
+    // 他のタブ・端末での生成を反映する
+    useChangeEvents(['generation'], () => fetchGenerationHistory(historyPage));
+
     const handlePageChange = (newPage: number) => {
         fetchGenerationHistory(newPage);
     };
@@ -5,6 +5,7 @@ import { addFavorite, removeFavorite, isFavorite } from '../api/favoriteApi';
 import { useAuthStore } from '../store/authStore';
 import { useAIStore } from '../store/aiStore';
 import IdeaGenerationModal from '../components/IdeaGenerationModal';
+import { useChangeEvents } from '../hooks/useChangeEvents';
 
 export default function NotesPage() {
   const [notes, setNotes] = useState<Note[]>([]);
@@ -22,6 +23,9 @@ export default function NotesPage() {
     loadNotes();
   }, []);
 
+  // 他のタブ・端末での変更を反映する
+  useChangeEvents(['note', 'favorite'], () => loadNotes());
+
   const loadNotes = async () => {
     try {
       const data = await getNotes();